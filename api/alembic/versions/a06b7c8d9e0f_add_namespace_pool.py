@@ -0,0 +1,39 @@
+"""add the warm namespace pool
+
+Revision ID: a06b7c8d9e0f
+Revises: ff5a6b7c8d9e
+Create Date: 2026-05-10 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "a06b7c8d9e0f"
+down_revision = "ff5a6b7c8d9e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "namespace_pool",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("cluster", sa.String(), nullable=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("deployment_id", sa.Uuid(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("claimed_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["cluster"], ["cluster.name"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_index(op.f("ix_namespace_pool_cluster"), "namespace_pool", ["cluster"], unique=False)
+    op.create_index(op.f("ix_namespace_pool_status"), "namespace_pool", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_namespace_pool_status"), table_name="namespace_pool")
+    op.drop_index(op.f("ix_namespace_pool_cluster"), table_name="namespace_pool")
+    op.drop_table("namespace_pool")
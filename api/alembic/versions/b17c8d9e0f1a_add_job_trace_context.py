@@ -0,0 +1,23 @@
+"""add the trace context of reconcile jobs
+
+Revision ID: b17c8d9e0f1a
+Revises: a06b7c8d9e0f
+Create Date: 2026-05-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "b17c8d9e0f1a"
+down_revision = "a06b7c8d9e0f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("deployment_reconcile_job", sa.Column("trace_context", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("deployment_reconcile_job", "trace_context")
@@ -0,0 +1,38 @@
+"""add catalog_revision counter for catalog ETags
+
+Revision ID: c7d8e9f0a1b2
+Revises: b4a8f1c2d3e5
+Create Date: 2026-04-06 10:00:00.000000
+
+"""
+from datetime import UTC, datetime
+from uuid import uuid4
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "c7d8e9f0a1b2"
+down_revision = "b4a8f1c2d3e5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    catalog_revision = op.create_table(
+        "catalog_revision",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("epoch", sa.String(), nullable=False),
+        sa.Column("revision", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # Seed the single counter row so the first catalog write only has to UPDATE.
+    op.bulk_insert(
+        catalog_revision,
+        [{"id": 1, "epoch": uuid4().hex, "revision": 1, "updated_at": datetime.now(UTC)}],
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("catalog_revision")
@@ -0,0 +1,48 @@
+"""add precomputed hostname paths to product_template_version
+
+Revision ID: d8e9f0a1b2c3
+Revises: c7d8e9f0a1b2
+Create Date: 2026-04-08 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "d8e9f0a1b2c3"
+down_revision = "c7d8e9f0a1b2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "product_template_version",
+        sa.Column("hostname_paths_json", sa.JSON(), nullable=True),
+    )
+
+    # Backfill existing templates so request handlers never have to write to
+    # catalog rows. Offline (--sql) runs cannot read the rows; the service
+    # computes paths for any template left NULL.
+    if op.get_context().as_sql:
+        return
+    from app.services.template_values import find_hostname_paths
+
+    template = sa.table(
+        "product_template_version",
+        sa.column("id", sa.Integer()),
+        sa.column("values_schema_json", sa.JSON()),
+        sa.column("hostname_paths_json", sa.JSON()),
+    )
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(template.c.id, template.c.values_schema_json)).fetchall()
+    for row in rows:
+        conn.execute(
+            template.update()
+            .where(template.c.id == row.id)
+            .values(hostname_paths_json=find_hostname_paths(row.values_schema_json))
+        )
+
+
+def downgrade() -> None:
+    op.drop_column("product_template_version", "hostname_paths_json")
@@ -0,0 +1,42 @@
+"""add mollie_webhook_inbox for queued webhook processing
+
+Revision ID: e9f0a1b2c3d4
+Revises: d8e9f0a1b2c3
+Create Date: 2026-04-09 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "e9f0a1b2c3d4"
+down_revision = "d8e9f0a1b2c3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "mollie_webhook_inbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("mollie_payment_id", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("received_at", sa.DateTime(), nullable=False),
+        sa.Column("run_after", sa.DateTime(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("locked_by", sa.String(), nullable=True),
+        sa.Column("locked_at", sa.DateTime(), nullable=True),
+        sa.Column("processed_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("mollie_payment_id"),
+    )
+    op.create_index(
+        op.f("ix_mollie_webhook_inbox_status"), "mollie_webhook_inbox", ["status"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_mollie_webhook_inbox_status"), table_name="mollie_webhook_inbox")
+    op.drop_table("mollie_webhook_inbox")
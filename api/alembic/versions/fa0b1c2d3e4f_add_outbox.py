@@ -0,0 +1,43 @@
+"""add outbox for deferred external side effects and mollie_payment.checkout_url
+
+Revision ID: fa0b1c2d3e4f
+Revises: e9f0a1b2c3d4
+Create Date: 2026-04-10 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "fa0b1c2d3e4f"
+down_revision = "e9f0a1b2c3d4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("run_after", sa.DateTime(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("locked_by", sa.String(), nullable=True),
+        sa.Column("locked_at", sa.DateTime(), nullable=True),
+        sa.Column("processed_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("key"),
+    )
+    op.create_index(op.f("ix_outbox_status"), "outbox", ["status"], unique=False)
+    op.add_column("mollie_payment", sa.Column("checkout_url", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("mollie_payment", "checkout_url")
+    op.drop_index(op.f("ix_outbox_status"), table_name="outbox")
+    op.drop_table("outbox")
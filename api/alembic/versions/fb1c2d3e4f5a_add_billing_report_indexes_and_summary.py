@@ -0,0 +1,52 @@
+"""add billing report indexes and the materialized billing summary
+
+Revision ID: fb1c2d3e4f5a
+Revises: fa0b1c2d3e4f
+Create Date: 2026-04-11 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "fb1c2d3e4f5a"
+down_revision = "fa0b1c2d3e4f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_subscription_status_payment_status_plan",
+        "subscription",
+        ["status", "payment_status", "plan_template_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_mollie_payment_status_created_at", "mollie_payment", ["status", "created_at"], unique=False
+    )
+    op.create_table(
+        "billing_plan_summary",
+        sa.Column("plan_template_id", sa.Integer(), nullable=False),
+        sa.Column("current", sa.Integer(), nullable=False),
+        sa.Column("arrears", sa.Integer(), nullable=False),
+        sa.Column("pending", sa.Integer(), nullable=False),
+        sa.Column("revenue_cents", sa.BigInteger(), nullable=False),
+        sa.Column("refreshed_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["plan_template_id"], ["plan_template_version.id"]),
+        sa.PrimaryKeyConstraint("plan_template_id"),
+    )
+    op.create_table(
+        "billing_summary_dirty",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("plan_template_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("billing_summary_dirty")
+    op.drop_table("billing_plan_summary")
+    op.drop_index("ix_mollie_payment_status_created_at", table_name="mollie_payment")
+    op.drop_index("ix_subscription_status_payment_status_plan", table_name="subscription")
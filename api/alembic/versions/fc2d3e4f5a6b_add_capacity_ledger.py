@@ -0,0 +1,48 @@
+"""add template resource footprints, deployment reservations and the capacity ledger
+
+Revision ID: fc2d3e4f5a6b
+Revises: fb1c2d3e4f5a
+Create Date: 2026-04-12 10:00:00.000000
+
+"""
+from datetime import UTC, datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "fc2d3e4f5a6b"
+down_revision = "fb1c2d3e4f5a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("product_template_version", sa.Column("footprint_cpu_millicores", sa.Integer(), nullable=True))
+    op.add_column("product_template_version", sa.Column("footprint_memory_bytes", sa.BigInteger(), nullable=True))
+    op.add_column("product_template_version", sa.Column("footprint_storage_bytes", sa.BigInteger(), nullable=True))
+    for column in ("reserved_cpu_millicores", "reserved_memory_bytes", "reserved_storage_bytes"):
+        op.add_column("deployment", sa.Column(column, sa.BigInteger(), nullable=False, server_default="0"))
+    capacity_ledger = op.create_table(
+        "capacity_ledger",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("cpu_millicores", sa.BigInteger(), nullable=False),
+        sa.Column("memory_bytes", sa.BigInteger(), nullable=False),
+        sa.Column("storage_bytes", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # Existing deployments have no footprint yet, so nothing is committed.
+    op.bulk_insert(
+        capacity_ledger,
+        [{"id": 1, "cpu_millicores": 0, "memory_bytes": 0, "storage_bytes": 0, "updated_at": datetime.now(UTC)}],
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("capacity_ledger")
+    for column in ("reserved_storage_bytes", "reserved_memory_bytes", "reserved_cpu_millicores"):
+        op.drop_column("deployment", column)
+    op.drop_column("product_template_version", "footprint_storage_bytes")
+    op.drop_column("product_template_version", "footprint_memory_bytes")
+    op.drop_column("product_template_version", "footprint_cpu_millicores")
@@ -0,0 +1,58 @@
+"""add the cluster registry and cluster placement of deployments and jobs
+
+Revision ID: fd3e4f5a6b7c
+Revises: fc2d3e4f5a6b
+Create Date: 2026-04-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "fd3e4f5a6b7c"
+down_revision = "fc2d3e4f5a6b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "cluster",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("kubeconfig", sa.String(), nullable=True),
+        sa.Column("kube_context", sa.String(), nullable=True),
+        sa.Column("enabled", sa.Boolean(), nullable=False),
+        sa.Column("capacity_cpu_millicores", sa.BigInteger(), nullable=True),
+        sa.Column("capacity_memory_bytes", sa.BigInteger(), nullable=True),
+        sa.Column("capacity_storage_bytes", sa.BigInteger(), nullable=True),
+        sa.Column("cpu_millicores", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("memory_bytes", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("storage_bytes", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    # Existing products and deployments stay unplaced: they keep running on
+    # the cluster the workers' default kubeconfig points at.
+    op.add_column("product", sa.Column("cluster", sa.String(), nullable=True))
+    op.create_foreign_key("product_cluster_fkey", "product", "cluster", ["cluster"], ["name"])
+    op.add_column("deployment", sa.Column("cluster", sa.String(), nullable=True))
+    op.create_foreign_key("deployment_cluster_fkey", "deployment", "cluster", ["cluster"], ["name"])
+    op.create_index(op.f("ix_deployment_cluster"), "deployment", ["cluster"], unique=False)
+    op.add_column("deployment_reconcile_job", sa.Column("cluster", sa.String(), nullable=True))
+    op.create_index(
+        op.f("ix_deployment_reconcile_job_cluster"), "deployment_reconcile_job", ["cluster"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_deployment_reconcile_job_cluster"), table_name="deployment_reconcile_job")
+    op.drop_column("deployment_reconcile_job", "cluster")
+    op.drop_index(op.f("ix_deployment_cluster"), table_name="deployment")
+    op.drop_constraint("deployment_cluster_fkey", "deployment", type_="foreignkey")
+    op.drop_column("deployment", "cluster")
+    op.drop_constraint("product_cluster_fkey", "product", type_="foreignkey")
+    op.drop_column("product", "cluster")
+    op.drop_table("cluster")
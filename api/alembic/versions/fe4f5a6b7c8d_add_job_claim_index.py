@@ -0,0 +1,27 @@
+"""index reconcile jobs by status and run_after for fair claiming
+
+Revision ID: fe4f5a6b7c8d
+Revises: fd3e4f5a6b7c
+Create Date: 2026-04-26 10:00:00.000000
+
+"""
+from alembic import op
+
+
+revision = "fe4f5a6b7c8d"
+down_revision = "fd3e4f5a6b7c"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_deployment_reconcile_job_status_run_after",
+        "deployment_reconcile_job",
+        ["status", "run_after"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_deployment_reconcile_job_status_run_after", table_name="deployment_reconcile_job")
@@ -0,0 +1,28 @@
+"""add reconcile job stages and rollout deadlines
+
+Revision ID: ff5a6b7c8d9e
+Revises: fe4f5a6b7c8d
+Create Date: 2026-05-03 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "ff5a6b7c8d9e"
+down_revision = "fe4f5a6b7c8d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "deployment_reconcile_job",
+        sa.Column("stage", sa.String(), nullable=False, server_default="reconcile"),
+    )
+    op.add_column("deployment_reconcile_job", sa.Column("deadline", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("deployment_reconcile_job", "deadline")
+    op.drop_column("deployment_reconcile_job", "stage")
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+
+from app.db import get_session
+from app.deps import require_admin
+from app.models import BillingReport, UserORM
+from app.services import billing_reports as billing_report_service
+
+router = APIRouter(prefix="/billing", tags=["billing"])
+
+
+@router.get("/report", response_model=BillingReport)
+def get_billing_report(
+    since: datetime | None = Query(None, description="Only count revenue from payments created since"),
+    live: bool = Query(False, description="Compute from the source tables even if a summary is materialized"),
+    current_user: UserORM = Depends(require_admin),
+    session: Session = Depends(get_session),
+) -> BillingReport:
+    return billing_report_service.billing_report(session, since=since, materialized=False if live else None)
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from typing import Any, Callable
+
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+from sqlmodel import Session
+
+from app.services import catalog as catalog_service
+
+# Catalog responses require authentication, so they must not land in shared
+# caches, and clients must revalidate (cheaply, via If-None-Match) on every use.
+CATALOG_CACHE_CONTROL = "private, no-cache"
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        # If-None-Match uses the weak comparison function (RFC 9110 §13.1.2).
+        if candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def catalog_response(
+    request: Request,
+    session: Session,
+    *,
+    key: str,
+    adapter: TypeAdapter,
+    load: Callable[[], Any],
+) -> Response:
+    """Serve a catalog read with a strong ETag and a cached serialized body.
+
+    Bodies are cached per ETag, so repeated reads (including ``304 Not
+    Modified`` answers to a matching ``If-None-Match``) do not run *load*.
+    """
+    etag = catalog_service.current_etag(session)
+    if etag is None:
+        return Response(
+            content=adapter.dump_json(load()),
+            media_type="application/json",
+            headers={"Cache-Control": CATALOG_CACHE_CONTROL},
+        )
+
+    # Load (or fetch from cache) before comparing validators: the ETag covers
+    # the whole catalog, so only a resource that exists may answer 304.
+    body = catalog_service.cached_body(key, etag, lambda: adapter.dump_json(load()))
+    headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends
+from sqlmodel import Session
+
+from app.db import get_session
+from app.deps import require_admin
+from app.models import CapacityRead, UserORM
+from app.services import capacity as capacity_service
+
+router = APIRouter(prefix="/capacity", tags=["capacity"])
+
+
+@router.get("", response_model=CapacityRead)
+def get_capacity(
+    current_user: UserORM = Depends(require_admin),
+    session: Session = Depends(get_session),
+) -> CapacityRead:
+    return capacity_service.get_capacity(session)
+
+
+@router.post("/rebuild", response_model=CapacityRead)
+def rebuild_capacity(
+    current_user: UserORM = Depends(require_admin),
+    session: Session = Depends(get_session),
+) -> CapacityRead:
+    return capacity_service.rebuild_ledger(session)
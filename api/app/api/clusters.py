@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, status
+from sqlmodel import Session
+
+from app.db import get_session
+from app.deps import require_admin
+from app.models import ClusterCreate, ClusterRead, ClusterUpdate, UserORM
+from app.services import clusters as cluster_service
+
+router = APIRouter(prefix="/clusters", tags=["clusters"])
+
+
+@router.get("", response_model=list[ClusterRead])
+def list_clusters(
+    current_user: UserORM = Depends(require_admin),
+    session: Session = Depends(get_session),
+) -> list[ClusterRead]:
+    return cluster_service.list_clusters(session)
+
+
+@router.post("", response_model=ClusterRead, status_code=status.HTTP_201_CREATED)
+def create_cluster(
+    payload: ClusterCreate,
+    current_user: UserORM = Depends(require_admin),
+    session: Session = Depends(get_session),
+) -> ClusterRead:
+    return cluster_service.create_cluster(session, payload)
+
+
+@router.put("/{name}", response_model=ClusterRead)
+def update_cluster(
+    name: str,
+    payload: ClusterUpdate,
+    current_user: UserORM = Depends(require_admin),
+    session: Session = Depends(get_session),
+) -> ClusterRead:
+    return cluster_service.update_cluster(session, name=name, payload=payload)
@@ -1,39 +1,42 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends
-from pydantic import BaseModel
 from sqlmodel import Session
 
 from app.config import get_settings
 from app.db import get_session
 from app.deps import get_current_user
-from app.models import UserORM
+from app.models import HostnameBatchCheck, HostnameCheck, UserORM
 from app.services.errors import HostnameException
-from app.services.hostnames import require_valid_hostname_for_deployment
+from app.services.hostnames import check_hostnames_async, require_valid_hostname_for_deployment_async
 
 router = APIRouter(tags=["hostnames"])
 
 
-class HostnameCheck(BaseModel):
-    fqdn: str
-    usable: bool
-    reason: str | None = None
-
-
 @router.get("/hostnames/{fqdn}", response_model=HostnameCheck)
-def check_hostname(
+async def check_hostname(
     fqdn: str,
     current_user: UserORM = Depends(get_current_user),
     session: Session = Depends(get_session),
 ) -> HostnameCheck:
     fqdn = fqdn.lower()
     try:
-        require_valid_hostname_for_deployment(session, fqdn)
+        await require_valid_hostname_for_deployment_async(session, fqdn)
         return HostnameCheck(fqdn=fqdn, usable=True)
     except HostnameException as exc:
         return HostnameCheck(fqdn=fqdn, usable=False, reason=exc.reason)
 
 
+@router.post("/hostnames/check", response_model=list[HostnameCheck])
+async def check_hostnames(
+    payload: HostnameBatchCheck,
+    current_user: UserORM = Depends(get_current_user),
+    session: Session = Depends(get_session),
+) -> list[HostnameCheck]:
+    """Validate up to ``HOSTNAME_BATCH_MAX`` hostnames; one result per input, in order."""
+    return await check_hostnames_async(session, payload.fqdns)
+
+
 @router.get("/domains", response_model=list[str])
 def list_domains() -> list[str]:
     return get_settings().wildcard_domains
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+
+from app.db import get_session
+from app.deps import require_admin
+from app.models import NamespacePoolStats, UserORM
+from app.services import namespace_pool as namespace_pool_service
+
+router = APIRouter(prefix="/namespace-pool", tags=["namespace-pool"])
+
+
+@router.get("/stats", response_model=NamespacePoolStats)
+def get_namespace_pool_stats(
+    cluster: str | None = Query(None, description="Pool of this cluster (default: unplaced deployments)"),
+    window_minutes: float = Query(60.0, gt=0, description="Window for the hit rate"),
+    current_user: UserORM = Depends(require_admin),
+    session: Session = Depends(get_session),
+) -> NamespacePoolStats:
+    return namespace_pool_service.pool_stats(session, cluster=cluster, window=timedelta(minutes=window_minutes))
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+
+from app.db import get_session
+from app.deps import require_admin
+from app.models import OutboxStats, UserORM
+from app.services import outbox as outbox_service
+
+router = APIRouter(prefix="/outbox", tags=["outbox"])
+
+
+@router.get("/stats", response_model=OutboxStats)
+def get_outbox_stats(
+    window_minutes: float = Query(60.0, gt=0, description="Window for delivery latency"),
+    current_user: UserORM = Depends(require_admin),
+    session: Session = Depends(get_session),
+) -> OutboxStats:
+    return outbox_service.outbox_stats(session, window=timedelta(minutes=window_minutes))
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, Response, status
+from pydantic import TypeAdapter
 from sqlmodel import Session
 
+from app.api.caching import catalog_response
 from app.db import get_session
 from app.deps import get_current_user, require_admin
 from app.models import (
@@ -17,6 +19,8 @@ from app.services import plans as plan_service
 
 router = APIRouter(tags=["plans"])
 
+_plan_list_adapter = TypeAdapter(list[PlanRead])
+
 
 # ---------------------------------------------------------------------------
 # Plan browsing (any authenticated user)
@@ -26,10 +30,17 @@ router = APIRouter(tags=["plans"])
 @router.get("/products/{product_id}/plans", response_model=list[PlanRead])
 def list_plans(
     product_id: int,
+    request: Request,
     _current_user: UserORM = Depends(get_current_user),
     session: Session = Depends(get_session),
-) -> list[PlanRead]:
-    return plan_service.list_plans_for_product(session, product_id)
+) -> Response:
+    return catalog_response(
+        request,
+        session,
+        key=f"products/{product_id}/plans",
+        adapter=_plan_list_adapter,
+        load=lambda: plan_service.list_plans_for_product(session, product_id),
+    )
 
 
 @router.get("/plans/{plan_id}", response_model=PlanRead)
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+
+from app.db import get_session
+from app.deps import require_admin
+from app.models import PlanPricingRequest, PlanPricingResult, PricingSweepRequest, PricingSweepResult, UserORM
+from app.services import pricing as pricing_service
+
+router = APIRouter(tags=["pricing"])
+
+
+@router.post("/pricing/sweep", response_model=PricingSweepResult)
+def sweep_pricing(
+    payload: PricingSweepRequest,
+    current_user: UserORM = Depends(require_admin),
+) -> PricingSweepResult:
+    return pricing_service.sweep(payload)
+
+
+@router.post("/products/{product_id}/plans/pricing", response_model=PlanPricingResult)
+def price_plans(
+    product_id: int,
+    payload: PlanPricingRequest,
+    apply: bool = Query(False, description="Publish the suggested prices as new plan template versions"),
+    current_user: UserORM = Depends(require_admin),
+    session: Session = Depends(get_session),
+) -> PlanPricingResult:
+    return pricing_service.price_plans(session, product_id=product_id, request=payload, apply=apply)
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from collections.abc import AsyncGenerator
+from contextlib import aclosing
 import json
 from typing import TypeVar
 
@@ -12,11 +14,14 @@ from fastapi import (
     status,
 )
 from fastapi.requests import Request
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response
+from pydantic import TypeAdapter
 from starlette.concurrency import run_in_threadpool
-from starlette.datastructures import UploadFile
+from starlette.datastructures import FormData, UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
 from sqlmodel import SQLModel, Session
 
+from app.api.caching import catalog_response
 from app.db import get_session
 from app.deps import get_current_user, require_admin
 from app.models import (
@@ -28,54 +33,105 @@ from app.models import (
     UserORM,
 )
 from app.services import templates as template_service, products as product_service
+from app.services.errors import ValidationException
+from app.services.images import MAX_ICON_SIZE
 
 T = TypeVar("T", bound=SQLModel)
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+_product_list_adapter = TypeAdapter(list[ProductRead])
+_template_list_adapter = TypeAdapter(list[ProductTemplateVersionRead])
+
+
+# Multipart bodies are parsed straight from the request stream. File parts
+# spool to a temporary file once they pass this size instead of staying in
+# memory.
+ICON_SPOOL_THRESHOLD = 1024 * 1024
+# Room for the JSON payload and multipart framing on top of the icon itself.
+_MULTIPART_OVERHEAD = 1024 * 1024
+
+
+def _icon_too_large() -> ValidationException:
+    return ValidationException(
+        f"Image file too large. Maximum size is {MAX_ICON_SIZE // (1024 * 1024)}MB"
+    )
+
+
+class _ProductMultiPartParser(MultiPartParser):
+    spool_max_size = ICON_SPOOL_THRESHOLD
+
+
+async def _limited_stream(request: Request, limit: int) -> AsyncGenerator[bytes, None]:
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise _icon_too_large()
+        yield chunk
+
+
+async def _parse_multipart(request: Request) -> FormData:
+    """Parse a multipart body in one streaming pass, rejecting oversized bodies early."""
+    limit = MAX_ICON_SIZE + _MULTIPART_OVERHEAD
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > limit:
+        raise _icon_too_large()
+    try:
+        async with aclosing(_limited_stream(request, limit)) as stream:
+            return await _ProductMultiPartParser(request.headers, stream).parse()
+    except MultiPartException as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=exc.message) from exc
+
+
+async def _read_icon(form: FormData) -> bytes | None:
+    icon_file = form.get("icon")
+    if icon_file is None:
+        return None
+    if not isinstance(icon_file, UploadFile):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="Icon must be a file upload",
+        )
+    if icon_file.size is not None and icon_file.size > MAX_ICON_SIZE:
+        raise _icon_too_large()
+    try:
+        return await icon_file.read()
+    except OSError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to read icon upload: {exc}",
+        ) from exc
+
 
 async def parse_product_request(request: Request, model_cls: type[T] = ProductCreate) -> tuple[T, bytes | None]:
     content_type = request.headers.get("content-type", "")
-    body = await request.body()
 
     if "multipart/form-data" in content_type:
-        form = await request.form()
-        payload_data = form.get("payload")
-
-        if payload_data is None:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
-                detail="Product JSON payload is required",
-            )
-
+        form = await _parse_multipart(request)
         try:
-            payload_dict = json.loads(str(payload_data))
-        except json.JSONDecodeError as e:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
-                detail=f"Invalid product JSON: {e}",
-            ) from e
+            payload_data = form.get("payload")
 
-        payload = model_cls(**payload_dict)
+            if payload_data is None:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                    detail="Product JSON payload is required",
+                )
 
-        icon_data: bytes | None = None
-        icon_file = form.get("icon")
-        if icon_file is not None and not isinstance(icon_file, UploadFile):
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
-                detail="Icon must be a file upload",
-            )
-        if isinstance(icon_file, UploadFile):
             try:
-                icon_data = await icon_file.read()
-            except OSError as exc:
+                payload_dict = json.loads(str(payload_data))
+            except json.JSONDecodeError as e:
                 raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Failed to read icon upload: {exc}",
-                ) from exc
-
-        return payload, icon_data
+                    status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                    detail=f"Invalid product JSON: {e}",
+                ) from e
+
+            payload = model_cls(**payload_dict)
+            return payload, await _read_icon(form)
+        finally:
+            await form.close()
     else:
+        body = await request.body()
         try:
             if body:
                 payload = model_cls.model_validate(json.loads(body))
@@ -96,20 +152,28 @@ async def create_product(
     session: Session = Depends(get_session),
 ) -> ProductRead:
     payload, icon_data = await parse_product_request(request)
+    icon = await product_service.prepare_icon_async(icon_data) if icon_data is not None else None
     # Wrap the blocking DB/file-I/O service call in run_in_threadpool so it
     # doesn't block the event loop. This endpoint must be async def for the
     # multipart form parsing above, but without this wrapper the sync service
     # call would stall all other concurrent request handling.
-    product = await run_in_threadpool(product_service.create_product, session, payload, icon_data)
+    product = await run_in_threadpool(product_service.create_product, session, payload, icon)
     return product
 
 
 @router.get("", response_model=list[ProductRead])
 def list_products(
+    request: Request,
     _current_user: UserORM = Depends(get_current_user),
     session: Session = Depends(get_session),
-) -> list[ProductRead]:
-    return product_service.list_products(session)
+) -> Response:
+    return catalog_response(
+        request,
+        session,
+        key="products",
+        adapter=_product_list_adapter,
+        load=lambda: product_service.list_products(session),
+    )
 
 
 @router.get("/{product_id}", response_model=ProductRead)
@@ -130,7 +194,8 @@ async def update_product(
 ) -> ProductRead:
     payload, icon_data = await parse_product_request(request, ProductUpdate)
     payload.id = product_id
-    return await run_in_threadpool(product_service.update_product, session, product=payload, icon_data=icon_data)
+    icon = await product_service.prepare_icon_async(icon_data) if icon_data is not None else None
+    return await run_in_threadpool(product_service.update_product, session, product=payload, icon_data=icon)
 
 
 @router.delete("/{product_id}", status_code=204)
@@ -160,10 +225,17 @@ def create_template(
 @router.get("/{product_id}/templates", response_model=list[ProductTemplateVersionRead])
 def list_templates(
     product_id: int,
+    request: Request,
     _current_user: UserORM = Depends(get_current_user),
     session: Session = Depends(get_session),
-) -> list[ProductTemplateVersionRead]:
-    return template_service.list_templates(session, product_id=product_id)
+) -> Response:
+    return catalog_response(
+        request,
+        session,
+        key=f"products/{product_id}/templates",
+        adapter=_template_list_adapter,
+        load=lambda: template_service.list_templates(session, product_id=product_id),
+    )
 
 
 @router.get("/{product_id}/templates/{template_id}", response_model=ProductTemplateVersionRead)
@@ -187,14 +259,16 @@ def delete_template_endpoint(
 
 
 @router.put("/{product_id}/icon", response_model=ProductRead)
-def upload_icon(
+async def upload_icon(
     product_id: int,
     icon: FastAPIUploadFile = File(...),
     current_user: UserORM = Depends(require_admin),
     session: Session = Depends(get_session),
 ) -> ProductRead:
-    icon_data = icon.file.read()
-    return product_service.upload_product_icon(session, product_id, icon_data)
+    if icon.size is not None and icon.size > MAX_ICON_SIZE:
+        raise _icon_too_large()
+    processed = await product_service.prepare_icon_async(await icon.read())
+    return await run_in_threadpool(product_service.upload_product_icon, session, product_id, processed)
 
 
 @router.get("/{product_id}/icon")
@@ -206,8 +280,12 @@ def get_icon_redirect(
     rel_path = product_service.get_product_icon_path(session, product_id)
     if rel_path is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Icon not found")
-    from app.config import get_static_url_base
+    from app.config import get_icon_url_base
 
+    # The target is content-addressed, so clients may reuse the redirect for a
+    # while; clients that already have icon_url should link it directly.
     return RedirectResponse(
-        url=f"{get_static_url_base()}/{rel_path}", status_code=status.HTTP_302_FOUND
+        url=f"{get_icon_url_base()}/{rel_path}",
+        status_code=status.HTTP_302_FOUND,
+        headers={"Cache-Control": "private, max-age=300"},
     )
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import os
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from app.services.icon_store import IMMUTABLE_CACHE_CONTROL, strong_etag
+
+
+class IconStaticFiles(StaticFiles):
+    """``StaticFiles`` that marks content-addressed icons as immutable.
+
+    Icon paths contain the hash of their content, so they can be cached
+    forever and get a strong ETag derived from that hash instead of the
+    default mtime/size one. Other files are served unchanged.
+    """
+
+    def file_response(
+        self,
+        full_path: os.PathLike | str,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        rel_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        etag = strong_etag(rel_path)
+        if etag is None:
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        headers = {"etag": etag, "cache-control": IMMUTABLE_CACHE_CONTROL}
+        response = FileResponse(full_path, status_code=status_code, headers=headers, stat_result=stat_result)
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -1,14 +1,20 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from typing import AsyncIterator
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.config import get_settings
 from app.db import get_session
 from app.deps import get_current_user, get_payment_provider, require_admin, require_self
 from app.models import (
+    CheckoutRead,
     DeploymentCreate,
     DeploymentCreateResponse,
     DeploymentRead,
@@ -16,9 +22,16 @@ from app.models import (
     UserORM,
     UserRead, DeploymentUpdate,
 )
-from app.services import deployments as deployment_service, users as user_service
+from app.services import (
+    checkout as checkout_service,
+    deployment_events,
+    deployments as deployment_service,
+    users as user_service,
+)
+from app.services.checkout import CHECKOUT_STATUS_PENDING
+from app.services.deployment_events import DeploymentEvent, Subscription
 from app.services.mollie import PaymentProvider
-from app.util import amend_url
+from app.services.reconcile_constants import DEPLOYMENT_STATUS_DELETED
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -81,7 +94,6 @@ def create_deployment(
     payment_provider: PaymentProvider | None = Depends(get_payment_provider),
 ) -> DeploymentCreateResponse:
     payload.user_id = user_id
-    settings = get_settings()
     result = deployment_service.create_deployment(
         session,
         payload=payload,
@@ -90,9 +102,32 @@ def create_deployment(
     return DeploymentCreateResponse(
         deployment=result.deployment,
         checkout_url=result.checkout_url,
+        checkout_status=result.checkout_status,
     )
 
 
+@router.get("/{user_id}/deployments/{deployment_id}/checkout", response_model=CheckoutRead)
+async def get_deployment_checkout(
+    user_id: int,
+    deployment_id: UUID,
+    wait: float = Query(0, ge=0, description="Seconds to wait while the checkout is still pending"),
+    current_user: UserORM = Depends(require_self),
+    session: Session = Depends(get_session),
+) -> CheckoutRead:
+    """Checkout state of a paid deployment; long-polls up to *wait* seconds while pending."""
+    settings = get_settings()
+    deadline = time.monotonic() + min(wait, settings.checkout_wait_max_seconds)
+    while True:
+        checkout = await run_in_threadpool(
+            checkout_service.get_checkout, session, user_id=user_id, deployment_id=deployment_id
+        )
+        # Release the pooled connection between polls.
+        await run_in_threadpool(session.rollback)
+        if checkout.status != CHECKOUT_STATUS_PENDING or time.monotonic() >= deadline:
+            return checkout
+        await asyncio.sleep(settings.checkout_poll_interval_seconds)
+
+
 @router.get("/{user_id}/deployments", response_model=list[DeploymentRead])
 def list_deployments(
     user_id: int,
@@ -133,3 +168,58 @@ def delete_deployment_endpoint(
     session: Session = Depends(get_session),
 ) -> None:
     deployment_service.delete_deployment(session, user_id=user_id, deployment_id=deployment_id)
+
+
+def _format_sse(evt: DeploymentEvent) -> str:
+    return f"event: deployment\ndata: {evt.to_json()}\n\n"
+
+
+async def _deployment_event_stream(
+    subscription: Subscription, snapshot: DeploymentEvent, heartbeat_seconds: float,
+) -> AsyncIterator[str]:
+    with subscription:
+        yield _format_sse(snapshot)
+        while True:
+            evt = await subscription.get(timeout=heartbeat_seconds)
+            if evt is None:
+                # SSE comment line: keeps proxies from closing the idle connection.
+                yield ": keep-alive\n\n"
+                continue
+            yield _format_sse(evt)
+            if evt.status == DEPLOYMENT_STATUS_DELETED:
+                return
+
+
+@router.get("/{user_id}/deployments/{deployment_id}/events")
+async def stream_deployment_events(
+    user_id: int,
+    deployment_id: UUID,
+    current_user: UserORM = Depends(require_self),
+    session: Session = Depends(get_session),
+) -> StreamingResponse:
+    """Server-sent events stream of a deployment's status, generation and last_error.
+
+    The first event is the current state; subsequent events are pushed whenever
+    a reconcile commits. The stream ends after the deployment reaches ``deleted``.
+    """
+    deployment_events.ensure_listener(session.get_bind())
+    # Subscribe before reading the snapshot so no change can slip in between.
+    subscription = deployment_events.hub.subscribe(deployment_id)
+    try:
+        deployment = await run_in_threadpool(
+            deployment_service.get_deployment, session, user_id=user_id, deployment_id=deployment_id
+        )
+        # Release the pooled connection: the stream itself never touches the database.
+        await run_in_threadpool(session.rollback)
+    except BaseException:
+        subscription.close()
+        raise
+    return StreamingResponse(
+        _deployment_event_stream(
+            subscription,
+            DeploymentEvent.from_deployment(deployment),
+            get_settings().deployment_events_heartbeat_seconds,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,10 +1,16 @@
 import logging
+import re
+import uuid
 
 from starlette.requests import Request
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.logging_config import log_context
 
 from app.services.errors import (
     CaelusException,
+    CapacityException,
     DeploymentInProgressException,
     HostnameException,
     IntegrityException,
@@ -13,6 +19,7 @@ from app.services.errors import (
 )
 
 ERROR_STATUS = {
+    CapacityException: 409,
     HostnameException: 409,
     IntegrityException: 409,
     DeploymentInProgressException: 409,
@@ -35,3 +42,33 @@ def _exception_handler(request: Request, exc: Exception):
 def register_exception_handlers(app):
     app.exception_handler(CaelusException)(_exception_handler)
     # app.exception_handler(ValidationError)(_exception_handler)
+
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class RequestContextMiddleware:
+    """Tag the logs of each request with a request_id, echoed as ``X-Request-ID``.
+
+    A well-formed ``X-Request-ID`` from the client (or a proxy) is kept;
+    otherwise a new one is generated.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        with log_context(request_id=request_id):
+            await self.app(scope, receive, send_with_id)
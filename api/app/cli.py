@@ -1,42 +1,28 @@
+"""The ``caelus`` command line.
+
+Every invocation imports this module, so it only imports the standard
+library and typer at the top. Services, models, the database engine and
+their dependencies (SQLAlchemy, FastAPI, the Mollie SDK, Pillow, ...) load
+on first use by a command: see :class:`_LazyModule`. The import time is
+held to a budget by ``tests/test_cli_startup.py``.
+"""
 from __future__ import annotations
 
+import csv
+import importlib
+import io
 import json
 import logging
 import os
 import time
+from datetime import datetime, timedelta
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Literal
 from uuid import UUID
 
 import typer
-import yaml
-from fastapi.encoders import jsonable_encoder
-
-from app.config import get_settings
-from app.db import session_scope
-from app.logging_config import configure_logging
-from app.models import (
-    UserCreate,
-    DeploymentCreate,
-    ProductTemplateVersionCreate,
-    ProductCreate,
-    ProductUpdate,
-    DeploymentUpdate,
-    PlanCreate,
-    PlanUpdate,
-    PlanTemplateVersionCreate,
-    BillingInterval,
-)
-from app.services import (
-    templates as template_service,
-    deployments as deployment_service,
-    products as product_service,
-    users as user_service,
-    reconcile as reconcile_service,
-    jobs as jobs_service,
-    plans as plan_service,
-    subscriptions as subscription_service,
-)
-from app.services.errors import CaelusException
+
+from app.services.errors import CaelusException, DeploymentInProgressException
 from app.services.reconcile_constants import (
     JOB_STATUS_QUEUED,
     JOB_STATUS_RUNNING,
@@ -44,12 +30,52 @@ from app.services.reconcile_constants import (
     JOB_STATUS_FAILED,
 )
 
-from sqlalchemy import func
-from sqlmodel import Session, select
+if TYPE_CHECKING:
+    from sqlmodel import Session
+
+    from app.models import UserORM
+
+
+class _LazyModule:
+    """A module that is imported on first attribute access."""
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(importlib.import_module(self._name), attr)
+
+
+models = _LazyModule("app.models")
+template_service = _LazyModule("app.services.templates")
+deployment_service = _LazyModule("app.services.deployments")
+product_service = _LazyModule("app.services.products")
+user_service = _LazyModule("app.services.users")
+reconcile_service = _LazyModule("app.services.reconcile")
+jobs_service = _LazyModule("app.services.jobs")
+plan_service = _LazyModule("app.services.plans")
+subscription_service = _LazyModule("app.services.subscriptions")
+hostname_service = _LazyModule("app.services.hostnames")
+icon_store_service = _LazyModule("app.services.icon_store")
+outbox_service = _LazyModule("app.services.outbox")
+billing_report_service = _LazyModule("app.services.billing_reports")
+pricing_service = _LazyModule("app.services.pricing")
+capacity_service = _LazyModule("app.services.capacity")
+cluster_service = _LazyModule("app.services.clusters")
+namespace_pool_service = _LazyModule("app.services.namespace_pool")
+
+# app.models.BillingInterval, without importing the models to build the
+# command line.
+_BillingInterval = Literal["monthly", "annual"]
+
+
+def session_scope():
+    """``app.db.session_scope``; the engine is created on first use."""
+    from app.db import session_scope
+
+    return session_scope()
 
-from app.models import UserORM
 
-configure_logging(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 app = typer.Typer(help="Caelus CLI", pretty_exceptions_show_locals=False)
 
@@ -69,6 +95,9 @@ def _main(
 ) -> None:
     global _cli_user_email
     _cli_user_email = as_user
+    from app.logging_config import configure_logging
+
+    configure_logging()
 
 
 def _require_cli_user(session: Session) -> UserORM:
@@ -76,6 +105,11 @@ def _require_cli_user(session: Session) -> UserORM:
 
     Exits with code 1 when no email is configured.
     """
+    from sqlalchemy import func
+    from sqlmodel import select
+
+    from app.models import UserORM
+
     if not _cli_user_email:
         typer.echo(
             "Error: No user email configured. "
@@ -144,11 +178,17 @@ def _exit_for_domain_error(exc: CaelusException) -> None:
 
 
 def _echo_yaml_entity(entity: object) -> None:
+    import yaml
+    from fastapi.encoders import jsonable_encoder
+
     encoded = jsonable_encoder(entity)
     typer.echo(yaml.safe_dump(encoded, sort_keys=False), nl=False)
 
 
 def _echo_yaml_stream_item(entity: object) -> None:
+    import yaml
+    from fastapi.encoders import jsonable_encoder
+
     encoded = jsonable_encoder(entity)
     typer.echo(yaml.safe_dump(encoded, sort_keys=False).rstrip())
 
@@ -158,7 +198,7 @@ def create_user(email: str) -> None:
     with session_scope() as session:
         _require_cli_user(session)
         try:
-            user = user_service.create_user(session, UserCreate(email=email))
+            user = user_service.create_user(session, models.UserCreate(email=email))
         except CaelusException as e:
             _exit_for_domain_error(e)
         _echo_yaml_entity(user)
@@ -199,6 +239,7 @@ def create_product(
     description: str,
     template_id: int | None = None,
     icon: Path | None = typer.Option(None, "--icon", help="Path to product icon image"),
+    cluster: str | None = typer.Option(None, "--cluster", help="Place all deployments on this cluster"),
 ) -> None:
     with session_scope() as session:
         _require_cli_user(session)
@@ -208,7 +249,7 @@ def create_product(
                 icon_data = icon.read_bytes()
             product = product_service.create_product(
                 session,
-                payload=ProductCreate(name=name, description=description, template_id=template_id),
+                payload=models.ProductCreate(name=name, description=description, template_id=template_id, cluster=cluster),
                 icon_data=icon_data,
             )
         except CaelusException as e:
@@ -222,16 +263,18 @@ def update_product(
     *,
     template_id: int | None = typer.Option(None, "--template-id"),
     description: str | None = typer.Option(None, "--description"),
+    cluster: str | None = typer.Option(None, "--cluster", help="Pin to this cluster ('' unpins)"),
 ) -> None:
     with session_scope() as session:
         _require_cli_user(session)
         try:
             product = product_service.update_product(
                 session,
-                product=ProductUpdate(
+                product=models.ProductUpdate(
                     id=product_id,
                     template_id=template_id,
                     description=description,
+                    cluster=cluster,
                 ),
             )
         except CaelusException as e:
@@ -313,6 +356,15 @@ def create_template(
         "--capabilities-file",
         help="Path to JSON file containing template capabilities object.",
     ),
+    footprint_cpu_millicores: int | None = typer.Option(
+        None, "--footprint-cpu-millicores", help="CPU one instance reserves (millicores)."
+    ),
+    footprint_memory_bytes: int | None = typer.Option(
+        None, "--footprint-memory-bytes", help="Memory one instance reserves (bytes)."
+    ),
+    footprint_storage_bytes: int | None = typer.Option(
+        None, "--footprint-storage-bytes", help="Storage one instance reserves on top of its plan (bytes)."
+    ),
 ) -> None:
     try:
         parsed_system_values = _parse_json_object_input(
@@ -343,7 +395,7 @@ def create_template(
         try:
             template = template_service.create_template(
                 session,
-                ProductTemplateVersionCreate(
+                models.ProductTemplateVersionCreate(
                     product_id=product_id,
                     chart_ref=chart_ref,
                     chart_version=chart_version,
@@ -352,6 +404,9 @@ def create_template(
                     system_values_json=parsed_system_values,
                     values_schema_json=parsed_values_schema,
                     capabilities_json=parsed_capabilities,
+                    footprint_cpu_millicores=footprint_cpu_millicores,
+                    footprint_memory_bytes=footprint_memory_bytes,
+                    footprint_storage_bytes=footprint_storage_bytes,
                 ),
             )
         except CaelusException as e:
@@ -427,6 +482,8 @@ def create_deployment(
         _require_cli_user(session)
 
         # Refuse paid plans via CLI — checkout requires a browser redirect.
+        from app.config import get_settings
+
         settings = get_settings()
         if settings.mollie_api_key:
             from app.models import PlanTemplateVersionORM
@@ -442,7 +499,7 @@ def create_deployment(
         try:
             result = deployment_service.create_deployment(
                 session,
-                payload=DeploymentCreate(
+                payload=models.DeploymentCreate(
                     user_id=user_id,
                     desired_template_id=desired_template_id,
                     plan_template_id=plan_template_id,
@@ -510,7 +567,7 @@ def update_deployment(
         try:
             deployment = deployment_service.update_deployment(
                 session,
-                update=DeploymentUpdate(
+                update=models.DeploymentUpdate(
                     user_id=user_id, id=deployment_id, desired_template_id=desired_template_id
                 ),
             )
@@ -545,22 +602,85 @@ def reconcile(
 def worker(
     concurrency: int = typer.Option(1, "--concurrency", "-c", help="Number of parallel job workers"),
     poll_seconds: float = typer.Option(1.0, "--poll-seconds", help="Sleep interval when no jobs are available"),
+    cluster: str | None = typer.Option(
+        None, "--cluster", help="Only claim jobs of this registered cluster and use its kubeconfig/context"
+    ),
 ) -> None:
     if concurrency < 1:
         typer.echo("Error: --concurrency must be >= 1", err=True)
         raise typer.Exit(code=1)
-
+    if cluster is not None:
+        with session_scope() as session:
+            try:
+                cluster_service.get_cluster_orm(session, cluster)
+            except CaelusException as e:
+                _exit_for_domain_error(e)
+
+    from app.tracing import configure_tracing
     from app.worker import run_worker
 
+    configure_tracing(service_name="caelus-worker")
     base_worker_id = os.environ.get("CAELUS_WORKER_ID") or f"worker-{int(time.time())}"
     run_worker(
         base_worker_id=base_worker_id,
         concurrency=concurrency,
         poll_seconds=poll_seconds,
         emit=_echo_yaml_stream_item,
+        cluster=cluster,
     )
 
 
+@app.command("purge")
+def purge(
+    user_id: int | None = typer.Option(
+        None, "--user-id", help="First mark all of this user's deployments for deletion"
+    ),
+    concurrency: int = typer.Option(8, "--concurrency", "-c", help="Teardowns started in parallel"),
+    wait_seconds: float = typer.Option(
+        600.0, "--wait-seconds", help="How long to wait for namespaces to finish terminating"
+    ),
+    poll_seconds: float = typer.Option(2.0, "--poll-seconds", help="Interval between namespace sweeps"),
+    cluster: str | None = typer.Option(None, "--cluster", help="Only tear down deployments on this cluster"),
+) -> None:
+    """Tear down all queued deletions concurrently, without waiting on each namespace's finalizers."""
+    if concurrency < 1:
+        typer.echo("Error: --concurrency must be >= 1", err=True)
+        raise typer.Exit(code=1)
+    with session_scope() as session:
+        try:
+            if cluster is not None:
+                cluster_service.get_cluster_orm(session, cluster)
+            if user_id is not None:
+                for deployment in deployment_service.list_deployments(session, user_id=user_id):
+                    try:
+                        deployment_service.delete_deployment(
+                            session, user_id=user_id, deployment_id=deployment.id
+                        )
+                    except DeploymentInProgressException as e:
+                        typer.echo(f"Warning: Skipping deployment {deployment.id}: {e}", err=True)
+        except CaelusException as e:
+            _exit_for_domain_error(e)
+
+    from app.worker import run_purge
+
+    base_worker_id = os.environ.get("CAELUS_WORKER_ID") or f"purge-{int(time.time())}"
+    terminating = run_purge(
+        base_worker_id=base_worker_id,
+        concurrency=concurrency,
+        wait_seconds=wait_seconds,
+        poll_seconds=poll_seconds,
+        emit=_echo_yaml_stream_item,
+        cluster=cluster,
+    )
+    if terminating:
+        typer.echo(
+            f"Error: {len(terminating)} namespace(s) still terminating after {wait_seconds:.0f}s; "
+            "run purge again to finish them",
+            err=True,
+        )
+        raise typer.Exit(code=1)
+
+
 @app.command("jobs")
 def jobs(
     failed: bool = typer.Option(False, "--failed", help="Show only failed jobs"),
@@ -626,7 +746,7 @@ def create_plan(
             plan = plan_service.create_plan(
                 session,
                 product_id=product_id,
-                payload=PlanCreate(name=name, sort_order=sort_order),
+                payload=models.PlanCreate(name=name, sort_order=sort_order),
             )
         except CaelusException as e:
             _exit_for_domain_error(e)
@@ -646,7 +766,7 @@ def update_plan(
             plan = plan_service.update_plan(
                 session,
                 plan_id=plan_id,
-                payload=PlanUpdate(
+                payload=models.PlanUpdate(
                     name=name,
                     template_id=template_id, sort_order=sort_order,
                 ),
@@ -671,7 +791,7 @@ def delete_plan(plan_id: int) -> None:
 def create_plan_template(
     plan_id: int = typer.Option(..., "--plan-id"),
     price_cents: int = typer.Option(..., "--price-cents"),
-    billing_interval: BillingInterval = typer.Option(..., "--billing-interval"),
+    billing_interval: _BillingInterval = typer.Option(..., "--billing-interval"),
     storage_bytes: int | None = typer.Option(None, "--storage-bytes"),
     description: str | None = typer.Option(None, "--description"),
 ) -> None:
@@ -681,9 +801,9 @@ def create_plan_template(
             tmpl = plan_service.create_plan_template_version(
                 session,
                 plan_id=plan_id,
-                payload=PlanTemplateVersionCreate(
+                payload=models.PlanTemplateVersionCreate(
                     price_cents=price_cents,
-                    billing_interval=billing_interval,
+                    billing_interval=models.BillingInterval(billing_interval),
                     storage_bytes=storage_bytes,
                     description=description,
                 ),
@@ -717,5 +837,314 @@ def cancel_subscription(subscription_id: int) -> None:
         _echo_yaml_entity(sub)
 
 
+# ── Hostname commands ─────────────────────────────────────────────────
+
+
+@app.command("check-hostnames")
+def check_hostnames(
+    fqdns: list[str] | None = typer.Argument(None, help="Hostnames to validate"),
+    file: Path | None = typer.Option(
+        None, "--file", help="File with one hostname per line ('-' for stdin)"
+    ),
+) -> None:
+    """Validate many hostnames at once; prints one result per hostname."""
+    names = list(fqdns or [])
+    if file is not None:
+        text = typer.get_text_stream("stdin").read() if str(file) == "-" else file.read_text()
+        names.extend(line.strip() for line in text.splitlines() if line.strip())
+    if not names:
+        typer.echo("Error: provide hostnames as arguments or via --file", err=True)
+        raise typer.Exit(code=1)
+    with session_scope() as session:
+        _require_cli_user(session)
+        _echo_yaml_entity(hostname_service.check_hostnames(session, names))
+
+
+@app.command("gc-icons")
+def gc_icons(
+    min_age_hours: float = typer.Option(
+        24.0, "--min-age-hours", help="Keep unreferenced icons stored more recently than this"
+    ),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only list what would be removed"),
+) -> None:
+    """Remove stored icons that no product references."""
+    with session_scope() as session:
+        removed = icon_store_service.gc_icons(
+            session, min_age=timedelta(hours=min_age_hours), dry_run=dry_run
+        )
+    _echo_yaml_entity({"dry_run": dry_run, "removed": removed})
+
+
+@app.command("billing-sync")
+def billing_sync(
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only report what would be corrected"),
+) -> None:
+    """Reconcile subscriptions and payments with their state at Mollie."""
+    from app.deps import get_payment_provider
+    from app.worker import run_billing_sync
+
+    payment_provider = get_payment_provider()
+    if payment_provider is None:
+        typer.echo("Error: no payment provider configured (set CAELUS_MOLLIE_API_KEY)", err=True)
+        raise typer.Exit(code=1)
+    report = run_billing_sync(payment_provider, dry_run=dry_run)
+    if report is None:
+        typer.echo("Error: a billing sync is already running", err=True)
+        raise typer.Exit(code=1)
+    _echo_yaml_entity(report)
+
+
+@app.command("billing-report")
+def billing_report(
+    since: datetime | None = typer.Option(None, "--since", help="Only count revenue from payments created since"),
+    live: bool = typer.Option(False, "--live", help="Ignore the materialized summary"),
+    refresh: bool = typer.Option(False, "--refresh", help="Rebuild the materialized summary first"),
+) -> None:
+    """Show MRR, payment status counts and revenue per plan."""
+    with session_scope() as session:
+        _require_cli_user(session)
+        if refresh:
+            billing_report_service.refresh_summary(session, full=True)
+        _echo_yaml_entity(billing_report_service.billing_report(session, since=since, materialized=False if live else None))
+
+
+@app.command("dispatch-outbox")
+def dispatch_outbox(
+    poll_seconds: float = typer.Option(1.0, "--poll-seconds", help="Sleep interval when nothing is due"),
+    once: bool = typer.Option(False, "--once", help="Exit once no outbox rows are due"),
+) -> None:
+    """Deliver queued external side effects (runs alongside or instead of the worker stage)."""
+    from app.deps import get_payment_provider
+    from app.worker import run_outbox_dispatcher
+
+    payment_provider = get_payment_provider()
+    if payment_provider is None:
+        typer.echo("Error: no payment provider configured (set CAELUS_MOLLIE_API_KEY)", err=True)
+        raise typer.Exit(code=1)
+    base_worker_id = os.environ.get("CAELUS_WORKER_ID") or f"outbox-{int(time.time())}"
+    run_outbox_dispatcher(
+        payment_provider,
+        base_worker_id=base_worker_id,
+        poll_seconds=poll_seconds,
+        once=once,
+        emit=_echo_yaml_stream_item,
+    )
+
+
+@app.command("outbox-stats")
+def outbox_stats(
+    window_minutes: float = typer.Option(60.0, "--window-minutes", help="Window for delivery latency"),
+) -> None:
+    """Show outbox backlog, retries, failures and delivery latency per kind."""
+    with session_scope() as session:
+        _echo_yaml_entity(outbox_service.outbox_stats(session, window=timedelta(minutes=window_minutes)))
+
+
+@app.command("namespace-pool")
+def namespace_pool(
+    cluster: str | None = typer.Option(None, "--cluster", help="Pool of this registered cluster"),
+    refill: bool = typer.Option(False, "--refill", help="Top the pool up before reporting"),
+    window_minutes: float = typer.Option(60.0, "--window-minutes", help="Window for the hit rate"),
+) -> None:
+    """Show the warm namespace pool's size and hit rate."""
+    with session_scope() as session:
+        try:
+            provisioner = None
+            if cluster is not None:
+                provisioner = cluster_service.provisioner_for(cluster_service.get_cluster_orm(session, cluster))
+        except CaelusException as e:
+            _exit_for_domain_error(e)
+        if refill:
+            namespace_pool_service.refill_pool(session, cluster=cluster, provisioner=provisioner)
+        _echo_yaml_entity(
+            namespace_pool_service.pool_stats(session, cluster=cluster, window=timedelta(minutes=window_minutes))
+        )
+
+
+@app.command("capacity")
+def capacity(
+    rebuild: bool = typer.Option(False, "--rebuild", help="Recompute the ledger from live deployments first"),
+) -> None:
+    """Show committed, configured and available cluster capacity."""
+    with session_scope() as session:
+        _require_cli_user(session)
+        if rebuild:
+            _echo_yaml_entity(capacity_service.rebuild_ledger(session))
+        else:
+            _echo_yaml_entity(capacity_service.get_capacity(session))
+
+
+@app.command("create-cluster")
+def create_cluster(
+    name: str,
+    kubeconfig: str | None = typer.Option(None, "--kubeconfig", help="Kubeconfig file for this cluster"),
+    kube_context: str | None = typer.Option(None, "--kube-context", help="Context within the kubeconfig"),
+    cpu_millicores: int | None = typer.Option(None, "--cpu-millicores", help="Allocatable CPU"),
+    memory_bytes: int | None = typer.Option(None, "--memory-bytes", help="Allocatable memory"),
+    storage_bytes: int | None = typer.Option(None, "--storage-bytes", help="Allocatable storage"),
+) -> None:
+    """Register a cluster new deployments can be placed on."""
+    with session_scope() as session:
+        _require_cli_user(session)
+        try:
+            cluster = cluster_service.create_cluster(
+                session,
+                models.ClusterCreate(
+                    name=name,
+                    kubeconfig=kubeconfig,
+                    kube_context=kube_context,
+                    capacity_cpu_millicores=cpu_millicores,
+                    capacity_memory_bytes=memory_bytes,
+                    capacity_storage_bytes=storage_bytes,
+                ),
+            )
+        except CaelusException as e:
+            _exit_for_domain_error(e)
+        _echo_yaml_entity(cluster)
+
+
+@app.command("list-clusters")
+def list_clusters() -> None:
+    with session_scope() as session:
+        _require_cli_user(session)
+        _echo_yaml_entity(cluster_service.list_clusters(session))
+
+
+@app.command("update-cluster")
+def update_cluster(
+    name: str,
+    enabled: bool | None = typer.Option(None, "--enabled/--disabled", help="Accept new deployments"),
+    kubeconfig: str | None = typer.Option(None, "--kubeconfig"),
+    kube_context: str | None = typer.Option(None, "--kube-context"),
+    cpu_millicores: int | None = typer.Option(None, "--cpu-millicores"),
+    memory_bytes: int | None = typer.Option(None, "--memory-bytes"),
+    storage_bytes: int | None = typer.Option(None, "--storage-bytes"),
+) -> None:
+    options = {
+        "enabled": enabled,
+        "kubeconfig": kubeconfig,
+        "kube_context": kube_context,
+        "capacity_cpu_millicores": cpu_millicores,
+        "capacity_memory_bytes": memory_bytes,
+        "capacity_storage_bytes": storage_bytes,
+    }
+    with session_scope() as session:
+        _require_cli_user(session)
+        try:
+            cluster = cluster_service.update_cluster(
+                session,
+                name=name,
+                payload=models.ClusterUpdate(**{key: value for key, value in options.items() if value is not None}),
+            )
+        except CaelusException as e:
+            _exit_for_domain_error(e)
+        _echo_yaml_entity(cluster)
+
+
+# ── Pricing commands ──────────────────────────────────────────────────
+
+
+def _parse_floats(value: str, option_name: str) -> list[float]:
+    try:
+        return [float(item) for item in value.split(",") if item.strip()]
+    except ValueError as exc:
+        raise ValueError(f"{option_name} must be a comma-separated list of numbers") from exc
+
+
+def _parse_cost_model(cost_model_json: str | None, cost_model_file: Path | None) -> dict:
+    return _parse_json_object_input(
+        json_text=cost_model_json,
+        json_file=cost_model_file,
+        json_option_name="--cost-model-json",
+        file_option_name="--cost-model-file",
+    )
+
+
+@app.command("price-plans")
+def price_plans(
+    product_id: int,
+    cpu_cores: float = typer.Option(..., "--cpu-cores", help="CPU cores per customer"),
+    ram_gb: float = typer.Option(..., "--ram-gb", help="RAM per customer (GB)"),
+    bandwidth_gb_mo: float = typer.Option(0.0, "--bandwidth-gb-mo", help="Bandwidth per customer (GB/month)"),
+    storage_overhead_pct: float = typer.Option(
+        0.0, "--storage-overhead-pct", help="Database storage on top of each plan's storage tier (%)"
+    ),
+    cost_model_json: str | None = typer.Option(None, "--cost-model-json", help="JSON object of cost assumptions."),
+    cost_model_file: Path | None = typer.Option(
+        None, "--cost-model-file", help="Path to JSON file containing the cost assumptions object."
+    ),
+    apply: bool = typer.Option(False, "--apply", help="Publish the suggested prices as new plan template versions"),
+) -> None:
+    """Suggest a price for each plan of a product from its cost to serve."""
+    from pydantic import ValidationError
+
+    try:
+        request = models.PlanPricingRequest.model_validate(
+            {
+                "cost_model": _parse_cost_model(cost_model_json, cost_model_file),
+                "cpu_cores": cpu_cores,
+                "ram_gb": ram_gb,
+                "bandwidth_gb_mo": bandwidth_gb_mo,
+                "storage_overhead_pct": storage_overhead_pct,
+            }
+        )
+    except (ValueError, ValidationError) as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(code=1)
+    with session_scope() as session:
+        _require_cli_user(session)
+        try:
+            result = pricing_service.price_plans(session, product_id=product_id, request=request, apply=apply)
+        except CaelusException as e:
+            _exit_for_domain_error(e)
+        _echo_yaml_entity(result)
+
+
+@app.command("price-sweep")
+def price_sweep(
+    cpu_cores: str = typer.Option(..., "--cpu-cores", help="Comma-separated CPU cores per customer"),
+    ram_gb: str = typer.Option(..., "--ram-gb", help="Comma-separated RAM per customer (GB)"),
+    storage_gb: str = typer.Option(..., "--storage-gb", help="Comma-separated storage per customer (GB)"),
+    bandwidth_gb_mo: str = typer.Option("0", "--bandwidth-gb-mo", help="Comma-separated bandwidth (GB/month)"),
+    cost_model_json: str | None = typer.Option(None, "--cost-model-json", help="JSON object of cost assumptions."),
+    cost_model_file: Path | None = typer.Option(
+        None, "--cost-model-file", help="Path to JSON file containing the cost assumptions object."
+    ),
+    output: Path | None = typer.Option(None, "--output", help="Write the CSV here instead of stdout"),
+) -> None:
+    """Evaluate every combination of the given values and print them as CSV."""
+    from pydantic import ValidationError
+
+    try:
+        cost_model = _parse_cost_model(cost_model_json, cost_model_file)
+        # Reference servers to compare may ride along in the cost assumptions.
+        servers = cost_model.pop("servers", [])
+        request = models.PricingSweepRequest.model_validate(
+            {
+                "cost_model": cost_model,
+                "cpu_cores": _parse_floats(cpu_cores, "--cpu-cores"),
+                "ram_gb": _parse_floats(ram_gb, "--ram-gb"),
+                "storage_gb": _parse_floats(storage_gb, "--storage-gb"),
+                "bandwidth_gb_mo": _parse_floats(bandwidth_gb_mo, "--bandwidth-gb-mo"),
+                "servers": servers,
+            }
+        )
+    except (ValueError, ValidationError) as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(code=1)
+    try:
+        result = pricing_service.sweep(request)
+    except CaelusException as e:
+        _exit_for_domain_error(e)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(result.columns)
+    writer.writerows(zip(*result.columns.values()))
+    if output is not None:
+        output.write_text(buffer.getvalue())
+    else:
+        typer.echo(buffer.getvalue(), nl=False)
+
+
 if __name__ == "__main__":
     app()
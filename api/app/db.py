@@ -1,44 +1,68 @@
 from __future__ import annotations
 
 import logging
+import threading
 from contextlib import contextmanager
 from typing import Iterator, Generator
 
+from sqlalchemy import Engine
 from sqlalchemy.pool import StaticPool
 from sqlmodel import Session, SQLModel, create_engine
 
 from app.config import get_settings
+from app.services import billing_reports, capacity as capacity_service, catalog as catalog_service, deployment_events
 
 logger = logging.getLogger(__name__)
 
-_settings = get_settings()
-_url = _settings.database_url
-is_sqlite = _url.startswith("sqlite")
-connect_args = {"check_same_thread": False} if is_sqlite else {}
-poolclass = StaticPool if is_sqlite else None
+_engine: Engine | None = None
+_engine_lock = threading.Lock()
 
-engine = create_engine(
-    _url,
-    echo=False,
-    connect_args=connect_args,
-    poolclass=poolclass,
-)
+
+def get_engine() -> Engine:
+    """The process-wide engine for ``CAELUS_DATABASE_URL``, created on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            url = get_settings().database_url
+            is_sqlite = url.startswith("sqlite")
+            _engine = create_engine(
+                url,
+                echo=False,
+                connect_args={"check_same_thread": False} if is_sqlite else {},
+                poolclass=StaticPool if is_sqlite else None,
+            )
+        return _engine
+
+
+def __getattr__(name: str):
+    # ``app.db.engine`` keeps working, without creating the engine at import.
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+catalog_service.register_listeners()
+deployment_events.register_listeners()
+billing_reports.register_listeners()
 
 
 def init_db(engine) -> None:
     # Ensure models are imported before creating tables.
     logger.info("Initializing database schema")
     SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        catalog_service.seed_revision(session)
+        capacity_service.seed_ledger(session)
 
 
 def get_session() -> Generator[Session, None, None]:
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         yield session
 
 
 @contextmanager
 def session_scope() -> Iterator[Session]:
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         try:
             yield session
         except Exception:
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from functools import lru_cache
+
 from fastapi import Depends, Header, HTTPException, status
 from sqlalchemy import func
 from sqlmodel import Session, select
@@ -52,12 +54,19 @@ def require_self(
     return current_user
 
 
+@lru_cache(maxsize=4)
+def _shared_payment_provider(api_key: str) -> MolliePaymentProvider:
+    return MolliePaymentProvider.from_settings(api_key, get_settings())
+
+
 def get_payment_provider() -> PaymentProvider | None:
-    """Return a MolliePaymentProvider when configured, None otherwise.
+    """Return the process-wide MolliePaymentProvider when configured, None otherwise.
 
-    When None, all plans are treated as free regardless of price_cents.
+    The provider is shared so its HTTP connection pool, rate limiter and
+    payment cache span requests. When None, all plans are treated as free
+    regardless of price_cents.
     """
     settings = get_settings()
     if settings.mollie_api_key:
-        return MolliePaymentProvider(api_key=settings.mollie_api_key)
+        return _shared_payment_provider(settings.mollie_api_key)
     return None
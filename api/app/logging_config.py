@@ -1,8 +1,30 @@
+"""Logging setup shared by the API and CLI entrypoints.
+
+``CAELUS_LOG_FORMAT=json`` writes one JSON object per record with the
+contextual fields set by :func:`log_context` (or passed via ``extra=``):
+``request_id``, ``worker_id``, ``job_id`` and ``deployment_id``. Records
+below WARNING are rate limited per call site (``CAELUS_LOG_SAMPLE_BURST``
+per ``CAELUS_LOG_SAMPLE_WINDOW_SECONDS``), and with ``CAELUS_LOG_QUEUE``
+(default) they are formatted and written by a background thread so the
+caller only pays for the enqueue.
+"""
 from __future__ import annotations
 
+import atexit
+from contextlib import contextmanager
+from contextvars import ContextVar
+import copy
+from datetime import UTC, datetime
+import json
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import multiprocessing.util
 import os
+import queue
 import sys
+import threading
+import time
+from typing import Any, Iterator
 
 from app.config import get_settings
 
@@ -16,6 +38,67 @@ _LEVEL_COLORS = {
     "CRITICAL": "\x1b[1;31m",
 }
 
+CONTEXT_FIELDS = ("request_id", "worker_id", "job_id", "deployment_id")
+
+_context: ContextVar[dict[str, Any]] = ContextVar("caelus_log_context", default={})
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """Attach *fields* (None values skipped) to every record logged in this block."""
+    token = _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class _ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class _RateLimitFilter(logging.Filter):
+    """Keep at most *burst* records per call site every *window* seconds.
+
+    WARNING and above always pass. The first record kept after a window
+    that dropped some carries their count as ``suppressed``.
+    """
+
+    def __init__(self, *, burst: int, window: float) -> None:
+        super().__init__()
+        self._burst = burst
+        self._window = window
+        self._lock = threading.Lock()
+        # (pathname, lineno) -> [window start, kept, dropped]
+        self._sites: dict[tuple[str, int], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            state = self._sites.get(site)
+            if state is None or now - state[0] >= self._window:
+                self._sites[site] = [now, 1, 0]
+                if state is not None and state[2]:
+                    record.suppressed = state[2]
+                return True
+            if state[1] < self._burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            return False
+
+
+def _context_suffix(record: logging.LogRecord) -> str:
+    fields = [(key, getattr(record, key, None)) for key in (*CONTEXT_FIELDS, "suppressed")]
+    return "".join(f" {key}={value}" for key, value in fields if value is not None)
+
 
 class _ColorFormatter(logging.Formatter):
     def __init__(self, fmt: str, datefmt: str, *, use_color: bool) -> None:
@@ -28,9 +111,78 @@ class _ColorFormatter(logging.Formatter):
             color = _LEVEL_COLORS.get(original, "")
             record.levelname = f"{color}{original}{_RESET}" if color else original
         try:
-            return super().format(record)
+            text = super().format(record)
         finally:
             record.levelname = original
+        if suffix := _context_suffix(record):
+            first, sep, rest = text.partition("\n")
+            text = f"{first} |{suffix}{sep}{rest}"
+        return text
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in (*CONTEXT_FIELDS, "suppressed"):
+            if (value := getattr(record, key, None)) is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like QueueHandler.prepare, merge args and render the traceback in
+        # the calling thread, but keep the extra fields and leave the rest of
+        # the formatting to the listener's handler.
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_queue_handler: _QueueHandler | None = None
+_listener: QueueListener | None = None
+
+
+def _start_listener(target: logging.Handler) -> None:
+    global _listener
+    assert _queue_handler is not None
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(_queue_handler.queue, target, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
+
+
+def _restart_listener_in_child() -> None:
+    # The listener thread does not survive a fork: the child gets its own.
+    if _listener is not None:
+        _start_listener(_listener.handlers[0])
+
+
+def _flush_at_process_exit(handler: _QueueHandler) -> None:
+    # multiprocessing children leave through os._exit, skipping atexit.
+    multiprocessing.util.Finalize(None, _stop_listener, exitpriority=-100)
+
+
+os.register_at_fork(after_in_child=_restart_listener_in_child)
+atexit.register(_stop_listener)
 
 
 def _should_use_color() -> bool:
@@ -52,7 +204,22 @@ def _resolve_level(level: str | int | None) -> int:
     return logging.INFO
 
 
+def _build_formatter(log_format: str) -> logging.Formatter:
+    if log_format == "json":
+        return _JsonFormatter()
+    return _ColorFormatter(
+        fmt="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        use_color=_should_use_color(),
+    )
+
+
 def configure_logging(*, level: str | int | None = None, force: bool = False) -> None:
+    """Set the root level (*level*, else ``CAELUS_LOG_LEVEL``) and install the handler.
+
+    Existing root handlers are kept (only their level is set) unless *force*.
+    """
+    global _queue_handler
     root = logging.getLogger()
     resolved_level = _resolve_level(level)
     root.setLevel(resolved_level)
@@ -62,14 +229,23 @@ def configure_logging(*, level: str | int | None = None, force: bool = False) ->
             handler.setLevel(resolved_level)
         return
 
-    handler = logging.StreamHandler()
-    handler.setLevel(resolved_level)
-    handler.setFormatter(
-        _ColorFormatter(
-            fmt="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-            use_color=_should_use_color(),
+    settings = get_settings()
+    stream = logging.StreamHandler()
+    stream.setLevel(resolved_level)
+    stream.setFormatter(_build_formatter(settings.log_format))
+    handler: logging.Handler = stream
+    _stop_listener()
+    if settings.log_queue:
+        _queue_handler = _QueueHandler(queue.SimpleQueue())
+        _start_listener(stream)
+        multiprocessing.util.register_after_fork(_queue_handler, _flush_at_process_exit)
+        handler = _queue_handler
+        handler.setLevel(resolved_level)
+    # Filters run in the logging thread, where the context is set.
+    handler.addFilter(_ContextFilter())
+    if settings.log_sample_burst > 0:
+        handler.addFilter(
+            _RateLimitFilter(burst=settings.log_sample_burst, window=settings.log_sample_window_seconds)
         )
-    )
     root.handlers.clear()
     root.addHandler(handler)
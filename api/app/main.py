@@ -4,14 +4,16 @@ import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
-from fastapi.staticfiles import StaticFiles
 
-from app.api import users, products, deployments, hostnames, plans, subscriptions, webhooks
-from app.api.util import register_exception_handlers
+from app.api import billing, capacity, clusters, users, products, deployments, hostnames, namespace_pool, outbox, plans, pricing, subscriptions, webhooks
+from app.api.static import IconStaticFiles
+from app.api.util import RequestContextMiddleware, register_exception_handlers
 from app.logging_config import configure_logging
 from app.config import get_settings
+from app.tracing import TracingMiddleware, configure_tracing
 
-configure_logging(level="DEBUG")
+configure_logging()
+configure_tracing(service_name="caelus-api")
 
 _settings = get_settings()
 
@@ -34,7 +36,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+app.add_middleware(RequestContextMiddleware)
+app.add_middleware(TracingMiddleware)
 
 
 @app.get("/", include_in_schema=False)
@@ -57,11 +62,17 @@ app.include_router(hostnames.router, prefix="/api")
 app.include_router(plans.router, prefix="/api")
 app.include_router(subscriptions.router, prefix="/api")
 app.include_router(webhooks.router, prefix="/api")
+app.include_router(outbox.router, prefix="/api")
+app.include_router(billing.router, prefix="/api")
+app.include_router(pricing.router, prefix="/api")
+app.include_router(capacity.router, prefix="/api")
+app.include_router(clusters.router, prefix="/api")
+app.include_router(namespace_pool.router, prefix="/api")
 
 _init_static_dir()
-app.mount("/api/static", StaticFiles(directory=str(_settings.static_path)), name="static")
+app.mount("/api/static", IconStaticFiles(directory=str(_settings.static_path)), name="static")
 
 register_exception_handlers(app)
 
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, log_level="info", reload=True)
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, log_level=_settings.log_level.lower(), reload=True)
@@ -5,14 +5,27 @@ working everywhere.
 The models are split across two modules:
   - core.py:    User, Product, ProductTemplateVersion, Deployment,
                 DeploymentReconcileJob (and their Base/Create/Update/Read
-                variants).
+                variants), plus the CatalogRevision counter, the capacity
+                ledger, the cluster registry, the warm namespace pool and
+                the outbox of pending external side effects.
   - billing.py: Plan, PlanTemplateVersion, Subscription (and their
                 Base/Create/Update/Read variants), plus the BillingInterval,
-                SubscriptionStatus, and PaymentStatus enums.
+                SubscriptionStatus, and PaymentStatus enums, plus Mollie
+                payments, the Mollie webhook inbox, the billing report
+                summary tables and the plan pricing requests.
 """
 
 from app.models.core import (  # noqa: F401
     _utcnow,
+    CapacityDimension,
+    CapacityLedgerORM,
+    CapacityRead,
+    CatalogRevisionORM,
+    CheckoutRead,
+    ClusterCreate,
+    ClusterORM,
+    ClusterRead,
+    ClusterUpdate,
     DeploymentBase,
     DeploymentCreate,
     DeploymentCreateResponse,
@@ -21,6 +34,14 @@ from app.models.core import (  # noqa: F401
     DeploymentReconcileJobBase,
     DeploymentReconcileJobORM,
     DeploymentUpdate,
+    HOSTNAME_BATCH_MAX,
+    HostnameBatchCheck,
+    HostnameCheck,
+    NamespacePoolORM,
+    NamespacePoolStats,
+    OutboxKindStats,
+    OutboxORM,
+    OutboxStats,
     ProductBase,
     ProductCreate,
     ProductORM,
@@ -40,12 +61,20 @@ from app.models.core import (  # noqa: F401
 
 from app.models.billing import (  # noqa: F401
     BillingInterval,
+    BillingPlanReport,
+    BillingPlanSummaryORM,
+    BillingReport,
+    BillingSummaryDirtyORM,
     MolliePaymentORM,
     MolliePaymentStatus,
+    MollieWebhookInboxORM,
     PaymentStatus,
     PlanBase,
     PlanCreate,
     PlanORM,
+    PlanPriceSuggestion,
+    PlanPricingRequest,
+    PlanPricingResult,
     PlanRead,
     PlanReadBase,
     PlanTemplateVersionBase,
@@ -53,6 +82,8 @@ from app.models.billing import (  # noqa: F401
     PlanTemplateVersionORM,
     PlanTemplateVersionRead,
     PlanUpdate,
+    PricingSweepRequest,
+    PricingSweepResult,
     SubscriptionBase,
     SubscriptionORM,
     SubscriptionRead,
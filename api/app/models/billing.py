@@ -1,13 +1,14 @@
 import uuid as uuid_mod
 from datetime import datetime
 from enum import StrEnum
-from typing import Optional
+from typing import Any, Optional
 
 from pydantic import ConfigDict
 from sqlmodel import Field, SQLModel, Relationship
 from sqlalchemy import BigInteger, Column, Enum as SAEnum, ForeignKey, Integer, Index, JSON, String, Text, Uuid, func
 
 from app.models.core import _utcnow, ProductORM, UserORM
+from app.pricing import CostModel, ServerSpec
 
 
 class BillingInterval(StrEnum):
@@ -180,6 +181,10 @@ class SubscriptionBase(SQLModel):
 
 class SubscriptionORM(SubscriptionBase, table=True):
     __tablename__ = "subscription"
+    __table_args__ = (
+        # Billing reports group active subscriptions by payment status and plan.
+        Index("ix_subscription_status_payment_status_plan", "status", "payment_status", "plan_template_id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     plan_template_id: int = Field(
@@ -233,6 +238,10 @@ class SubscriptionRead(SubscriptionBase):
 
 class MolliePaymentORM(SQLModel, table=True):
     __tablename__ = "mollie_payment"
+    __table_args__ = (
+        # Revenue reports sum paid payments, optionally since a date.
+        Index("ix_mollie_payment_status_created_at", "status", "created_at"),
+    )
 
     id: uuid_mod.UUID = Field(
         default_factory=uuid_mod.uuid4,
@@ -254,8 +263,157 @@ class MolliePaymentORM(SQLModel, table=True):
     amount_cents: int = Field(nullable=False)
     created_at: datetime = Field(default_factory=_utcnow, nullable=False)
     payload: Optional[dict] = Field(default=None, sa_column=Column(JSON, nullable=True))
+    # Hosted checkout page for first payments, returned to the client.
+    checkout_url: Optional[str] = Field(default=None, sa_column=Column(Text(), nullable=True))
 
     subscription: SubscriptionORM = Relationship(
         back_populates="mollie_payments",
         sa_relationship_kwargs={"foreign_keys": "MolliePaymentORM.subscription_id", "lazy": "joined"},
     )
+
+
+# ---------------------------------------------------------------------------
+# Mollie webhook inbox
+# ---------------------------------------------------------------------------
+
+
+class MollieWebhookInboxORM(SQLModel, table=True):
+    """One row per Mollie payment id with a webhook still to process.
+
+    The webhook endpoint only upserts this row; the worker fetches the payment
+    from Mollie and applies it. Repeated webhooks for the same payment collapse
+    into one queued row.
+    """
+
+    __tablename__ = "mollie_webhook_inbox"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    mollie_payment_id: str = Field(sa_column=Column(String(), unique=True, nullable=False))
+    status: str = Field(default="queued", sa_column=Column(String(), nullable=False, index=True))
+    # Last time Mollie notified us; a notification that arrives while the row
+    # is being processed sends it back to the queue afterwards.
+    received_at: datetime = Field(default_factory=_utcnow, nullable=False)
+    run_after: datetime = Field(default_factory=_utcnow, nullable=False)
+    attempts: int = Field(default=0, nullable=False)
+    locked_by: Optional[str] = None
+    locked_at: Optional[datetime] = None
+    processed_at: Optional[datetime] = None
+    last_error: Optional[str] = Field(default=None, sa_column=Column(Text(), nullable=True))
+    created_at: datetime = Field(default_factory=_utcnow, nullable=False)
+
+
+# ---------------------------------------------------------------------------
+# Billing reports
+# ---------------------------------------------------------------------------
+
+
+class BillingPlanSummaryORM(SQLModel, table=True):
+    """Materialized billing figures per plan template version.
+
+    Maintained by :func:`app.services.billing_reports.refresh_summary`, which
+    only recomputes the plan templates marked in ``billing_summary_dirty``.
+    """
+
+    __tablename__ = "billing_plan_summary"
+
+    plan_template_id: int = Field(
+        sa_column=Column(Integer, ForeignKey("plan_template_version.id"), primary_key=True)
+    )
+    current: int = Field(default=0, nullable=False)
+    arrears: int = Field(default=0, nullable=False)
+    pending: int = Field(default=0, nullable=False)
+    revenue_cents: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+    refreshed_at: datetime = Field(default_factory=_utcnow, nullable=False)
+
+
+class BillingSummaryDirtyORM(SQLModel, table=True):
+    """A plan template whose billing summary is out of date.
+
+    Insert-only from write paths (no unique key, so concurrent writers never
+    conflict); the refresh consumes the rows it has read.
+    """
+
+    __tablename__ = "billing_summary_dirty"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    plan_template_id: int = Field(nullable=False)
+    created_at: datetime = Field(default_factory=_utcnow, nullable=False)
+
+
+class BillingPlanReport(SQLModel):
+    plan_id: int
+    plan_name: str
+    product_name: str
+    billing_interval: BillingInterval
+    price_cents: int
+    active: int = 0
+    current: int = 0
+    arrears: int = 0
+    pending: int = 0
+    # Monthly recurring revenue of subscriptions whose payments are current.
+    mrr_cents: int = 0
+    revenue_cents: int = 0
+
+
+class BillingReport(SQLModel):
+    """Aggregated billing figures for finance dashboards."""
+    as_of: datetime
+    # Start of the revenue window (``None``: all time).
+    revenue_since: Optional[datetime] = None
+    materialized: bool = False
+    mrr_cents: int = 0
+    active: int = 0
+    current: int = 0
+    arrears: int = 0
+    pending: int = 0
+    revenue_cents: int = 0
+    plans: list[BillingPlanReport] = Field(default_factory=list)
+
+
+class PlanPricingRequest(SQLModel):
+    """Resource profile of a product's customers, priced against each plan's storage tier."""
+    cost_model: CostModel = Field(default_factory=CostModel)
+    cpu_cores: float = Field(gt=0)
+    ram_gb: float = Field(gt=0)
+    bandwidth_gb_mo: float = Field(default=0, ge=0)
+    # Database and metadata storage on top of the plan's storage tier.
+    storage_overhead_pct: float = Field(default=0, ge=0)
+    # Only price these plans (default: all plans of the product).
+    plan_ids: Optional[list[int]] = None
+
+
+class PlanPriceSuggestion(SQLModel):
+    plan_id: int
+    plan_name: str
+    template_id: int
+    billing_interval: BillingInterval
+    storage_bytes: Optional[int] = None
+    current_price_cents: int
+    # Cost to serve and suggested price per billing interval.
+    cost_cents: int
+    suggested_price_cents: int
+    # Template version created for the suggested price (when applied).
+    new_template_id: Optional[int] = None
+
+
+class PlanPricingResult(SQLModel):
+    product_id: int
+    applied: bool = False
+    plans: list[PlanPriceSuggestion] = Field(default_factory=list)
+
+
+class PricingSweepRequest(SQLModel):
+    """Axes of a what-if grid: every combination of the values is evaluated."""
+    cost_model: CostModel = Field(default_factory=CostModel)
+    cpu_cores: list[float] = Field(min_length=1)
+    ram_gb: list[float] = Field(min_length=1)
+    storage_gb: list[float] = Field(min_length=1)
+    bandwidth_gb_mo: list[float] = Field(default_factory=lambda: [0.0], min_length=1)
+    # Reference servers to compare (default: the cost model's server).
+    servers: list[ServerSpec] = Field(default_factory=list)
+
+
+class PricingSweepResult(SQLModel):
+    count: int
+    # One list per input and computed figure, all of length ``count``.
+    columns: dict[str, list[Any]]
@@ -4,7 +4,7 @@ from uuid import UUID, uuid4
 
 from pydantic import ConfigDict, model_validator
 from sqlmodel import Field, SQLModel, Relationship
-from sqlalchemy import Column, ForeignKey, Integer, Index, JSON, Text, String, Uuid, func
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer, Index, JSON, Text, String, Uuid, func
 
 from app.services.reconcile_constants import DEPLOYMENT_STATUS_DELETED
 
@@ -55,6 +55,8 @@ class ProductBase(SQLModel):
     name: str
     description: str | None = None
     template_id: Optional[int] = None
+    # Cluster all of the product's new deployments are placed on.
+    cluster: Optional[str] = None
 
 
 class ProductORM(ProductBase, table=True):
@@ -75,6 +77,7 @@ class ProductORM(ProductBase, table=True):
     template_id: Optional[int] = Field(
         default=None, foreign_key="product_template_version.id", index=True
     )
+    cluster: Optional[str] = Field(default=None, foreign_key="cluster.name")
     # Relative path to product icon under STATIC_PATH (e.g., "icons/<sha1>.png")
     rel_icon_path: Optional[str] = Field(default=None, nullable=True)
     template: "ProductTemplateVersionORM" = Relationship(
@@ -102,6 +105,8 @@ class ProductUpdate(SQLModel):
     name: str | None = None
     template_id: Optional[int] = None
     description: str | None = None
+    # "" unpins the product.
+    cluster: str | None = None
 
 
 class ProductReadBase(ProductBase):
@@ -109,24 +114,33 @@ class ProductReadBase(ProductBase):
     id: int
     created_at: datetime
     icon_url: Optional[str] = None
+    # Variant name (e.g. "64.webp") -> URL; absent for icons uploaded before
+    # variants were generated.
+    icon_variants: Optional[dict[str, str]] = None
 
     @model_validator(mode="before")
     @classmethod
     def _compute_icon_url(cls, data: Any) -> Any:
-        """Derive icon_url from rel_icon_path when serializing from ORM."""
-        from app.config import get_static_url_base
+        """Derive icon_url and icon_variants from rel_icon_path when serializing from ORM."""
+        from app.config import get_icon_url_base
+        from app.services.images import icon_variant_paths
 
         if isinstance(data, dict):
             rel = data.get("rel_icon_path")
         else:
             rel = getattr(data, "rel_icon_path", None)
         if rel:
+            base = get_icon_url_base()
+            variants = icon_variant_paths(rel)
+            variant_urls = {name: f"{base}/{path}" for name, path in variants.items()} if variants else None
             if isinstance(data, dict):
-                data.setdefault("icon_url", f"{get_static_url_base()}/{rel}")
+                data.setdefault("icon_url", f"{base}/{rel}")
+                data.setdefault("icon_variants", variant_urls)
             else:
                 # For ORM objects, we need to return a dict so we can inject icon_url
                 d = {k: getattr(data, k) for k in cls.model_fields if hasattr(data, k)}
-                d["icon_url"] = f"{get_static_url_base()}/{rel}"
+                d["icon_url"] = f"{base}/{rel}"
+                d["icon_variants"] = variant_urls
                 return d
         return data
 
@@ -144,6 +158,11 @@ class ProductTemplateVersionBase(SQLModel):
     system_values_json: Optional[dict[str, Any]] = None
     values_schema_json: Optional[dict[str, Any]] = None
     capabilities_json: Optional[dict[str, Any]] = None
+    # Cluster resources one instance of this template needs, on top of the
+    # plan's storage quota; checked against the capacity ledger on admission.
+    footprint_cpu_millicores: Optional[int] = None
+    footprint_memory_bytes: Optional[int] = None
+    footprint_storage_bytes: Optional[int] = None
 
 
 class ProductTemplateVersionORM(ProductTemplateVersionBase, table=True):
@@ -162,7 +181,15 @@ class ProductTemplateVersionORM(ProductTemplateVersionBase, table=True):
     capabilities_json: Optional[dict[str, Any]] = Field(
         default=None, sa_column=Column(JSON, nullable=True)
     )
+    # Paths into user values whose schema is titled "hostname", derived from
+    # values_schema_json when the template is created.
+    hostname_paths_json: Optional[list[list[str]]] = Field(
+        default=None, sa_column=Column(JSON, nullable=True)
+    )
     health_timeout_sec: Optional[int] = Field(default=None)
+    footprint_cpu_millicores: Optional[int] = Field(default=None)
+    footprint_memory_bytes: Optional[int] = Field(default=None, sa_column=Column(BigInteger, nullable=True))
+    footprint_storage_bytes: Optional[int] = Field(default=None, sa_column=Column(BigInteger, nullable=True))
     product_id: int = Field(
         sa_column=Column(Integer, ForeignKey("product.id"), nullable=False, index=True)
     )
@@ -187,10 +214,109 @@ class ProductTemplateVersionCreate(ProductTemplateVersionBase):
 
 class ProductTemplateVersionRead(ProductTemplateVersionBase):
     id: Optional[int]
+    hostname_paths_json: Optional[list[list[str]]] = None
     created_at: datetime
     product: ProductReadBase
 
 
+class CatalogRevisionORM(SQLModel, table=True):
+    """Single-row counter bumped whenever a product, template or plan changes.
+
+    ``epoch`` is generated when the row is first created so that revisions from
+    a different (e.g. restored or recreated) database never produce the same ETag.
+    """
+    __tablename__ = "catalog_revision"
+
+    id: int = Field(default=1, primary_key=True)
+    epoch: str = Field(nullable=False)
+    revision: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+    updated_at: datetime = Field(default_factory=_utcnow, nullable=False)
+
+
+class CapacityLedgerORM(SQLModel, table=True):
+    """Single-row totals of the cluster resources reserved by live deployments.
+
+    Admission adds a deployment's footprint with one conditional UPDATE, so
+    concurrent requests can never commit more than the configured capacity.
+    """
+    __tablename__ = "capacity_ledger"
+
+    id: int = Field(default=1, primary_key=True)
+    cpu_millicores: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+    memory_bytes: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+    storage_bytes: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+    updated_at: datetime = Field(default_factory=_utcnow, nullable=False)
+
+
+class ClusterBase(SQLModel):
+    name: str = Field(min_length=1, max_length=63)
+    # Passed to kubectl/helm as --kubeconfig and --context/--kube-context;
+    # None uses the worker environment's defaults.
+    kubeconfig: Optional[str] = None
+    kube_context: Optional[str] = None
+    # Disabled clusters keep their deployments but receive no new ones.
+    enabled: bool = True
+    # Allocatable resources; None means that resource is not limited.
+    capacity_cpu_millicores: Optional[int] = Field(default=None, ge=0)
+    capacity_memory_bytes: Optional[int] = Field(default=None, ge=0)
+    capacity_storage_bytes: Optional[int] = Field(default=None, ge=0)
+
+
+class ClusterORM(ClusterBase, table=True):
+    """A Kubernetes cluster deployments are placed on, with the resources committed to it."""
+    __tablename__ = "cluster"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str = Field(sa_column=Column(String(), unique=True, nullable=False))
+    capacity_cpu_millicores: Optional[int] = Field(default=None, sa_column=Column(BigInteger, nullable=True))
+    capacity_memory_bytes: Optional[int] = Field(default=None, sa_column=Column(BigInteger, nullable=True))
+    capacity_storage_bytes: Optional[int] = Field(default=None, sa_column=Column(BigInteger, nullable=True))
+    cpu_millicores: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, server_default="0"))
+    memory_bytes: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, server_default="0"))
+    storage_bytes: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, server_default="0"))
+    created_at: datetime = Field(default_factory=_utcnow, nullable=False)
+    updated_at: datetime = Field(default_factory=_utcnow, nullable=False)
+
+
+class ClusterCreate(ClusterBase):
+    model_config = ConfigDict(extra="forbid")
+
+
+class ClusterUpdate(SQLModel):
+    model_config = ConfigDict(extra="forbid")
+    kubeconfig: Optional[str] = None
+    kube_context: Optional[str] = None
+    enabled: Optional[bool] = None
+    capacity_cpu_millicores: Optional[int] = Field(default=None, ge=0)
+    capacity_memory_bytes: Optional[int] = Field(default=None, ge=0)
+    capacity_storage_bytes: Optional[int] = Field(default=None, ge=0)
+
+
+class ClusterRead(ClusterBase):
+    id: int
+    # Resources committed to the cluster's live deployments.
+    cpu_millicores: int
+    memory_bytes: int
+    storage_bytes: int
+    created_at: datetime
+    updated_at: datetime
+
+
+class CapacityDimension(SQLModel):
+    committed: int
+    # ``None``: no limit configured for this resource.
+    limit: Optional[int] = None
+    available: Optional[int] = None
+
+
+class CapacityRead(SQLModel):
+    cpu_millicores: CapacityDimension
+    memory_bytes: CapacityDimension
+    storage_bytes: CapacityDimension
+    updated_at: datetime
+    clusters: list[ClusterRead] = []
+
+
 # ---------------------------------------------------------------------------
 # Deployment
 # ---------------------------------------------------------------------------
@@ -264,6 +390,14 @@ class DeploymentORM(DeploymentBase, table=True):
     last_reconcile_at: Optional[datetime] = Field(default=None)
     created_at: datetime = Field(default_factory=_utcnow, nullable=False)
     deleted_at: Optional[datetime] = Field(default=None)
+    # Cluster the deployment is placed on; None when no clusters are registered.
+    cluster: Optional[str] = Field(
+        default=None, sa_column=Column(String(), ForeignKey("cluster.name"), nullable=True, index=True)
+    )
+    # This deployment's share of the capacity ledger, released once it is deleted.
+    reserved_cpu_millicores: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, server_default="0"))
+    reserved_memory_bytes: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, server_default="0"))
+    reserved_storage_bytes: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, server_default="0"))
     reconcile_jobs: list["DeploymentReconcileJobORM"] = Relationship(back_populates="deployment")
     user: UserORM = Relationship(back_populates="deployments", sa_relationship_kwargs={"lazy": "joined"})
     desired_template: Optional[ProductTemplateVersionORM] = Relationship(
@@ -317,6 +451,7 @@ class DeploymentRead(DeploymentBase):
     applied_template: Optional[ProductTemplateVersionRead]
     subscription_id: Optional[int] = None
     subscription: Optional["SubscriptionRead"] = None
+    cluster: Optional[str] = None
     name: Optional[str] = None
     namespace: Optional[str] = None
     status: str = Field(default="pending")
@@ -329,6 +464,29 @@ class DeploymentCreateResponse(SQLModel):
     """Envelope returned by the deployment creation endpoint only."""
     deployment: DeploymentRead
     checkout_url: str | None = None
+    # "pending" while the checkout is still being created; poll the checkout
+    # endpoint for the URL then.
+    checkout_status: str | None = None
+
+
+class CheckoutRead(SQLModel):
+    """Checkout state of a paid deployment (``pending``, ``ready``, ``failed``, ``not_required``)."""
+    status: str
+    checkout_url: str | None = None
+    last_error: str | None = None
+
+
+HOSTNAME_BATCH_MAX = 1000
+
+
+class HostnameCheck(SQLModel):
+    fqdn: str
+    usable: bool
+    reason: str | None = None
+
+
+class HostnameBatchCheck(SQLModel):
+    fqdns: list[str] = Field(min_length=1, max_length=HOSTNAME_BATCH_MAX)
 
 
 class DeploymentReconcileJobBase(SQLModel):
@@ -341,6 +499,13 @@ class DeploymentReconcileJobBase(SQLModel):
     locked_by: Optional[str] = None
     locked_at: Optional[datetime] = None
     last_error: Optional[str] = None
+    # The deployment's cluster at enqueue time; only that cluster's workers claim the job.
+    cluster: Optional[str] = None
+    stage: str = Field(default="reconcile")
+    # When an await_ready job gives up on the rollout and rolls it back.
+    deadline: Optional[datetime] = None
+    # W3C trace context (JSON carrier) of the span that enqueued the job.
+    trace_context: Optional[str] = None
 
 
 class DeploymentReconcileJobORM(DeploymentReconcileJobBase, table=True):
@@ -353,6 +518,8 @@ class DeploymentReconcileJobORM(DeploymentReconcileJobBase, table=True):
             sqlite_where=Column("status").in_(("queued", "running")),
             postgresql_where=Column("status").in_(("queued", "running")),
         ),
+        # Claiming scans queued jobs by run_after and counts running ones.
+        Index("ix_deployment_reconcile_job_status_run_after", "status", "run_after"),
     )
 
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -364,6 +531,86 @@ class DeploymentReconcileJobORM(DeploymentReconcileJobBase, table=True):
             index=True,
         )
     )
+    cluster: Optional[str] = Field(default=None, sa_column=Column(String(), nullable=True, index=True))
+    stage: str = Field(default="reconcile", sa_column=Column(String(), nullable=False, server_default="reconcile"))
     deployment: DeploymentORM = Relationship(back_populates="reconcile_jobs")
     created_at: datetime = Field(default_factory=_utcnow, nullable=False)
     updated_at: datetime = Field(default_factory=_utcnow, nullable=False)
+
+
+class OutboxORM(SQLModel, table=True):
+    """An external side effect recorded in the same transaction as the change causing it.
+
+    Rows are delivered after commit (by the request that wrote them, or by a
+    worker) so no database transaction is held open across a third-party
+    call. ``key`` doubles as the idempotency key sent to the third party, so a
+    redelivery never duplicates the side effect.
+    """
+
+    __tablename__ = "outbox"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(nullable=False)
+    key: str = Field(sa_column=Column(String(), unique=True, nullable=False))
+    payload: dict = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))
+    status: str = Field(default="queued", sa_column=Column(String(), nullable=False, index=True))
+    run_after: datetime = Field(default_factory=_utcnow, nullable=False)
+    attempts: int = Field(default=0, nullable=False)
+    locked_by: Optional[str] = None
+    locked_at: Optional[datetime] = None
+    processed_at: Optional[datetime] = None
+    last_error: Optional[str] = Field(default=None, sa_column=Column(Text(), nullable=True))
+    created_at: datetime = Field(default_factory=_utcnow, nullable=False)
+
+
+class OutboxKindStats(SQLModel):
+    kind: str
+    queued: int = 0
+    running: int = 0
+    done: int = 0
+    failed: int = 0
+    # Queued again after at least one failed delivery.
+    retrying: int = 0
+    oldest_open_age_seconds: Optional[float] = None
+    delivered_recently: int = 0
+    avg_latency_seconds: Optional[float] = None
+    max_latency_seconds: Optional[float] = None
+
+
+class OutboxStats(SQLModel):
+    """Outbox backlog and delivery latency (over the last ``window_seconds``)."""
+    window_seconds: float
+    kinds: list[OutboxKindStats] = Field(default_factory=list)
+
+
+class NamespacePoolORM(SQLModel, table=True):
+    """A pre-created namespace waiting for a new deployment (see app.services.namespace_pool).
+
+    ``warming`` while the namespace is being created, ``ready`` once it can
+    be claimed and ``claimed`` once a deployment took it.
+    """
+
+    __tablename__ = "namespace_pool"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str = Field(sa_column=Column(String(), unique=True, nullable=False))
+    cluster: Optional[str] = Field(
+        default=None, sa_column=Column(String(), ForeignKey("cluster.name"), nullable=True, index=True)
+    )
+    status: str = Field(default="warming", sa_column=Column(String(), nullable=False, index=True))
+    deployment_id: Optional[UUID] = Field(default=None, sa_column=Column(Uuid, nullable=True))
+    created_at: datetime = Field(default_factory=_utcnow, nullable=False)
+    claimed_at: Optional[datetime] = None
+
+
+class NamespacePoolStats(SQLModel):
+    """Warm namespace pool of one cluster and its hit rate over the last ``window_seconds``."""
+    cluster: Optional[str] = None
+    target_size: int
+    ready: int = 0
+    warming: int = 0
+    window_seconds: float
+    # Deployments created in the window, and how many of them got a warm namespace.
+    created_recently: int = 0
+    hits_recently: int = 0
+    hit_rate: Optional[float] = None
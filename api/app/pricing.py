@@ -0,0 +1,269 @@
+"""Vectorized cost-to-serve and pricing engine.
+
+This is the pricing model from ``products/pricing/pricing_model.py`` as an
+importable library: the Streamlit explorer, ``caelus price-plans`` /
+``caelus price-sweep`` and the ``/api/pricing`` endpoints all evaluate it.
+
+Every function takes array-likes and broadcasts them with NumPy, so a whole
+product line, or a grid of thousands of (cpu, ram, storage, bandwidth,
+server) what-if scenarios, is one evaluation rather than one Python call per
+plan. :func:`evaluate` and :func:`scenario_grid` cache their results keyed on
+the inputs; cached arrays are read-only.
+
+The module depends only on NumPy (pandas is needed for
+:meth:`PricingResult.to_frame` alone) and none of the API, so it can be
+imported without a database or settings.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Iterator, Literal, Sequence
+
+import numpy as np
+
+COST_MODE_SERVER_SHARE = "server_share"
+COST_MODE_COMPONENT = "component"
+
+CostMode = Literal["server_share", "component"]
+
+MAX_SCENARIOS = 1_000_000
+
+_CACHE_SIZE = 128
+
+# Columns holding the scenario inputs; everything else is a computed figure.
+INPUT_COLUMNS = ("cpu_cores", "ram_gb", "storage_gb", "bandwidth_gb_mo", "server")
+
+
+@dataclass(frozen=True)
+class ServerSpec:
+    """A reference server; customers are charged the share of it they occupy."""
+
+    name: str = "AX162-R"
+    cost_mo: float = 215.0
+    cpu_cores: float = 48
+    ram_gb: float = 256
+    storage_tb: float = 7.6
+    storage_usable_pct: float = 80
+    bw_included_tb: float = 20.0
+    extra_bw_cost_tb: float = 1.30
+
+    @property
+    def usable_storage_tb(self) -> float:
+        return self.storage_tb * (self.storage_usable_pct / 100)
+
+
+@dataclass(frozen=True)
+class ComponentCosts:
+    """Unit prices for the component-based cost mode."""
+
+    cpu_cost_core_mo: float = 4.50
+    ram_cost_gb_mo: float = 0.35
+    bandwidth_cost_tb: float = 1.30
+
+
+@dataclass(frozen=True)
+class CostModel:
+    """Every assumption the cost of a scenario depends on (hashable, so it keys the cache)."""
+
+    mode: CostMode = COST_MODE_SERVER_SHARE
+    server: ServerSpec = field(default_factory=ServerSpec)
+    components: ComponentCosts = field(default_factory=ComponentCosts)
+    nvme_cost_tb_yr: float = 40.0
+    avg_storage_utilisation_pct: float = 50
+    support_fte_cost_yr: float = 60000
+    customers_per_support_fte: float = 500
+    target_margin_pct: float = 50
+
+    @property
+    def support_cost_mo(self) -> float:
+        return (self.support_fte_cost_yr / 12) / self.customers_per_support_fte
+
+
+class PricingResult:
+    """Column-oriented scenarios: one NumPy array per input and computed figure."""
+
+    def __init__(self, columns: dict[str, np.ndarray], servers: tuple[ServerSpec, ...]):
+        self.columns = columns
+        self.servers = servers
+
+    def __len__(self) -> int:
+        return len(self.columns["cost"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def rows(self) -> Iterator[dict[str, Any]]:
+        """Yield one plain-Python dict per scenario (server as its name)."""
+        names = list(self.columns)
+        lists = [self.columns[name].tolist() for name in names]
+        for values in zip(*lists):
+            row = dict(zip(names, values))
+            if "server" in row:
+                row["server"] = self.servers[row["server"]].name
+            yield row
+
+    def to_frame(self):
+        """The scenarios as a pandas ``DataFrame`` (requires pandas)."""
+        import pandas as pd
+
+        frame = pd.DataFrame(self.columns)
+        if "server" in frame:
+            frame["server"] = frame["server"].map(lambda i: self.servers[i].name)
+        return frame
+
+
+def price_from_cost(cost, target_margin_pct: float):
+    """Price that leaves *target_margin_pct* gross margin on *cost*."""
+    return np.asarray(cost, dtype=float) / (1 - target_margin_pct / 100)
+
+
+def _server_columns(servers: tuple[ServerSpec, ...], index: np.ndarray) -> dict[str, np.ndarray]:
+    def column(values: list[float]) -> np.ndarray:
+        return np.asarray(values, dtype=float)[index]
+
+    return {
+        "cost_mo": column([s.cost_mo for s in servers]),
+        "cpu_cores": column([s.cpu_cores for s in servers]),
+        "ram_gb": column([s.ram_gb for s in servers]),
+        "usable_storage_gb": column([s.usable_storage_tb * 1000 for s in servers]),
+        "bw_included_tb": column([s.bw_included_tb for s in servers]),
+        "extra_bw_cost_tb": column([s.extra_bw_cost_tb for s in servers]),
+    }
+
+
+def _compute(
+    model: CostModel,
+    servers: tuple[ServerSpec, ...],
+    server_index: np.ndarray,
+    cpu_cores: np.ndarray,
+    ram_gb: np.ndarray,
+    storage_gb: np.ndarray,
+    bandwidth_gb_mo: np.ndarray,
+) -> dict[str, np.ndarray]:
+    # Customers don't fill their whole quota: cost follows average usage,
+    # which is what lets storage be overcommitted.
+    used_gb = storage_gb * (model.avg_storage_utilisation_pct / 100)
+    nvme_tb_mo = model.nvme_cost_tb_yr / 12
+    out: dict[str, np.ndarray] = {"storage_used_gb": used_gb}
+
+    if model.mode == COST_MODE_SERVER_SHARE:
+        server = _server_columns(servers, server_index)
+        cpu_frac = cpu_cores / server["cpu_cores"]
+        ram_frac = ram_gb / server["ram_gb"]
+        share = np.maximum(cpu_frac, ram_frac)
+        # The compute share pays for the same share of the server's NVMe and
+        # bandwidth allowance; only usage beyond that is charged extra.
+        included_gb = share * server["usable_storage_gb"]
+        extra_gb = np.maximum(0.0, used_gb - included_gb)
+        extra_bw_tb = np.maximum(0.0, bandwidth_gb_mo / 1000 - share * server["bw_included_tb"])
+        out.update(
+            server_share=share,
+            cpu_bound=cpu_frac >= ram_frac,
+            included_storage_gb=included_gb,
+            extra_storage_gb=extra_gb,
+            compute=share * server["cost_mo"],
+            storage=(extra_gb / 1000) * nvme_tb_mo,
+            bandwidth=extra_bw_tb * server["extra_bw_cost_tb"],
+        )
+    elif model.mode == COST_MODE_COMPONENT:
+        costs = model.components
+        cpu = cpu_cores * costs.cpu_cost_core_mo
+        ram = ram_gb * costs.ram_cost_gb_mo
+        out.update(
+            cpu=cpu,
+            ram=ram,
+            compute=cpu + ram,
+            storage=(used_gb / 1000) * nvme_tb_mo,
+            bandwidth=(bandwidth_gb_mo / 1000) * costs.bandwidth_cost_tb,
+        )
+    else:
+        raise ValueError(f"Unknown cost mode {model.mode!r}")
+
+    out["support"] = np.full(used_gb.shape, model.support_cost_mo)
+    out["cost"] = out["compute"] + out["storage"] + out["bandwidth"] + out["support"]
+    out["price"] = price_from_cost(out["cost"], model.target_margin_pct)
+    return out
+
+
+def _freeze(columns: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    for array in columns.values():
+        array.setflags(write=False)
+    return columns
+
+
+def _key(values) -> tuple[float, ...]:
+    return tuple(np.asarray(values, dtype=float).ravel().tolist())
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _evaluate_cached(
+    model: CostModel,
+    cpu_cores: tuple[float, ...],
+    ram_gb: tuple[float, ...],
+    storage_gb: tuple[float, ...],
+    bandwidth_gb_mo: tuple[float, ...],
+) -> PricingResult:
+    cpu, ram, storage, bw = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (cpu_cores, ram_gb, storage_gb, bandwidth_gb_mo))
+    )
+    servers = (model.server,)
+    index = np.zeros(cpu.shape, dtype=np.intp)
+    columns = {"cpu_cores": cpu.copy(), "ram_gb": ram.copy(), "storage_gb": storage.copy(), "bandwidth_gb_mo": bw.copy()}
+    columns.update(_compute(model, servers, index, cpu, ram, storage, bw))
+    return PricingResult(_freeze(columns), servers)
+
+
+def evaluate(model: CostModel, cpu_cores, ram_gb, storage_gb, bandwidth_gb_mo) -> PricingResult:
+    """Cost and price of each scenario, pairing the inputs element-wise.
+
+    Inputs are scalars or 1-D sequences broadcast against each other, e.g. one
+    CPU/RAM/bandwidth profile against a list of storage tiers.
+    """
+    return _evaluate_cached(model, _key(cpu_cores), _key(ram_gb), _key(storage_gb), _key(bandwidth_gb_mo))
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _grid_cached(
+    model: CostModel,
+    cpu_cores: tuple[float, ...],
+    ram_gb: tuple[float, ...],
+    storage_gb: tuple[float, ...],
+    bandwidth_gb_mo: tuple[float, ...],
+    servers: tuple[ServerSpec, ...],
+) -> PricingResult:
+    axes = [np.asarray(v, dtype=float) for v in (cpu_cores, ram_gb, storage_gb, bandwidth_gb_mo)]
+    axes.append(np.arange(len(servers), dtype=np.intp))
+    cpu, ram, storage, bw, index = (a.ravel() for a in np.meshgrid(*axes, indexing="ij"))
+    columns = {"cpu_cores": cpu, "ram_gb": ram, "storage_gb": storage, "bandwidth_gb_mo": bw, "server": index}
+    columns.update(_compute(model, servers, index, cpu, ram, storage, bw))
+    return PricingResult(_freeze(columns), servers)
+
+
+def scenario_grid(
+    model: CostModel,
+    cpu_cores: Sequence[float],
+    ram_gb: Sequence[float],
+    storage_gb: Sequence[float],
+    bandwidth_gb_mo: Sequence[float],
+    servers: Sequence[ServerSpec] | None = None,
+) -> PricingResult:
+    """Evaluate every combination of the given values (and servers, default the model's).
+
+    Raises ValueError if an axis is empty or the grid exceeds :data:`MAX_SCENARIOS`.
+    """
+    servers = tuple(servers) if servers else (model.server,)
+    keys = [_key(v) for v in (cpu_cores, ram_gb, storage_gb, bandwidth_gb_mo)]
+    size = len(servers)
+    for axis in keys:
+        size *= len(axis)
+    if size == 0:
+        raise ValueError("Every scenario axis needs at least one value")
+    if size > MAX_SCENARIOS:
+        raise ValueError(f"{size} scenarios exceed the limit of {MAX_SCENARIOS}")
+    return _grid_cached(model, *keys, servers)
+
+
+def cache_clear() -> None:
+    _evaluate_cached.cache_clear()
+    _grid_cached.cache_clear()
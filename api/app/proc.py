@@ -6,6 +6,8 @@ import shlex
 import subprocess
 from typing import Callable
 
+from app import tracing
+
 CommandRunner = Callable[[list[str]], subprocess.CompletedProcess[str]]
 logger = logging.getLogger(__name__)
 
@@ -40,7 +42,7 @@ class AdapterCommandError(RuntimeError):
 
 
 def default_runner(command: list[str]) -> subprocess.CompletedProcess[str]:
-    logger.info("Running external command: %s", shlex.join(command))
+    logger.debug("Running external command: %s", shlex.join(command))
     return subprocess.run(command, capture_output=True, text=True, check=False)
 
 
@@ -51,7 +53,10 @@ def run_command(
     error_message: str,
 ) -> CommandResult:
     active_runner = runner or default_runner
-    completed = active_runner(command)
+    # Named by the tool and subcommand ("helm upgrade", "kubectl get").
+    with tracing.span(" ".join(command[:2]), command=shlex.join(command)):
+        completed = active_runner(command)
+        tracing.set_attributes(returncode=completed.returncode)
     result = CommandResult(
         command=command,
         returncode=completed.returncode,
@@ -5,7 +5,7 @@ import json
 import logging
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-from typing import Any
+from typing import Any, Collection
 
 from app.proc import AdapterCommandError, CommandRunner, run_command
 
@@ -18,11 +18,69 @@ class NamespaceResult:
     changed: bool
 
 
+@dataclass(frozen=True)
+class ReleaseReadiness:
+    namespace: str
+    release_name: str
+    ready: bool
+    # The first workload still rolling out, e.g. "Deployment/web 1/3 available".
+    reason: str | None = None
+
+
+# Helm annotates every resource it manages with its release.
+_RELEASE_ANNOTATION = "meta.helm.sh/release-name"
+
+
+def _workload_progress(item: dict[str, Any]) -> str | None:
+    """Why a Deployment/StatefulSet/DaemonSet is not rolled out yet, or None once it is."""
+    kind = item.get("kind")
+    name = item.get("metadata", {}).get("name")
+    spec = item.get("spec", {})
+    status = item.get("status", {})
+    if status.get("observedGeneration", 0) < item.get("metadata", {}).get("generation", 0):
+        return f"{kind}/{name} update not observed yet"
+    if kind == "DaemonSet":
+        desired = status.get("desiredNumberScheduled", 0)
+        ready = min(status.get("numberReady", 0), status.get("updatedNumberScheduled", 0))
+    else:
+        desired = spec.get("replicas", 1)
+        available = status.get("readyReplicas" if kind == "StatefulSet" else "availableReplicas", 0)
+        ready = min(available or 0, status.get("updatedReplicas", 0) or 0)
+    if ready < desired:
+        return f"{kind}/{name} {ready}/{desired} available"
+    return None
+
+
+def _cluster_flags(
+    *, kubeconfig: str | None, context: str | None, context_flag: str
+) -> list[str]:
+    flags = []
+    if kubeconfig:
+        flags.extend(["--kubeconfig", kubeconfig])
+    if context:
+        flags.extend([context_flag, context])
+    return flags
+
+
 class KubeAdapter:
-    """Adapter for namespace lifecycle operations."""
+    """Adapter for namespace lifecycle operations.
 
-    def __init__(self, *, runner: CommandRunner | None = None) -> None:
+    *kubeconfig* and *context* select the cluster; by default ``kubectl``
+    uses whatever its environment points at.
+    """
+
+    def __init__(
+        self,
+        *,
+        runner: CommandRunner | None = None,
+        kubeconfig: str | None = None,
+        context: str | None = None,
+    ) -> None:
         self._runner = runner
+        self._flags = _cluster_flags(kubeconfig=kubeconfig, context=context, context_flag="--context")
+
+    def _kubectl(self, *args: str) -> list[str]:
+        return ["kubectl", *args, *self._flags]
 
     def ensure_namespace(self, name: str) -> NamespaceResult:
         logger.info("Ensuring Kubernetes namespace exists: %s", name)
@@ -31,18 +89,22 @@ class KubeAdapter:
             return NamespaceResult(name=name, exists=True, changed=False)
 
         run_command(
-            ["kubectl", "create", "namespace", name],
+            self._kubectl("create", "namespace", name),
             runner=self._runner,
             error_message=f"Failed to create namespace {name}",
         )
         logger.info("Created namespace: %s", name)
         return NamespaceResult(name=name, exists=True, changed=True)
 
-    def delete_namespace(self, name: str) -> NamespaceResult:
+    def delete_namespace(self, name: str, *, wait: bool = True) -> NamespaceResult:
+        """Delete *name*; without *wait*, return once deletion has started instead of after its finalizers."""
         logger.info("Deleting Kubernetes namespace: %s", name)
+        args = ["delete", "namespace", name, "--ignore-not-found=true"]
+        if not wait:
+            args.append("--wait=false")
         try:
             run_command(
-                ["kubectl", "delete", "namespace", name, "--ignore-not-found=true"],
+                self._kubectl(*args),
                 runner=self._runner,
                 error_message=f"Failed to delete namespace {name}",
             )
@@ -54,10 +116,26 @@ class KubeAdapter:
                 return NamespaceResult(name=name, exists=False, changed=False)
             raise
 
+    def list_namespaces(self) -> dict[str, str]:
+        """Phase (``Active``/``Terminating``) of every namespace, from one ``kubectl get``."""
+        result = run_command(
+            self._kubectl("get", "namespaces", "-o", "json"),
+            runner=self._runner,
+            error_message="Failed to list namespaces",
+        )
+        try:
+            items = json.loads(result.stdout).get("items", [])
+        except (json.JSONDecodeError, AttributeError) as exc:
+            raise ValueError("Invalid JSON from kubectl get namespaces") from exc
+        return {
+            item["metadata"]["name"]: item.get("status", {}).get("phase", "Active")
+            for item in items
+        }
+
     def namespace_exists(self, name: str) -> bool:
         try:
             run_command(
-                ["kubectl", "get", "namespace", name, "-o", "name"],
+                self._kubectl("get", "namespace", name, "-o", "name"),
                 runner=self._runner,
                 error_message=f"Failed to check namespace {name}",
             )
@@ -70,6 +148,43 @@ class KubeAdapter:
                 return False
             raise
 
+    def release_readiness(
+        self, namespaces: Collection[str] | None = None
+    ) -> dict[tuple[str, str], ReleaseReadiness]:
+        """Rollout state of every Helm release in *namespaces* (default: all), keyed by (namespace, release).
+
+        One ``kubectl get`` across all namespaces lists the workloads of every
+        release at once. Releases without workloads do not appear.
+        """
+        wanted = set(namespaces) if namespaces is not None else None
+        if wanted is not None and not wanted:
+            return {}
+        result = run_command(
+            self._kubectl("get", "deployments,statefulsets,daemonsets", "--all-namespaces", "-o", "json"),
+            runner=self._runner,
+            error_message="Failed to list workloads",
+        )
+        try:
+            items = json.loads(result.stdout).get("items", [])
+        except (json.JSONDecodeError, AttributeError) as exc:
+            raise ValueError("Invalid JSON from kubectl get workloads") from exc
+
+        readiness: dict[tuple[str, str], ReleaseReadiness] = {}
+        for item in items:
+            metadata = item.get("metadata", {})
+            namespace = metadata.get("namespace")
+            release = (metadata.get("annotations") or {}).get(_RELEASE_ANNOTATION)
+            if not release or (wanted is not None and namespace not in wanted):
+                continue
+            key = (namespace, release)
+            if key in readiness and not readiness[key].ready:
+                continue
+            reason = _workload_progress(item)
+            readiness[key] = ReleaseReadiness(
+                namespace=namespace, release_name=release, ready=reason is None, reason=reason
+            )
+        logger.debug("Checked rollout of %d release(s)", len(readiness))
+        return readiness
 
 
 @dataclass(frozen=True)
@@ -92,10 +207,17 @@ class HelmReleaseStatusResult:
 
 
 class HelmAdapter:
-    """Adapter for Helm release lifecycle operations."""
+    """Adapter for Helm release lifecycle operations (cluster selection as for :class:`KubeAdapter`)."""
 
-    def __init__(self, *, runner: CommandRunner | None = None) -> None:
+    def __init__(
+        self,
+        *,
+        runner: CommandRunner | None = None,
+        kubeconfig: str | None = None,
+        context: str | None = None,
+    ) -> None:
         self._runner = runner
+        self._flags = _cluster_flags(kubeconfig=kubeconfig, context=context, context_flag="--kube-context")
 
     def helm_upgrade_install(
         self,
@@ -139,8 +261,15 @@ class HelmAdapter:
                 cmd.append("--atomic")
             if wait:
                 cmd.append("--wait")
+            cmd.extend(self._flags)
 
-            logger.info(f"Helm values for deployment {namespace}/{release_name}:\n{json.dumps(values, indent=2)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Helm values for deployment %s/%s: %s",
+                    namespace,
+                    release_name,
+                    json.dumps(values, separators=(",", ":")),
+                )
             run_command(
                 cmd,
                 runner=self._runner,
@@ -176,6 +305,7 @@ class HelmAdapter:
         ]
         if wait:
             cmd.append("--wait")
+        cmd.extend(self._flags)
         try:
             run_command(
                 cmd,
@@ -204,6 +334,18 @@ class HelmAdapter:
                 )
             raise
 
+    def helm_rollback(self, *, release_name: str, namespace: str, timeout: int) -> HelmReleaseOperationResult:
+        """Roll a release back to its previous revision (what ``--atomic`` does on failure)."""
+        logger.info("Rolling back Helm release '%s' in namespace '%s'", release_name, namespace)
+        run_command(
+            ["helm", "rollback", release_name, "--namespace", namespace, "--timeout", f"{timeout}s", *self._flags],
+            runner=self._runner,
+            error_message=f"Failed to roll back release {release_name}",
+        )
+        return HelmReleaseOperationResult(
+            release_name=release_name, namespace=namespace, changed=True, status="rolled-back"
+        )
+
     def helm_get_release_status(self, *, release_name: str, namespace: str) -> HelmReleaseStatusResult:
         logger.debug(
             "Fetching Helm release status: release='%s' namespace='%s'",
@@ -212,7 +354,7 @@ class HelmAdapter:
         )
         try:
             result = run_command(
-                ["helm", "status", release_name, "--namespace", namespace, "--output", "json"],
+                ["helm", "status", release_name, "--namespace", namespace, "--output", "json", *self._flags],
                 runner=self._runner,
                 error_message=f"Failed to fetch release status for {release_name}",
             )
@@ -312,12 +454,23 @@ class Provisioner:
         self.kube = kube or KubeAdapter()
         self.helm = helm or HelmAdapter()
 
+    @classmethod
+    def for_cluster(cls, *, kubeconfig: str | None, context: str | None) -> Provisioner:
+        """A provisioner whose ``kubectl``/``helm`` calls target one cluster."""
+        return cls(
+            kube=KubeAdapter(kubeconfig=kubeconfig, context=context),
+            helm=HelmAdapter(kubeconfig=kubeconfig, context=context),
+        )
+
     # TODO: these namespace functions should not be exposed -- namespace creation/deletion should be done by the install/uninstall methods transparently
     def ensure_namespace(self, *, name: str) -> NamespaceResult:
         return self.kube.ensure_namespace(name)
 
-    def delete_namespace(self, *, name: str) -> NamespaceResult:
-        return self.kube.delete_namespace(name)
+    def delete_namespace(self, *, name: str, wait: bool = True) -> NamespaceResult:
+        return self.kube.delete_namespace(name, wait=wait)
+
+    def list_namespaces(self) -> dict[str, str]:
+        return self.kube.list_namespaces()
 
     def namespace_exists(self, *, name: str) -> bool:
         return self.kube.namespace_exists(name)
@@ -370,5 +523,13 @@ class Provisioner:
     ) -> HelmReleaseStatusResult:
         return self.helm.helm_get_release_status(release_name=release_name, namespace=namespace)
 
+    def helm_rollback(self, *, release_name: str, namespace: str, timeout: int) -> HelmReleaseOperationResult:
+        return self.helm.helm_rollback(release_name=release_name, namespace=namespace, timeout=timeout)
+
+    def release_readiness(
+        self, *, namespaces: Collection[str] | None = None
+    ) -> dict[tuple[str, str], ReleaseReadiness]:
+        return self.kube.release_readiness(namespaces)
+
 
 provisioner = Provisioner()
@@ -0,0 +1,266 @@
+"""Aggregated billing figures: MRR, payment status counts and revenue per plan.
+
+:func:`billing_report` computes everything with a few grouped queries over
+``subscription``, ``plan_template_version`` and ``mollie_payment``, never
+loading subscriptions one by one.
+
+With ``CAELUS_BILLING_SUMMARY_MATERIALIZED`` the all-time report is read from
+``billing_plan_summary`` instead. Every flush that changes a subscription or a
+Mollie payment marks its plan template in ``billing_summary_dirty`` (see
+:func:`register_listeners`), and :func:`refresh_summary` recomputes only the
+marked plan templates.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import UTC, datetime
+import logging
+from typing import Iterable
+
+from sqlalchemy import case, delete, event, func, insert, text
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from app.config import get_settings
+from app.models import (
+    BillingInterval,
+    BillingPlanReport,
+    BillingPlanSummaryORM,
+    BillingReport,
+    BillingSummaryDirtyORM,
+    MolliePaymentORM,
+    MolliePaymentStatus,
+    PaymentStatus,
+    PlanORM,
+    PlanTemplateVersionORM,
+    ProductORM,
+    SubscriptionORM,
+    SubscriptionStatus,
+)
+
+logger = logging.getLogger(__name__)
+
+_MONTHS_PER_INTERVAL = {BillingInterval.MONTHLY: 1, BillingInterval.ANNUAL: 12}
+# Arbitrary constant identifying the summary refresh advisory lock on Postgres,
+# so worker pools do not recompute the same plan templates side by side.
+_REFRESH_LOCK_KEY = 0x63_61_65_6C_73_75_6D  # "caelsum"
+
+
+@dataclass
+class _Figures:
+    current: int = 0
+    arrears: int = 0
+    pending: int = 0
+    revenue_cents: int = 0
+
+
+def _subscription_counts(
+    session: Session, plan_template_ids: Iterable[int] | None = None
+) -> dict[int, _Figures]:
+    stmt = (
+        select(
+            SubscriptionORM.plan_template_id,
+            func.sum(case((SubscriptionORM.payment_status == PaymentStatus.CURRENT, 1), else_=0)),
+            func.sum(case((SubscriptionORM.payment_status == PaymentStatus.ARREARS, 1), else_=0)),
+            func.sum(case((SubscriptionORM.payment_status == PaymentStatus.PENDING, 1), else_=0)),
+        )
+        .where(SubscriptionORM.status == SubscriptionStatus.ACTIVE)
+        .group_by(SubscriptionORM.plan_template_id)
+    )
+    if plan_template_ids is not None:
+        stmt = stmt.where(SubscriptionORM.plan_template_id.in_(list(plan_template_ids)))
+    figures: dict[int, _Figures] = {}
+    for ptv_id, current, arrears, pending in session.exec(stmt).all():
+        figures[ptv_id] = _Figures(current=current or 0, arrears=arrears or 0, pending=pending or 0)
+    return figures
+
+
+def _revenue(
+    session: Session,
+    figures: dict[int, _Figures],
+    *,
+    since: datetime | None = None,
+    plan_template_ids: Iterable[int] | None = None,
+) -> None:
+    stmt = (
+        select(SubscriptionORM.plan_template_id, func.sum(MolliePaymentORM.amount_cents))
+        .join(SubscriptionORM, SubscriptionORM.id == MolliePaymentORM.subscription_id)
+        .where(MolliePaymentORM.status == MolliePaymentStatus.PAID)
+        .group_by(SubscriptionORM.plan_template_id)
+    )
+    if since is not None:
+        stmt = stmt.where(MolliePaymentORM.created_at >= since)
+    if plan_template_ids is not None:
+        stmt = stmt.where(SubscriptionORM.plan_template_id.in_(list(plan_template_ids)))
+    for ptv_id, revenue in session.exec(stmt).all():
+        figures.setdefault(ptv_id, _Figures()).revenue_cents = int(revenue or 0)
+
+
+def _build_report(
+    session: Session,
+    figures: dict[int, _Figures],
+    *,
+    since: datetime | None,
+    materialized: bool,
+    as_of: datetime,
+) -> BillingReport:
+    report = BillingReport(as_of=as_of, revenue_since=since, materialized=materialized)
+    if not figures:
+        return report
+    rows = session.exec(
+        select(PlanTemplateVersionORM.id, PlanTemplateVersionORM.price_cents, PlanTemplateVersionORM.billing_interval,
+               PlanORM.id, PlanORM.name, ProductORM.name)
+        .join(PlanORM, PlanORM.id == PlanTemplateVersionORM.plan_id)
+        .join(ProductORM, ProductORM.id == PlanORM.product_id)
+        .where(PlanTemplateVersionORM.id.in_(list(figures)))
+    ).all()
+    # One line per plan and price point; plan template versions with the same
+    # price and interval are folded together.
+    plans: dict[tuple[int, BillingInterval, int], BillingPlanReport] = {}
+    for ptv_id, price_cents, interval, plan_id, plan_name, product_name in rows:
+        fig = figures[ptv_id]
+        line = plans.setdefault(
+            (plan_id, interval, price_cents),
+            BillingPlanReport(
+                plan_id=plan_id,
+                plan_name=plan_name,
+                product_name=product_name,
+                billing_interval=interval,
+                price_cents=price_cents,
+            ),
+        )
+        line.current += fig.current
+        line.arrears += fig.arrears
+        line.pending += fig.pending
+        line.active += fig.current + fig.arrears + fig.pending
+        line.revenue_cents += fig.revenue_cents
+    for line in plans.values():
+        line.mrr_cents = round(line.current * line.price_cents / _MONTHS_PER_INTERVAL[line.billing_interval])
+        report.mrr_cents += line.mrr_cents
+        report.active += line.active
+        report.current += line.current
+        report.arrears += line.arrears
+        report.pending += line.pending
+        report.revenue_cents += line.revenue_cents
+    report.plans = sorted(plans.values(), key=lambda p: (p.product_name, p.plan_name, p.price_cents))
+    return report
+
+
+def billing_report(
+    session: Session, *, since: datetime | None = None, materialized: bool | None = None
+) -> BillingReport:
+    """MRR, payment status counts and revenue (paid payments since *since*) per plan.
+
+    The materialized summary only covers all-time revenue, so a report with
+    *since* is always computed live, as is one asked for before the summary
+    was first seeded.
+    """
+    if materialized is None:
+        materialized = get_settings().billing_summary_materialized
+    summaries = session.exec(select(BillingPlanSummaryORM)).all() if materialized and since is None else []
+    if summaries:
+        figures = {
+            s.plan_template_id: _Figures(
+                current=s.current, arrears=s.arrears, pending=s.pending, revenue_cents=s.revenue_cents
+            )
+            for s in summaries
+        }
+        as_of = min(s.refreshed_at for s in summaries)
+        return _build_report(session, figures, since=None, materialized=True, as_of=as_of)
+    figures = _subscription_counts(session)
+    _revenue(session, figures, since=since)
+    return _build_report(session, figures, since=since, materialized=False, as_of=datetime.now(UTC))
+
+
+# ── Materialized summary ──────────────────────────────────────────────
+
+
+def refresh_summary(session: Session, *, full: bool = False) -> int:
+    """Recompute the summary rows of dirty plan templates (all with *full*); returns how many.
+
+    The first refresh of an empty summary is always full, seeding it with the
+    plan templates that predate it. On Postgres one refresh runs at a time:
+    an incremental one is skipped (returning 0) while another holds the lock,
+    a full one waits for it. Commits. Markers written while the refresh runs
+    are left for the next one.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        params = {"key": _REFRESH_LOCK_KEY}
+        if full:
+            session.execute(text("SELECT pg_advisory_xact_lock(:key)"), params)
+        elif not session.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), params).scalar():
+            logger.info("Billing summary refresh already running elsewhere; skipping")
+            return 0
+    markers = session.exec(select(BillingSummaryDirtyORM.id, BillingSummaryDirtyORM.plan_template_id)).all()
+    if full or session.exec(select(BillingPlanSummaryORM.plan_template_id).limit(1)).first() is None:
+        ptv_ids = set(session.exec(select(PlanTemplateVersionORM.id)).all())
+    else:
+        ptv_ids = {ptv_id for _, ptv_id in markers}
+    if not ptv_ids:
+        return 0
+
+    figures = _subscription_counts(session, ptv_ids)
+    _revenue(session, figures, plan_template_ids=ptv_ids)
+    now = datetime.now(UTC)
+    existing = {
+        s.plan_template_id: s
+        for s in session.exec(
+            select(BillingPlanSummaryORM).where(BillingPlanSummaryORM.plan_template_id.in_(ptv_ids))
+        ).all()
+    }
+    for ptv_id in ptv_ids:
+        fig = figures.get(ptv_id, _Figures())
+        summary = existing.get(ptv_id) or BillingPlanSummaryORM(plan_template_id=ptv_id)
+        summary.current = fig.current
+        summary.arrears = fig.arrears
+        summary.pending = fig.pending
+        summary.revenue_cents = fig.revenue_cents
+        summary.refreshed_at = now
+        session.add(summary)
+    marker_ids = [marker_id for marker_id, _ in markers]
+    for start in range(0, len(marker_ids), 500):
+        session.execute(
+            delete(BillingSummaryDirtyORM).where(BillingSummaryDirtyORM.id.in_(marker_ids[start:start + 500]))
+        )
+    session.commit()
+    logger.info("Refreshed billing summary for %d plan template(s)", len(ptv_ids))
+    return len(ptv_ids)
+
+
+def _dirty_plan_templates(session: OrmSession) -> set[int]:
+    ptv_ids: set[int] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, SubscriptionORM):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            if obj.plan_template_id is not None:
+                ptv_ids.add(obj.plan_template_id)
+        elif isinstance(obj, MolliePaymentORM):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            sub = obj.subscription if obj.subscription_id is None else session.get(SubscriptionORM, obj.subscription_id)
+            if sub is not None and sub.plan_template_id is not None:
+                ptv_ids.add(sub.plan_template_id)
+    return ptv_ids
+
+
+def _mark_dirty_on_flush(session: OrmSession, flush_context, instances) -> None:
+    if not get_settings().billing_summary_materialized:
+        return
+    ptv_ids = _dirty_plan_templates(session)
+    if ptv_ids:
+        now = datetime.now(UTC)
+        session.connection().execute(
+            insert(BillingSummaryDirtyORM.__table__),
+            [{"plan_template_id": ptv_id, "created_at": now} for ptv_id in sorted(ptv_ids)],
+        )
+
+
+_LISTENERS = (("before_flush", _mark_dirty_on_flush),)
+
+
+def register_listeners() -> None:
+    """Install the session hook that marks billing summaries dirty (idempotent)."""
+    for identifier, fn in _LISTENERS:
+        if not event.contains(OrmSession, identifier, fn):
+            event.listen(OrmSession, identifier, fn)
@@ -0,0 +1,216 @@
+"""Reconcile local billing state with Mollie.
+
+Payment state normally changes only when a webhook arrives. :func:`sync_billing`
+catches up on missed webhooks. It pages through recent Mollie payments and all
+Mollie subscriptions in bulk, diffs them against the local rows in one pass,
+and applies corrections through the same transitions the webhook worker uses
+(:mod:`app.services.payment_webhooks`).
+
+All Mollie calls go through the payment provider, so the client-side rate
+limiter applies.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+import logging
+from typing import Iterator
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.models import MolliePaymentORM, SubscriptionORM, SubscriptionStatus
+from app.services import payment_webhooks
+from app.services.mollie import PaymentInfo, PaymentProvider
+
+logger = logging.getLogger(__name__)
+
+# Payments that may still change state on Mollie's side.
+OPEN_PAYMENT_STATUSES = ("open", "pending", "authorized")
+_IN_CHUNK = 500
+# Arbitrary constant identifying the billing sync advisory lock on Postgres.
+_ADVISORY_LOCK_KEY = 0x63_61_65_6C_62_69_6C  # "caelbil"
+
+
+@dataclass
+class BillingSyncReport:
+    payments_checked: int = 0
+    subscriptions_checked: int = 0
+    # Mollie payment ids whose state was (or, on a dry run, would be) applied.
+    payments_corrected: list[str] = field(default_factory=list)
+    # Local subscription ids changed because of their Mollie subscription state.
+    subscriptions_corrected: list[int] = field(default_factory=list)
+    # Differences the sync reports but does not fix automatically.
+    discrepancies: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+
+def _chunks(values: list[str]) -> Iterator[list[str]]:
+    for start in range(0, len(values), _IN_CHUNK):
+        yield values[start:start + _IN_CHUNK]
+
+
+def _local_payments(session: Session, payment_ids: list[str]) -> dict[str, MolliePaymentORM]:
+    """Local rows for *payment_ids*, plus every local payment still open."""
+    rows = list(
+        session.exec(
+            select(MolliePaymentORM).where(MolliePaymentORM.status.in_(OPEN_PAYMENT_STATUSES))
+        ).all()
+    )
+    for chunk in _chunks(payment_ids):
+        rows.extend(
+            session.exec(select(MolliePaymentORM).where(MolliePaymentORM.mollie_payment_id.in_(chunk))).all()
+        )
+    return {row.mollie_payment_id: row for row in rows}
+
+
+def _local_subscriptions(session: Session, mollie_ids: list[str]) -> dict[str, SubscriptionORM]:
+    subs: dict[str, SubscriptionORM] = {}
+    for chunk in _chunks(mollie_ids):
+        for sub in session.exec(
+            select(SubscriptionORM).where(SubscriptionORM.mollie_subscription_id.in_(chunk))
+        ).unique():
+            subs[sub.mollie_subscription_id] = sub
+    return subs
+
+
+def _paid_first_payments_without_subscription(session: Session) -> list[MolliePaymentORM]:
+    """First payments that were paid but never got their Mollie subscription created."""
+    return list(
+        session.exec(
+            select(MolliePaymentORM)
+            .join(SubscriptionORM, SubscriptionORM.id == MolliePaymentORM.subscription_id)
+            .where(
+                MolliePaymentORM.sequence_type == "first",
+                MolliePaymentORM.status == "paid",
+                SubscriptionORM.mollie_subscription_id.is_(None),
+                SubscriptionORM.status == SubscriptionStatus.ACTIVE,
+            )
+        ).unique()
+    )
+
+
+def _apply(
+    session: Session,
+    payment_id: str,
+    info: PaymentInfo,
+    report: BillingSyncReport,
+    *,
+    dry_run: bool,
+) -> None:
+    report.payments_corrected.append(payment_id)
+    if dry_run:
+        return
+    try:
+        payment_webhooks.apply_payment(session, payment_id, info)
+        session.commit()
+    except Exception as exc:
+        session.rollback()
+        logger.exception("Billing sync failed to apply Mollie payment id=%s", payment_id)
+        report.errors.append(f"payment {payment_id}: {exc}")
+
+
+def sync_billing(
+    session: Session,
+    provider: PaymentProvider,
+    *,
+    since: datetime,
+    dry_run: bool = False,
+) -> BillingSyncReport:
+    """Diff Mollie payments (created since *since*) and subscriptions against local rows.
+
+    Corrections:
+    - payments whose local status differs from Mollie's, or recurring payments
+      for a known subscription that were never recorded, are applied like a
+      webhook;
+    - local payments still open but older than the window are fetched one by one;
+    - paid first payments whose Mollie subscription was never created are
+      applied again, which queues its creation in the outbox again;
+    - Mollie subscriptions that were suspended put the local subscription in
+      arrears.
+
+    Mollie subscriptions cancelled or completed while the local one is active
+    are only reported.
+    """
+    report = BillingSyncReport()
+
+    remote = {info.payment_id: info for info in provider.list_payments(since=since)}
+    local = _local_payments(session, list(remote))
+    for payment_id, row in local.items():
+        if payment_id not in remote and row.status in OPEN_PAYMENT_STATUSES:
+            remote[payment_id] = provider.get_payment(payment_id, fresh=True)
+    report.payments_checked = len(remote)
+
+    unknown_sub_ids = sorted(
+        {info.subscription_id for pid, info in remote.items() if pid not in local and info.subscription_id}
+    )
+    known_subs = _local_subscriptions(session, unknown_sub_ids)
+
+    for payment_id, info in remote.items():
+        row = local.get(payment_id)
+        if row is None:
+            if info.subscription_id not in known_subs:
+                continue
+        elif row.status == info.status:
+            continue
+        _apply(session, payment_id, info, report, dry_run=dry_run)
+
+    for row in _paid_first_payments_without_subscription(session):
+        payment_id = row.mollie_payment_id
+        if payment_id in report.payments_corrected:
+            continue
+        info = remote.get(payment_id) or provider.get_payment(payment_id, fresh=True)
+        if info.status == "paid":
+            _apply(session, payment_id, info, report, dry_run=dry_run)
+
+    remote_subs = list(provider.list_subscriptions())
+    report.subscriptions_checked = len(remote_subs)
+    subs = _local_subscriptions(session, [s.subscription_id for s in remote_subs])
+    for remote_sub in remote_subs:
+        sub = subs.get(remote_sub.subscription_id)
+        if sub is None or sub.status != SubscriptionStatus.ACTIVE:
+            continue
+        if remote_sub.status in ("canceled", "completed"):
+            report.discrepancies.append(
+                f"subscription {sub.id}: active locally but {remote_sub.status} at Mollie "
+                f"({remote_sub.subscription_id})"
+            )
+            continue
+        if payment_webhooks.apply_subscription_status(sub, remote_sub.status):
+            report.subscriptions_corrected.append(sub.id)
+            if dry_run:
+                session.rollback()
+            else:
+                session.commit()
+
+    logger.info(
+        "Billing sync%s: checked %d payment(s) and %d subscription(s), corrected %d payment(s) "
+        "and %d subscription(s), %d discrepancy(ies), %d error(s)",
+        " (dry run)" if dry_run else "",
+        report.payments_checked,
+        report.subscriptions_checked,
+        len(report.payments_corrected),
+        len(report.subscriptions_corrected),
+        len(report.discrepancies),
+        len(report.errors),
+    )
+    return report
+
+
+@contextmanager
+def exclusive(engine: Engine) -> Iterator[bool]:
+    """Yield whether this process may run the sync (one runner at a time on Postgres)."""
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    # A dedicated connection holds the session-level advisory lock for the
+    # whole sync, independent of the sync session's commits.
+    with engine.connect() as conn:
+        acquired = bool(conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY}).scalar())
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
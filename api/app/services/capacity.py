@@ -0,0 +1,257 @@
+"""Capacity admission: reserve cluster resources before a deployment is accepted.
+
+A deployment's footprint is its template's ``footprint_*`` resources plus its
+plan's ``storage_bytes`` quota. :func:`reserve` moves the ledger
+(``capacity_ledger``) to the deployment's new footprint with a single
+conditional UPDATE in the caller's transaction: when the result would exceed a
+``CAELUS_CAPACITY_*`` limit no row matches and the request is rejected with
+:class:`CapacityException`, instead of the reconciler finding out when
+``helm --wait`` times out. The reservation is kept on the deployment row and
+released (:func:`release`) when the reconciler has deleted it.
+
+With clusters registered (:mod:`app.services.clusters`) the same conditional
+UPDATE also runs against the deployment's cluster row, checked against that
+cluster's own limits; a new deployment is placed on the first of the
+placement policy's candidate clusters where it fits.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import UTC, datetime
+import logging
+from typing import Sequence
+
+from sqlalchemy import func, insert, or_, select as sa_select, update
+from sqlmodel import Session, select
+
+from app.config import CaelusSettings, get_settings
+from app.models import (
+    CapacityDimension,
+    CapacityLedgerORM,
+    CapacityRead,
+    ClusterORM,
+    ClusterRead,
+    DeploymentORM,
+    PlanTemplateVersionORM,
+    ProductTemplateVersionORM,
+)
+from app.services.errors import CapacityException
+from app.services.reconcile_constants import DEPLOYMENT_STATUS_DELETED
+
+logger = logging.getLogger(__name__)
+
+_LEDGER_ROW_ID = 1
+
+# (ledger column, deployment column, settings attribute, display unit, divisor)
+_DIMENSIONS = (
+    ("cpu_millicores", "reserved_cpu_millicores", "capacity_cpu_millicores", "cores", 1000),
+    ("memory_bytes", "reserved_memory_bytes", "capacity_memory_bytes", "GiB", 1024**3),
+    ("storage_bytes", "reserved_storage_bytes", "capacity_storage_bytes", "GiB", 1024**3),
+)
+
+
+@dataclass(frozen=True)
+class Footprint:
+    cpu_millicores: int = 0
+    memory_bytes: int = 0
+    storage_bytes: int = 0
+
+
+def footprint(template: ProductTemplateVersionORM, plan_template: PlanTemplateVersionORM | None) -> Footprint:
+    """Resources one deployment of *template* on *plan_template* reserves."""
+    plan_storage = plan_template.storage_bytes if plan_template is not None else None
+    return Footprint(
+        cpu_millicores=template.footprint_cpu_millicores or 0,
+        memory_bytes=template.footprint_memory_bytes or 0,
+        storage_bytes=(template.footprint_storage_bytes or 0) + (plan_storage or 0),
+    )
+
+
+def reserved(deployment: DeploymentORM) -> Footprint:
+    return Footprint(
+        cpu_millicores=deployment.reserved_cpu_millicores or 0,
+        memory_bytes=deployment.reserved_memory_bytes or 0,
+        storage_bytes=deployment.reserved_storage_bytes or 0,
+    )
+
+
+def seed_ledger(session: Session) -> None:
+    """Create the ledger row if it does not exist yet (alembic seeds it in its migration)."""
+    table = CapacityLedgerORM.__table__
+    if session.execute(sa_select(table.c.id).where(table.c.id == _LEDGER_ROW_ID)).first() is None:
+        session.execute(
+            insert(table).values(
+                id=_LEDGER_ROW_ID, cpu_millicores=0, memory_bytes=0, storage_bytes=0, updated_at=datetime.now(UTC)
+            )
+        )
+    session.commit()
+
+
+def _ledger(session: Session):
+    # Read with Core: the ledger only ever changes through UPDATE statements,
+    # so an ORM instance in the identity map would be stale.
+    table = CapacityLedgerORM.__table__
+    return session.execute(sa_select(table).where(table.c.id == _LEDGER_ROW_ID)).first()
+
+
+def _shortfall(ledger, delta: dict[str, int], settings: CaelusSettings) -> str:
+    missing = []
+    for column, _, setting, unit, divisor in _DIMENSIONS:
+        limit = getattr(settings, setting)
+        if limit is None or delta[column] <= 0:
+            continue
+        available = limit - getattr(ledger, column)
+        if delta[column] > available:
+            missing.append(f"{column.split('_')[0]} (needs {delta[column] / divisor:.2f} {unit}, "
+                           f"{max(available, 0) / divisor:.2f} {unit} free)")
+    return ", ".join(missing) or "limit reached"
+
+
+def _reserve_on_cluster(session: Session, name: str, delta: dict[str, int]) -> bool:
+    table = ClusterORM.__table__
+    conditions = [table.c.name == name]
+    for column, *_ in _DIMENSIONS:
+        if delta[column] > 0:
+            limit = table.c[f"capacity_{column}"]
+            conditions.append(or_(limit.is_(None), table.c[column] + delta[column] <= limit))
+    result = session.connection().execute(
+        update(table)
+        .where(*conditions)
+        .values(updated_at=datetime.now(UTC), **{column: table.c[column] + delta[column] for column in delta})
+    )
+    return result.rowcount > 0
+
+
+def _place(session: Session, deployment: DeploymentORM, candidates: Sequence[str], delta: dict[str, int]) -> None:
+    for name in candidates:
+        if _reserve_on_cluster(session, name, delta):
+            deployment.cluster = name
+            return
+    if candidates:
+        reason = f"no cluster has room (tried {', '.join(candidates)})"
+    else:
+        reason = "no cluster is accepting deployments"
+    logger.warning("Rejected deployment id=%s: insufficient capacity: %s", deployment.id, reason)
+    raise CapacityException(f"Insufficient cluster capacity: {reason}")
+
+
+def reserve(
+    session: Session,
+    deployment: DeploymentORM,
+    target: Footprint,
+    *,
+    clusters: Sequence[str] | None = None,
+) -> None:
+    """Move *deployment*'s reservation to *target* in the current transaction (no commit).
+
+    *clusters* places a new deployment on the first of those clusters with
+    room; a placed deployment's reservation moves on its own cluster.
+
+    Raises CapacityException if growing it would exceed a configured limit.
+    Shrinking always succeeds.
+    """
+    settings = get_settings()
+    current = reserved(deployment)
+    delta = {column: getattr(target, column) - getattr(current, column) for column, *_ in _DIMENSIONS}
+    if clusters is not None:
+        _place(session, deployment, clusters, delta)
+    elif not any(delta.values()):
+        return
+    elif deployment.cluster is not None and not _reserve_on_cluster(session, deployment.cluster, delta):
+        logger.warning("Rejected deployment id=%s: cluster %s is full", deployment.id, deployment.cluster)
+        raise CapacityException(f"Insufficient cluster capacity on cluster {deployment.cluster}")
+    table = CapacityLedgerORM.__table__
+    conditions = [table.c.id == _LEDGER_ROW_ID]
+    for column, _, setting, _, _ in _DIMENSIONS:
+        limit = getattr(settings, setting)
+        if limit is not None and delta[column] > 0:
+            conditions.append(table.c[column] + delta[column] <= limit)
+    result = session.connection().execute(
+        update(table)
+        .where(*conditions)
+        .values(updated_at=datetime.now(UTC), **{column: table.c[column] + delta[column] for column in delta})
+    )
+    if result.rowcount == 0:
+        ledger = _ledger(session)
+        reason = _shortfall(ledger, delta, settings) if ledger is not None else "capacity ledger is missing"
+        logger.warning("Rejected deployment id=%s: insufficient capacity: %s", deployment.id, reason)
+        raise CapacityException(f"Insufficient cluster capacity: {reason}")
+    for column, attr, *_ in _DIMENSIONS:
+        setattr(deployment, attr, getattr(target, column))
+
+
+def release(session: Session, deployment: DeploymentORM) -> None:
+    """Return *deployment*'s reservation to the ledger (no commit)."""
+    reserve(session, deployment, Footprint())
+
+
+def _read(session: Session, ledger, settings: CaelusSettings) -> CapacityRead:
+    dimensions = {}
+    for column, _, setting, _, _ in _DIMENSIONS:
+        committed = getattr(ledger, column)
+        limit = getattr(settings, setting)
+        dimensions[column] = CapacityDimension(
+            committed=committed, limit=limit, available=None if limit is None else limit - committed
+        )
+    # Cluster totals change through Core UPDATEs too; refresh loaded instances.
+    clusters = session.exec(
+        select(ClusterORM).order_by(ClusterORM.name).execution_options(populate_existing=True)
+    ).all()
+    return CapacityRead(
+        updated_at=ledger.updated_at,
+        clusters=[ClusterRead.model_validate(cluster) for cluster in clusters],
+        **dimensions,
+    )
+
+
+def get_capacity(session: Session) -> CapacityRead:
+    """Committed, configured and available cluster resources."""
+    ledger = _ledger(session)
+    if ledger is None:
+        seed_ledger(session)
+        ledger = _ledger(session)
+    return _read(session, ledger, get_settings())
+
+
+def rebuild_ledger(session: Session) -> CapacityRead:
+    """Recompute the ledger and cluster totals from the reservations of all live deployments (commits)."""
+    totals = session.exec(
+        select(
+            func.coalesce(func.sum(DeploymentORM.reserved_cpu_millicores), 0),
+            func.coalesce(func.sum(DeploymentORM.reserved_memory_bytes), 0),
+            func.coalesce(func.sum(DeploymentORM.reserved_storage_bytes), 0),
+        ).where(DeploymentORM.status != DEPLOYMENT_STATUS_DELETED)
+    ).one()
+    cpu, memory, storage = (int(t) for t in totals)
+    if _ledger(session) is None:
+        seed_ledger(session)
+    now = datetime.now(UTC)
+    table = CapacityLedgerORM.__table__
+    session.execute(
+        update(table)
+        .where(table.c.id == _LEDGER_ROW_ID)
+        .values(cpu_millicores=cpu, memory_bytes=memory, storage_bytes=storage, updated_at=now)
+    )
+    per_cluster = session.exec(
+        select(
+            DeploymentORM.cluster,
+            func.sum(DeploymentORM.reserved_cpu_millicores),
+            func.sum(DeploymentORM.reserved_memory_bytes),
+            func.sum(DeploymentORM.reserved_storage_bytes),
+        )
+        .where(DeploymentORM.status != DEPLOYMENT_STATUS_DELETED, DeploymentORM.cluster != None)
+        .group_by(DeploymentORM.cluster)
+    ).all()
+    clusters = ClusterORM.__table__
+    session.execute(update(clusters).values(cpu_millicores=0, memory_bytes=0, storage_bytes=0, updated_at=now))
+    for name, cluster_cpu, cluster_memory, cluster_storage in per_cluster:
+        session.execute(
+            update(clusters)
+            .where(clusters.c.name == name)
+            .values(cpu_millicores=cluster_cpu, memory_bytes=cluster_memory, storage_bytes=cluster_storage)
+        )
+    session.commit()
+    logger.info(
+        "Rebuilt capacity ledger cpu_millicores=%d memory_bytes=%d storage_bytes=%d", cpu, memory, storage
+    )
+    return _read(session, _ledger(session), get_settings())
@@ -0,0 +1,182 @@
+"""Catalog revision tracking and serialized response caching.
+
+Products, product templates, plans and plan templates only change on admin
+writes. Every flush that touches one of those tables bumps the single-row
+``catalog_revision`` counter inside the same transaction, so the pair
+``(epoch, revision)`` identifies one immutable snapshot of the catalog.
+
+Readers derive a strong ETag from that pair and keep serialized response
+bodies keyed by it. The revision itself is cached in-process for
+``catalog_revision_ttl_seconds`` (and dropped immediately after any local
+commit that bumped it), so a cache hit does not run the catalog queries.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from datetime import UTC, datetime
+import logging
+import threading
+import time
+from typing import Callable
+from uuid import uuid4
+import weakref
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import (
+    CatalogRevisionORM,
+    PlanORM,
+    PlanTemplateVersionORM,
+    ProductORM,
+    ProductTemplateVersionORM,
+)
+
+logger = logging.getLogger(__name__)
+
+CATALOG_MODELS = (ProductORM, ProductTemplateVersionORM, PlanORM, PlanTemplateVersionORM)
+
+_REVISION_ROW_ID = 1
+_BUMPED_KEY = "catalog_revision_bumped"
+
+_lock = threading.Lock()
+# engine -> (expires_at, etag)
+_etag_cache: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+# (key, etag) -> serialized body
+_body_cache: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+
+
+def _touches_catalog(session: Session) -> bool:
+    for obj in session.new:
+        if isinstance(obj, CATALOG_MODELS):
+            return True
+    for obj in session.deleted:
+        if isinstance(obj, CATALOG_MODELS):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, CATALOG_MODELS) and session.is_modified(obj):
+            return True
+    return False
+
+
+def seed_revision(session: Session) -> None:
+    """Create the catalog revision row if it does not exist yet.
+
+    Alembic seeds the row in its migration; this covers databases created with
+    ``SQLModel.metadata.create_all`` (tests, local development).
+    """
+    table = CatalogRevisionORM.__table__
+    exists = session.execute(select(table.c.id).where(table.c.id == _REVISION_ROW_ID)).first()
+    if exists is None:
+        session.execute(
+            insert(table).values(
+                id=_REVISION_ROW_ID, epoch=uuid4().hex, revision=1, updated_at=datetime.now(UTC)
+            )
+        )
+    session.commit()
+
+
+def bump_revision(session: Session) -> None:
+    """Increment the catalog revision in the session's current transaction."""
+    table = CatalogRevisionORM.__table__
+    result = session.connection().execute(
+        update(table)
+        .where(table.c.id == _REVISION_ROW_ID)
+        .values(revision=table.c.revision + 1, updated_at=datetime.now(UTC))
+    )
+    if result.rowcount == 0:
+        logger.warning("catalog_revision row is missing; catalog responses will not be cached")
+        return
+    session.info[_BUMPED_KEY] = True
+
+
+def _bump_on_catalog_write(session: Session, flush_context, instances) -> None:
+    if _touches_catalog(session):
+        bump_revision(session)
+
+
+def _invalidate_after_commit(session: Session) -> None:
+    if session.info.pop(_BUMPED_KEY, False):
+        logger.debug("Catalog revision bumped; dropping cached catalog ETags")
+        with _lock:
+            _etag_cache.clear()
+
+
+def _forget_bump_after_rollback(session: Session) -> None:
+    session.info.pop(_BUMPED_KEY, None)
+
+
+_LISTENERS = (
+    ("before_flush", _bump_on_catalog_write),
+    ("after_commit", _invalidate_after_commit),
+    ("after_rollback", _forget_bump_after_rollback),
+)
+
+
+def register_listeners() -> None:
+    """Install the session hooks that track catalog revisions (idempotent).
+
+    Called from ``app.db`` so that every session in the process, whichever
+    module performs the write, bumps the revision.
+    """
+    for identifier, fn in _LISTENERS:
+        if not event.contains(Session, identifier, fn):
+            event.listen(Session, identifier, fn)
+
+
+def _format_etag(epoch: str, revision: int) -> str:
+    return f'"{epoch}-{revision}"'
+
+
+def current_etag(session: Session) -> str | None:
+    """Return the strong ETag of the current catalog snapshot.
+
+    Returns ``None`` when the catalog has never been written, in which case
+    callers should serve uncached responses.
+    """
+    bind = session.get_bind()
+    now = time.monotonic()
+    with _lock:
+        cached = _etag_cache.get(bind)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    row = session.execute(
+        select(CatalogRevisionORM.epoch, CatalogRevisionORM.revision).where(
+            CatalogRevisionORM.id == _REVISION_ROW_ID
+        )
+    ).first()
+    if row is None:
+        return None
+    etag = _format_etag(row.epoch, row.revision)
+    ttl = get_settings().catalog_revision_ttl_seconds
+    if ttl > 0:
+        with _lock:
+            _etag_cache[bind] = (now + ttl, etag)
+    return etag
+
+
+def cached_body(key: str, etag: str, build: Callable[[], bytes]) -> bytes:
+    """Return the serialized body for *key* at *etag*, building it on a miss."""
+    cache_key = (key, etag)
+    with _lock:
+        body = _body_cache.get(cache_key)
+        if body is not None:
+            _body_cache.move_to_end(cache_key)
+            return body
+
+    body = build()
+    with _lock:
+        _body_cache[cache_key] = body
+        _body_cache.move_to_end(cache_key)
+        while len(_body_cache) > get_settings().catalog_cache_size:
+            _body_cache.popitem(last=False)
+    return body
+
+
+def clear_cache() -> None:
+    """Drop all cached ETags and response bodies."""
+    with _lock:
+        _etag_cache.clear()
+        _body_cache.clear()
@@ -0,0 +1,144 @@
+"""Mollie checkout for paid deployments.
+
+Creating a paid deployment commits the subscription and the ``pending``
+deployment together with an outbox row (:data:`FIRST_PAYMENT_KIND`). The
+outbox delivers it through :func:`deliver_first_payment`, which makes the
+Mollie calls (``ensure_customer``, ``create_first_payment``) outside of any
+database transaction and stores the checkout URL on the first
+:class:`~app.models.MolliePaymentORM` row. Clients read it with
+:func:`get_checkout`.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any
+from uuid import UUID
+
+from sqlmodel import Session, select
+
+from app.config import get_settings
+from app.models import (
+    CheckoutRead,
+    DeploymentORM,
+    MolliePaymentORM,
+    MolliePaymentStatus,
+    OutboxORM,
+    SubscriptionStatus,
+    UserORM,
+)
+from app.services import outbox
+from app.services.errors import NotFoundException
+from app.services.mollie import PaymentProvider
+from app.services.reconcile_constants import DEPLOYMENT_STATUS_PENDING
+from app.util import amend_url
+
+logger = logging.getLogger(__name__)
+
+FIRST_PAYMENT_KIND = "mollie.first_payment"
+
+CHECKOUT_STATUS_PENDING = "pending"
+CHECKOUT_STATUS_READY = "ready"
+CHECKOUT_STATUS_FAILED = "failed"
+CHECKOUT_STATUS_NOT_REQUIRED = "not_required"
+
+
+def first_payment_key(deployment_id: UUID) -> str:
+    # Same key Mollie has always seen for this deployment's first payment.
+    return f"first_payment_{deployment_id}"
+
+
+def enqueue_first_payment(session: Session, deployment: DeploymentORM) -> OutboxORM:
+    """Queue the checkout step for *deployment* in the current transaction."""
+    return outbox.enqueue(
+        session,
+        kind=FIRST_PAYMENT_KIND,
+        key=first_payment_key(deployment.id),
+        payload={"deployment_id": str(deployment.id)},
+    )
+
+
+def _first_payment(session: Session, subscription_id: int) -> MolliePaymentORM | None:
+    return session.exec(
+        select(MolliePaymentORM)
+        .where(
+            MolliePaymentORM.subscription_id == subscription_id,
+            MolliePaymentORM.sequence_type == "first",
+        )
+        .order_by(MolliePaymentORM.created_at.desc())
+    ).first()
+
+
+def deliver_first_payment(session: Session, provider: PaymentProvider, key: str, payload: dict[str, Any]) -> None:
+    """Outbox handler: create the Mollie customer and first payment for a deployment."""
+    deployment_id = UUID(payload["deployment_id"])
+    deployment = session.get(DeploymentORM, deployment_id)
+    if deployment is None or deployment.status != DEPLOYMENT_STATUS_PENDING:
+        logger.info("Skipping checkout for deployment id=%s: no longer pending", deployment_id)
+        return
+    sub = deployment.subscription
+    if sub is None or sub.status != SubscriptionStatus.ACTIVE or _first_payment(session, sub.id) is not None:
+        return
+
+    settings = get_settings()
+    subscription_id = sub.id
+    user_id = deployment.user_id
+    email = deployment.user.email
+    customer_id = deployment.user.mollie_customer_id
+    amount_cents = sub.plan_template.price_cents
+    description = deployment.payment_description()
+    # End the read transaction: the Mollie calls below must not hold it open.
+    session.commit()
+
+    if not customer_id:
+        customer_id = provider.ensure_customer(email=email, idempotency_key=f"customer_{deployment_id}")
+        user = session.get(UserORM, user_id)
+        if user.mollie_customer_id:
+            # Another checkout got there first; keep a single customer per user.
+            customer_id = user.mollie_customer_id
+        else:
+            user.mollie_customer_id = customer_id
+        session.commit()
+
+    # The redirect carries the deployment id so the dashboard can focus on
+    # the new deployment when the user returns from checkout.
+    payment = provider.create_first_payment(
+        customer_id=customer_id,
+        amount_cents=amount_cents,
+        description=description,
+        redirect_url=amend_url(settings.mollie_redirect_url, query={"deployment": str(deployment_id)}),
+        webhook_url=amend_url(settings.mollie_webhook_base_url, "webhooks/mollie"),
+        idempotency_key=key,
+    )
+    session.add(
+        MolliePaymentORM(
+            subscription_id=subscription_id,
+            mollie_payment_id=payment.payment_id,
+            status=MolliePaymentStatus.OPEN,
+            sequence_type="first",
+            amount_cents=amount_cents,
+            checkout_url=payment.checkout_url,
+        )
+    )
+    logger.info("Created checkout for deployment id=%s mollie_payment_id=%s", deployment_id, payment.payment_id)
+
+
+def get_checkout(session: Session, *, deployment_id: UUID, user_id: int | None = None) -> CheckoutRead:
+    """Current checkout state of a deployment."""
+    stmt = select(DeploymentORM).where(DeploymentORM.id == deployment_id)
+    if user_id is not None:
+        stmt = stmt.where(DeploymentORM.user_id == user_id)
+    deployment = session.exec(stmt).one_or_none()
+    if deployment is None:
+        raise NotFoundException("Deployment not found")
+
+    if deployment.subscription_id is not None and (payment := _first_payment(session, deployment.subscription_id)):
+        if payment.status == MolliePaymentStatus.OPEN and payment.checkout_url:
+            return CheckoutRead(status=CHECKOUT_STATUS_READY, checkout_url=payment.checkout_url)
+        return CheckoutRead(status=CHECKOUT_STATUS_NOT_REQUIRED)
+
+    row = session.exec(select(OutboxORM).where(OutboxORM.key == first_payment_key(deployment_id))).one_or_none()
+    if row is None or deployment.status != DEPLOYMENT_STATUS_PENDING:
+        return CheckoutRead(status=CHECKOUT_STATUS_NOT_REQUIRED)
+    if row.status == outbox.OUTBOX_STATUS_FAILED:
+        return CheckoutRead(status=CHECKOUT_STATUS_FAILED, last_error=row.last_error)
+    return CheckoutRead(status=CHECKOUT_STATUS_PENDING, last_error=row.last_error)
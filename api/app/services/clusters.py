@@ -0,0 +1,140 @@
+"""Cluster registry and placement of new deployments.
+
+Without registered clusters Caelus runs against the single cluster that
+``kubectl``/``helm`` pick up from the worker environment, and deployments and
+jobs carry no cluster. Once clusters are registered, every new deployment is
+placed on one of them (:func:`placement_candidates`; the capacity ledger in
+:mod:`app.services.capacity` makes the final, race-free choice), its reconcile
+jobs carry the cluster's name, and ``caelus worker --cluster NAME`` pools only
+claim the jobs of their own cluster, reaching it through
+:func:`provisioner_for`.
+
+Placement policies (``CAELUS_PLACEMENT_POLICY``):
+  - ``least_loaded``: the cluster whose most utilised limited resource would
+    be lowest after placement, spreading deployments evenly.
+  - ``bin_pack``: the fullest cluster the footprint still fits on, keeping
+    the others free for large deployments.
+A product pinned to a cluster (``ProductORM.cluster``) is always placed there.
+"""
+from __future__ import annotations
+
+from datetime import UTC, datetime
+import logging
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.config import get_settings
+from app.models import ClusterCreate, ClusterORM, ClusterRead, ClusterUpdate, ProductORM
+from app.provisioner import Provisioner
+from app.services.capacity import Footprint
+from app.services.errors import IntegrityException, NotFoundException, ValidationException
+
+logger = logging.getLogger(__name__)
+
+PLACEMENT_LEAST_LOADED = "least_loaded"
+PLACEMENT_BIN_PACK = "bin_pack"
+PLACEMENT_POLICIES = (PLACEMENT_LEAST_LOADED, PLACEMENT_BIN_PACK)
+
+_RESOURCES = ("cpu_millicores", "memory_bytes", "storage_bytes")
+
+
+def get_cluster_orm(session: Session, name: str) -> ClusterORM:
+    if not (cluster := session.exec(select(ClusterORM).where(ClusterORM.name == name)).one_or_none()):
+        raise NotFoundException(f"Cluster {name} not found")
+    return cluster
+
+
+def create_cluster(session: Session, payload: ClusterCreate) -> ClusterRead:
+    """Register a cluster.
+
+    Raises IntegrityException if a cluster with that name exists.
+    """
+    cluster = ClusterORM.model_validate(payload)
+    session.add(cluster)
+    try:
+        session.commit()
+    except IntegrityError as exc:
+        session.rollback()
+        raise IntegrityException(f"A cluster with this name already exists: {payload.name}") from exc
+    session.refresh(cluster)
+    logger.info("Registered cluster %s (context=%s)", cluster.name, cluster.kube_context)
+    return ClusterRead.model_validate(cluster)
+
+
+def list_clusters(session: Session) -> list[ClusterRead]:
+    return [
+        ClusterRead.model_validate(c)
+        for c in session.exec(
+            select(ClusterORM).order_by(ClusterORM.name).execution_options(populate_existing=True)
+        ).all()
+    ]
+
+
+def update_cluster(session: Session, *, name: str, payload: ClusterUpdate) -> ClusterRead:
+    """Change a cluster's connection settings, limits or whether it takes new deployments.
+
+    Lowering a limit below what is committed only stops further placements.
+    Raises NotFoundException if the cluster does not exist.
+    """
+    cluster = get_cluster_orm(session, name)
+    for field, value in payload.model_dump(exclude_unset=True).items():
+        setattr(cluster, field, value)
+    cluster.updated_at = datetime.now(UTC)
+    session.add(cluster)
+    session.commit()
+    session.refresh(cluster)
+    logger.info("Updated cluster %s: %s", name, sorted(payload.model_fields_set))
+    return ClusterRead.model_validate(cluster)
+
+
+def provisioner_for(cluster: ClusterORM) -> Provisioner:
+    """A provisioner whose kubectl/helm calls target *cluster*."""
+    return Provisioner.for_cluster(kubeconfig=cluster.kubeconfig, context=cluster.kube_context)
+
+
+def _fits(cluster: ClusterORM, need: Footprint) -> bool:
+    for resource in _RESOURCES:
+        limit = getattr(cluster, f"capacity_{resource}")
+        if limit is not None and getattr(cluster, resource) + getattr(need, resource) > limit:
+            return False
+    return True
+
+
+def _load_after(cluster: ClusterORM, need: Footprint) -> float:
+    """Utilisation of the cluster's most utilised limited resource once *need* is added."""
+    load = 0.0
+    for resource in _RESOURCES:
+        limit = getattr(cluster, f"capacity_{resource}")
+        if limit:
+            load = max(load, (getattr(cluster, resource) + getattr(need, resource)) / limit)
+    return load
+
+
+def placement_candidates(session: Session, product: ProductORM, need: Footprint) -> list[str] | None:
+    """Clusters to try for a new deployment of *product*, best first.
+
+    Returns None when no clusters are registered (single-cluster mode) and
+    an empty list when no eligible cluster is enabled. The order, clusters
+    the footprint fits on first, is a hint from a snapshot of the cluster
+    totals; ``capacity.reserve`` makes the binding choice.
+
+    Raises ValidationException for an unknown ``CAELUS_PLACEMENT_POLICY``.
+    """
+    policy = get_settings().placement_policy
+    if policy not in PLACEMENT_POLICIES:
+        raise ValidationException(f"Unknown placement policy {policy!r}")
+    clusters = session.exec(
+        select(ClusterORM).order_by(ClusterORM.name).execution_options(populate_existing=True)
+    ).all()
+    if not clusters:
+        return None
+    if product.cluster is not None:
+        clusters = [c for c in clusters if c.name == product.cluster]
+    enabled = [c for c in clusters if c.enabled]
+    if policy == PLACEMENT_BIN_PACK:
+        enabled.sort(key=lambda c: (not _fits(c, need), -_load_after(c, need)))
+    else:
+        # Unlimited clusters tie at zero load; spread them by committed memory.
+        enabled.sort(key=lambda c: (not _fits(c, need), _load_after(c, need), c.memory_bytes, c.cpu_millicores))
+    return [c.name for c in enabled]
@@ -0,0 +1,264 @@
+"""Deployment status change notifications.
+
+The reconciler calls :func:`notify_deployment_changed` before it commits. On
+Postgres this issues ``pg_notify`` inside the same transaction, so the
+notification is delivered to every listening API process exactly when (and
+only if) the new status becomes visible. On other databases the event is
+dispatched to the in-process hub after commit, which is enough for tests and
+single-process development setups.
+
+API processes hold one ``LISTEN`` connection (started lazily on the first
+subscriber) that fans notifications out to all connected SSE clients through
+:data:`hub`, so open streams cost no database queries while idle.
+"""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import asdict, dataclass
+from datetime import datetime
+import json
+import logging
+import threading
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+
+from app.models import DeploymentORM, DeploymentRead
+
+logger = logging.getLogger(__name__)
+
+DEPLOYMENT_EVENTS_CHANNEL = "caelus_deployment_events"
+
+# pg_notify payloads are limited to 8000 bytes; keep errors well under that.
+_MAX_ERROR_LEN = 2000
+_PENDING_KEY = "deployment_events_pending"
+_SUBSCRIBER_QUEUE_SIZE = 16
+
+
+@dataclass(frozen=True)
+class DeploymentEvent:
+    deployment_id: UUID
+    user_id: int
+    status: str
+    generation: int
+    last_error: str | None
+    last_reconcile_at: datetime | None
+
+    @classmethod
+    def from_deployment(cls, deployment: DeploymentORM | DeploymentRead) -> DeploymentEvent:
+        last_error = deployment.last_error
+        if last_error and len(last_error) > _MAX_ERROR_LEN:
+            last_error = f"{last_error[:_MAX_ERROR_LEN - 3]}..."
+        return cls(
+            deployment_id=deployment.id,
+            user_id=deployment.user_id,
+            status=deployment.status,
+            generation=deployment.generation,
+            last_error=last_error,
+            last_reconcile_at=deployment.last_reconcile_at,
+        )
+
+    def to_json(self) -> str:
+        data: dict[str, Any] = asdict(self)
+        data["deployment_id"] = str(self.deployment_id)
+        data["last_reconcile_at"] = self.last_reconcile_at.isoformat() if self.last_reconcile_at else None
+        return json.dumps(data, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, payload: str) -> DeploymentEvent:
+        data = json.loads(payload)
+        return cls(
+            deployment_id=UUID(data["deployment_id"]),
+            user_id=int(data["user_id"]),
+            status=data["status"],
+            generation=int(data["generation"]),
+            last_error=data.get("last_error"),
+            last_reconcile_at=(
+                datetime.fromisoformat(data["last_reconcile_at"]) if data.get("last_reconcile_at") else None
+            ),
+        )
+
+
+class Subscription:
+    """A single consumer's view of the events for one deployment."""
+
+    def __init__(self, hub: DeploymentEventHub, deployment_id: UUID) -> None:
+        self._hub = hub
+        self.deployment_id = deployment_id
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue[DeploymentEvent] = asyncio.Queue(maxsize=_SUBSCRIBER_QUEUE_SIZE)
+
+    def _offer(self, evt: DeploymentEvent) -> None:
+        # Runs on the subscriber's event loop. A slow consumer only needs the
+        # latest state, so drop the oldest queued event rather than blocking.
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(evt)
+
+    def deliver(self, evt: DeploymentEvent) -> None:
+        self._loop.call_soon_threadsafe(self._offer, evt)
+
+    async def get(self, timeout: float | None = None) -> DeploymentEvent | None:
+        """Wait for the next event; returns ``None`` when *timeout* expires."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self._hub.unsubscribe(self)
+
+    def __enter__(self) -> Subscription:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class DeploymentEventHub:
+    """Thread-safe, process-wide fan-out of deployment events to subscribers."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: dict[UUID, set[Subscription]] = {}
+
+    def subscribe(self, deployment_id: UUID) -> Subscription:
+        """Register a subscriber; must be called from a running event loop."""
+        subscription = Subscription(self, deployment_id)
+        with self._lock:
+            self._subscribers.setdefault(deployment_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.deployment_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.deployment_id]
+
+    def subscriber_count(self, deployment_id: UUID | None = None) -> int:
+        with self._lock:
+            if deployment_id is not None:
+                return len(self._subscribers.get(deployment_id, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+    def dispatch(self, evt: DeploymentEvent) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(evt.deployment_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.deliver(evt)
+            except RuntimeError:
+                # The subscriber's event loop has shut down; drop it.
+                self.unsubscribe(subscription)
+
+
+hub = DeploymentEventHub()
+
+
+# ---------------------------------------------------------------------------
+# Publishing
+# ---------------------------------------------------------------------------
+
+
+def notify_deployment_changed(session: Session, deployment: DeploymentORM) -> None:
+    """Publish the deployment's current status once the session commits.
+
+    Must be called after the deployment's new state has been assigned and
+    before ``session.commit()``.
+    """
+    evt = DeploymentEvent.from_deployment(deployment)
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": DEPLOYMENT_EVENTS_CHANNEL, "payload": evt.to_json()},
+        )
+    else:
+        session.info.setdefault(_PENDING_KEY, []).append(evt)
+
+
+def _dispatch_after_commit(session: Session) -> None:
+    for evt in session.info.pop(_PENDING_KEY, ()):
+        hub.dispatch(evt)
+
+
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+_LISTENERS = (
+    ("after_commit", _dispatch_after_commit),
+    ("after_rollback", _discard_after_rollback),
+)
+
+
+def register_listeners() -> None:
+    """Install the session hooks that deliver queued in-process events (idempotent)."""
+    for identifier, fn in _LISTENERS:
+        if not event.contains(Session, identifier, fn):
+            event.listen(Session, identifier, fn)
+
+
+# ---------------------------------------------------------------------------
+# Postgres listener
+# ---------------------------------------------------------------------------
+
+
+class PostgresEventListener(threading.Thread):
+    """Background thread relaying ``NOTIFY`` messages into the hub."""
+
+    def __init__(self, engine: Engine, *, target: DeploymentEventHub = hub, poll_seconds: float = 5.0) -> None:
+        super().__init__(name="deployment-events-listener", daemon=True)
+        url = make_url(engine.url).set(drivername="postgresql")
+        self._conninfo = url.render_as_string(hide_password=False)
+        self._hub = target
+        self._poll_seconds = poll_seconds
+        self._stopped = threading.Event()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def run(self) -> None:
+        import psycopg
+
+        backoff = 1.0
+        while not self._stopped.is_set():
+            try:
+                with psycopg.connect(self._conninfo, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {DEPLOYMENT_EVENTS_CHANNEL}")
+                    logger.info("Listening for deployment events on channel %s", DEPLOYMENT_EVENTS_CHANNEL)
+                    backoff = 1.0
+                    while not self._stopped.is_set():
+                        for notify in conn.notifies(timeout=self._poll_seconds):
+                            self._relay(notify.payload)
+            except Exception:
+                logger.exception("Deployment event listener failed; reconnecting in %.0fs", backoff)
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _relay(self, payload: str) -> None:
+        try:
+            evt = DeploymentEvent.from_json(payload)
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed deployment event payload: %.200s", payload)
+            return
+        self._hub.dispatch(evt)
+
+
+_listener: PostgresEventListener | None = None
+_listener_lock = threading.Lock()
+
+
+def ensure_listener(engine: Engine) -> None:
+    """Start the process-wide Postgres listener once, if the engine is Postgres."""
+    global _listener
+    if engine.dialect.name != "postgresql":
+        return
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = PostgresEventListener(engine)
+            _listener.start()
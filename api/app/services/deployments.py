@@ -13,8 +13,6 @@ from app.models import (
     DeploymentCreate,
     DeploymentORM,
     DeploymentRead,
-    MolliePaymentORM,
-    MolliePaymentStatus,
     PaymentStatus,
     PlanTemplateVersionORM,
     ProductTemplateVersionORM,
@@ -22,9 +20,18 @@ from app.models import (
     DeploymentUpdate,
 )
 from app.services.jobs import JobService
+from app.services import capacity as capacity_service, clusters as cluster_service
+from app.services import namespace_pool as namespace_pool_service
+from app.services import checkout as checkout_service, outbox as outbox_service
 from app.services import subscriptions as subscription_service
 from app.services import template_values
-from app.services.errors import DeploymentInProgressException, IntegrityException, NotFoundException, ValidationException
+from app.services.errors import (
+    CapacityException,
+    DeploymentInProgressException,
+    IntegrityException,
+    NotFoundException,
+    ValidationException,
+)
 from app.services.hostnames import require_valid_hostname_for_deployment
 from app.util import set_value_at_path, value_for_path
 from app.config import get_settings
@@ -41,13 +48,13 @@ from app.services.reconcile_constants import (
     DEPLOYMENT_STATUS_DELETED,
 )
 from app.services.reconcile_naming import generate_deployment_name, generate_deployment_namespace
-from app.util import amend_url
 
 
 @dataclass
 class DeploymentCreateResult:
     deployment: DeploymentRead
     checkout_url: str | None = None
+    checkout_status: str | None = None
 
 logger = logging.getLogger(__name__)
 
@@ -90,60 +97,33 @@ def _validate_plan_template(session: Session, plan_template_id: int, product_id:
     return ptv
 
 
-def _iter_hostname_paths(schema: Any, path: tuple[str, ...] = ()) -> list[tuple[str, ...]]:
-    paths: list[tuple[str, ...]] = []
-    if isinstance(schema, dict):
-        title = schema.get("title")
-        if path and isinstance(title, str) and title.lower() == "hostname":
-            paths.append(path)
-
-        properties = schema.get("properties")
-        if isinstance(properties, dict):
-            for key, child_schema in properties.items():
-                if isinstance(key, str):
-                    paths.extend(_iter_hostname_paths(child_schema, path + (key,)))
-
-        items = schema.get("items")
-        if isinstance(items, dict):
-            paths.extend(_iter_hostname_paths(items, path + ("*",)))
-        elif isinstance(items, list):
-            for child_schema in items:
-                paths.extend(_iter_hostname_paths(child_schema, path + ("*",)))
-
-        for schema_key in ("allOf", "anyOf", "oneOf", "prefixItems"):
-            variants = schema.get(schema_key)
-            if isinstance(variants, list):
-                for child_schema in variants:
-                    paths.extend(_iter_hostname_paths(child_schema, path))
-
-        additional = schema.get("additionalProperties")
-        if isinstance(additional, dict):
-            paths.extend(_iter_hostname_paths(additional, path))
-
-        definitions = schema.get("$defs") or schema.get("definitions")
-        if isinstance(definitions, dict):
-            for child_schema in definitions.values():
-                paths.extend(_iter_hostname_paths(child_schema, path))
-    elif isinstance(schema, list):
-        for child_schema in schema:
-            paths.extend(_iter_hostname_paths(child_schema, path))
-    return paths
+def _template_hostname_paths(template: ProductTemplateVersionORM) -> list[list[str]]:
+    """Return the template's precomputed hostname paths.
+
+    Migration ``d8e9f0a1b2c3`` backfills existing templates; should a row
+    still lack them, they are computed here without being written back, so a
+    deployment request never touches the catalog.
+    """
+    if template.hostname_paths_json is None:
+        return template_values.find_hostname_paths(template.values_schema_json)
+    return template.hostname_paths_json
 
 
 def normalize_and_return_hostname(
     *,
-    values_schema_json: dict[str, Any] | None,
+    hostname_paths: list[list[str]],
     user_values_json: dict[str, Any] | None,
 ) -> str | None:
     """Derive the hostname from user values and normalize it to lowercase.
 
-    When a hostname is found, the lowercased value is written back into
-    ``user_values_json`` so that downstream consumers (e.g. the Helm
-    reconciler) receive an RFC 1123-compliant value.
+    *hostname_paths* are the template's precomputed paths (see
+    ``template_values.find_hostname_paths``). When a hostname is found, the
+    lowercased value is written back into ``user_values_json`` so that
+    downstream consumers (e.g. the Helm reconciler) receive an RFC
+    1123-compliant value.
     """
-    if not isinstance(values_schema_json, dict):
-        return None
-    for path in _iter_hostname_paths(values_schema_json):
+    for path in hostname_paths:
+        path = tuple(path)
         value = value_for_path(user_values_json, path)
         if value is None:
             return None
@@ -180,7 +160,7 @@ def create_deployment(
     # Pre-flight the user-provided values against the template's schema:
     _validate_user_values(template, payload.user_values_json)
     derived_hostname = normalize_and_return_hostname(
-        values_schema_json=template.values_schema_json,
+        hostname_paths=_template_hostname_paths(template),
         user_values_json=payload.user_values_json,
     )
     if derived_hostname is not None:
@@ -192,12 +172,10 @@ def create_deployment(
     # Determine if this is a paid plan requiring payment.
     is_paid = payment_provider is not None and plan_template.price_cents > 0
 
-    # Pre-generate the deployment UUID so we can use it in the Mollie
-    # redirect URL and as an idempotency key before the DB transaction.
     deployment_id = uuid4()
-    checkout_url: str | None = None
 
-    # --- DB transaction ---
+    # Phase 1, one DB transaction and no external calls: the subscription, the
+    # deployment and (for paid plans) the outbox row for the checkout step.
     sub = subscription_service.create_subscription(
         session,
         plan_template_id=payload.plan_template_id,
@@ -221,58 +199,34 @@ def create_deployment(
         )
     )
     session.add(deployment)
-    session.flush()  # ensure deployment.subscription_id is available
-
-    if is_paid:
-        settings = get_settings()
-
-        # Ensure user has a Mollie customer
-        if not user.mollie_customer_id:
-            user.mollie_customer_id = payment_provider.ensure_customer(email=user.email,
-                                                                       idempotency_key=f"customer_{deployment_id}")
-
-        # Build redirect URL with deployment ID so the dashboard can
-        # focus on the new deployment when the user returns from checkout.
-        redirect_url = amend_url(settings.mollie_redirect_url, query={"deployment": str(deployment_id)})
-
-        # Create first payment via Mollie
-        payment_result = payment_provider.create_first_payment(
-            customer_id=user.mollie_customer_id,
-            amount_cents=plan_template.price_cents,
-            description=deployment.payment_description(),
-            redirect_url=redirect_url,
-            webhook_url=amend_url(settings.mollie_webhook_base_url, "webhooks/mollie"),
-            idempotency_key=f"first_payment_{deployment_id}",
-        )
-        checkout_url = payment_result.checkout_url
-        mollie_payment = MolliePaymentORM(
-            subscription_id=sub.id,
-            mollie_payment_id=payment_result.payment_id,
-            status=MolliePaymentStatus.OPEN,
-            sequence_type="first",
-            amount_cents=plan_template.price_cents,
-        )
-        session.add(mollie_payment)
-
 
     try:
+        # Place the deployment and reserve its footprint in the same
+        # transaction, so a deployment that cannot fit is rejected here rather
+        # than timing out in the reconciler.
+        need = capacity_service.footprint(template, plan_template)
+        candidates = cluster_service.placement_candidates(session, template.product, need)
+        capacity_service.reserve(session, deployment, need, clusters=candidates)
+        if warm := namespace_pool_service.claim_namespace(
+            session, deployment_id=deployment.id, cluster=deployment.cluster
+        ):
+            deployment.namespace = warm
         session.flush()
+        checkout_row = checkout_service.enqueue_first_payment(session, deployment) if is_paid else None
         if not is_paid:
             _enqueue_reconcile_job(session, deployment_id=deployment.id, reason=JOB_REASON_CREATE)
         session.commit()
-        deployment = _get_deployment_orm(session, deployment_id=deployment.id)
         logger.info(
             "Created deployment id=%s user_id=%s desired_template_id=%s subscription_id=%s paid=%s",
-            deployment.id,
-            deployment.user_id,
-            deployment.desired_template_id,
-            deployment.subscription_id,
+            deployment_id,
+            payload.user_id,
+            payload.desired_template_id,
+            sub.id,
             is_paid,
         )
-        return DeploymentCreateResult(
-            deployment=DeploymentRead.model_validate(deployment),
-            checkout_url=checkout_url,
-        )
+    except CapacityException:
+        session.rollback()
+        raise
     except DeploymentInProgressException:
         session.rollback()
         logger.warning("Create deployment blocked by in-progress reconcile job for user_id=%s", payload.user_id)
@@ -282,6 +236,22 @@ def create_deployment(
         logger.warning("Deployment create failed due to integrity conflict for user_id=%s", payload.user_id)
         raise IntegrityException("Deployment already exists") from exc
 
+    # Phase 2, after commit: deliver the checkout step right away when
+    # configured. A failure leaves it queued for the worker; the client then
+    # waits for the URL on the checkout endpoint.
+    checkout = None
+    if checkout_row is not None:
+        if get_settings().checkout_inline:
+            outbox_service.dispatch_one(session, payment_provider, checkout_row.id, worker_id="api")
+        checkout = checkout_service.get_checkout(session, deployment_id=deployment_id)
+
+    deployment = _get_deployment_orm(session, deployment_id=deployment_id)
+    return DeploymentCreateResult(
+        deployment=DeploymentRead.model_validate(deployment),
+        checkout_url=checkout.checkout_url if checkout else None,
+        checkout_status=checkout.status if checkout else None,
+    )
+
 
 def list_deployments(session: Session, *, user_id: int | None = None) -> list[DeploymentRead]:
     # Return non-deleted deployments for the given user if provided, otherwise all
@@ -352,7 +322,7 @@ def update_deployment(session: Session, update: DeploymentUpdate) -> DeploymentR
     # Pre-flight the user-provided values against the template's schema:
     _validate_user_values(target_template, new_user_values)
     derived_hostname = normalize_and_return_hostname(
-        values_schema_json=target_template.values_schema_json,
+        hostname_paths=_template_hostname_paths(target_template),
         user_values_json=new_user_values,
     )
     if derived_hostname is not None:
@@ -388,8 +358,13 @@ def update_deployment(session: Session, update: DeploymentUpdate) -> DeploymentR
     session.expire(deployment)
 
     try:
+        plan_template = deployment.subscription.plan_template if deployment.subscription else None
+        capacity_service.reserve(session, deployment, capacity_service.footprint(target_template, plan_template))
         _enqueue_reconcile_job(session, deployment_id=update.id, reason=JOB_REASON_UPDATE)
         session.commit()
+    except CapacityException:
+        session.rollback()
+        raise
     except DeploymentInProgressException:
         session.rollback()
         logger.warning("Update deployment blocked by in-progress reconcile job deployment_id=%s", update.id)
@@ -19,6 +19,10 @@ class ValidationException(CaelusException):
     pass
 
 
+class CapacityException(CaelusException):
+    pass
+
+
 class HostnameException(CaelusException):
     def __init__(self, reason: str):
         self.reason = reason
@@ -1,14 +1,16 @@
 from __future__ import annotations
 
+import asyncio
 import re
-import socket
 import logging
 from uuid import UUID
 
+from sqlalchemy import func
 from sqlmodel import Session, select
 
 from app.config import CaelusSettings, get_settings
-from app.models import DeploymentORM
+from app.models import DeploymentORM, HostnameCheck
+from app.services import resolver
 from app.services.errors import HostnameException
 from app.services.reconcile_constants import DEPLOYMENT_STATUS_DELETED
 
@@ -55,19 +57,30 @@ def _check_available(session: Session, fqdn: str, *, exclude_deployment_id: UUID
         raise HostnameException("in_use")
 
 
+def _require_lb_addresses(addresses: frozenset[str] | None, settings: CaelusSettings) -> None:
+    if not addresses or not addresses <= set(settings.lb_ips):
+        raise HostnameException("not_resolving")
+
+
 def _check_resolving(fqdn: str, settings: CaelusSettings) -> None:
     if not settings.lb_ips:
         return
+    _require_lb_addresses(resolver.lookup(fqdn), settings)
 
-    lb_set = set(settings.lb_ips)
-    try:
-        results = socket.getaddrinfo(fqdn, None, proto=socket.IPPROTO_TCP)
-    except socket.gaierror:
-        raise HostnameException("not_resolving")
 
-    resolved_ips = {addr[0] for _, _, _, _, addr in results}
-    if not resolved_ips or not resolved_ips <= lb_set:
-        raise HostnameException("not_resolving")
+async def _check_resolving_async(fqdn: str, settings: CaelusSettings) -> None:
+    if not settings.lb_ips:
+        return
+    _require_lb_addresses(await resolver.lookup_async(fqdn), settings)
+
+
+def _check_local(
+    session: Session, fqdn: str, settings: CaelusSettings, exclude_deployment_id: UUID | None,
+) -> None:
+    _check_format(fqdn)
+    _check_wildcard_depth(fqdn, settings)
+    _check_reserved(fqdn, settings)
+    _check_available(session, fqdn, exclude_deployment_id=exclude_deployment_id)
 
 
 def require_valid_hostname_for_deployment(
@@ -87,8 +100,120 @@ def require_valid_hostname_for_deployment(
     """
     settings = settings or get_settings()
     fqdn = fqdn.lower()
-    _check_format(fqdn)
-    _check_wildcard_depth(fqdn, settings)
-    _check_reserved(fqdn, settings)
-    _check_available(session, fqdn, exclude_deployment_id=exclude_deployment_id)
+    _check_local(session, fqdn, settings, exclude_deployment_id)
     _check_resolving(fqdn, settings)
+
+
+async def require_valid_hostname_for_deployment_async(
+    session: Session,
+    fqdn: str,
+    *,
+    exclude_deployment_id: UUID | None = None,
+    settings: CaelusSettings | None = None,
+) -> None:
+    """Async variant of :func:`require_valid_hostname_for_deployment`.
+
+    The database checks run in a worker thread; the DNS lookup is awaited on
+    the shared resolver loop, so a slow resolver holds no thread.
+    """
+    settings = settings or get_settings()
+    fqdn = fqdn.lower()
+    await asyncio.to_thread(_check_local, session, fqdn, settings, exclude_deployment_id)
+    await _check_resolving_async(fqdn, settings)
+
+
+# ── Batch validation ──────────────────────────────────────────────────
+
+# Stay well under SQLite's bound-parameter limit for the IN (...) lookup.
+_IN_CHUNK = 500
+
+
+def _hostnames_in_use(session: Session, fqdns: list[str]) -> set[str]:
+    """Return the subset of *fqdns* held by non-deleted deployments (one query per chunk)."""
+    in_use: set[str] = set()
+    lowered = func.lower(DeploymentORM.hostname)
+    for start in range(0, len(fqdns), _IN_CHUNK):
+        chunk = fqdns[start:start + _IN_CHUNK]
+        stmt = select(lowered).where(
+            lowered.in_(chunk),
+            DeploymentORM.status != DEPLOYMENT_STATUS_DELETED,
+        )
+        in_use.update(session.exec(stmt).all())
+    return in_use
+
+
+def _check_batch_local(
+    session: Session, fqdns: list[str], settings: CaelusSettings,
+) -> tuple[list[HostnameCheck], list[str]]:
+    """Run the in-memory and DB checks for a batch.
+
+    Returns the per-input results (``usable`` still provisional) and the
+    unique hostnames that passed and need a DNS check.
+    """
+    results: list[HostnameCheck] = []
+    seen: set[str] = set()
+    candidates: list[str] = []
+    for raw in fqdns:
+        fqdn = raw.lower()
+        reason = None
+        try:
+            _check_format(fqdn)
+            _check_wildcard_depth(fqdn, settings)
+            _check_reserved(fqdn, settings)
+        except HostnameException as exc:
+            reason = exc.reason
+        else:
+            if fqdn in seen:
+                reason = "duplicate"
+            else:
+                seen.add(fqdn)
+                candidates.append(fqdn)
+        results.append(HostnameCheck(fqdn=fqdn, usable=reason is None, reason=reason))
+
+    in_use = _hostnames_in_use(session, candidates) if candidates else set()
+    for result in results:
+        if result.usable and result.fqdn in in_use:
+            result.usable, result.reason = False, "in_use"
+    return results, [fqdn for fqdn in candidates if fqdn not in in_use]
+
+
+def _apply_dns(
+    results: list[HostnameCheck],
+    addresses: dict[str, frozenset[str] | None],
+    settings: CaelusSettings,
+) -> list[HostnameCheck]:
+    for result in results:
+        if result.usable and result.fqdn in addresses:
+            try:
+                _require_lb_addresses(addresses[result.fqdn], settings)
+            except HostnameException as exc:
+                result.usable, result.reason = False, exc.reason
+    return results
+
+
+def check_hostnames(
+    session: Session, fqdns: list[str], *, settings: CaelusSettings | None = None,
+) -> list[HostnameCheck]:
+    """Validate many hostnames at once, returning one result per input (in order).
+
+    Reason codes match :func:`require_valid_hostname_for_deployment`, plus
+    ``duplicate`` for a repeated hostname after its first occurrence.
+    Availability is one ``lower(hostname) IN (...)`` query and DNS lookups
+    run concurrently.
+    """
+    settings = settings or get_settings()
+    results, to_resolve = _check_batch_local(session, fqdns, settings)
+    if not settings.lb_ips:
+        return results
+    return _apply_dns(results, resolver.lookup_many(to_resolve), settings)
+
+
+async def check_hostnames_async(
+    session: Session, fqdns: list[str], *, settings: CaelusSettings | None = None,
+) -> list[HostnameCheck]:
+    """Async variant of :func:`check_hostnames`."""
+    settings = settings or get_settings()
+    results, to_resolve = await asyncio.to_thread(_check_batch_local, session, fqdns, settings)
+    if not settings.lb_ips:
+        return results
+    return _apply_dns(results, await resolver.lookup_many_async(to_resolve), settings)
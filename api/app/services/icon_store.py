@@ -0,0 +1,274 @@
+"""Content-addressed storage for product icons.
+
+Icons are stored under their content hash (``icons/<sha1>/`` with one file per
+variant, or ``icons/<sha1>.png`` for icons uploaded before variants existed),
+so identical uploads share one copy and stored files never change. Products
+reference icons through ``ProductORM.rel_icon_path``; :func:`gc_icons` removes
+stored icons that no product row references any more.
+
+The backend is pluggable: :class:`LocalIconStore` writes below
+``static_path`` (served by ``/api/static``), :class:`S3IconStore` writes to an
+S3-compatible bucket. Select it with ``CAELUS_ICON_STORE``; tests swap it with
+:func:`set_icon_store`.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+import logging
+import os
+from pathlib import Path
+import re
+import shutil
+import threading
+from typing import Any, Protocol
+from uuid import uuid4
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.config import CaelusSettings, get_settings
+from app.models import ProductORM
+from app.services.images import ProcessedIcon
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# "icons/<sha1>/<variant>" (current layout) or "icons/<sha1>.png" (legacy).
+_HASHED_PATH_RE = re.compile(r"^icons/(?P<digest>[0-9a-f]{40})(?:/(?P<variant>\d+\.(?:png|webp))|\.png)$")
+
+_CONTENT_TYPES = {"png": "image/png", "webp": "image/webp"}
+
+
+@dataclass(frozen=True)
+class StoredIcon:
+    key: str  # "icons/<sha1>" or legacy "icons/<sha1>.png"
+    modified_at: datetime
+
+
+def parse_hashed_path(rel_path: str) -> tuple[str, str | None] | None:
+    """Return ``(digest, variant)`` for a content-addressed icon path, else ``None``."""
+    match = _HASHED_PATH_RE.match(rel_path)
+    if match is None:
+        return None
+    return match.group("digest"), match.group("variant")
+
+
+def icon_key(rel_path: str) -> str | None:
+    """The storage key (unit of garbage collection) an icon path belongs to."""
+    parsed = parse_hashed_path(rel_path)
+    if parsed is None:
+        return None
+    digest, variant = parsed
+    return f"icons/{digest}" if variant else f"icons/{digest}.png"
+
+
+def strong_etag(rel_path: str) -> str | None:
+    """Strong ETag for a content-addressed icon path, derived from its hash."""
+    parsed = parse_hashed_path(rel_path)
+    if parsed is None:
+        return None
+    digest, variant = parsed
+    return f'"{digest}-{variant}"' if variant else f'"{digest}"'
+
+
+class IconStore(Protocol):
+    def put(self, icon: ProcessedIcon) -> str:
+        """Store all variants of *icon* (idempotent) and return its ``rel_icon_path``."""
+        ...
+
+    def list_icons(self) -> list[StoredIcon]:
+        ...
+
+    def delete(self, key: str) -> None:
+        ...
+
+
+class LocalIconStore:
+    """Icons as files below a local directory (normally ``static_path``)."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def put(self, icon: ProcessedIcon) -> str:
+        icons_dir = self.root / "icons"
+        target = icons_dir / icon.digest
+        if target.is_dir():
+            # Refresh the mtime so a concurrent GC run treats it as new.
+            os.utime(target)
+            return icon.rel_path
+        icons_dir.mkdir(parents=True, exist_ok=True)
+        # Write into a temporary directory and rename it into place, so
+        # readers never see a partial set of variants.
+        tmp = icons_dir / f".tmp-{uuid4().hex}"
+        tmp.mkdir()
+        try:
+            for name, data in icon.variants.items():
+                (tmp / name).write_bytes(data)
+            try:
+                os.rename(tmp, target)
+            except OSError:
+                if not target.is_dir():
+                    raise
+                # Lost a race with an identical upload; theirs is just as good.
+        finally:
+            if tmp.exists():
+                shutil.rmtree(tmp, ignore_errors=True)
+        return icon.rel_path
+
+    def list_icons(self) -> list[StoredIcon]:
+        icons_dir = self.root / "icons"
+        if not icons_dir.is_dir():
+            return []
+        stored = []
+        for entry in icons_dir.iterdir():
+            key = f"icons/{entry.name}"
+            if entry.is_dir():
+                if parse_hashed_path(f"{key}/256.png") is None:
+                    continue
+            elif parse_hashed_path(key) is None:
+                continue
+            stored.append(StoredIcon(key=key, modified_at=datetime.fromtimestamp(entry.stat().st_mtime, UTC)))
+        return stored
+
+    def delete(self, key: str) -> None:
+        path = self.root / key
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink(missing_ok=True)
+
+
+class S3IconStore:
+    """Icons as objects in an S3-compatible bucket.
+
+    *client* is a boto3 S3 client (or anything with the same ``put_object``,
+    ``list_objects_v2`` and ``delete_objects`` methods). Objects are uploaded
+    with immutable cache headers so a CDN in front of the bucket can cache
+    them forever.
+    """
+
+    def __init__(self, client: Any, bucket: str, *, prefix: str = "") -> None:
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def put(self, icon: ProcessedIcon) -> str:
+        # The primary variant goes last: its presence marks a complete set.
+        primary = icon.rel_path.rsplit("/", 1)[1]
+        for name in sorted(icon.variants, key=lambda name: name == primary):
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=f"{self.prefix}icons/{icon.digest}/{name}",
+                Body=icon.variants[name],
+                ContentType=_CONTENT_TYPES[name.rsplit(".", 1)[1]],
+                CacheControl=IMMUTABLE_CACHE_CONTROL,
+            )
+        return icon.rel_path
+
+    def _objects(self):
+        kwargs = {"Bucket": self.bucket, "Prefix": f"{self.prefix}icons/"}
+        while True:
+            page = self.client.list_objects_v2(**kwargs)
+            yield from page.get("Contents", ())
+            if not page.get("IsTruncated"):
+                return
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+    def list_icons(self) -> list[StoredIcon]:
+        newest: dict[str, datetime] = {}
+        for obj in self._objects():
+            key = icon_key(obj["Key"][len(self.prefix):])
+            if key is not None:
+                modified = obj["LastModified"]
+                if key not in newest or modified > newest[key]:
+                    newest[key] = modified
+        return [StoredIcon(key=key, modified_at=modified) for key, modified in newest.items()]
+
+    def delete(self, key: str) -> None:
+        keys = [
+            {"Key": obj["Key"]}
+            for obj in self._objects()
+            if icon_key(obj["Key"][len(self.prefix):]) == key
+        ]
+        for start in range(0, len(keys), 1000):
+            self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": keys[start:start + 1000]})
+
+
+def build_icon_store(settings: CaelusSettings) -> IconStore:
+    if settings.icon_store == "local":
+        return LocalIconStore(settings.static_path)
+    if settings.icon_store == "s3":
+        if not settings.icon_s3_bucket:
+            raise RuntimeError("CAELUS_ICON_S3_BUCKET is required when CAELUS_ICON_STORE=s3")
+        try:
+            import boto3
+        except ImportError as exc:
+            raise RuntimeError("CAELUS_ICON_STORE=s3 requires the boto3 package") from exc
+        client = boto3.client("s3", endpoint_url=settings.icon_s3_endpoint_url)
+        return S3IconStore(client, settings.icon_s3_bucket, prefix=settings.icon_s3_prefix)
+    raise RuntimeError(f"Unknown icon store {settings.icon_store!r} (expected 'local' or 's3')")
+
+
+_lock = threading.Lock()
+_store: IconStore | None = None
+
+
+def get_icon_store() -> IconStore:
+    """The process-wide icon store, built from settings on first use."""
+    global _store
+    with _lock:
+        if _store is None:
+            _store = build_icon_store(get_settings())
+        return _store
+
+
+def set_icon_store(store: IconStore | None) -> None:
+    """Replace the process-wide icon store (``None`` rebuilds it from settings)."""
+    global _store
+    with _lock:
+        _store = store
+
+
+# ── Garbage collection ────────────────────────────────────────────────
+
+
+def icon_references(session: Session) -> dict[str, int]:
+    """Count product rows (including soft-deleted ones) per stored icon key."""
+    rows = session.exec(
+        select(ProductORM.rel_icon_path, func.count())
+        .where(ProductORM.rel_icon_path.is_not(None))
+        .group_by(ProductORM.rel_icon_path)
+    ).all()
+    refs: dict[str, int] = {}
+    for rel_path, count in rows:
+        if (key := icon_key(rel_path)) is not None:
+            refs[key] = refs.get(key, 0) + count
+    return refs
+
+
+def gc_icons(
+    session: Session,
+    *,
+    store: IconStore | None = None,
+    min_age: timedelta = timedelta(hours=1),
+    dry_run: bool = False,
+) -> list[str]:
+    """Delete stored icons no product references; returns the removed keys.
+
+    Icons younger than *min_age* are kept: an upload is stored before the
+    product row referencing it commits.
+    """
+    store = store or get_icon_store()
+    refs = icon_references(session)
+    cutoff = datetime.now(UTC) - min_age
+    removed = []
+    for stored in store.list_icons():
+        if refs.get(stored.key) or stored.modified_at > cutoff:
+            continue
+        if not dry_run:
+            store.delete(stored.key)
+        removed.append(stored.key)
+    logger.info("Icon GC %s %d unreferenced icon(s)", "found" if dry_run else "removed", len(removed))
+    return sorted(removed)
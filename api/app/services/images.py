@@ -1,44 +1,82 @@
 from __future__ import annotations
 
+import asyncio
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
 import hashlib
 import io
-from pathlib import Path
+import logging
+import multiprocessing
+import re
+import threading
 
 from PIL import Image, ImageOps
 
+logger = logging.getLogger(__name__)
+
 MAX_ICON_SIZE = 10 * 1024 * 1024  # 10MB
 MAX_ICON_DIMENSION = 2048
 ICON_SIZE = 256
+# Rendered for every upload from a single decode, largest first.
+ICON_VARIANT_SIZES = (256, 128, 64)
+ICON_VARIANT_FORMATS = {"png": "PNG", "webp": "WEBP"}
+
+# New-style icons live in a directory per content hash; rel_icon_path points
+# at the 256px PNG inside it. Older icons are single files "icons/<sha1>.png".
+_VARIANT_DIR_RE = re.compile(r"^icons/([0-9a-f]{40})/256\.png$")
+
+
+@dataclass(frozen=True)
+class ProcessedIcon:
+    """All rendered variants of one uploaded icon, keyed like ``"128.webp"``."""
+
+    digest: str
+    variants: dict[str, bytes]
+
+    @property
+    def rel_path(self) -> str:
+        return f"icons/{self.digest}/{ICON_SIZE}.png"
 
+    @property
+    def primary(self) -> bytes:
+        return self.variants[f"{ICON_SIZE}.png"]
 
-def process_icon(image_data: bytes) -> bytes:
-    """Process icon image: normalize orientation, center-crop to square, downscale to 256, output PNG.
 
-    Args:
-        image_data: Raw image bytes
+def _too_large_message() -> str:
+    return f"Image file too large. Maximum size is {MAX_ICON_SIZE // (1024 * 1024)}MB"
 
-    Returns:
-        Processed PNG image bytes
+
+def check_icon_header(image_data: bytes) -> None:
+    """Reject oversized uploads from the byte count and image header alone.
+
+    ``Image.open`` only parses the header, so this is cheap enough to run on the
+    request path before handing the full decode to the worker pool.
 
     Raises:
-        ValueError: If image is too large or invalid
+        ValueError: If the image is too large, too big in pixels, or unreadable
     """
     if len(image_data) > MAX_ICON_SIZE:
-        raise ValueError(
-            f"Image file too large. Maximum size is {MAX_ICON_SIZE // (1024 * 1024)}MB"
-        )
-
+        raise ValueError(_too_large_message())
     try:
-        img = Image.open(io.BytesIO(image_data))
+        with Image.open(io.BytesIO(image_data)) as img:
+            width, height = img.size
     except Exception as e:
         raise ValueError(f"Invalid image file: {e}") from e
-
-    width, height = img.size
     if width > MAX_ICON_DIMENSION or height > MAX_ICON_DIMENSION:
         raise ValueError(
             f"Image dimensions too large. Maximum allowed is {MAX_ICON_DIMENSION}x{MAX_ICON_DIMENSION}"
         )
 
+
+def _decode_square(image_data: bytes) -> Image.Image:
+    check_icon_header(image_data)
+    try:
+        img = Image.open(io.BytesIO(image_data))
+        img.load()
+    except Exception as e:
+        raise ValueError(f"Invalid image file: {e}") from e
+
     if hasattr(img, "_getexif") and img._getexif():
         try:
             img = ImageOps.exif_transpose(img)
@@ -51,46 +89,161 @@ def process_icon(image_data: bytes) -> bytes:
     size = min(img.size)
     left = (img.width - size) // 2
     top = (img.height - size) // 2
-    right = left + size
-    bottom = top + size
-    img = img.crop((left, top, right, bottom))
+    return img.crop((left, top, left + size, top + size))
+
+
+def render_icon_variants(image_data: bytes) -> ProcessedIcon:
+    """Decode once, then render every size/format variant.
+
+    Runs inside the icon worker processes (see :func:`render_icon`), but is a
+    plain function so it can also be called directly.
 
-    if img.width > ICON_SIZE or img.height > ICON_SIZE:
-        img.thumbnail((ICON_SIZE, ICON_SIZE), Image.LANCZOS)
+    Raises:
+        ValueError: If image is too large or invalid
+    """
+    img = _decode_square(image_data)
+    variants: dict[str, bytes] = {}
+    for size in ICON_VARIANT_SIZES:
+        # Each size is downscaled from the previous (larger) one.
+        if img.width > size:
+            img = img.resize((size, size), Image.LANCZOS)
+        for ext, fmt in ICON_VARIANT_FORMATS.items():
+            output = io.BytesIO()
+            img.save(output, format=fmt)
+            variants[f"{size}.{ext}"] = output.getvalue()
+    digest = hashlib.sha1(variants[f"{ICON_SIZE}.png"]).hexdigest()
+    return ProcessedIcon(digest=digest, variants=variants)
 
-    output = io.BytesIO()
-    img.save(output, format="PNG")
-    output.seek(0)
-    return output.getvalue()
 
+# ── Worker pool ───────────────────────────────────────────────────────
 
-def generate_icon_filename(processed_data: bytes) -> str:
-    """Generate an icon filename based on SHA1 hash of the processed image data.
+_pool_lock = threading.Lock()
+_pool: ProcessPoolExecutor | None = None
+_slots: threading.BoundedSemaphore | None = None
 
-    Args:
-        processed_data: Processed PNG bytes
 
-    Returns:
-        Relative path like "icons/<sha1>.png"
-    """
-    sha1_hash = hashlib.sha1(processed_data).hexdigest()
-    return f"icons/{sha1_hash}.png"
+def _get_pool() -> tuple[ProcessPoolExecutor, threading.BoundedSemaphore]:
+    global _pool, _slots
+    from app.config import get_settings
+
+    with _pool_lock:
+        if _pool is None:
+            workers = max(1, get_settings().icon_workers)
+            # spawn: the API process runs threads (DB pools, listeners) that a
+            # forked child must not inherit.
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            # Bound queued work: each pending job holds an upload of up to 10MB.
+            _slots = threading.BoundedSemaphore(workers * 2)
+        return _pool, _slots
+
+
+def shutdown_pool() -> None:
+    """Stop the icon worker processes (they are restarted on next use)."""
+    global _pool, _slots
+    with _pool_lock:
+        pool, _pool, _slots = _pool, None, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _recycle_pool(pool: ProcessPoolExecutor) -> None:
+    """Kill *pool*'s workers (one is stuck) and start a fresh pool on next use."""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _slots = None, None
+    # ProcessPoolExecutor has no public way to stop a running task before 3.14.
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _abandon(pool: ProcessPoolExecutor, future: Future[ProcessedIcon]) -> ValueError:
+    # Still queued: just drop it. Already running: the worker is stuck on
+    # this image and would hold its slot for good, so replace the pool.
+    if not future.cancel():
+        _recycle_pool(pool)
+    return ValueError("Icon processing timed out")
+
+
+def _submit(
+    image_data: bytes, *, blocking: bool
+) -> tuple[ProcessPoolExecutor, Future[ProcessedIcon]] | None:
+    from app.config import get_settings
+
+    pool, slots = _get_pool()
+    if blocking:
+        if not slots.acquire(timeout=get_settings().icon_timeout_seconds):
+            raise ValueError("Icon processing is busy, please retry")
+    elif not slots.acquire(blocking=False):
+        return None
+    try:
+        future = pool.submit(render_icon_variants, image_data)
+    except BrokenProcessPool:
+        slots.release()
+        shutdown_pool()
+        raise ValueError("Icon processing failed, please retry")
+    future.add_done_callback(lambda _: slots.release())
+    return pool, future
 
 
-def save_icon(processed_data: bytes, rel_path: str) -> Path:
-    """Save processed icon data to static storage.
+def _result(pool: ProcessPoolExecutor, future: Future[ProcessedIcon]) -> ProcessedIcon:
+    from app.config import get_settings
+
+    try:
+        return future.result(timeout=get_settings().icon_timeout_seconds)
+    except TimeoutError:
+        raise _abandon(pool, future) from None
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a hostile image); start fresh next time.
+        shutdown_pool()
+        raise ValueError("Icon processing failed, please retry")
 
-    Args:
-        processed_data: Processed PNG bytes
-        rel_path: Relative path including icons/ prefix
 
-    Returns:
-        Absolute path to saved file
+def render_icon(image_data: bytes) -> ProcessedIcon:
+    """Render icon variants in the worker pool, blocking the calling thread.
+
+    Header checks run first, so oversized uploads never reach the pool.
     """
+    check_icon_header(image_data)
+    return _result(*_submit(image_data, blocking=True))
+
+
+async def render_icon_async(image_data: bytes) -> ProcessedIcon:
+    """Render icon variants in the worker pool without holding a thread."""
     from app.config import get_settings
 
-    static_path = get_settings().static_path
-    file_path = static_path / rel_path
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-    file_path.write_bytes(processed_data)
-    return file_path
+    check_icon_header(image_data)
+    submitted = _submit(image_data, blocking=False)
+    if submitted is None:
+        # All slots busy: wait for one in a thread rather than on the loop.
+        submitted = await asyncio.to_thread(_submit, image_data, blocking=True)
+    pool, future = submitted
+    try:
+        # shield: on timeout _abandon decides between cancelling and recycling.
+        return await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(future)), get_settings().icon_timeout_seconds
+        )
+    except TimeoutError:
+        raise _abandon(pool, future) from None
+    except BrokenProcessPool:
+        shutdown_pool()
+        raise ValueError("Icon processing failed, please retry")
+
+
+# ── Paths ─────────────────────────────────────────────────────────────
+
+
+def icon_variant_paths(rel_icon_path: str | None) -> dict[str, str] | None:
+    """Map variant names (``"64.webp"``) to relative paths for a stored icon.
+
+    Returns ``None`` for icons stored before variants existed.
+    """
+    if not rel_icon_path or not (match := _VARIANT_DIR_RE.match(rel_icon_path)):
+        return None
+    digest = match.group(1)
+    return {
+        f"{size}.{ext}": f"icons/{digest}/{size}.{ext}"
+        for size in ICON_VARIANT_SIZES
+        for ext in ICON_VARIANT_FORMATS
+    }
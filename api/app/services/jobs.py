@@ -1,16 +1,21 @@
 from __future__ import annotations
 
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
 import logging
 from uuid import UUID
 
-from sqlalchemy import text
+from sqlalchemy import func, text, update as sa_update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
 from sqlmodel import Session, select
 
-from app.models import DeploymentReconcileJobORM
+from app import tracing
+from app.config import get_settings
+from app.models import DeploymentORM, DeploymentReconcileJobORM, ProductTemplateVersionORM
 from app.services.errors import DeploymentInProgressException, NotFoundException
 from app.services.reconcile_constants import (
+    JOB_STAGE_AWAIT_READY,
+    JOB_STAGE_RECONCILE,
     JOB_STATUS_DONE,
     JOB_STATUS_FAILED,
     JOB_STATUS_QUEUED,
@@ -19,6 +24,9 @@ from app.services.reconcile_constants import (
 
 logger = logging.getLogger(__name__)
 
+# Arbitrary constant identifying the job claim advisory lock on Postgres.
+_CLAIM_LOCK_KEY = 0x63_61_65_6C_6A_6F_62  # "caeljob"
+
 
 class JobService:
     def __init__(self, session: Session) -> None:
@@ -31,31 +39,38 @@ class JobService:
         reason: str,
         run_after: datetime | None = None,
     ) -> DeploymentReconcileJobORM:
-        """Create a queued reconcile job for a deployment in the current transaction."""
-        job = DeploymentReconcileJobORM(
-            deployment_id=deployment_id,
-            reason=reason,
-            run_after=run_after or datetime.now(UTC),
-            status=JOB_STATUS_QUEUED,
-        )
-        try:
-            self._session.add(job)
-            self._session.flush()
-            logger.info(
-                "Enqueued reconcile job id=%s deployment_id=%s reason=%s run_after=%s",
-                job.id,
-                deployment_id,
-                reason,
-                job.run_after,
-            )
-        except IntegrityError as exc:
-            logger.warning(
-                "Duplicate in-progress job for deployment_id=%s; rejecting enqueue",
-                deployment_id,
+        """Create a queued reconcile job for a deployment in the current transaction.
+
+        The job inherits the deployment's cluster, so only that cluster's workers claim it.
+        """
+        deployment = self._session.get(DeploymentORM, deployment_id)
+        with tracing.span("reconcile_job.enqueue", deployment_id=deployment_id, reason=reason):
+            job = DeploymentReconcileJobORM(
+                deployment_id=deployment_id,
+                cluster=deployment.cluster if deployment is not None else None,
+                reason=reason,
+                run_after=run_after or datetime.now(UTC),
+                status=JOB_STATUS_QUEUED,
+                trace_context=tracing.current_context(),
             )
-            raise DeploymentInProgressException(
-                "A deployment job is already queued or running"
-            ) from exc
+            try:
+                self._session.add(job)
+                self._session.flush()
+                logger.info(
+                    "Enqueued reconcile job id=%s deployment_id=%s reason=%s run_after=%s",
+                    job.id,
+                    deployment_id,
+                    reason,
+                    job.run_after,
+                )
+            except IntegrityError as exc:
+                logger.warning(
+                    "Duplicate in-progress job for deployment_id=%s; rejecting enqueue",
+                    deployment_id,
+                )
+                raise DeploymentInProgressException(
+                    "A deployment job is already queued or running"
+                ) from exc
         return job
 
     def list_jobs(
@@ -74,26 +89,77 @@ class JobService:
         stmt = stmt.order_by(DeploymentReconcileJobORM.run_after, DeploymentReconcileJobORM.id).limit(limit)
         return list(self._session.exec(stmt).all())
 
-    def _claim_next_job_postgres(self, *, worker_id: str) -> DeploymentReconcileJobORM | None:
+    def _next_runnable_job(self, *, now: datetime, cluster: str | None, reason: str | None = None):
+        """Select the next runnable job, fairly chosen across users and within the concurrency caps.
+
+        Jobs of the user with the fewest running reconciles go first (then
+        oldest ``run_after``), so one user's backlog cannot starve everyone
+        else; users/products already at ``CAELUS_JOB_MAX_RUNNING_PER_USER`` /
+        ``_PER_PRODUCT`` are skipped until one of their jobs finishes.
+        """
+        settings = get_settings()
+        job = DeploymentReconcileJobORM
+        running_job = aliased(DeploymentReconcileJobORM)
+        running_deployment = aliased(DeploymentORM)
+        running_template = aliased(ProductTemplateVersionORM)
+
+        def running_count(condition):
+            # Running reconciles sharing *condition* with the candidate job's deployment.
+            return (
+                select(func.count())
+                .select_from(running_job)
+                .join(running_deployment, running_deployment.id == running_job.deployment_id)
+                .join(running_template, running_template.id == running_deployment.desired_template_id)
+                .where(running_job.status == JOB_STATUS_RUNNING, condition)
+                .correlate(DeploymentORM, ProductTemplateVersionORM)
+                .scalar_subquery()
+            )
+
+        user_running = running_count(running_deployment.user_id == DeploymentORM.user_id)
+        stmt = (
+            select(job)
+            .join(DeploymentORM, DeploymentORM.id == job.deployment_id)
+            .join(ProductTemplateVersionORM, ProductTemplateVersionORM.id == DeploymentORM.desired_template_id)
+            .where(
+                job.status == JOB_STATUS_QUEUED,
+                job.stage == JOB_STAGE_RECONCILE,
+                job.run_after <= now,
+                job.cluster.is_(None) if cluster is None else job.cluster == cluster,
+            )
+            .order_by(user_running, job.run_after, job.id)
+            .limit(1)
+        )
+        if reason is not None:
+            stmt = stmt.where(job.reason == reason)
+        if settings.job_max_running_per_user is not None:
+            stmt = stmt.where(user_running < settings.job_max_running_per_user)
+        if settings.job_max_running_per_product is not None:
+            product_running = running_count(running_template.product_id == ProductTemplateVersionORM.product_id)
+            stmt = stmt.where(product_running < settings.job_max_running_per_product)
+        return stmt
+
+    def _claim_next_job_postgres(
+        self, *, worker_id: str, cluster: str | None, reason: str | None
+    ) -> DeploymentReconcileJobORM | None:
         """Claim the next runnable job using Postgres row locking with SKIP LOCKED."""
         now = datetime.now(UTC)
+        settings = get_settings()
+        if settings.job_max_running_per_user is not None or settings.job_max_running_per_product is not None:
+            # SKIP LOCKED alone would let two workers both see a user one below
+            # the cap and both claim; with caps, claims take turns instead
+            # (the lock is held for this one short transaction).
+            self._session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _CLAIM_LOCK_KEY})
         # TODO: Write a more sophisticated query that groups by deployment_id, selects the deployment that has the
         #  oldest open job and then selects all live jobs for that deployment ordered by run_after, immediately marks
         #  all but the newest jobs as done, and then returns that newest job. This automatically eliminates redundant
         #  pending jobs that have already been superseded by a newer job.
-        stmt = (
-            select(DeploymentReconcileJobORM)
-            .where(
-                DeploymentReconcileJobORM.status == JOB_STATUS_QUEUED,
-                DeploymentReconcileJobORM.run_after <= now,
-            )
-            .order_by(DeploymentReconcileJobORM.run_after, DeploymentReconcileJobORM.id)
-            .with_for_update(skip_locked=True)
-            .limit(1)
+        stmt = self._next_runnable_job(now=now, cluster=cluster, reason=reason).with_for_update(
+            skip_locked=True, of=DeploymentReconcileJobORM
         )
         job = self._session.exec(stmt).first()
         if job is None:
             # logger.debug("No runnable reconcile job available for worker_id=%s", worker_id)
+            self._session.commit()
             return None
         job.status = JOB_STATUS_RUNNING
         job.locked_by = worker_id
@@ -103,43 +169,32 @@ class JobService:
         self._session.commit()
         self._session.refresh(job)
         logger.info(
-            "Claimed reconcile job id=%s deployment_id=%s worker_id=%s (postgres)",
+            "Claimed reconcile job id=%s deployment_id=%s worker_id=%s cluster=%s (postgres)",
             job.id,
             job.deployment_id,
             worker_id,
+            cluster,
         )
         return job
 
-    def _claim_next_job_sqlite(self, *, worker_id: str) -> DeploymentReconcileJobORM | None:
+    def _claim_next_job_sqlite(
+        self, *, worker_id: str, cluster: str | None, reason: str | None
+    ) -> DeploymentReconcileJobORM | None:
         """Claim the next runnable job atomically using SQLite UPDATE ... RETURNING fallback."""
         now = datetime.now(UTC)
-        stmt = text(
-            """
-            UPDATE deployment_reconcile_job
-            SET status = :running_status,
-                locked_by = :worker_id,
-                locked_at = :now_ts,
-                updated_at = :now_ts
-            WHERE id = (
-                SELECT id
-                FROM deployment_reconcile_job
-                WHERE status = :queued_status
-                  AND run_after <= :now_ts
-                ORDER BY run_after, id
-                LIMIT 1
+        table = DeploymentReconcileJobORM.__table__
+        stmt = (
+            sa_update(table)
+            .where(
+                table.c.id
+                == self._next_runnable_job(now=now, cluster=cluster, reason=reason)
+                .with_only_columns(DeploymentReconcileJobORM.id)
+                .scalar_subquery()
             )
-            RETURNING id
-            """
+            .values(status=JOB_STATUS_RUNNING, locked_by=worker_id, locked_at=now, updated_at=now)
+            .returning(table.c.id)
         )
-        row = self._session.execute(
-            stmt,
-            {
-                "running_status": JOB_STATUS_RUNNING,
-                "queued_status": JOB_STATUS_QUEUED,
-                "worker_id": worker_id,
-                "now_ts": now,
-            },
-        ).first()
+        row = self._session.execute(stmt).first()
         if row is None:
             self._session.commit()
             # logger.debug("No runnable reconcile job available for worker_id=%s", worker_id)
@@ -149,19 +204,27 @@ class JobService:
         job = self._session.get(DeploymentReconcileJobORM, job_id)
         if job is not None:
             logger.info(
-                "Claimed reconcile job id=%s deployment_id=%s worker_id=%s (sqlite)",
+                "Claimed reconcile job id=%s deployment_id=%s worker_id=%s cluster=%s (sqlite)",
                 job.id,
                 job.deployment_id,
                 worker_id,
+                cluster,
             )
         return job
 
-    def claim_next_job(self, *, worker_id: str) -> DeploymentReconcileJobORM | None:
-        """Claim one runnable job for a worker, using a dialect-appropriate strategy."""
+    def claim_next_job(
+        self, *, worker_id: str, cluster: str | None = None, reason: str | None = None
+    ) -> DeploymentReconcileJobORM | None:
+        """Claim one runnable job for a worker, using a dialect-appropriate strategy.
+
+        Only jobs of *cluster* are claimed; with None, only jobs of unplaced
+        deployments (single-cluster mode). With *reason*, only jobs for that
+        reason (e.g. ``delete`` for ``caelus purge``).
+        """
         dialect_name = self._session.get_bind().dialect.name
         if dialect_name == "sqlite":
-            return self._claim_next_job_sqlite(worker_id=worker_id)
-        return self._claim_next_job_postgres(worker_id=worker_id)
+            return self._claim_next_job_sqlite(worker_id=worker_id, cluster=cluster, reason=reason)
+        return self._claim_next_job_postgres(worker_id=worker_id, cluster=cluster, reason=reason)
 
     def mark_job_done(self, *, job_id: int) -> DeploymentReconcileJobORM:
         """Mark a claimed job as done and clear lock/error state."""
@@ -196,6 +259,104 @@ class JobService:
         logger.warning("Marked reconcile job id=%s as failed: %s", job_id, error)
         return job
 
+    def await_ready(self, *, job_id: int, deadline: datetime) -> DeploymentReconcileJobORM:
+        """Hand a claimed job whose release is installed over to the rollout poller.
+
+        The job stays open (queued, stage ``await_ready``) so no other job
+        can start for the deployment until the rollout is settled.
+        """
+        job = self._session.get(DeploymentReconcileJobORM, job_id)
+        if job is None:
+            raise NotFoundException("Job not found")
+        now = datetime.now(UTC)
+        job.stage = JOB_STAGE_AWAIT_READY
+        job.status = JOB_STATUS_QUEUED
+        job.deadline = deadline
+        job.run_after = now + timedelta(seconds=get_settings().rollout_poll_seconds)
+        job.locked_by = None
+        job.locked_at = None
+        job.updated_at = now
+        self._session.add(job)
+        self._session.commit()
+        self._session.refresh(job)
+        logger.info("Reconcile job id=%s is awaiting rollout until %s", job_id, deadline)
+        return job
+
+    def claim_awaiting_jobs(
+        self,
+        *,
+        worker_id: str,
+        cluster: str | None = None,
+        limit: int = 200,
+        due_before: datetime | None = None,
+    ) -> list[DeploymentReconcileJobORM]:
+        """Claim up to *limit* ``await_ready`` jobs (of *cluster*) in one statement.
+
+        Only jobs due by *due_before* (default: now) are claimed.
+        """
+        now = datetime.now(UTC)
+        job = DeploymentReconcileJobORM
+        due = (
+            select(job.id)
+            .where(
+                job.status == JOB_STATUS_QUEUED,
+                job.stage == JOB_STAGE_AWAIT_READY,
+                job.run_after <= (due_before or now),
+                job.cluster.is_(None) if cluster is None else job.cluster == cluster,
+            )
+            .order_by(job.run_after, job.id)
+            .limit(limit)
+        )
+        if self._session.get_bind().dialect.name != "sqlite":
+            due = due.with_for_update(skip_locked=True)
+        table = job.__table__
+        ids = [
+            row[0]
+            for row in self._session.execute(
+                sa_update(table)
+                .where(table.c.id.in_(due.scalar_subquery()))
+                .values(status=JOB_STATUS_RUNNING, locked_by=worker_id, locked_at=now, updated_at=now)
+                .returning(table.c.id)
+            ).all()
+        ]
+        self._session.commit()
+        if not ids:
+            return []
+        claimed = list(
+            self._session.exec(
+                select(job).where(job.id.in_(ids)).order_by(job.id).execution_options(populate_existing=True)
+            ).all()
+        )
+        logger.info("Claimed %d awaiting rollout job(s) worker_id=%s cluster=%s", len(claimed), worker_id, cluster)
+        return claimed
+
+    def settle_awaiting_jobs(
+        self, *, done: list[int], failed: dict[int, str], waiting: list[int]
+    ) -> None:
+        """Record a rollout poll in the current transaction (no commit).
+
+        *done* and *failed* jobs are finished; *waiting* ones are queued for
+        the next poll.
+        """
+        now = datetime.now(UTC)
+        table = DeploymentReconcileJobORM.__table__
+        unlocked = dict(locked_by=None, locked_at=None, updated_at=now)
+        if done:
+            self._session.execute(
+                sa_update(table).where(table.c.id.in_(done)).values(status=JOB_STATUS_DONE, last_error=None, **unlocked)
+            )
+        for job_id, error in failed.items():
+            self._session.execute(
+                sa_update(table).where(table.c.id == job_id).values(status=JOB_STATUS_FAILED, last_error=error, **unlocked)
+            )
+        if waiting:
+            run_after = now + timedelta(seconds=get_settings().rollout_poll_seconds)
+            self._session.execute(
+                sa_update(table)
+                .where(table.c.id.in_(waiting))
+                .values(status=JOB_STATUS_QUEUED, run_after=run_after, **unlocked)
+            )
+
     def dedupe_open_jobs(self, *, deployment_id: UUID) -> int:
         """Remove duplicate open jobs for a deployment, keeping the earliest one."""
         jobs = list(
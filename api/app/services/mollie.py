@@ -1,7 +1,13 @@
 import json
 import logging
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Protocol
+from datetime import UTC, datetime
+from typing import Any, Callable, Iterator, Protocol
+
+import httpx
 
 from mollie import (
     Amount,
@@ -22,6 +28,19 @@ def _nullable(value: Any) -> Any:
     return None if isinstance(value, Unset) else value
 
 
+def _payment_info(response: Any) -> "PaymentInfo":
+    payload = response.model_dump(mode="json", by_alias=True)
+    return PaymentInfo(
+        status=response.status.value,
+        metadata=payload.get("metadata"),
+        mandate_id=_nullable(response.mandate_id),
+        subscription_id=_nullable(response.subscription_id),
+        payload=payload,
+        payment_id=response.id,
+        created_at=datetime.fromisoformat(response.created_at),
+    )
+
+
 def cents_to_amount(cents: int) -> Amount:
     """Convert euro cents to Mollie Amount.
 
@@ -52,6 +71,16 @@ class PaymentInfo:
     mandate_id: str | None
     subscription_id: str | None
     payload: dict[str, Any]
+    # Filled in by list_payments (and get_payment on the real provider).
+    payment_id: str | None = None
+    created_at: datetime | None = None
+
+
+@dataclass
+class SubscriptionInfo:
+    subscription_id: str
+    customer_id: str
+    status: str
 
 
 # ---------------------------------------------------------------------------
@@ -76,7 +105,9 @@ class PaymentProvider(Protocol):
         idempotency_key: str | None = None,
     ) -> FirstPaymentResult: ...
 
-    def get_payment(self, payment_id: str) -> PaymentInfo: ...
+    def get_payment(self, payment_id: str, *, fresh: bool = False) -> PaymentInfo:
+        """Current state of a payment; ``fresh`` bypasses any client-side cache."""
+        ...
 
     def create_subscription(
         self,
@@ -94,6 +125,53 @@ class PaymentProvider(Protocol):
 
     def cancel_subscription(self, customer_id: str, subscription_id: str) -> None: ...
 
+    def list_payments(self, *, since: datetime) -> Iterator[PaymentInfo]:
+        """Payments created at or after *since*, newest first, fetched page by page."""
+        ...
+
+    def list_subscriptions(self) -> Iterator[SubscriptionInfo]:
+        """All subscriptions of all customers, fetched page by page."""
+        ...
+
+
+# ---------------------------------------------------------------------------
+# Rate limiting
+# ---------------------------------------------------------------------------
+
+
+class TokenBucket:
+    """Thread-safe token bucket: *rate* tokens per second, at most *burst* banked."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available; returns the time waited."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            # Reserve the token now (possibly going negative) so concurrent
+            # callers queue up behind each other instead of all waking at once.
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
 
 # ---------------------------------------------------------------------------
 # Real implementation
@@ -101,14 +179,70 @@ class PaymentProvider(Protocol):
 
 
 class MolliePaymentProvider(PaymentProvider):
-    """Payment provider backed by the Mollie API via mollie-api-py SDK."""
+    """Payment provider backed by the Mollie API via mollie-api-py SDK.
+
+    Meant to be shared process-wide (see ``app.deps.get_payment_provider``):
+    it holds a pooled keep-alive HTTP client, an optional client-side rate
+    limiter, and a short-TTL cache of payment lookups.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        server_url: str | None = None,
+        rate_limiter: TokenBucket | None = None,
+        payment_cache_ttl: float = 0.0,
+        payment_cache_size: int = 1024,
+        max_connections: int = 10,
+        timeout: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._http = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+        self._client = ClientSDK(
+            security=Security(api_key=api_key),
+            server_url=server_url,
+            client=self._http,
+            debug_logger=logging.getLogger("mollie"),
+        )
+        self._rate_limiter = rate_limiter
+        self._payment_cache_ttl = payment_cache_ttl
+        self._payment_cache_size = payment_cache_size
+        self._clock = clock
+        # payment_id -> (expires_at, PaymentInfo)
+        self._payment_cache: OrderedDict[str, tuple[float, PaymentInfo]] = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, api_key: str, settings) -> "MolliePaymentProvider":
+        limiter = None
+        if settings.mollie_rate_limit_per_second > 0:
+            limiter = TokenBucket(settings.mollie_rate_limit_per_second, settings.mollie_rate_limit_burst)
+        return cls(
+            api_key,
+            server_url=settings.mollie_api_url,
+            rate_limiter=limiter,
+            payment_cache_ttl=settings.mollie_payment_cache_ttl_seconds,
+            max_connections=settings.mollie_max_connections,
+            timeout=settings.mollie_timeout_seconds,
+        )
 
-    def __init__(self, api_key: str) -> None:
-        self._client = ClientSDK(security=Security(api_key=api_key), debug_logger=logging.getLogger("mollie"))
+    def close(self) -> None:
+        self._http.close()
+
+    def _throttle(self, operation: str) -> None:
+        if self._rate_limiter is not None:
+            waited = self._rate_limiter.acquire()
+            if waited > 0.5:
+                logger.warning("Mollie rate limiter delayed %s by %.2fs", operation, waited)
 
     def ensure_customer(
         self, email: str, name: str | None = None, *, idempotency_key: str | None = None,
     ) -> str:
+        self._throttle("customers.create")
         response = self._client.customers.create(
             entity_customer=EntityCustomer(email=email, name=name),
             idempotency_key=idempotency_key,
@@ -126,6 +260,7 @@ class MolliePaymentProvider(PaymentProvider):
         *,
         idempotency_key: str | None = None,
     ) -> FirstPaymentResult:
+        self._throttle("payments.create")
         response = self._client.payments.create(
             idempotency_key=idempotency_key,
             payment_request=PaymentRequest(
@@ -145,18 +280,41 @@ class MolliePaymentProvider(PaymentProvider):
             payload=response.model_dump(mode="json", by_alias=True),
         )
 
-    def get_payment(self, payment_id: str) -> PaymentInfo:
-        response = self._client.payments.get(payment_id=payment_id)
-        payload = response.model_dump(mode="json", by_alias=True)
-        logger.info(f"Pulled payment info from Mollie for id={payment_id}:\n{json.dumps(payload, indent=2)}")
+    def get_payment(self, payment_id: str, *, fresh: bool = False) -> PaymentInfo:
+        if not fresh and (cached := self._cached_payment(payment_id)) is not None:
+            return cached
 
-        return PaymentInfo(
-            status=response.status.value,
-            metadata=payload.get("metadata"),
-            mandate_id=_nullable(response.mandate_id),
-            subscription_id=_nullable(response.subscription_id),
-            payload=payload,
+        self._throttle("payments.get")
+        info = _payment_info(self._client.payments.get(payment_id=payment_id))
+        payload = info.payload
+        logger.info(
+            "Fetched Mollie payment id=%s status=%s mandate_id=%s subscription_id=%s",
+            payment_id, info.status, info.mandate_id, info.subscription_id,
         )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Mollie payment id=%s payload=%s", payment_id, json.dumps(payload, separators=(",", ":")))
+        self._cache_payment(payment_id, info)
+        return info
+
+    def _cached_payment(self, payment_id: str) -> PaymentInfo | None:
+        with self._cache_lock:
+            entry = self._payment_cache.get(payment_id)
+            if entry is None:
+                return None
+            if entry[0] <= self._clock():
+                del self._payment_cache[payment_id]
+                return None
+            self._payment_cache.move_to_end(payment_id)
+            return entry[1]
+
+    def _cache_payment(self, payment_id: str, info: PaymentInfo) -> None:
+        if self._payment_cache_ttl <= 0:
+            return
+        with self._cache_lock:
+            self._payment_cache[payment_id] = (self._clock() + self._payment_cache_ttl, info)
+            self._payment_cache.move_to_end(payment_id)
+            while len(self._payment_cache) > self._payment_cache_size:
+                self._payment_cache.popitem(last=False)
 
     def create_subscription(
         self,
@@ -171,6 +329,7 @@ class MolliePaymentProvider(PaymentProvider):
         *,
         idempotency_key: str | None = None,
     ) -> str:
+        self._throttle("subscriptions.create")
         response = self._client.subscriptions.create(
             customer_id=customer_id,
             idempotency_key=idempotency_key,
@@ -187,11 +346,45 @@ class MolliePaymentProvider(PaymentProvider):
         return response.id
 
     def cancel_subscription(self, customer_id: str, subscription_id: str) -> None:
+        self._throttle("subscriptions.cancel")
         self._client.subscriptions.cancel(
             customer_id=customer_id,
             subscription_id=subscription_id,
         )
 
+    def list_payments(self, *, since: datetime, page_size: int = 250) -> Iterator[PaymentInfo]:
+        self._throttle("payments.list")
+        page = self._client.payments.list(limit=page_size)
+        fetched = 0
+        while page is not None:
+            for response in page.result.embedded.payments or ():
+                info = _payment_info(response)
+                if info.created_at is not None and info.created_at < since:
+                    logger.info("Listed %d Mollie payment(s) since %s", fetched, since.isoformat())
+                    return
+                fetched += 1
+                yield info
+            if page.result.links.next is None:
+                break
+            self._throttle("payments.list")
+            page = page.next()
+        logger.info("Listed %d Mollie payment(s) since %s", fetched, since.isoformat())
+
+    def list_subscriptions(self, *, page_size: int = 250) -> Iterator[SubscriptionInfo]:
+        self._throttle("subscriptions.all")
+        page = self._client.subscriptions.all(limit=page_size)
+        while page is not None:
+            for response in page.result.embedded.subscriptions or ():
+                yield SubscriptionInfo(
+                    subscription_id=response.id,
+                    customer_id=response.customer_id,
+                    status=response.status.value,
+                )
+            if page.result.links.next is None:
+                break
+            self._throttle("subscriptions.all")
+            page = page.next()
+
 
 # ---------------------------------------------------------------------------
 # Fake implementation (for tests)
@@ -248,7 +441,7 @@ class FakePaymentProvider(PaymentProvider):
             payload=self.payments[payment_id],
         )
 
-    def get_payment(self, payment_id: str) -> PaymentInfo:
+    def get_payment(self, payment_id: str, *, fresh: bool = False) -> PaymentInfo:
         payment = self.payments[payment_id]
         return PaymentInfo(
             status=self._next_payment_status,
@@ -288,6 +481,32 @@ class FakePaymentProvider(PaymentProvider):
         if subscription_id in self.subscriptions:
             self.subscriptions[subscription_id]["status"] = "canceled"
 
+    def list_payments(self, *, since: datetime) -> Iterator[PaymentInfo]:
+        now = datetime.now(UTC)
+        # Newest first, like the Mollie API.
+        newest_first = sorted(
+            reversed(list(self.payments.items())), key=lambda item: item[1].get("created_at") or now, reverse=True
+        )
+        for payment_id, payment in newest_first:
+            created_at = payment.get("created_at") or now
+            if created_at < since:
+                return
+            yield PaymentInfo(
+                status=payment["status"],
+                metadata=payment["metadata"],
+                mandate_id=payment.get("mandate_id"),
+                subscription_id=payment.get("subscription_id"),
+                payload={"id": payment_id, **{k: v for k, v in payment.items() if k != "created_at"}},
+                payment_id=payment_id,
+                created_at=created_at,
+            )
+
+    def list_subscriptions(self) -> Iterator[SubscriptionInfo]:
+        for sub_id, sub in self.subscriptions.items():
+            yield SubscriptionInfo(
+                subscription_id=sub_id, customer_id=sub["customer_id"], status=sub.get("status", "active")
+            )
+
     def simulate_paid(self, payment_id: str) -> None:
         """Helper: simulate a successful payment for webhook tests."""
         if payment_id in self.payments:
@@ -0,0 +1,172 @@
+"""Warm pool of pre-created namespaces for new deployments.
+
+Creating the namespace is the first thing the reconciler does for a new
+deployment, before Helm starts. With ``CAELUS_NAMESPACE_POOL_SIZE`` set,
+:func:`refill_pool` (run by the ``caelus worker`` settle process) keeps that
+many namespaces per cluster created ahead of time, and
+:func:`claim_namespace` hands one to :func:`app.services.deployments.create_deployment`
+in the deployment's own transaction. A pool namespace is named by
+:func:`~app.services.reconcile_naming.generate_deployment_namespace` rules
+but with a neutral base instead of the (not yet known) user's email.
+
+When the pool is empty the deployment gets a fresh per-user namespace as
+before. :func:`pool_stats` reports the pool's size and hit rate.
+"""
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+import logging
+from uuid import UUID
+
+from sqlalchemy import func, insert, text, update
+from sqlmodel import Session, select
+
+from app.config import get_settings
+from app.models import DeploymentORM, NamespacePoolORM, NamespacePoolStats
+from app.provisioner import Provisioner, provisioner as default_provisioner
+from app.services.reconcile_naming import generate_deployment_namespace
+
+logger = logging.getLogger(__name__)
+
+POOL_STATUS_WARMING = "warming"
+POOL_STATUS_READY = "ready"
+POOL_STATUS_CLAIMED = "claimed"
+
+POOL_NAMESPACE_BASE = "tenant"
+
+# A refill that died between inserting a row and creating its namespace
+# leaves it warming; the next refill after this long creates it again.
+_STALE_WARMING = timedelta(minutes=5)
+# Arbitrary constant identifying the refill advisory lock on Postgres, so
+# worker pools of the same cluster do not overfill its pool.
+_REFILL_LOCK_KEY = 0x63_61_65_6C_70_6F_6F_6C  # "caelpool"
+
+
+def _in_cluster(cluster: str | None):
+    return NamespacePoolORM.cluster.is_(None) if cluster is None else NamespacePoolORM.cluster == cluster
+
+
+def claim_namespace(session: Session, *, deployment_id: UUID, cluster: str | None) -> str | None:
+    """Take a ready namespace of *cluster* for *deployment_id* in the current transaction (no commit).
+
+    Returns its name, or None when the pool is empty or disabled.
+    """
+    if get_settings().namespace_pool_size <= 0:
+        return None
+    table = NamespacePoolORM.__table__
+    candidate = (
+        select(NamespacePoolORM.id)
+        .where(NamespacePoolORM.status == POOL_STATUS_READY, _in_cluster(cluster))
+        .order_by(NamespacePoolORM.id)
+        .limit(1)
+    )
+    if session.get_bind().dialect.name != "sqlite":
+        candidate = candidate.with_for_update(skip_locked=True)
+    row = session.execute(
+        update(table)
+        .where(table.c.id == candidate.scalar_subquery())
+        .values(status=POOL_STATUS_CLAIMED, deployment_id=deployment_id, claimed_at=datetime.now(UTC))
+        .returning(table.c.name)
+    ).first()
+    if row is None:
+        logger.info("Namespace pool of cluster=%s is empty for deployment_id=%s", cluster, deployment_id)
+        return None
+    logger.info("Claimed warm namespace %s for deployment_id=%s", row[0], deployment_id)
+    return row[0]
+
+
+def refill_pool(
+    session: Session, *, cluster: str | None = None, provisioner: Provisioner | None = None
+) -> int:
+    """Top the pool of *cluster* up to ``CAELUS_NAMESPACE_POOL_SIZE`` namespaces.
+
+    The rows are reserved in one short transaction, then the namespaces are
+    created and marked ready one by one. A namespace that cannot be created
+    is dropped from the pool and replaced on the next refill. Returns how
+    many namespaces were created.
+    """
+    size = get_settings().namespace_pool_size
+    if size <= 0:
+        return 0
+    provisioner = provisioner or default_provisioner
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _REFILL_LOCK_KEY})
+    now = datetime.now(UTC)
+    pooled = session.exec(
+        select(func.count())
+        .select_from(NamespacePoolORM)
+        .where(NamespacePoolORM.status.in_([POOL_STATUS_WARMING, POOL_STATUS_READY]), _in_cluster(cluster))
+    ).one()
+    names = [generate_deployment_namespace(POOL_NAMESPACE_BASE) for _ in range(max(size - pooled, 0))]
+    if names:
+        session.execute(
+            insert(NamespacePoolORM.__table__),
+            [dict(name=name, cluster=cluster, status=POOL_STATUS_WARMING, created_at=now) for name in names],
+        )
+    names += session.exec(
+        select(NamespacePoolORM.name).where(
+            NamespacePoolORM.status == POOL_STATUS_WARMING,
+            NamespacePoolORM.created_at < now - _STALE_WARMING,
+            _in_cluster(cluster),
+        )
+    ).all()
+    session.commit()
+
+    table = NamespacePoolORM.__table__
+    created = 0
+    for name in names:
+        try:
+            provisioner.ensure_namespace(name=name)
+        except Exception:
+            logger.exception("Creating warm namespace %s failed", name)
+            session.execute(table.delete().where(table.c.name == name, table.c.status == POOL_STATUS_WARMING))
+        else:
+            session.execute(
+                update(table)
+                .where(table.c.name == name, table.c.status == POOL_STATUS_WARMING)
+                .values(status=POOL_STATUS_READY)
+            )
+            created += 1
+        session.commit()
+    if names:
+        logger.info("Refilled namespace pool of cluster=%s: created=%d of %d", cluster, created, len(names))
+    return created
+
+
+def pool_stats(session: Session, *, cluster: str | None = None, window: timedelta) -> NamespacePoolStats:
+    """Size of the pool of *cluster*, and how many deployments created within *window* got a warm namespace."""
+    since = datetime.now(UTC) - window
+    counts = dict(
+        session.exec(
+            select(NamespacePoolORM.status, func.count())
+            .where(_in_cluster(cluster))
+            .group_by(NamespacePoolORM.status)
+        ).all()
+    )
+    hits = session.exec(
+        select(func.count())
+        .select_from(NamespacePoolORM)
+        .where(
+            NamespacePoolORM.status == POOL_STATUS_CLAIMED,
+            NamespacePoolORM.claimed_at >= since,
+            _in_cluster(cluster),
+        )
+    ).one()
+    created = session.exec(
+        select(func.count())
+        .select_from(DeploymentORM)
+        .where(
+            DeploymentORM.created_at >= since,
+            DeploymentORM.cluster.is_(None) if cluster is None else DeploymentORM.cluster == cluster,
+        )
+    ).one()
+    return NamespacePoolStats(
+        cluster=cluster,
+        target_size=get_settings().namespace_pool_size,
+        ready=counts.get(POOL_STATUS_READY, 0),
+        warming=counts.get(POOL_STATUS_WARMING, 0),
+        window_seconds=window.total_seconds(),
+        created_recently=created,
+        hits_recently=hits,
+        hit_rate=hits / created if created else None,
+    )
@@ -0,0 +1,284 @@
+"""Transactional outbox for external side effects.
+
+Services write an :class:`~app.models.OutboxORM` row (:func:`enqueue`) in the
+same transaction as the change that causes the side effect. Once that
+transaction has committed, the row is delivered by :func:`dispatch_one` (from
+the request that wrote it) or :func:`dispatch_batch` (from ``caelus worker``).
+Delivery never holds a database transaction open across the third-party call:
+rows are claimed and committed first, the handler runs, and the outcome is
+recorded in a new transaction.
+
+Handlers receive the row's key, which they pass on as the idempotency key, so
+a row delivered twice (a lost lease, a retry after a timeout) has the same
+effect as delivering it once.
+
+Dispatch scales independently of the API: any number of ``caelus worker`` or
+``caelus dispatch-outbox`` processes claim disjoint batches. Backlog, retries
+and delivery latency are reported by :func:`outbox_stats`.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+import logging
+from typing import Any, Callable
+
+from sqlalchemy import func, or_, update
+from sqlmodel import Session, select
+
+from app.config import CaelusSettings, get_settings
+from app.models import OutboxKindStats, OutboxORM, OutboxStats
+from app.services.mollie import PaymentProvider
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_STATUS_QUEUED = "queued"
+OUTBOX_STATUS_RUNNING = "running"
+OUTBOX_STATUS_DONE = "done"
+OUTBOX_STATUS_FAILED = "failed"
+
+_MAX_RETRY_DELAY = timedelta(hours=1)
+_OPEN_STATUSES = (OUTBOX_STATUS_QUEUED, OUTBOX_STATUS_RUNNING)
+
+Handler = Callable[[Session, PaymentProvider, str, dict[str, Any]], None]
+
+
+@dataclass(frozen=True)
+class OutboxResult:
+    id: int
+    kind: str
+    key: str
+    status: str
+    error: str | None = None
+
+
+@dataclass(frozen=True)
+class _Claimed:
+    id: int
+    kind: str
+    key: str
+    payload: dict[str, Any]
+    attempts: int
+    created_at: datetime
+
+
+def _handlers() -> dict[str, Handler]:
+    from app.services import checkout, payment_webhooks, subscriptions
+
+    return {
+        checkout.FIRST_PAYMENT_KIND: checkout.deliver_first_payment,
+        payment_webhooks.CREATE_SUBSCRIPTION_KIND: payment_webhooks.deliver_create_subscription,
+        subscriptions.CANCEL_SUBSCRIPTION_KIND: subscriptions.deliver_cancel_subscription,
+    }
+
+
+def enqueue(session: Session, *, kind: str, key: str, payload: dict[str, Any]) -> OutboxORM:
+    """Record a side effect to deliver once the current transaction commits (no commit).
+
+    A row with the same key that was already delivered (or given up on) is
+    queued again: handlers check whether their effect is still needed.
+    """
+    row = session.exec(select(OutboxORM).where(OutboxORM.key == key)).one_or_none()
+    if row is None:
+        row = OutboxORM(kind=kind, key=key, payload=payload)
+        session.add(row)
+    elif row.status not in _OPEN_STATUSES:
+        row.status = OUTBOX_STATUS_QUEUED
+        row.payload = payload
+        row.run_after = datetime.now(UTC)
+        row.attempts = 0
+        row.last_error = None
+    return row
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes for columns written as UTC.
+    return value if value.tzinfo else value.replace(tzinfo=UTC)
+
+
+def _claim(
+    session: Session, *, worker_id: str, limit: int, lease: timedelta, row_id: int | None = None
+) -> list[_Claimed]:
+    now = datetime.now(UTC)
+    stmt = (
+        select(OutboxORM)
+        .where(
+            or_(
+                (OutboxORM.status == OUTBOX_STATUS_QUEUED) & (OutboxORM.run_after <= now),
+                (OutboxORM.status == OUTBOX_STATUS_RUNNING) & (OutboxORM.locked_at < now - lease),
+            )
+        )
+        .order_by(OutboxORM.run_after, OutboxORM.id)
+        .with_for_update(skip_locked=True)
+        .limit(limit)
+    )
+    if row_id is not None:
+        stmt = stmt.where(OutboxORM.id == row_id)
+    claimed = []
+    for row in session.exec(stmt).all():
+        row.status = OUTBOX_STATUS_RUNNING
+        row.locked_by = worker_id
+        row.locked_at = now
+        row.attempts += 1
+        claimed.append(
+            _Claimed(
+                id=row.id,
+                kind=row.kind,
+                key=row.key,
+                payload=dict(row.payload),
+                attempts=row.attempts,
+                created_at=_aware(row.created_at),
+            )
+        )
+    # Commit the claim before any handler runs: nothing stays locked during delivery.
+    session.commit()
+    return claimed
+
+
+def _mark_done(session: Session, claimed: _Claimed) -> None:
+    now = datetime.now(UTC)
+    session.execute(
+        update(OutboxORM)
+        .where(OutboxORM.id == claimed.id)
+        .values(
+            status=OUTBOX_STATUS_DONE,
+            processed_at=now,
+            locked_by=None,
+            locked_at=None,
+            last_error=None,
+        )
+    )
+    session.commit()
+
+
+def _mark_retry(session: Session, claimed: _Claimed, error: str, *, max_attempts: int) -> str:
+    row = session.get(OutboxORM, claimed.id)
+    session.refresh(row)
+    row.locked_by = None
+    row.locked_at = None
+    row.last_error = error
+    if row.attempts >= max_attempts:
+        row.status = OUTBOX_STATUS_FAILED
+        logger.error("Giving up on outbox %s key=%s after %d attempts: %s", claimed.kind, claimed.key, row.attempts, error)
+    else:
+        row.status = OUTBOX_STATUS_QUEUED
+        row.run_after = datetime.now(UTC) + min(timedelta(seconds=5 * 2 ** row.attempts), _MAX_RETRY_DELAY)
+        logger.warning("Outbox %s key=%s failed (attempt %d), retrying: %s", claimed.kind, claimed.key, row.attempts, error)
+    session.commit()
+    return row.status
+
+
+def _deliver(
+    session: Session, provider: PaymentProvider, claimed: _Claimed, settings: CaelusSettings
+) -> OutboxResult:
+    error: str | None = None
+    handler = _handlers().get(claimed.kind)
+    if handler is None:
+        error = f"Unknown outbox kind {claimed.kind!r}"
+    else:
+        try:
+            handler(session, provider, claimed.key, claimed.payload)
+            session.commit()
+        except Exception as exc:
+            logger.exception("Outbox delivery failed kind=%s key=%s", claimed.kind, claimed.key)
+            session.rollback()
+            error = str(exc) or type(exc).__name__
+    if error is None:
+        _mark_done(session, claimed)
+        status = OUTBOX_STATUS_DONE
+        logger.info(
+            "Delivered outbox %s key=%s attempts=%d latency=%.3fs",
+            claimed.kind,
+            claimed.key,
+            claimed.attempts,
+            (datetime.now(UTC) - claimed.created_at).total_seconds(),
+        )
+    else:
+        status = _mark_retry(session, claimed, error, max_attempts=settings.outbox_max_attempts)
+    return OutboxResult(id=claimed.id, kind=claimed.kind, key=claimed.key, status=status, error=error)
+
+
+def dispatch_one(
+    session: Session,
+    provider: PaymentProvider,
+    row_id: int,
+    *,
+    worker_id: str,
+    settings: CaelusSettings | None = None,
+) -> OutboxResult | None:
+    """Deliver one committed row now; ``None`` if it is not runnable (e.g. a worker has it)."""
+    settings = settings or get_settings()
+    claimed = _claim(
+        session,
+        worker_id=worker_id,
+        limit=1,
+        lease=timedelta(seconds=settings.outbox_lease_seconds),
+        row_id=row_id,
+    )
+    if not claimed:
+        return None
+    return _deliver(session, provider, claimed[0], settings)
+
+
+def dispatch_batch(
+    session: Session,
+    provider: PaymentProvider,
+    *,
+    worker_id: str,
+    settings: CaelusSettings | None = None,
+) -> list[OutboxResult]:
+    """Claim one batch of due rows and deliver them; returns one result per row."""
+    settings = settings or get_settings()
+    claimed = _claim(
+        session,
+        worker_id=worker_id,
+        limit=settings.outbox_batch_size,
+        lease=timedelta(seconds=settings.outbox_lease_seconds),
+    )
+    if claimed:
+        logger.info("Claimed %d outbox row(s) worker_id=%s", len(claimed), worker_id)
+    return [_deliver(session, provider, item, settings) for item in claimed]
+
+
+# ── Observability ─────────────────────────────────────────────────────
+
+
+def outbox_stats(session: Session, *, window: timedelta = timedelta(hours=1)) -> OutboxStats:
+    """Backlog, retries, failures and recent delivery latency per kind."""
+    now = datetime.now(UTC)
+    kinds: dict[str, OutboxKindStats] = {}
+
+    def entry(kind: str) -> OutboxKindStats:
+        return kinds.setdefault(kind, OutboxKindStats(kind=kind))
+
+    for kind, status, count, oldest in session.exec(
+        select(OutboxORM.kind, OutboxORM.status, func.count(), func.min(OutboxORM.created_at))
+        .group_by(OutboxORM.kind, OutboxORM.status)
+    ).all():
+        stats = entry(kind)
+        setattr(stats, status, count)
+        if status in _OPEN_STATUSES and oldest is not None:
+            age = (now - _aware(oldest)).total_seconds()
+            stats.oldest_open_age_seconds = max(stats.oldest_open_age_seconds or 0.0, age)
+
+    for kind, count in session.exec(
+        select(OutboxORM.kind, func.count())
+        .where(OutboxORM.status == OUTBOX_STATUS_QUEUED, OutboxORM.attempts > 0)
+        .group_by(OutboxORM.kind)
+    ).all():
+        entry(kind).retrying = count
+
+    latencies: dict[str, list[float]] = {}
+    for kind, created_at, processed_at in session.exec(
+        select(OutboxORM.kind, OutboxORM.created_at, OutboxORM.processed_at).where(
+            OutboxORM.status == OUTBOX_STATUS_DONE, OutboxORM.processed_at >= now - window
+        )
+    ).all():
+        latencies.setdefault(kind, []).append((_aware(processed_at) - _aware(created_at)).total_seconds())
+    for kind, values in latencies.items():
+        stats = entry(kind)
+        stats.delivered_recently = len(values)
+        stats.avg_latency_seconds = sum(values) / len(values)
+        stats.max_latency_seconds = max(values)
+
+    return OutboxStats(window_seconds=window.total_seconds(), kinds=sorted(kinds.values(), key=lambda k: k.kind))
@@ -0,0 +1,434 @@
+"""Queued processing of Mollie payment webhooks.
+
+The webhook endpoint only records the payment id in ``mollie_webhook_inbox``
+(:func:`record_webhook`) and returns 200 straight away. Workers then claim
+batches of inbox rows (:func:`process_inbox`), fetch the payments from Mollie
+with bounded concurrency, and apply them one by one.
+
+Each payment id has at most one inbox row, so a burst of retries from Mollie
+for the same payment is processed once. A webhook that arrives while its row
+is being processed sends the row back to the queue afterwards, so no status
+change is lost.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
+import logging
+import re
+from typing import Any
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import case, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.config import CaelusSettings, get_settings
+from app.models import (
+    MolliePaymentORM,
+    MolliePaymentStatus,
+    MollieWebhookInboxORM,
+    PaymentStatus,
+    SubscriptionORM,
+    SubscriptionStatus,
+)
+from app.models.billing import BillingInterval
+from app.services import outbox
+from app.services.jobs import JobService
+from app.services.mollie import PaymentInfo, PaymentProvider
+from app.services.reconcile_constants import (
+    DEPLOYMENT_STATUS_PENDING,
+    DEPLOYMENT_STATUS_PROVISIONING,
+    JOB_REASON_CREATE,
+)
+from app.util import amend_url
+
+logger = logging.getLogger(__name__)
+
+INBOX_STATUS_QUEUED = "queued"
+INBOX_STATUS_RUNNING = "running"
+INBOX_STATUS_DONE = "done"
+INBOX_STATUS_FAILED = "failed"
+
+_PAYMENT_ID_RE = re.compile(r"^tr_\w{1,64}$")
+_MAX_RETRY_DELAY = timedelta(hours=1)
+
+CREATE_SUBSCRIPTION_KIND = "mollie.create_subscription"
+
+TERMINAL_FAILURE_STATUSES = {"failed", "expired", "canceled"}
+
+BILLING_INTERVAL_TO_MOLLIE = {
+    BillingInterval.MONTHLY: "1 month",
+    BillingInterval.ANNUAL: "12 months",
+}
+
+BILLING_INTERVAL_MONTHS = {
+    BillingInterval.MONTHLY: 1,
+    BillingInterval.ANNUAL: 12,
+}
+
+
+@dataclass(frozen=True)
+class InboxResult:
+    mollie_payment_id: str
+    status: str
+    error: str | None = None
+
+
+# ── Inbox ─────────────────────────────────────────────────────────────
+
+
+def record_webhook(session: Session, payment_id: str) -> bool:
+    """Queue *payment_id* for processing; returns ``False`` for ids that are ignored.
+
+    Cheap by design: one indexed lookup and one write, no Mollie calls.
+    """
+    if not _PAYMENT_ID_RE.match(payment_id):
+        logger.warning("Ignoring Mollie webhook with malformed id=%r", payment_id[:80])
+        return False
+    # Two attempts: a concurrent webhook for the same id may insert first.
+    for _ in range(2):
+        now = datetime.now(UTC)
+        row = session.exec(
+            select(MollieWebhookInboxORM).where(MollieWebhookInboxORM.mollie_payment_id == payment_id)
+        ).one_or_none()
+        if row is None:
+            session.add(MollieWebhookInboxORM(mollie_payment_id=payment_id, received_at=now, run_after=now))
+        else:
+            row.received_at = now
+            if row.status in (INBOX_STATUS_DONE, INBOX_STATUS_FAILED):
+                row.status = INBOX_STATUS_QUEUED
+                row.run_after = now
+                row.attempts = 0
+                row.last_error = None
+        try:
+            session.commit()
+            return True
+        except IntegrityError:
+            session.rollback()
+    raise RuntimeError(f"Could not record Mollie webhook for id={payment_id}")
+
+
+@dataclass(frozen=True)
+class _Claimed:
+    id: int
+    mollie_payment_id: str
+    locked_at: datetime
+
+
+def claim_batch(session: Session, *, worker_id: str, limit: int, lease: timedelta) -> list[_Claimed]:
+    """Claim up to *limit* runnable inbox rows for *worker_id*.
+
+    Rows left running by a worker that died are reclaimed once their lease
+    has expired.
+    """
+    now = datetime.now(UTC)
+    rows = session.exec(
+        select(MollieWebhookInboxORM)
+        .where(
+            or_(
+                (MollieWebhookInboxORM.status == INBOX_STATUS_QUEUED)
+                & (MollieWebhookInboxORM.run_after <= now),
+                (MollieWebhookInboxORM.status == INBOX_STATUS_RUNNING)
+                & (MollieWebhookInboxORM.locked_at < now - lease),
+            )
+        )
+        .order_by(MollieWebhookInboxORM.run_after, MollieWebhookInboxORM.id)
+        .with_for_update(skip_locked=True)
+        .limit(limit)
+    ).all()
+    claimed = []
+    for row in rows:
+        row.status = INBOX_STATUS_RUNNING
+        row.locked_by = worker_id
+        row.locked_at = now
+        row.attempts += 1
+        claimed.append(_Claimed(id=row.id, mollie_payment_id=row.mollie_payment_id, locked_at=now))
+    session.commit()
+    if claimed:
+        logger.info("Claimed %d Mollie webhook(s) worker_id=%s", len(claimed), worker_id)
+    return claimed
+
+
+def _mark_done(session: Session, claimed: _Claimed) -> str:
+    now = datetime.now(UTC)
+    # Back to the queue if Mollie notified us again while we were working.
+    session.execute(
+        update(MollieWebhookInboxORM)
+        .where(MollieWebhookInboxORM.id == claimed.id)
+        .values(
+            status=case(
+                (MollieWebhookInboxORM.received_at > claimed.locked_at, INBOX_STATUS_QUEUED),
+                else_=INBOX_STATUS_DONE,
+            ),
+            attempts=case(
+                (MollieWebhookInboxORM.received_at > claimed.locked_at, 0),
+                else_=MollieWebhookInboxORM.attempts,
+            ),
+            run_after=now,
+            processed_at=now,
+            locked_by=None,
+            locked_at=None,
+            last_error=None,
+        )
+    )
+    session.commit()
+    row = session.get(MollieWebhookInboxORM, claimed.id)
+    session.refresh(row)
+    return row.status
+
+
+def _mark_retry(session: Session, claimed: _Claimed, error: str, *, max_attempts: int) -> str:
+    row = session.get(MollieWebhookInboxORM, claimed.id)
+    session.refresh(row)
+    now = datetime.now(UTC)
+    row.locked_by = None
+    row.locked_at = None
+    row.last_error = error
+    if row.attempts >= max_attempts:
+        row.status = INBOX_STATUS_FAILED
+        logger.error("Giving up on Mollie webhook id=%s after %d attempts: %s", claimed.mollie_payment_id, row.attempts, error)
+    else:
+        row.status = INBOX_STATUS_QUEUED
+        row.run_after = now + min(timedelta(seconds=5 * 2 ** row.attempts), _MAX_RETRY_DELAY)
+        logger.warning("Mollie webhook id=%s failed (attempt %d), retrying: %s", claimed.mollie_payment_id, row.attempts, error)
+    session.commit()
+    return row.status
+
+
+def _fetch_payments(
+    provider: PaymentProvider, payment_ids: list[str], *, concurrency: int
+) -> list[PaymentInfo | Exception]:
+    """Fetch payments from Mollie, at most *concurrency* requests at a time."""
+
+    def fetch(payment_id: str) -> PaymentInfo | Exception:
+        try:
+            # A webhook means the status changed: never answer from the cache.
+            return provider.get_payment(payment_id, fresh=True)
+        except Exception as exc:
+            logger.exception("Failed to fetch payment from Mollie id=%s", payment_id)
+            return exc
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(payment_ids)))) as pool:
+        return list(pool.map(fetch, payment_ids))
+
+
+def process_inbox(
+    session: Session,
+    provider: PaymentProvider,
+    *,
+    worker_id: str,
+    settings: CaelusSettings | None = None,
+) -> list[InboxResult]:
+    """Claim one batch of queued webhooks and apply them; returns one result per row."""
+    settings = settings or get_settings()
+    claimed = claim_batch(
+        session,
+        worker_id=worker_id,
+        limit=settings.mollie_webhook_batch_size,
+        lease=timedelta(seconds=settings.mollie_webhook_lease_seconds),
+    )
+    if not claimed:
+        return []
+
+    fetched = _fetch_payments(
+        provider, [c.mollie_payment_id for c in claimed], concurrency=settings.mollie_webhook_concurrency
+    )
+    results = []
+    for item, payment_info in zip(claimed, fetched):
+        error: str | None = None
+        if isinstance(payment_info, Exception):
+            error = f"Failed to fetch payment: {payment_info}"
+        else:
+            try:
+                apply_payment(session, item.mollie_payment_id, payment_info)
+                session.commit()
+            except Exception as exc:
+                logger.exception("Failed to apply Mollie payment id=%s", item.mollie_payment_id)
+                session.rollback()
+                error = str(exc) or type(exc).__name__
+        if error is None:
+            status = _mark_done(session, item)
+        else:
+            status = _mark_retry(session, item, error, max_attempts=settings.mollie_webhook_max_attempts)
+        results.append(InboxResult(mollie_payment_id=item.mollie_payment_id, status=status, error=error))
+    return results
+
+
+# ── Applying payments ─────────────────────────────────────────────────
+
+
+def apply_payment(session: Session, payment_id: str, payment_info: PaymentInfo) -> None:
+    """Apply the current state of a Mollie payment to its subscription (no commit).
+
+    Makes no Mollie calls: follow-up side effects are queued in the outbox.
+    """
+    # --- Lookup: find MolliePaymentORM and subscription ---
+    mollie_payment = session.exec(
+        select(MolliePaymentORM).where(MolliePaymentORM.mollie_payment_id == payment_id)
+    ).one_or_none()
+
+    if mollie_payment:
+        # Known payment (first payment created during deployment, or previously seen recurring)
+        sub = session.get(SubscriptionORM, mollie_payment.subscription_id)
+        logger.info(f"Found Caelus subscription ({sub.id}) for this payment ({payment_id}) -- must be a first payment")
+    elif payment_info.subscription_id:
+        # New recurring payment — look up by Mollie subscription ID
+        logger.info(f"This Mollie payment id is new to us (no known subscription) and hence must be recurring payment; "
+                    f"retrieve through 'mollie_subscription_id' ({payment_info.subscription_id}) subscription id={payment_info.subscription_id}")
+        sub = session.exec(
+            select(SubscriptionORM).where(
+                SubscriptionORM.mollie_subscription_id == payment_info.subscription_id
+            )
+        ).one_or_none()
+
+        if sub:
+            logger.info(f"Found Caelus subscription ({sub.id}) for this payment ({payment_id}) -- record the recurring payment")
+            mollie_payment = MolliePaymentORM(
+                subscription_id=sub.id,
+                mollie_payment_id=payment_id,
+                status=MolliePaymentStatus(payment_info.status),
+                sequence_type="recurring",
+                amount_cents=sub.plan_template.price_cents,
+            )
+            session.add(mollie_payment)
+        else:
+            logger.warning(f"No matching subscription found for Mollie subscription id={payment_info.subscription_id}")
+    else:
+        logger.warning(f"Unknow payment without Mollie 'subscription_id' reference -- ignoring")
+        sub = None
+
+    if not sub:
+        logger.warning("Webhook for unknown payment id=%s, no matching subscription", payment_id)
+        return
+
+    # Update payment record status and payload
+    if mollie_payment:
+        mollie_payment.status = MolliePaymentStatus(payment_info.status)
+        mollie_payment.payload = payment_info.payload
+
+    # --- Process based on payment type and status ---
+    is_first = mollie_payment is not None and mollie_payment.sequence_type == "first"
+    is_paid = payment_info.status == "paid"
+    is_failed = payment_info.status in TERMINAL_FAILURE_STATUSES
+
+    if is_first and is_paid:
+        _handle_first_payment_paid(session, sub, payment_info)
+    elif is_first and is_failed:
+        _handle_first_payment_failed(sub)
+    elif not is_first and is_paid:
+        _handle_recurring_payment_paid(sub)
+    elif not is_first and is_failed:
+        _handle_recurring_payment_failed(sub)
+    else:
+        logger.warning("Ignoring webhook for payment id=%s with status=%s", payment_id, payment_info.status)
+
+
+def apply_subscription_status(sub: SubscriptionORM, mollie_status: str) -> bool:
+    """Apply a Mollie subscription status to *sub* (no commit); returns whether it changed.
+
+    Mollie suspends a subscription when its mandate stops working, which is
+    treated like a failed recurring payment.
+    """
+    if mollie_status == "suspended" and sub.payment_status != PaymentStatus.ARREARS:
+        _handle_recurring_payment_failed(sub)
+        return True
+    return False
+
+
+def _handle_first_payment_paid(
+    session: Session,
+    sub: SubscriptionORM,
+    payment_info: PaymentInfo,
+) -> None:
+    """First payment succeeded: provision deployment, queue the recurring subscription."""
+    logger.info("First payment succeeded for subscription=%s", sub.id)
+    was_pending = sub.payment_status == PaymentStatus.PENDING
+
+    sub.payment_status = PaymentStatus.CURRENT
+    sub.mollie_mandate_id = payment_info.mandate_id
+
+    # Transition deployment(s) from pending → provisioning
+    for deployment in sub.deployments:
+        if deployment.status == DEPLOYMENT_STATUS_PENDING:
+            deployment.status = DEPLOYMENT_STATUS_PROVISIONING
+
+    # Only enqueue reconcile on pending → current transition (idempotency)
+    if was_pending:
+        session.flush()
+        for deployment in sub.deployments:
+            if deployment.status == DEPLOYMENT_STATUS_PROVISIONING:
+                JobService(session).enqueue_job(
+                    deployment_id=deployment.id, reason=JOB_REASON_CREATE,
+                )
+
+    # Create the Mollie recurring subscription after commit (skipped if it exists)
+    if not sub.mollie_subscription_id:
+        outbox.enqueue(
+            session,
+            kind=CREATE_SUBSCRIPTION_KIND,
+            key=f"subscription_{sub.id}",
+            payload={"subscription_id": sub.id, "mandate_id": payment_info.mandate_id},
+        )
+
+    logger.info(
+        "First payment paid: subscription_id=%s payment_status=current",
+        sub.id,
+    )
+
+
+def deliver_create_subscription(
+    session: Session, provider: PaymentProvider, key: str, payload: dict[str, Any]
+) -> None:
+    """Outbox handler: create the Mollie recurring subscription for a paid first payment."""
+    sub = session.get(SubscriptionORM, payload["subscription_id"])
+    if sub is None or sub.mollie_subscription_id or sub.status != SubscriptionStatus.ACTIVE:
+        return
+    settings = get_settings()
+    subscription_id = sub.id
+    customer_id = sub.user.mollie_customer_id
+    plan_template = sub.plan_template
+    amount_cents = plan_template.price_cents
+    interval_str = BILLING_INTERVAL_TO_MOLLIE[plan_template.billing_interval]
+    months = BILLING_INTERVAL_MONTHS[plan_template.billing_interval]
+    start = (date.today() + relativedelta(months=months)).isoformat()
+    description = sub.deployments[0].payment_description()
+    logger.info(f"Creating Mollie subscription for ongoing recurring payments of "
+                f"€{amount_cents/100}/{plan_template.billing_interval} according to plan "
+                f"{plan_template.plan.name} starting at {start}...")
+    # End the read transaction before calling Mollie.
+    session.commit()
+
+    mollie_sub_id = provider.create_subscription(
+        customer_id=customer_id,
+        mandate_id=payload["mandate_id"],
+        amount_cents=amount_cents,
+        interval=interval_str,
+        start_date=start,
+        description=description,
+        webhook_url=amend_url(settings.mollie_webhook_base_url, "webhooks/mollie"),
+        idempotency_key=key,
+    )
+    sub = session.get(SubscriptionORM, subscription_id)
+    sub.mollie_subscription_id = mollie_sub_id
+    logger.info(f"Created Mollie recurring payment subscription id={mollie_sub_id} for subscription id={subscription_id}")
+
+
+def _handle_first_payment_failed(sub: SubscriptionORM) -> None:
+    """First payment failed/expired/canceled: mark subscription as arrears."""
+    sub.payment_status = PaymentStatus.ARREARS
+    logger.info("First payment failed: subscription_id=%s payment_status=arrears", sub.id)
+
+
+def _handle_recurring_payment_paid(sub: SubscriptionORM) -> None:
+    """Recurring payment succeeded: ensure subscription stays/returns to current."""
+    if sub.payment_status != PaymentStatus.CURRENT:
+        logger.info("Recurring payment recovered from arrears: subscription_id=%s", sub.id)
+        sub.payment_status = PaymentStatus.CURRENT
+
+
+def _handle_recurring_payment_failed(sub: SubscriptionORM) -> None:
+    """Recurring payment failed: mark subscription as arrears."""
+    sub.payment_status = PaymentStatus.ARREARS
+    logger.info("Recurring payment failed: subscription_id=%s payment_status=arrears", sub.id)
@@ -0,0 +1,130 @@
+"""Plan prices and what-if sweeps from the pricing engine (:mod:`app.pricing`).
+
+:func:`price_plans` prices every plan of a product in one vectorized
+evaluation, keyed on each plan's storage tier, and with ``apply`` publishes
+the suggested prices as new plan template versions. Existing subscriptions
+keep the template version they signed up on.
+"""
+from __future__ import annotations
+
+import logging
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app import pricing
+from app.models import (
+    BillingInterval,
+    PlanORM,
+    PlanPriceSuggestion,
+    PlanPricingRequest,
+    PlanPricingResult,
+    PlanTemplateVersionORM,
+    PricingSweepRequest,
+    PricingSweepResult,
+    ProductORM,
+)
+from app.services.errors import NotFoundException, ValidationException
+
+logger = logging.getLogger(__name__)
+
+_MONTHS_PER_INTERVAL = {BillingInterval.MONTHLY: 1, BillingInterval.ANNUAL: 12}
+_BYTES_PER_GB = 1000**3
+
+
+def _cents(amounts: np.ndarray) -> list[int]:
+    return np.rint(amounts * 100).astype(int).tolist()
+
+
+def price_plans(
+    session: Session, *, product_id: int, request: PlanPricingRequest, apply: bool = False
+) -> PlanPricingResult:
+    """Cost and suggested price of each plan's canonical template; publish them with *apply*.
+
+    With *apply*, every plan whose suggested price differs gets a new template
+    version (same interval, storage and description) that becomes its canonical
+    template, all in one commit.
+
+    Raises NotFoundException if the product does not exist.
+    """
+    if not session.exec(
+        select(ProductORM).where(ProductORM.id == product_id, ProductORM.deleted_at == None)
+    ).one_or_none():
+        raise NotFoundException(f"Product {product_id} not found")
+
+    stmt = (
+        select(PlanORM)
+        .where(PlanORM.product_id == product_id, PlanORM.deleted_at == None, PlanORM.template_id != None)
+        .order_by(PlanORM.sort_order, PlanORM.id)
+    )
+    if request.plan_ids is not None:
+        stmt = stmt.where(PlanORM.id.in_(request.plan_ids))
+    plans = session.exec(stmt).all()
+    result = PlanPricingResult(product_id=product_id, applied=apply)
+    if not plans:
+        return result
+
+    storage_gb = np.array([(p.template.storage_bytes or 0) / _BYTES_PER_GB for p in plans])
+    storage_gb *= 1 + request.storage_overhead_pct / 100
+    evaluated = pricing.evaluate(
+        request.cost_model, request.cpu_cores, request.ram_gb, storage_gb, request.bandwidth_gb_mo
+    )
+    months = np.array([_MONTHS_PER_INTERVAL[p.template.billing_interval] for p in plans])
+    costs = _cents(evaluated["cost"] * months)
+    prices = _cents(evaluated["price"] * months)
+
+    for plan, cost_cents, price_cents in zip(plans, costs, prices):
+        template = plan.template
+        suggestion = PlanPriceSuggestion(
+            plan_id=plan.id,
+            plan_name=plan.name,
+            template_id=template.id,
+            billing_interval=template.billing_interval,
+            storage_bytes=template.storage_bytes,
+            current_price_cents=template.price_cents,
+            cost_cents=cost_cents,
+            suggested_price_cents=price_cents,
+        )
+        if apply and price_cents != template.price_cents:
+            new_template = PlanTemplateVersionORM(
+                plan_id=plan.id,
+                price_cents=price_cents,
+                billing_interval=template.billing_interval,
+                storage_bytes=template.storage_bytes,
+                description=template.description,
+            )
+            session.add(new_template)
+            session.flush()
+            plan.template_id = new_template.id
+            suggestion.new_template_id = new_template.id
+        result.plans.append(suggestion)
+
+    if apply:
+        session.commit()
+        logger.info(
+            "Repriced %d plan(s) of product id=%s",
+            sum(1 for s in result.plans if s.new_template_id is not None),
+            product_id,
+        )
+    return result
+
+
+def sweep(request: PricingSweepRequest) -> PricingSweepResult:
+    """Evaluate every combination of the request's axes.
+
+    Raises ValidationException if the grid is too large.
+    """
+    try:
+        grid = pricing.scenario_grid(
+            request.cost_model,
+            request.cpu_cores,
+            request.ram_gb,
+            request.storage_gb,
+            request.bandwidth_gb_mo,
+            servers=request.servers,
+        )
+    except ValueError as exc:
+        raise ValidationException(str(exc)) from exc
+    columns = {name: values.tolist() for name, values in grid.columns.items()}
+    columns["server"] = [grid.servers[i].name for i in columns["server"]]
+    return PricingSweepResult(count=len(grid), columns=columns)
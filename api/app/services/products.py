@@ -6,42 +6,64 @@ from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
 from app.models import ProductRead, ProductORM, ProductCreate, ProductUpdate
-from app.services import templates as template_service
+from app.services import clusters as cluster_service, templates as template_service
 from app.services.errors import NotFoundException, IntegrityException, ValidationException
-from app.services.images import process_icon, generate_icon_filename, save_icon, MAX_ICON_SIZE
+from app.services import icon_store, images
+from app.services.images import ProcessedIcon
+
+IconInput = bytes | ProcessedIcon
+
+
+def prepare_icon(icon_data: IconInput) -> ProcessedIcon:
+    """Render an uploaded icon's variants in the icon worker pool (blocking)."""
+    if isinstance(icon_data, ProcessedIcon):
+        return icon_data
+    try:
+        return images.render_icon(icon_data)
+    except ValueError as exc:
+        raise ValidationException(str(exc)) from exc
+
+
+async def prepare_icon_async(icon_data: bytes) -> ProcessedIcon:
+    """Render an uploaded icon's variants without holding an API thread.
+
+    Endpoints call this before the (threadpooled) service call and pass the
+    result on as ``icon_data``.
+    """
+    try:
+        return await images.render_icon_async(icon_data)
+    except ValueError as exc:
+        raise ValidationException(str(exc)) from exc
 
 
 def create_product(
-    session: Session, payload: ProductCreate, icon_data: bytes | None = None
+    session: Session, payload: ProductCreate, icon_data: IconInput | None = None
 ) -> ProductRead:
     """Create a product, optionally with an icon.
 
     Args:
         session: Database session
         payload: Product create payload
-        icon_data: Optional raw icon image bytes
+        icon_data: Optional raw icon image bytes, or an already rendered icon
 
     Returns:
         Created ProductRead with icon_url if icon provided
 
     Raises:
         IntegrityException: If product name already exists
+        NotFoundException: If the product is pinned to an unknown cluster
         ValidationException: If icon processing fails
     """
-    if icon_data is not None and len(icon_data) > MAX_ICON_SIZE:
-        raise ValidationException(
-            f"Image file too large. Maximum size is {MAX_ICON_SIZE // (1024 * 1024)}MB"
-        )
+    icon = prepare_icon(icon_data) if icon_data is not None else None
+    if payload.cluster is not None:
+        cluster_service.get_cluster_orm(session, payload.cluster)
 
     product = ProductORM.model_validate(payload)
     session.add(product)
 
     try:
-        if icon_data is not None:
-            processed_icon = process_icon(icon_data)
-            rel_icon_path = generate_icon_filename(processed_icon)
-            save_icon(processed_icon, rel_icon_path)
-            product.rel_icon_path = rel_icon_path
+        if icon is not None:
+            product.rel_icon_path = icon_store.get_icon_store().put(icon)
 
         session.commit()
         session.refresh(product)
@@ -51,9 +73,6 @@ def create_product(
         raise IntegrityException(
             f"A product with this name already exists: {product.name}"
         ) from exc
-    except ValueError as exc:
-        session.rollback()
-        raise ValidationException(str(exc)) from exc
 
 
 def list_products(session: Session) -> list[ProductRead]:
@@ -91,12 +110,12 @@ def delete_product(session: Session, *, product_id: int) -> ProductRead:
 
 
 def update_product(
-    session: Session, *, product: ProductUpdate, icon_data: bytes | None = None
+    session: Session, *, product: ProductUpdate, icon_data: IconInput | None = None
 ) -> ProductRead:
     """Update a product's fields and/or icon.
 
-    Validates that the product exists and that the template belongs to the product.
-    Raises NotFoundException if either is missing.
+    Validates that the product exists, that the template belongs to the product
+    and that a pinned cluster exists. Raises NotFoundException if any is missing.
     Raises ValidationException if icon processing fails.
     """
     if not (
@@ -115,19 +134,13 @@ def update_product(
         product_orm.name = product.name
     if product.description is not None:
         product_orm.description = product.description
+    if product.cluster is not None:
+        if product.cluster:
+            cluster_service.get_cluster_orm(session, product.cluster)
+        product_orm.cluster = product.cluster or None
 
     if icon_data is not None:
-        if len(icon_data) > MAX_ICON_SIZE:
-            raise ValidationException(
-                f"Image file too large. Maximum size is {MAX_ICON_SIZE // (1024 * 1024)}MB"
-            )
-        try:
-            processed_icon = process_icon(icon_data)
-            rel_icon_path = generate_icon_filename(processed_icon)
-        except ValueError as e:
-            raise ValidationException(str(e)) from e
-        save_icon(processed_icon, rel_icon_path)
-        product_orm.rel_icon_path = rel_icon_path
+        product_orm.rel_icon_path = icon_store.get_icon_store().put(prepare_icon(icon_data))
 
     session.add(product_orm)
     session.commit()
@@ -135,13 +148,13 @@ def update_product(
     return ProductRead.model_validate(product_orm)
 
 
-def upload_product_icon(session: Session, product_id: int, icon_data: bytes) -> ProductRead:
+def upload_product_icon(session: Session, product_id: int, icon_data: IconInput) -> ProductRead:
     """Upload and process an icon for a product.
 
     Args:
         session: Database session
         product_id: ID of the product
-        icon_data: Raw icon image bytes
+        icon_data: Raw icon image bytes, or an already rendered icon
 
     Returns:
         Updated ProductRead with new icon_url
@@ -150,11 +163,6 @@ def upload_product_icon(session: Session, product_id: int, icon_data: bytes) ->
         NotFoundException: If product doesn't exist
         ValidationException: If icon processing fails
     """
-    if len(icon_data) > MAX_ICON_SIZE:
-        raise ValidationException(
-            f"Image file too large. Maximum size is {MAX_ICON_SIZE // (1024 * 1024)}MB"
-        )
-
     if not (
         product_orm := session.exec(
             select(ProductORM).where(ProductORM.id == product_id, ProductORM.deleted_at == None)
@@ -162,14 +170,7 @@ def upload_product_icon(session: Session, product_id: int, icon_data: bytes) ->
     ):
         raise NotFoundException("Product not found")
 
-    try:
-        processed_icon = process_icon(icon_data)
-        rel_icon_path = generate_icon_filename(processed_icon)
-    except ValueError as e:
-        raise ValidationException(str(e)) from e
-    save_icon(processed_icon, rel_icon_path)
-
-    product_orm.rel_icon_path = rel_icon_path
+    product_orm.rel_icon_path = icon_store.get_icon_store().put(prepare_icon(icon_data))
     session.add(product_orm)
     session.commit()
     session.refresh(product_orm)
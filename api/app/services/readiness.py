@@ -0,0 +1,63 @@
+"""In-memory readiness index of the Helm releases on one cluster.
+
+Instead of one ``helm --wait`` process polling each release, the rollout
+poller (``caelus worker`` with ``CAELUS_RECONCILE_STAGED``) keeps a
+:class:`ReadinessIndex` per cluster: a map of (namespace, release) to
+:class:`~app.provisioner.ReleaseReadiness`, filled from a single
+``kubectl get deployments,statefulsets,daemonsets --all-namespaces`` listing
+that covers every tenant namespace at once. :func:`app.services.reconcile.check_rollouts`
+reads it for whole batches of awaiting jobs, so hundreds of concurrent
+rollouts cost one listing per poll interval.
+
+An index is refreshed when its snapshot is older than ``max_age``. A release
+missing from it may have no workloads, or may not have created them yet;
+``check_rollouts`` keeps waiting for it until the job's deadline and then
+asks ``helm status``.
+"""
+from __future__ import annotations
+
+import logging
+import time
+
+from app.provisioner import Provisioner, ReleaseReadiness, provisioner as default_provisioner
+
+logger = logging.getLogger(__name__)
+
+
+class ReadinessIndex:
+    """Readiness of every Helm release on a cluster, from the last listing."""
+
+    def __init__(self, provisioner: Provisioner | None = None) -> None:
+        self._provisioner = provisioner or default_provisioner
+        self._releases: dict[tuple[str, str], ReleaseReadiness] = {}
+        self._refreshed_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._releases)
+
+    @property
+    def age(self) -> float | None:
+        """Seconds since the last refresh started, None before the first."""
+        return None if self._refreshed_at is None else time.monotonic() - self._refreshed_at
+
+    def refresh(self) -> None:
+        """Replace the index with a new listing of all namespaces.
+
+        Raises whatever the listing raises and keeps the previous snapshot.
+        """
+        # Taken before the listing: the snapshot is at least this recent.
+        started = time.monotonic()
+        self._releases = self._provisioner.release_readiness()
+        self._refreshed_at = started
+        logger.debug("Refreshed readiness index: %d release(s)", len(self._releases))
+
+    def ensure_fresh(self, max_age: float) -> None:
+        """Refresh unless the snapshot is younger than *max_age* seconds."""
+        age = self.age
+        if age is None or age >= max_age:
+            self.refresh()
+
+    def get(self, namespace: str, release: str) -> ReleaseReadiness | None:
+        """The release's state, or None if no workloads of it were listed."""
+        return self._releases.get((namespace, release))
+
@@ -1,23 +1,33 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
 import logging
 from uuid import UUID
 
-from sqlmodel import Session
+from sqlalchemy import case, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import Session, select
 
+from app import tracing
+from app.config import get_settings
 from app.models import DeploymentORM, ProductTemplateVersionORM, DeploymentRead
 from app.provisioner import Provisioner, provisioner as default_provisioner
-from app.services import template_values
+from app.services import capacity, deployment_events, teardown, template_values
+from app.services.jobs import JobService
 from app.services.template_values import bytes_to_k8s_size
 from app.services.deployments import _get_deployment_orm
 from app.services.errors import IntegrityException
+from app.services.readiness import ReadinessIndex
 from app.services.reconcile_constants import (
     DEPLOYMENT_STATUS_DELETED,
+    DEPLOYMENT_STATUS_DELETING,
     DEPLOYMENT_STATUS_ERROR,
     DEPLOYMENT_STATUS_PENDING,
+    DEPLOYMENT_STATUS_PROVISIONING,
     DEPLOYMENT_STATUS_READY,
+    JOB_STATUS_DONE,
+    JOB_STATUS_FAILED,
 )
 
 logger = logging.getLogger(__name__)
@@ -28,16 +38,51 @@ class ReconcileResult:
     applied_template_id: int | None
     last_error: str | None
     last_reconcile_at: datetime | None
+    # Staged apply: the release is installed and its rollout is awaited
+    # until *rollout_deadline* by :func:`check_rollouts`.
+    rollout_deadline: datetime | None = None
+
+
+@dataclass(frozen=True)
+class RolloutResult:
+    job_id: int
+    deployment_id: UUID
+    reason: str
+    status: str
+    last_error: str | None
 
 
 class DeploymentReconciler:
-    """Reconcile a single deployment state against Kubernetes/Helm."""
+    """Reconcile a single deployment state against Kubernetes/Helm.
 
-    def __init__(self, *, session: Session, provisioner: Provisioner | None = None) -> None:
+    With *staged*, an apply installs the release without ``--atomic --wait``
+    and returns a ``provisioning`` result with a rollout deadline; readiness
+    is then settled for many deployments at once by :func:`check_rollouts`,
+    instead of holding a worker inside ``helm --wait``. With *async_teardown*,
+    a delete only starts the teardown and leaves the deployment ``deleting``
+    until :func:`app.services.teardown.sweep_teardowns` sees its namespace gone.
+    """
+
+    def __init__(
+        self,
+        *,
+        session: Session,
+        provisioner: Provisioner | None = None,
+        staged: bool = False,
+        async_teardown: bool = False,
+    ) -> None:
         self._session = session
         self._provisioner = provisioner or default_provisioner
+        self._staged = staged
+        self._async_teardown = async_teardown
 
     def reconcile(self, deployment_id: UUID) -> ReconcileResult:
+        with tracing.span("reconcile", deployment_id=deployment_id):
+            result = self._reconcile(deployment_id)
+            tracing.set_attributes(status=result.status)
+            return result
+
+    def _reconcile(self, deployment_id: UUID) -> ReconcileResult:
         logger.info("Starting reconcile for deployment_id=%s", deployment_id)
         deployment = _get_deployment_orm(self._session, deployment_id=deployment_id)
         try:
@@ -58,7 +103,10 @@ class DeploymentReconciler:
         deployment.applied_template_id = result.applied_template_id
         deployment.last_error = result.last_error
         deployment.last_reconcile_at = result.last_reconcile_at
+        if result.status == DEPLOYMENT_STATUS_DELETED:
+            capacity.release(self._session, deployment)
         self._session.add(deployment)
+        deployment_events.notify_deployment_changed(self._session, deployment)
         self._session.commit()
         self._session.refresh(deployment)
         logger.info(
@@ -101,6 +149,7 @@ class DeploymentReconciler:
             deployment.desired_template_id,
         )
 
+        timeout = template.health_timeout_sec or 300
         self._provisioner.ensure_namespace(name=deployment.namespace)
         self._provisioner.helm_upgrade_install(
             release_name=deployment.name,
@@ -109,11 +158,20 @@ class DeploymentReconciler:
             chart_version=template.chart_version,
             chart_digest=template.chart_digest,
             values=merged_values,
-            timeout=template.health_timeout_sec or 300,
-            atomic=True,
-            wait=True,
+            timeout=timeout,
+            atomic=not self._staged,
+            wait=not self._staged,
         )
 
+        if self._staged:
+            now = datetime.now(UTC)
+            return ReconcileResult(
+                status=DEPLOYMENT_STATUS_PROVISIONING,
+                applied_template_id=deployment.applied_template_id,
+                last_error=None,
+                last_reconcile_at=now,
+                rollout_deadline=now + timedelta(seconds=timeout),
+            )
         return ReconcileResult(
             status=DEPLOYMENT_STATUS_READY,
             applied_template_id=deployment.desired_template_id,
@@ -128,6 +186,14 @@ class DeploymentReconciler:
             deployment.name,
             deployment.namespace,
         )
+        if self._async_teardown:
+            teardown.start_teardown(self._provisioner, teardown.teardown_of(deployment))
+            return ReconcileResult(
+                status=DEPLOYMENT_STATUS_DELETING,
+                applied_template_id=deployment.applied_template_id,
+                last_error=None,
+                last_reconcile_at=datetime.now(UTC),
+            )
         timeout = (deployment.desired_template.health_timeout_sec or 300) if deployment.desired_template else 300
 
         self._provisioner.helm_uninstall(
@@ -175,3 +241,216 @@ class DeploymentReconciler:
             plan_values["storageBytes"] = storage_bytes
             plan_values["storageSize"] = bytes_to_k8s_size(storage_bytes)
         return {"caelus": {"plan": plan_values}}
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes for columns written as UTC.
+    return value if value.tzinfo else value.replace(tzinfo=UTC)
+
+
+def _rollback(provisioner: Provisioner, deployment: DeploymentORM) -> None:
+    # What `helm --atomic` does on a failed rollout: back to the previous
+    # revision, or away entirely for a first install.
+    timeout = deployment.desired_template.health_timeout_sec or 300
+    if deployment.applied_template_id is None:
+        provisioner.helm_uninstall(
+            release_name=deployment.name, namespace=deployment.namespace, timeout=timeout, wait=False
+        )
+    else:
+        provisioner.helm_rollback(release_name=deployment.name, namespace=deployment.namespace, timeout=timeout)
+
+
+def _release_status(provisioner: Provisioner, deployment: DeploymentORM) -> str | None:
+    """``helm status`` of the deployment's release, ``"not found"`` if absent, None on error."""
+    try:
+        result = provisioner.helm_get_release_status(release_name=deployment.name, namespace=deployment.namespace)
+    except Exception:
+        logger.exception("Checking the release of deployment_id=%s failed", deployment.id)
+        return None
+    if not result.exists:
+        return "not found"
+    return result.status or "unknown"
+
+
+def _write_rollout_outcomes(
+    session: Session,
+    deployments: dict[UUID, DeploymentORM],
+    *,
+    ready: list[UUID],
+    failed: dict[UUID, str],
+    now: datetime,
+) -> None:
+    # One UPDATE per outcome for the whole batch, mirrored onto the loaded
+    # instances so the status events below carry the new state.
+    table = DeploymentORM.__table__
+    if ready:
+        session.execute(
+            update(table)
+            .where(table.c.id.in_(ready))
+            .values(
+                status=DEPLOYMENT_STATUS_READY,
+                applied_template_id=table.c.desired_template_id,
+                last_error=None,
+                last_reconcile_at=now,
+            )
+        )
+        for deployment_id in ready:
+            deployment = deployments[deployment_id]
+            for attr, value in (
+                ("status", DEPLOYMENT_STATUS_READY),
+                ("applied_template_id", deployment.desired_template_id),
+                ("last_error", None),
+                ("last_reconcile_at", now),
+            ):
+                set_committed_value(deployment, attr, value)
+    if failed:
+        session.execute(
+            update(table)
+            .where(table.c.id.in_(list(failed)))
+            .values(
+                status=DEPLOYMENT_STATUS_ERROR,
+                last_error=case(failed, value=table.c.id),
+                last_reconcile_at=now,
+            )
+        )
+        for deployment_id, error in failed.items():
+            deployment = deployments[deployment_id]
+            for attr, value in (
+                ("status", DEPLOYMENT_STATUS_ERROR),
+                ("last_error", error),
+                ("last_reconcile_at", now),
+            ):
+                set_committed_value(deployment, attr, value)
+
+
+def _settle_rollout_batch(
+    session: Session,
+    jobs: JobService,
+    claimed: list,
+    index: ReadinessIndex,
+    provisioner: Provisioner,
+) -> tuple[list[RolloutResult], int]:
+    deployments = {
+        d.id: d
+        for d in session.exec(
+            select(DeploymentORM).where(DeploymentORM.id.in_([job.deployment_id for job in claimed]))
+        ).unique().all()
+    }
+    now = datetime.now(UTC)
+    ready: dict[int, UUID] = {}
+    failed: dict[int, tuple[UUID, str]] = {}
+    waiting: list[int] = []
+    for job in claimed:
+        deployment = deployments[job.deployment_id]
+        state = index.get(deployment.namespace, deployment.name)
+        if state is not None and state.ready:
+            ready[job.id] = deployment.id
+            continue
+        if job.deadline is None or now < _aware(job.deadline):
+            # Includes releases missing from the index: their workloads may
+            # not be listed yet.
+            waiting.append(job.id)
+            continue
+        if state is not None:
+            reason = state.reason
+        else:
+            # Still unlisted at the deadline: a deployed release simply has
+            # no workloads; anything else failed.
+            status = _release_status(provisioner, deployment)
+            if status is None:
+                waiting.append(job.id)  # ask helm again next poll
+                continue
+            if status == "deployed":
+                ready[job.id] = deployment.id
+                continue
+            reason = f"release is {status}"
+        error = f"Timed out waiting for rollout: {reason}"
+        if state is not None or status != "not found":
+            try:
+                _rollback(provisioner, deployment)
+            except Exception as exc:
+                logger.exception("Rolling back deployment_id=%s failed", deployment.id)
+                error = f"{error}; rollback failed: {exc}"
+        failed[job.id] = (deployment.id, error)
+
+    _write_rollout_outcomes(
+        session,
+        deployments,
+        ready=list(ready.values()),
+        failed=dict(failed.values()),
+        now=now,
+    )
+    results: list[RolloutResult] = []
+    for job in claimed:
+        if job.id in waiting:
+            continue
+        deployment = deployments[job.deployment_id]
+        deployment_events.notify_deployment_changed(session, deployment)
+        results.append(
+            RolloutResult(
+                job_id=job.id,
+                deployment_id=deployment.id,
+                reason=job.reason,
+                status=JOB_STATUS_DONE if job.id in ready else JOB_STATUS_FAILED,
+                last_error=deployment.last_error,
+            )
+        )
+    jobs.settle_awaiting_jobs(
+        done=list(ready), failed={job_id: error for job_id, (_, error) in failed.items()}, waiting=waiting
+    )
+    session.commit()
+    return results, len(waiting)
+
+
+def check_rollouts(
+    session: Session,
+    *,
+    worker_id: str,
+    cluster: str | None = None,
+    provisioner: Provisioner | None = None,
+    index: ReadinessIndex | None = None,
+) -> list[RolloutResult]:
+    """Settle all due rollouts of staged reconciles (of *cluster*).
+
+    Claims ``await_ready`` jobs in batches of ``CAELUS_ROLLOUT_BATCH_SIZE``
+    and looks their releases up in *index* (by default a new one), which is
+    refreshed with one cluster-wide listing when it is older than
+    ``CAELUS_ROLLOUT_POLL_SECONDS``. Per batch, in one commit and with one
+    UPDATE per outcome, ready deployments are marked ``ready``, those past
+    their deadline are rolled back and marked ``error``, and the rest are
+    queued for the next poll. Returns the settled (done or failed) jobs.
+    """
+    provisioner = provisioner or default_provisioner
+    if index is None:
+        index = ReadinessIndex(provisioner)
+    settings = get_settings()
+    jobs = JobService(session)
+    started = datetime.now(UTC)
+    results: list[RolloutResult] = []
+    checked = waiting = 0
+    while claimed := jobs.claim_awaiting_jobs(
+        worker_id=worker_id, cluster=cluster, limit=settings.rollout_batch_size, due_before=started
+    ):
+        try:
+            index.ensure_fresh(settings.rollout_poll_seconds)
+        except Exception:
+            # Unreachable cluster: leave the rollouts waiting (and their deadlines running).
+            logger.exception("Checking rollouts failed for %d job(s)", len(claimed))
+            jobs.settle_awaiting_jobs(done=[], failed={}, waiting=[job.id for job in claimed])
+            session.commit()
+            break
+        batch, batch_waiting = _settle_rollout_batch(session, jobs, claimed, index, provisioner)
+        results.extend(batch)
+        checked += len(claimed)
+        waiting += batch_waiting
+        if len(claimed) < settings.rollout_batch_size:
+            break
+    if checked:
+        logger.info(
+            "Checked %d rollout(s) against %d release(s): settled=%d waiting=%d",
+            checked,
+            len(index),
+            len(results),
+            waiting,
+        )
+    return results
@@ -37,3 +37,15 @@ JOB_REASONS: tuple[str, ...] = (
     JOB_REASON_UPDATE,
     JOB_REASON_DELETE,
 )
+
+# Stages of a reconcile job (see app.services.reconcile). With staged
+# reconciles an apply job moves from "reconcile" (claimed by a worker, which
+# installs without waiting) to "await_ready" (settled in bulk by the rollout
+# poller).
+JOB_STAGE_RECONCILE = "reconcile"
+JOB_STAGE_AWAIT_READY = "await_ready"
+
+JOB_STAGES: tuple[str, ...] = (
+    JOB_STAGE_RECONCILE,
+    JOB_STAGE_AWAIT_READY,
+)
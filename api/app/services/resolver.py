@@ -0,0 +1,284 @@
+"""Cached, coalescing DNS lookups for hostname validation.
+
+Hostname checks run on every keystroke in the UI and on every deployment
+create/update. Lookups therefore go through :class:`CachingResolver`, which
+bounds each query with a timeout, caches positive and negative answers for a
+configurable TTL, and shares one in-flight query between identical concurrent
+lookups.
+
+All lookups run on a single background event loop, so synchronous service
+code (API threadpool, CLI) and async endpoints share the same cache and the
+same in-flight queries. At most ``CAELUS_DNS_MAX_CONCURRENCY`` queries run at
+once; the rest wait for a slot, and their timeout starts when they get one. The underlying :class:`Resolver` is pluggable via
+:func:`set_resolver`; tests install a local stub.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import math
+import socket
+import threading
+import time
+from typing import Callable, Protocol
+
+from app.config import CaelusSettings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class ResolutionError(Exception):
+    """The name does not resolve (NXDOMAIN, no addresses, resolver failure)."""
+
+
+class Resolver(Protocol):
+    async def resolve(self, fqdn: str) -> frozenset[str]:
+        """Return the addresses *fqdn* resolves to; raise ``ResolutionError`` if none."""
+        ...
+
+
+class SystemResolver:
+    """Resolver backed by the system's ``getaddrinfo``.
+
+    Calls run on a dedicated thread pool of *max_workers* rather than the
+    loop's default executor, so DNS never queues behind unrelated work (or
+    the other way round).
+    """
+
+    def __init__(self, *, max_workers: int = 32) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dns")
+
+    async def resolve(self, fqdn: str) -> frozenset[str]:
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self._executor, lambda: socket.getaddrinfo(fqdn, None, proto=socket.IPPROTO_TCP)
+            )
+        except socket.gaierror as exc:
+            raise ResolutionError(str(exc)) from exc
+        return frozenset(addr[0] for _, _, _, _, addr in results)
+
+
+class CachingResolver:
+    """TTL-cached, request-coalescing wrapper around a :class:`Resolver`.
+
+    ``resolve`` returns the resolved addresses, or ``None`` when the name does
+    not resolve or the query timed out. At most *max_concurrency* queries run
+    at once; a query holds its slot until the underlying resolver returns,
+    even past its timeout, so a resolver with that many workers never queues
+    a query internally. Not thread-safe: use it from one event loop (see
+    :func:`lookup`).
+    """
+
+    def __init__(
+        self,
+        resolver: Resolver,
+        *,
+        timeout: float,
+        positive_ttl: float,
+        negative_ttl: float,
+        max_entries: int,
+        max_concurrency: int = 32,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.resolver = resolver
+        self._timeout = timeout
+        self._positive_ttl = positive_ttl
+        self._negative_ttl = negative_ttl
+        self._max_entries = max_entries
+        self._max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._clock = clock
+        # fqdn -> (expires_at, addresses or None)
+        self._cache: OrderedDict[str, tuple[float, frozenset[str] | None]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future[frozenset[str] | None]] = {}
+
+    @property
+    def timeout(self) -> float:
+        return self._timeout
+
+    def batch_timeout(self, count: int) -> float:
+        """Worst-case seconds for *count* uncached queries run through the slots."""
+        return self._timeout * math.ceil(count / self._max_concurrency)
+
+    @classmethod
+    def from_settings(cls, resolver: Resolver, settings: CaelusSettings) -> CachingResolver:
+        return cls(
+            resolver,
+            timeout=settings.dns_timeout_seconds,
+            positive_ttl=settings.dns_positive_ttl_seconds,
+            negative_ttl=settings.dns_negative_ttl_seconds,
+            max_entries=settings.dns_cache_size,
+            max_concurrency=settings.dns_max_concurrency,
+        )
+
+    async def resolve(self, fqdn: str) -> frozenset[str] | None:
+        cached = self._cache.get(fqdn)
+        if cached is not None:
+            if cached[0] > self._clock():
+                self._cache.move_to_end(fqdn)
+                return cached[1]
+            del self._cache[fqdn]
+
+        inflight = self._inflight.get(fqdn)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._query(fqdn))
+            self._inflight[fqdn] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(fqdn, None))
+        # Shield so one cancelled waiter does not cancel the shared query.
+        return await asyncio.shield(inflight)
+
+    async def _query(self, fqdn: str) -> frozenset[str] | None:
+        await self._slots.acquire()
+        # The timeout starts only now that the query runs. On timeout the
+        # resolver call keeps its slot until it returns, so the next query
+        # does not queue behind it inside the resolver.
+        call = asyncio.ensure_future(self.resolver.resolve(fqdn))
+        call.add_done_callback(self._release_slot)
+        try:
+            addresses: frozenset[str] | None = await asyncio.wait_for(
+                asyncio.shield(call), self._timeout
+            )
+        except ResolutionError:
+            addresses = None
+        except TimeoutError:
+            logger.warning("DNS lookup for %s timed out after %.1fs", fqdn, self._timeout)
+            addresses = None
+        if not addresses:
+            addresses = None
+        self._store(fqdn, addresses)
+        return addresses
+
+    def _release_slot(self, call: asyncio.Future) -> None:
+        self._slots.release()
+        if not call.cancelled():
+            call.exception()  # retrieved, even when nobody waited for it
+
+    def _store(self, fqdn: str, addresses: frozenset[str] | None) -> None:
+        ttl = self._positive_ttl if addresses is not None else self._negative_ttl
+        if ttl <= 0:
+            return
+        self._cache[fqdn] = (self._clock() + ttl, addresses)
+        self._cache.move_to_end(fqdn)
+        while len(self._cache) > self._max_entries:
+            self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+# ---------------------------------------------------------------------------
+# Process-wide resolver loop
+# ---------------------------------------------------------------------------
+
+
+class _ResolverLoop(threading.Thread):
+    def __init__(self) -> None:
+        super().__init__(name="dns-resolver", daemon=True)
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+
+    def run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    def start(self) -> None:
+        super().start()
+        self._ready.wait()
+
+
+_lock = threading.Lock()
+_thread: _ResolverLoop | None = None
+_resolver: CachingResolver | None = None
+
+
+def _ensure_started() -> tuple[asyncio.AbstractEventLoop, CachingResolver]:
+    global _thread, _resolver
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = _ResolverLoop()
+            _thread.start()
+        if _resolver is None:
+            settings = get_settings()
+            _resolver = CachingResolver.from_settings(
+                SystemResolver(max_workers=settings.dns_max_concurrency), settings
+            )
+        return _thread.loop, _resolver
+
+
+def set_resolver(resolver: Resolver, *, settings: CaelusSettings | None = None) -> None:
+    """Replace the process-wide resolver (and drop all cached answers)."""
+    global _resolver
+    with _lock:
+        _resolver = CachingResolver.from_settings(resolver, settings or get_settings())
+
+
+def reset() -> None:
+    """Drop the cached answers and fall back to the system resolver on next use."""
+    global _resolver
+    with _lock:
+        _resolver = None
+
+
+def _submit(fqdn: str):
+    loop, caching = _ensure_started()
+    return asyncio.run_coroutine_threadsafe(caching.resolve(fqdn), loop), caching
+
+
+def _submit_many(fqdns: list[str]):
+    loop, caching = _ensure_started()
+    # Filled in as answers arrive, so a caller that gives up early still gets
+    # the ones that made it.
+    answers: dict[str, frozenset[str] | None] = {}
+
+    async def resolve_into(fqdn: str) -> None:
+        answers[fqdn] = await caching.resolve(fqdn)
+
+    async def gather() -> dict[str, frozenset[str] | None]:
+        await asyncio.gather(*(resolve_into(fqdn) for fqdn in set(fqdns)))
+        return answers
+
+    return asyncio.run_coroutine_threadsafe(gather(), loop), caching, answers
+
+
+def lookup(fqdn: str) -> frozenset[str] | None:
+    """Resolve *fqdn* from synchronous code; ``None`` if it does not resolve."""
+    future, caching = _submit(fqdn)
+    # The query itself is bounded by the resolver timeout; the margin only
+    # guards against a wedged loop.
+    try:
+        return future.result(timeout=caching.timeout + 1.0)
+    except TimeoutError:
+        future.cancel()
+        return None
+
+
+async def lookup_async(fqdn: str) -> frozenset[str] | None:
+    """Resolve *fqdn* without blocking the caller's event loop or a worker thread."""
+    future, _ = _submit(fqdn)
+    return await asyncio.wrap_future(future)
+
+
+def lookup_many(fqdns: list[str]) -> dict[str, frozenset[str] | None]:
+    """Resolve *fqdns* concurrently from synchronous code."""
+    if not fqdns:
+        return {}
+    future, caching, answers = _submit_many(fqdns)
+    try:
+        future.result(timeout=caching.batch_timeout(len(set(fqdns))) + 1.0)
+    except TimeoutError:
+        # Unfinished queries keep running (and fill the cache) on the loop.
+        future.cancel()
+    return {fqdn: answers.get(fqdn) for fqdn in fqdns}
+
+
+async def lookup_many_async(fqdns: list[str]) -> dict[str, frozenset[str] | None]:
+    """Resolve *fqdns* concurrently without blocking the caller's event loop."""
+    if not fqdns:
+        return {}
+    future, _, _ = _submit_many(fqdns)
+    answers = await asyncio.wrap_future(future)
+    return {fqdn: answers[fqdn] for fqdn in fqdns}
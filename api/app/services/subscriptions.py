@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 from datetime import UTC, datetime
+import logging
+from typing import Any
 
 from sqlmodel import Session, select
 
@@ -11,7 +13,13 @@ from app.models import (
     SubscriptionRead,
     SubscriptionStatus,
 )
+from app.services import outbox
 from app.services.errors import NotFoundException, ValidationException
+from app.services.mollie import PaymentProvider
+
+logger = logging.getLogger(__name__)
+
+CANCEL_SUBSCRIPTION_KIND = "mollie.cancel_subscription"
 
 
 def create_subscription(
@@ -89,12 +97,34 @@ def cancel_subscription(
     if sub.status != SubscriptionStatus.CANCELLED:
         sub.status = SubscriptionStatus.CANCELLED
         sub.cancelled_at = datetime.now(UTC)
+        if sub.mollie_subscription_id:
+            # Stop recurring payments at Mollie once this commits.
+            outbox.enqueue(
+                session,
+                kind=CANCEL_SUBSCRIPTION_KIND,
+                key=f"cancel_subscription_{sub.id}",
+                payload={"subscription_id": sub.id},
+            )
         session.commit()
         session.refresh(sub)
 
     return SubscriptionRead.model_validate(sub)
 
 
+def deliver_cancel_subscription(
+    session: Session, provider: PaymentProvider, key: str, payload: dict[str, Any]
+) -> None:
+    """Outbox handler: cancel the Mollie subscription of a cancelled subscription."""
+    sub = session.get(SubscriptionORM, payload["subscription_id"])
+    if sub is None or sub.status != SubscriptionStatus.CANCELLED or not sub.mollie_subscription_id:
+        return
+    customer_id = sub.user.mollie_customer_id
+    mollie_subscription_id = sub.mollie_subscription_id
+    session.commit()
+    provider.cancel_subscription(customer_id, mollie_subscription_id)
+    logger.info("Cancelled Mollie subscription id=%s for subscription id=%s", mollie_subscription_id, payload["subscription_id"])
+
+
 def update_payment_status(
     session: Session,
     *,
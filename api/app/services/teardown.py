@@ -0,0 +1,196 @@
+"""Asynchronous deployment teardown.
+
+``helm uninstall --wait`` followed by ``kubectl delete namespace`` holds a
+worker until every finalizer of the namespace has run, which for products
+with many volumes takes minutes. With ``CAELUS_TEARDOWN_ASYNC`` (and always in
+``caelus purge``) a delete only *starts* the teardown: the release is
+uninstalled and the namespace deletion issued without waiting, and the
+deployment stays ``deleting``. :func:`sweep_teardowns` then checks all of
+them against one namespace listing, marks those whose namespace is gone
+``deleted`` and releases their capacity reservation.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, datetime
+import logging
+from typing import Collection
+from uuid import UUID
+
+from sqlmodel import Session, select
+
+from app.models import DeploymentORM
+from app.provisioner import Provisioner, provisioner as default_provisioner
+from app.services import capacity, deployment_events
+from app.services.jobs import JobService
+from app.services.reconcile_constants import (
+    DEPLOYMENT_STATUS_DELETED,
+    DEPLOYMENT_STATUS_DELETING,
+    DEPLOYMENT_STATUS_ERROR,
+    JOB_REASON_DELETE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Teardown:
+    deployment_id: UUID
+    release_name: str
+    namespace: str
+    timeout: int
+
+
+@dataclass(frozen=True)
+class TeardownSweep:
+    deleted: list[UUID]
+    terminating: list[UUID]
+
+
+@dataclass(frozen=True)
+class TeardownResult:
+    job_id: int
+    deployment_id: UUID
+    status: str
+    last_error: str | None
+
+
+def teardown_of(deployment: DeploymentORM) -> Teardown:
+    template = deployment.desired_template
+    return Teardown(
+        deployment_id=deployment.id,
+        release_name=deployment.name,
+        namespace=deployment.namespace,
+        timeout=(template.health_timeout_sec or 300) if template else 300,
+    )
+
+
+def start_teardown(provisioner: Provisioner, teardown: Teardown) -> None:
+    """Uninstall the release and start deleting its namespace, without waiting for either."""
+    provisioner.helm_uninstall(
+        release_name=teardown.release_name,
+        namespace=teardown.namespace,
+        timeout=teardown.timeout,
+        wait=False,
+    )
+    provisioner.delete_namespace(name=teardown.namespace, wait=False)
+
+
+def _try_start(provisioner: Provisioner, teardown: Teardown) -> str | None:
+    # Runs in a pool thread: only kubectl/helm calls, no database access.
+    try:
+        start_teardown(provisioner, teardown)
+    except Exception as exc:
+        logger.exception("Starting teardown of deployment_id=%s failed", teardown.deployment_id)
+        return str(exc)
+    return None
+
+
+def start_teardowns(
+    session: Session,
+    *,
+    worker_id: str,
+    concurrency: int,
+    cluster: str | None = None,
+    provisioner: Provisioner | None = None,
+) -> list[TeardownResult]:
+    """Claim up to *concurrency* queued delete jobs (of *cluster*) and start their teardowns in parallel.
+
+    The ``kubectl``/``helm`` calls run *concurrency* at a time in threads;
+    claiming and recording stay on *session*. Started deployments stay
+    ``deleting`` until :func:`sweep_teardowns` sees their namespace gone.
+    Returns one result per claimed job (none when no delete job is queued).
+    """
+    provisioner = provisioner or default_provisioner
+    jobs = JobService(session)
+    claimed = []
+    while len(claimed) < concurrency and (
+        job := jobs.claim_next_job(worker_id=worker_id, cluster=cluster, reason=JOB_REASON_DELETE)
+    ):
+        claimed.append(job)
+    if not claimed:
+        return []
+    deployments = {
+        d.id: d
+        for d in session.exec(
+            select(DeploymentORM).where(DeploymentORM.id.in_([job.deployment_id for job in claimed]))
+        ).unique().all()
+    }
+    teardowns = [teardown_of(deployments[job.deployment_id]) for job in claimed]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        errors = list(pool.map(lambda teardown: _try_start(provisioner, teardown), teardowns))
+
+    now = datetime.now(UTC)
+    results = []
+    for job, error in zip(claimed, errors):
+        deployment = deployments[job.deployment_id]
+        deployment.status = DEPLOYMENT_STATUS_DELETING if error is None else DEPLOYMENT_STATUS_ERROR
+        deployment.last_error = error
+        deployment.last_reconcile_at = now
+        session.add(deployment)
+        deployment_events.notify_deployment_changed(session, deployment)
+        results.append(
+            TeardownResult(job_id=job.id, deployment_id=deployment.id, status=deployment.status, last_error=error)
+        )
+    session.commit()
+    for result in results:
+        if result.last_error is None:
+            jobs.mark_job_done(job_id=result.job_id)
+        else:
+            jobs.mark_job_failed(job_id=result.job_id, error=result.last_error)
+    logger.info(
+        "Started %d teardown(s) worker_id=%s cluster=%s failed=%d",
+        len(results),
+        worker_id,
+        cluster,
+        sum(1 for result in results if result.last_error is not None),
+    )
+    return results
+
+
+def sweep_teardowns(
+    session: Session,
+    *,
+    cluster: str | None = None,
+    provisioner: Provisioner | None = None,
+    deployment_ids: Collection[UUID] | None = None,
+) -> TeardownSweep:
+    """Mark started teardowns (of *cluster*) whose namespace is gone ``deleted`` (commits).
+
+    One namespace listing covers all of them. Restrict the sweep to
+    *deployment_ids* if given. Returns the ids marked deleted and those
+    still terminating.
+    """
+    provisioner = provisioner or default_provisioner
+    stmt = select(DeploymentORM.id, DeploymentORM.namespace).where(
+        DeploymentORM.status == DEPLOYMENT_STATUS_DELETING,
+        DeploymentORM.deleted_at.is_not(None),
+        # Only deployments whose teardown was started after they were deleted.
+        DeploymentORM.last_reconcile_at >= DeploymentORM.deleted_at,
+        DeploymentORM.cluster.is_(None) if cluster is None else DeploymentORM.cluster == cluster,
+    )
+    if deployment_ids is not None:
+        stmt = stmt.where(DeploymentORM.id.in_(list(deployment_ids)))
+    terminating = session.exec(stmt).all()
+    if not terminating:
+        return TeardownSweep(deleted=[], terminating=[])
+    namespaces = provisioner.list_namespaces()
+    gone = [deployment_id for deployment_id, namespace in terminating if namespace not in namespaces]
+    if gone:
+        for deployment in session.exec(select(DeploymentORM).where(DeploymentORM.id.in_(gone))).unique().all():
+            deployment.status = DEPLOYMENT_STATUS_DELETED
+            capacity.release(session, deployment)
+            session.add(deployment)
+            deployment_events.notify_deployment_changed(session, deployment)
+        session.commit()
+    logger.info(
+        "Swept %d teardown(s) cluster=%s: deleted=%d terminating=%d",
+        len(terminating),
+        cluster,
+        len(gone),
+        len(terminating) - len(gone),
+    )
+    return TeardownSweep(
+        deleted=gone, terminating=[deployment_id for deployment_id, _ in terminating if deployment_id not in gone]
+    )
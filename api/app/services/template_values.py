@@ -67,3 +67,55 @@ def merge_values_scoped(
     if system_overrides is not None:
         merged = deep_merge(merged, deepcopy(system_overrides))
     return merged
+
+
+def _iter_hostname_paths(schema: Any, path: tuple[str, ...] = ()) -> list[tuple[str, ...]]:
+    paths: list[tuple[str, ...]] = []
+    if isinstance(schema, dict):
+        title = schema.get("title")
+        if path and isinstance(title, str) and title.lower() == "hostname":
+            paths.append(path)
+
+        properties = schema.get("properties")
+        if isinstance(properties, dict):
+            for key, child_schema in properties.items():
+                if isinstance(key, str):
+                    paths.extend(_iter_hostname_paths(child_schema, path + (key,)))
+
+        items = schema.get("items")
+        if isinstance(items, dict):
+            paths.extend(_iter_hostname_paths(items, path + ("*",)))
+        elif isinstance(items, list):
+            for child_schema in items:
+                paths.extend(_iter_hostname_paths(child_schema, path + ("*",)))
+
+        for schema_key in ("allOf", "anyOf", "oneOf", "prefixItems"):
+            variants = schema.get(schema_key)
+            if isinstance(variants, list):
+                for child_schema in variants:
+                    paths.extend(_iter_hostname_paths(child_schema, path))
+
+        additional = schema.get("additionalProperties")
+        if isinstance(additional, dict):
+            paths.extend(_iter_hostname_paths(additional, path))
+
+        definitions = schema.get("$defs") or schema.get("definitions")
+        if isinstance(definitions, dict):
+            for child_schema in definitions.values():
+                paths.extend(_iter_hostname_paths(child_schema, path))
+    elif isinstance(schema, list):
+        for child_schema in schema:
+            paths.extend(_iter_hostname_paths(child_schema, path))
+    return paths
+
+
+def find_hostname_paths(values_schema_json: dict[str, Any] | None) -> list[list[str]]:
+    """Return the value paths whose schema is titled ``hostname``, in schema order.
+
+    Walks ``properties``, ``items``, ``allOf/anyOf/oneOf/prefixItems``,
+    ``additionalProperties`` and ``$defs``; ``"*"`` stands for any array index.
+    Computed once per template when it is created (``hostname_paths_json``).
+    """
+    if not isinstance(values_schema_json, dict):
+        return []
+    return [list(path) for path in _iter_hostname_paths(values_schema_json)]
@@ -10,12 +10,14 @@ from app.models import (
     ProductTemplateVersionRead,
     ProductTemplateVersionCreate,
 )
+from app.services import template_values
 from app.services.errors import NotFoundException, IntegrityException
 from app.services.products import get_product
 
 
 def create_template(session: Session, payload: ProductTemplateVersionCreate) -> ProductTemplateVersionORM:
     template = ProductTemplateVersionORM.model_validate(payload)
+    template.hostname_paths_json = template_values.find_hostname_paths(template.values_schema_json)
     # verify that the product exists:
     get_product(session, template.product_id)
 
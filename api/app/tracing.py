@@ -0,0 +1,184 @@
+"""Optional OpenTelemetry tracing of a deployment from request to ``helm``/``kubectl``.
+
+Spans cover the API request (:class:`TracingMiddleware`), the job enqueue
+(:meth:`app.services.jobs.JobService.enqueue_job`), the job's wait in the
+queue and its run in the worker, ``DeploymentReconciler.reconcile`` and every
+external command (:func:`app.proc.run_command`). The enqueue stores the W3C
+trace context on the job (``deployment_reconcile_job.trace_context``), so the
+worker's spans join the trace of the request that queued it.
+
+Without the ``opentelemetry-api`` package every helper here is a no-op.
+``CAELUS_TRACING_EXPORTER`` picks where spans go (needs ``opentelemetry-sdk``):
+  - ``none`` (default): nowhere, unless the process set up a provider itself.
+  - ``file``: one JSON span per line appended to ``CAELUS_TRACING_FILE``.
+  - ``otlp``: an OTLP collector (``opentelemetry-exporter-otlp``; endpoint from
+    the standard ``OTEL_EXPORTER_OTLP_ENDPOINT``).
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager, nullcontext
+from datetime import UTC, datetime
+import json
+import logging
+import multiprocessing.util
+from typing import Any, Iterator
+
+from app.config import get_settings
+
+try:
+    from opentelemetry import context as otel_context, propagate, trace
+except ImportError:  # tracing is optional
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+TRACING_EXPORTERS = ("none", "file", "otlp")
+
+_provider = None
+
+
+def _span_exporter(settings):
+    if settings.tracing_exporter == "file":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        out = open(settings.tracing_file, "a", encoding="utf-8")
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError as exc:
+        raise RuntimeError(
+            "CAELUS_TRACING_EXPORTER=otlp requires the opentelemetry-exporter-otlp package"
+        ) from exc
+    return OTLPSpanExporter()
+
+
+def configure_tracing(*, service_name: str) -> None:
+    """Install a tracer provider exporting to ``CAELUS_TRACING_EXPORTER`` (once per process)."""
+    global _provider
+    settings = get_settings()
+    if settings.tracing_exporter not in TRACING_EXPORTERS:
+        raise RuntimeError(
+            f"Unknown tracing exporter {settings.tracing_exporter!r} (expected one of {TRACING_EXPORTERS})"
+        )
+    if settings.tracing_exporter == "none" or _provider is not None:
+        return
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as exc:
+        raise RuntimeError(
+            f"CAELUS_TRACING_EXPORTER={settings.tracing_exporter} requires the opentelemetry-sdk package"
+        ) from exc
+    _provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    _provider.add_span_processor(BatchSpanProcessor(_span_exporter(settings)))
+    trace.set_tracer_provider(_provider)
+    # Worker processes leave through os._exit, skipping the provider's atexit flush.
+    multiprocessing.util.register_after_fork(
+        _provider,
+        lambda provider: multiprocessing.util.Finalize(None, provider.force_flush, exitpriority=-100),
+    )
+    logger.info("Tracing %s spans to %s", service_name, settings.tracing_exporter)
+
+
+def _tracer():
+    return trace.get_tracer("caelus")
+
+
+def span(name: str, *, kind: str = "INTERNAL", parent: str | None = None, **attributes: Any):
+    """A context manager running its block in a new span (the current one's child, or *parent*'s).
+
+    *parent* is a trace context from :func:`current_context`. None-valued
+    attributes are left out.
+    """
+    if trace is None:
+        return nullcontext()
+    return _span(name, kind=kind, parent=parent, attributes=attributes)
+
+
+@contextmanager
+def _span(name: str, *, kind: str, parent: str | None, attributes: dict[str, Any]) -> Iterator[Any]:
+    ctx = propagate.extract(json.loads(parent)) if parent else None
+    with _tracer().start_as_current_span(
+        name,
+        context=ctx,
+        kind=getattr(trace.SpanKind, kind),
+        attributes={key: str(value) for key, value in attributes.items() if value is not None},
+    ) as current:
+        yield current
+
+
+def record_span(name: str, *, start: datetime, end: datetime, parent: str | None = None, **attributes: Any) -> None:
+    """Record a finished span covering *start* to *end* (e.g. time a job spent queued)."""
+    if trace is None:
+        return
+    ctx = propagate.extract(json.loads(parent)) if parent else None
+    _tracer().start_span(
+        name,
+        context=ctx,
+        start_time=int(_aware(start).timestamp() * 1e9),
+        attributes={key: str(value) for key, value in attributes.items() if value is not None},
+    ).end(end_time=int(_aware(end).timestamp() * 1e9))
+
+
+def current_context() -> str | None:
+    """The current span's trace context as a JSON carrier, None outside a recording span."""
+    if trace is None:
+        return None
+    carrier: dict[str, str] = {}
+    propagate.inject(carrier)
+    return json.dumps(carrier, separators=(",", ":")) if carrier else None
+
+
+def set_attributes(**attributes: Any) -> None:
+    """Add attributes to the current span."""
+    if trace is None:
+        return
+    current = trace.get_current_span()
+    for key, value in attributes.items():
+        if value is not None:
+            current.set_attribute(key, str(value) if not isinstance(value, (int, float, bool)) else value)
+
+
+def _aware(value: datetime) -> datetime:
+    return value if value.tzinfo is not None else value.replace(tzinfo=UTC)
+
+
+def _route_template(scope) -> str:
+    # The router leaves the matched path parameters in the scope; put their
+    # names back in place of their values to keep span names low-cardinality.
+    names = {str(value): name for name, value in (scope.get("path_params") or {}).items()}
+    return "/".join(f"{{{names[part]}}}" if part in names else part for part in scope["path"].split("/"))
+
+
+class TracingMiddleware:
+    """A server span per HTTP request, continuing an incoming ``traceparent``."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if trace is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        token = otel_context.attach(propagate.extract(carrier))
+        try:
+            with _tracer().start_as_current_span(
+                scope["method"],
+                kind=trace.SpanKind.SERVER,
+                attributes={"http.request.method": scope["method"], "url.path": scope["path"]},
+            ) as current:
+
+                async def send_with_status(message) -> None:
+                    if message["type"] == "http.response.start":
+                        current.set_attribute("http.response.status_code", message["status"])
+                    await send(message)
+
+                await self.app(scope, receive, send_with_status)
+                if scope.get("endpoint") is not None:
+                    route = _route_template(scope)
+                    current.update_name(f"{scope['method']} {route}")
+                    current.set_attribute("http.route", route)
+        finally:
+            otel_context.detach(token)
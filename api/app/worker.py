@@ -5,32 +5,56 @@ import multiprocessing
 import os
 import signal
 import time
+from dataclasses import asdict
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
 
+from app import tracing
+from app.config import CaelusSettings, get_settings
 from app.db import session_scope
+from app.deps import get_payment_provider
+from app.logging_config import log_context
+from app.provisioner import Provisioner
 from app.services import (
+    billing_reports as billing_reports_service,
+    billing_sync as billing_sync_service,
+    clusters as clusters_service,
     reconcile as reconcile_service,
     jobs as jobs_service,
+    namespace_pool as namespace_pool_service,
+    outbox as outbox_service,
+    payment_webhooks as payment_webhook_service,
+    teardown as teardown_service,
 )
+from app.services.mollie import PaymentProvider
+from app.services.readiness import ReadinessIndex
 from app.services.reconcile_constants import (
+    DEPLOYMENT_STATUS_DELETED,
     DEPLOYMENT_STATUS_ERROR,
+    JOB_STAGE_AWAIT_READY,
+    JOB_STAGE_RECONCILE,
     JOB_STATUS_DONE,
     JOB_STATUS_FAILED,
+    JOB_STATUS_QUEUED,
 )
 
 logger = logging.getLogger(__name__)
 
 
-def process_one_job(base_worker_id: str) -> dict | None:
+def process_one_job(
+    base_worker_id: str, *, cluster: str | None = None, provisioner: Provisioner | None = None
+) -> dict | None:
     """Claim and process a single job.
 
     Each call opens its own database session so it is safe to run in a
-    subprocess.  Returns a result dict on success/failure, or ``None`` when
-    no job was available.
+    subprocess.  Only jobs of *cluster* are claimed (None: jobs of unplaced
+    deployments), and reconciled through *provisioner*.  Returns a result
+    dict on success/failure, or ``None`` when no job was available.
     """
     effective_worker_id = f"{base_worker_id}-{os.getpid()}"
     with session_scope() as session:
         jobs = jobs_service.JobService(session)
-        claimed = jobs.claim_next_job(worker_id=effective_worker_id)
+        claimed = jobs.claim_next_job(worker_id=effective_worker_id, cluster=cluster)
         if claimed is None:
             return None
 
@@ -40,36 +64,208 @@ def process_one_job(base_worker_id: str) -> dict | None:
         reason = claimed.reason
         locked_by = claimed.locked_by
         locked_at = claimed.locked_at
+        trace_context = claimed.trace_context
 
-        reconciler = reconcile_service.DeploymentReconciler(session=session)
-        result = reconciler.reconcile(deployment_id)
+        tracing.record_span(
+            "reconcile_job.queued", start=claimed.run_after, end=locked_at, parent=trace_context, job_id=job_id
+        )
+        with log_context(
+            worker_id=effective_worker_id, job_id=job_id, deployment_id=deployment_id
+        ), tracing.span(
+            "reconcile_job.run",
+            kind="CONSUMER",
+            parent=trace_context,
+            job_id=job_id,
+            deployment_id=deployment_id,
+            reason=reason,
+            worker_id=effective_worker_id,
+        ):
+            settings = get_settings()
+            reconciler = reconcile_service.DeploymentReconciler(
+                session=session,
+                provisioner=provisioner,
+                staged=settings.reconcile_staged,
+                async_teardown=settings.teardown_async,
+            )
+            result = reconciler.reconcile(deployment_id)
 
-        status: str
-        last_error: str | None = result.last_error
-        if result.status == DEPLOYMENT_STATUS_ERROR:
-            jobs.mark_job_failed(job_id=job_id, error=result.last_error or "unknown error")
-            status = JOB_STATUS_FAILED
-        else:
-            jobs.mark_job_done(job_id=job_id)
-            status = JOB_STATUS_DONE
-
-        return {
-            "id": job_id,
-            "deployment_id": deployment_id,
-            "reason": reason,
-            "status": status,
-            "locked_by": locked_by,
-            "locked_at": locked_at,
-            "last_error": last_error,
+            status: str
+            stage = JOB_STAGE_RECONCILE
+            last_error: str | None = result.last_error
+            if result.rollout_deadline is not None:
+                jobs.await_ready(job_id=job_id, deadline=result.rollout_deadline)
+                status, stage = JOB_STATUS_QUEUED, JOB_STAGE_AWAIT_READY
+            elif result.status == DEPLOYMENT_STATUS_ERROR:
+                jobs.mark_job_failed(job_id=job_id, error=result.last_error or "unknown error")
+                status = JOB_STATUS_FAILED
+            else:
+                jobs.mark_job_done(job_id=job_id)
+                status = JOB_STATUS_DONE
+
+            return {
+                "id": job_id,
+                "deployment_id": deployment_id,
+                "reason": reason,
+                "status": status,
+                "locked_by": locked_by,
+                "locked_at": locked_at,
+                "last_error": last_error,
+                "cluster": cluster,
+                "stage": stage,
+            }
+
+
+def process_rollouts(
+    base_worker_id: str,
+    *,
+    cluster: str | None = None,
+    provisioner: Provisioner | None = None,
+    index: ReadinessIndex | None = None,
+) -> list[dict]:
+    """Settle the due staged rollouts; returns a result dict per finished job."""
+    effective_worker_id = f"{base_worker_id}-{os.getpid()}"
+    with session_scope() as session, log_context(worker_id=effective_worker_id):
+        results = reconcile_service.check_rollouts(
+            session, worker_id=effective_worker_id, cluster=cluster, provisioner=provisioner, index=index
+        )
+    return [
+        {
+            "id": r.job_id,
+            "deployment_id": r.deployment_id,
+            "reason": r.reason,
+            "status": r.status,
+            "last_error": r.last_error,
+            "cluster": cluster,
+            "stage": JOB_STAGE_AWAIT_READY,
         }
+        for r in results
+    ]
+
+
+def process_teardowns(
+    *, cluster: str | None = None, provisioner: Provisioner | None = None
+) -> list[dict]:
+    """Mark started teardowns whose namespace is gone deleted; returns a result dict per deployment."""
+    with session_scope() as session:
+        sweep = teardown_service.sweep_teardowns(session, cluster=cluster, provisioner=provisioner)
+    return [
+        {"deployment_id": deployment_id, "status": DEPLOYMENT_STATUS_DELETED, "cluster": cluster}
+        for deployment_id in sweep.deleted
+    ]
+
+
+def process_webhook_batch(base_worker_id: str, payment_provider: PaymentProvider) -> int:
+    """Claim and apply one batch of queued Mollie webhooks; returns how many were handled."""
+    effective_worker_id = f"{base_worker_id}-{os.getpid()}"
+    with session_scope() as session:
+        results = payment_webhook_service.process_inbox(
+            session, payment_provider, worker_id=effective_worker_id
+        )
+    return len(results)
+
+
+def process_outbox_batch(base_worker_id: str, payment_provider: PaymentProvider) -> int:
+    """Deliver one batch of due outbox rows; returns how many were handled."""
+    effective_worker_id = f"{base_worker_id}-{os.getpid()}"
+    with session_scope() as session:
+        results = outbox_service.dispatch_batch(session, payment_provider, worker_id=effective_worker_id)
+    return len(results)
+
+
+def run_outbox_dispatcher(
+    payment_provider: PaymentProvider,
+    *,
+    base_worker_id: str,
+    poll_seconds: float,
+    once: bool = False,
+    emit: callable,
+) -> None:
+    """Deliver outbox rows until signaled (or, with *once*, until none are due).
+
+    Runs in the calling process; start several to scale delivery. ``emit`` is
+    called with each delivery result.
+    """
+    shutdown = False
+
+    def _handle_signal(signum: int, frame: object) -> None:
+        nonlocal shutdown
+        shutdown = True
+        logger.info(f"Caught signal {signum}, stopping outbox dispatcher {os.getpid()}")
+
+    if not once:
+        signal.signal(signal.SIGINT, _handle_signal)
+        signal.signal(signal.SIGTERM, _handle_signal)
+
+    worker_id = f"{base_worker_id}-{os.getpid()}"
+    while not shutdown:
+        with session_scope() as session:
+            results = outbox_service.dispatch_batch(session, payment_provider, worker_id=worker_id)
+        for result in results:
+            emit(asdict(result))
+        if not results:
+            if once:
+                return
+            time.sleep(poll_seconds)
+
+
+def run_purge(
+    *,
+    base_worker_id: str,
+    concurrency: int,
+    wait_seconds: float,
+    poll_seconds: float,
+    emit: callable,
+    cluster: str | None = None,
+) -> list[UUID]:
+    """Tear down every queued deletion (of *cluster*), *concurrency* at a time.
+
+    Starts all teardowns without waiting for namespace finalizers, then
+    sweeps until every started teardown (including those of earlier runs) has
+    its namespace gone or *wait_seconds* have passed. ``emit`` is called with
+    each started and each finished teardown. Returns the deployments still
+    terminating.
+    """
+    worker_id = f"{base_worker_id}-{os.getpid()}"
+    with session_scope() as session:
+        provisioner = None
+        if cluster is not None:
+            provisioner = clusters_service.provisioner_for(clusters_service.get_cluster_orm(session, cluster))
+        while results := teardown_service.start_teardowns(
+            session, worker_id=worker_id, concurrency=concurrency, cluster=cluster, provisioner=provisioner
+        ):
+            for result in results:
+                emit(asdict(result))
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            sweep = teardown_service.sweep_teardowns(session, cluster=cluster, provisioner=provisioner)
+            for deployment_id in sweep.deleted:
+                emit({"deployment_id": deployment_id, "status": DEPLOYMENT_STATUS_DELETED, "cluster": cluster})
+            if not sweep.terminating or time.monotonic() >= deadline:
+                break
+            time.sleep(poll_seconds)
+    if sweep.terminating:
+        logger.warning("Purge left %d namespace(s) terminating after %.0fs", len(sweep.terminating), wait_seconds)
+    return sweep.terminating
+
+
+def run_billing_sync(
+    payment_provider: PaymentProvider, *, dry_run: bool = False
+) -> billing_sync_service.BillingSyncReport | None:
+    """Run one billing sync unless another process is already running one."""
+    since = datetime.now(UTC) - timedelta(days=get_settings().billing_sync_lookback_days)
+    with session_scope() as session, billing_sync_service.exclusive(session.get_bind()) as acquired:
+        if not acquired:
+            logger.info("Billing sync already running elsewhere; skipping")
+            return None
+        return billing_sync_service.sync_billing(session, payment_provider, since=since, dry_run=dry_run)
 
 
 # TODO: When a worker processes crashes, does it get replaced in the pool? If not, the sentinel object
 #       never gets sent and the master won't join and exit gracefully
 def _worker_loop(
-    base_worker_id: str, result_queue: multiprocessing.Queue, poll_seconds: float
+    base_worker_id: str, result_queue: multiprocessing.Queue, poll_seconds: float, cluster: str | None = None
 ) -> None:
-    """Run in a worker process. Claims and processes jobs until signaled."""
+    """Run in a worker process. Claims and processes jobs (of *cluster*) until signaled."""
     shutdown = False
 
     def _handle_signal(signum: int, frame: object) -> None:
@@ -80,10 +276,29 @@ def _worker_loop(
     signal.signal(signal.SIGINT, _handle_signal)
     signal.signal(signal.SIGTERM, _handle_signal)
 
+    provisioner = None
+    if cluster is not None:
+        with session_scope() as session:
+            provisioner = clusters_service.provisioner_for(clusters_service.get_cluster_orm(session, cluster))
+
+    payment_provider = get_payment_provider()
+    dispatch_outbox = get_settings().worker_dispatch_outbox
     while not shutdown:
-        payload = process_one_job(base_worker_id)
+        webhooks = 0
+        if payment_provider is not None:
+            try:
+                webhooks = process_webhook_batch(base_worker_id, payment_provider)
+            except Exception:
+                logger.exception("Processing Mollie webhooks failed")
+            if dispatch_outbox:
+                try:
+                    webhooks += process_outbox_batch(base_worker_id, payment_provider)
+                except Exception:
+                    logger.exception("Delivering outbox rows failed")
+        payload = process_one_job(base_worker_id, cluster=cluster, provisioner=provisioner)
         if payload is None:
-            time.sleep(poll_seconds)
+            if not webhooks:
+                time.sleep(poll_seconds)
         else:
             result_queue.put(payload)
 
@@ -91,23 +306,120 @@ def _worker_loop(
     result_queue.put(None)
 
 
+def _settle_loop(base_worker_id: str, result_queue: multiprocessing.Queue, cluster: str | None = None) -> None:
+    """Run in the pool's single settle process until signaled.
+
+    Settles staged rollouts (of *cluster*) against one readiness index,
+    refreshed by a single listing per ``CAELUS_ROLLOUT_POLL_SECONDS`` however
+    many rollouts are in flight, sweeps asynchronous teardowns every
+    ``CAELUS_TEARDOWN_SWEEP_SECONDS``, tops up the warm namespace pool
+    every ``CAELUS_NAMESPACE_POOL_REFILL_SECONDS``, and runs the billing sync
+    and the billing summary refresh on their intervals.
+    """
+    shutdown = False
+
+    def _handle_signal(signum: int, frame: object) -> None:
+        nonlocal shutdown
+        shutdown = True
+        logger.info(f"Caught signal {signum}, shutting down settle process {os.getpid()}")
+
+    signal.signal(signal.SIGINT, _handle_signal)
+    signal.signal(signal.SIGTERM, _handle_signal)
+
+    provisioner = None
+    if cluster is not None:
+        with session_scope() as session:
+            provisioner = clusters_service.provisioner_for(clusters_service.get_cluster_orm(session, cluster))
+    settings = get_settings()
+    index = ReadinessIndex(provisioner)
+    next_rollouts = time.monotonic() if settings.reconcile_staged else float("inf")
+    next_sweep = time.monotonic() if settings.teardown_async else float("inf")
+    next_refill = time.monotonic() if settings.namespace_pool_size > 0 else float("inf")
+    payment_provider = get_payment_provider()
+    next_billing_sync = time.monotonic() if _runs_billing_sync(settings) else float("inf")
+    next_summary_refresh = time.monotonic() if _refreshes_billing_summary(settings) else float("inf")
+    while not shutdown:
+        if time.monotonic() >= next_rollouts:
+            next_rollouts = time.monotonic() + settings.rollout_poll_seconds
+            try:
+                for rollout in process_rollouts(base_worker_id, cluster=cluster, provisioner=provisioner, index=index):
+                    result_queue.put(rollout)
+            except Exception:
+                logger.exception("Checking rollouts failed")
+        if time.monotonic() >= next_sweep:
+            next_sweep = time.monotonic() + settings.teardown_sweep_seconds
+            try:
+                for deleted in process_teardowns(cluster=cluster, provisioner=provisioner):
+                    result_queue.put(deleted)
+            except Exception:
+                logger.exception("Sweeping teardowns failed")
+        if time.monotonic() >= next_refill:
+            next_refill = time.monotonic() + settings.namespace_pool_refill_seconds
+            try:
+                with session_scope() as session:
+                    namespace_pool_service.refill_pool(session, cluster=cluster, provisioner=provisioner)
+            except Exception:
+                logger.exception("Refilling the namespace pool failed")
+        if time.monotonic() >= next_billing_sync:
+            next_billing_sync = time.monotonic() + settings.billing_sync_interval_seconds
+            try:
+                run_billing_sync(payment_provider)
+            except Exception:
+                logger.exception("Billing sync failed")
+        if time.monotonic() >= next_summary_refresh:
+            next_summary_refresh = time.monotonic() + settings.billing_summary_refresh_seconds
+            try:
+                with session_scope() as session:
+                    billing_reports_service.refresh_summary(session)
+            except Exception:
+                logger.exception("Refreshing the billing summary failed")
+        next_due = min(next_rollouts, next_sweep, next_refill, next_billing_sync, next_summary_refresh)
+        time.sleep(max(0.0, next_due - time.monotonic()))
+
+    result_queue.put(None)
+
+
+def _runs_billing_sync(settings: CaelusSettings) -> bool:
+    return bool(settings.mollie_api_key) and settings.billing_sync_interval_seconds > 0
+
+
+def _refreshes_billing_summary(settings: CaelusSettings) -> bool:
+    return settings.billing_summary_materialized and settings.billing_summary_refresh_seconds > 0
+
+
 def run_worker(
-    *, base_worker_id: str, concurrency: int, poll_seconds: float, emit: callable
+    *, base_worker_id: str, concurrency: int, poll_seconds: float, emit: callable, cluster: str | None = None
 ) -> None:
     """Spawn worker processes and collect results.
 
-    ``emit`` is called with each completed job result dict (used by the CLI
-    to print YAML output).
+    With *cluster* the pool only claims that cluster's jobs and reaches it
+    through the cluster's kubeconfig/context. With staged reconciles,
+    asynchronous teardown, a warm namespace pool or periodic billing work,
+    one extra process settles rollouts and teardowns, refills the namespace
+    pool and runs the billing sync and summary refresh. ``emit``
+    is called with each completed job result dict (used by the CLI to print
+    YAML output).
     """
     result_queue: multiprocessing.Queue = multiprocessing.Queue()
     workers = []
     for _ in range(concurrency):
         p = multiprocessing.Process(
             target=_worker_loop,
-            args=(base_worker_id, result_queue, poll_seconds),
+            args=(base_worker_id, result_queue, poll_seconds, cluster),
         )
         p.start()
         workers.append(p)
+    settings = get_settings()
+    if (
+        settings.reconcile_staged
+        or settings.teardown_async
+        or settings.namespace_pool_size > 0
+        or _runs_billing_sync(settings)
+        or _refreshes_billing_summary(settings)
+    ):
+        p = multiprocessing.Process(target=_settle_loop, args=(base_worker_id, result_queue, cluster))
+        p.start()
+        workers.append(p)
 
     def _handle_signal(signum: int, frame: object) -> None:
         logger.info(f"Master caught signal {signum} in master process {os.getpid()} -- waiting for workers to exit")
@@ -117,7 +429,7 @@ def run_worker(
 
     # Master: read results until all workers have exited
     exited = 0
-    while exited < concurrency:
+    while exited < len(workers):
         result = result_queue.get()
         if result is None:
             exited += 1
@@ -12,11 +12,39 @@ from typer.testing import CliRunner
 from app.db import get_session, init_db
 from app.deps import get_payment_provider
 from app.main import app
-from app.models import UserORM, PlanORM, PlanTemplateVersionORM, BillingInterval
+from app.models import (
+    BillingInterval,
+    DeploymentCreate,
+    PlanORM,
+    PlanTemplateVersionORM,
+    ProductORM,
+    UserORM,
+)
 from app.models.core import _utcnow
+from app.services import deployments, products, templates, users
 from app.services.mollie import FakePaymentProvider
 
 
+@pytest.fixture(autouse=True)
+def static_dir(tmp_path, monkeypatch):
+    """Point static file storage (and the mounted /api/static app) at a tmp dir."""
+    from app.config import get_settings
+    from app.services import icon_store
+
+    path = tmp_path / "static"
+    (path / "icons").mkdir(parents=True)
+    monkeypatch.setenv("CAELUS_STATIC_PATH", str(path))
+    get_settings.cache_clear()
+    for route in app.routes:
+        if getattr(route, "name", None) == "static":
+            monkeypatch.setattr(route.app, "directory", str(path))
+            monkeypatch.setattr(route.app, "all_directories", [str(path)])
+    icon_store.set_icon_store(None)
+    yield path
+    icon_store.set_icon_store(None)
+    get_settings.cache_clear()
+
+
 @pytest.fixture
 def db_session():
     engine = create_engine(
@@ -107,6 +135,83 @@ def create_paid_plan_template(
     return ptv.id
 
 
+def _create_plan_template(db_session, product_id: int, storage_bytes: int | None) -> int:
+    """Create a free Plan + PlanTemplateVersion with a specific storage_bytes value."""
+    plan = PlanORM(name=f"plan-{storage_bytes}", product_id=product_id, created_at=_utcnow())
+    db_session.add(plan)
+    db_session.flush()
+    ptv = PlanTemplateVersionORM(
+        plan_id=plan.id,
+        price_cents=0,
+        billing_interval=BillingInterval.MONTHLY,
+        storage_bytes=storage_bytes,
+        created_at=_utcnow(),
+    )
+    db_session.add(ptv)
+    db_session.flush()
+    plan.template_id = ptv.id
+    db_session.commit()
+    db_session.refresh(ptv)
+    return ptv.id
+
+
+def seed_deployment(db_session, *, storage_bytes: int | None = 0) -> int:
+    """Seed a user, product, template, plan and deployment ready to reconcile.
+
+    Returns the deployment ID.
+
+    ``storage_bytes`` defaults to 0 (free-plan behaviour used by existing tests).
+    Pass an explicit int to test plan storage injection, or ``None`` for a plan
+    with no storage quota.
+    """
+    user = users.create_user(db_session, payload=users.UserCreate(email="reconcile-user@example.com"))
+    product = products.create_product(
+        db_session,
+        payload=products.ProductCreate(name="reconcile-product", description="desc"),
+    )
+    schema = {
+        "type": "object",
+        "properties": {
+            "user": {
+                "type": "object",
+                "properties": {
+                    "message": {"type": "string"},
+                    "domain": {"type": "string", "title": "hostname"},
+                },
+                "additionalProperties": False,
+            },
+            "replicas": {"type": "integer"},
+        },
+        "additionalProperties": False,
+    }
+    template = templates.create_template(
+        db_session,
+        payload=templates.ProductTemplateVersionCreate(
+            product_id=product.id,
+            chart_ref="oci://example/chart",
+            chart_version="1.2.3",
+            system_values_json={"replicas": 1},
+            values_schema_json=schema,
+            health_timeout_sec=120,
+        ),
+    )
+    product_orm = db_session.get(ProductORM, product.id)
+    product_orm.template_id = template.id
+    db_session.add(product_orm)
+    db_session.commit()
+    ptv_id = _create_plan_template(db_session, product.id, storage_bytes)
+    deployment = deployments.create_deployment(
+        db_session,
+        payload=DeploymentCreate(
+            user_id=user.id,
+            desired_template_id=template.id,
+            user_values_json={"user": {"message": "hello", "domain": "reconcile.example.test"}},
+            plan_template_id=ptv_id,
+        ),
+    ).deployment
+    return deployment.id
+
+
 ADMIN_EMAIL = "test@example.com"
 AUTH_HEADER = {"X-Auth-Request-Email": ADMIN_EMAIL}
 
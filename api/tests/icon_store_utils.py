@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+
+class FakeS3Client:
+    """In-memory stand-in for the subset of the boto3 S3 client the icon store uses."""
+
+    def __init__(self, *, page_size: int = 1000) -> None:
+        self.objects: dict[tuple[str, str], dict] = {}
+        self.page_size = page_size
+
+    def put_object(self, *, Bucket, Key, Body, ContentType, CacheControl):
+        self.objects[(Bucket, Key)] = {
+            "Body": Body,
+            "ContentType": ContentType,
+            "CacheControl": CacheControl,
+            "LastModified": datetime.now(UTC),
+        }
+
+    def list_objects_v2(self, *, Bucket, Prefix, ContinuationToken=None):
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + self.page_size]
+        result = {
+            "Contents": [
+                {"Key": key, "LastModified": self.objects[(Bucket, key)]["LastModified"]} for key in page
+            ],
+            "IsTruncated": start + self.page_size < len(keys),
+        }
+        if result["IsTruncated"]:
+            result["NextContinuationToken"] = str(start + self.page_size)
+        return result
+
+    def delete_objects(self, *, Bucket, Delete):
+        for obj in Delete["Objects"]:
+            self.objects.pop((Bucket, obj["Key"]), None)
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeMollieServer:
+    """Local HTTP server answering ``GET /v2/payments/{id}`` like the Mollie API.
+
+    Records each request's path and client port (to observe connection reuse).
+    Use as a context manager; ``url`` is the base URL to hand to the SDK.
+    """
+
+    def __init__(self) -> None:
+        self.payments: dict[str, dict] = {}
+        self.requests: list[tuple[str, int]] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                server.requests.append((self.path, self.client_address[1]))
+                payment_id = self.path.rsplit("/", 1)[-1]
+                if payment_id not in server.payments:
+                    self._send(404, {"status": 404, "title": "Not Found", "detail": "No payment exists"})
+                    return
+                self._send(200, server.payments[payment_id])
+
+            def _send(self, code: int, body: dict) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/hal+json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def add_payment(self, payment_id: str, status: str = "open", **extra) -> None:
+        self.payments[payment_id] = {
+            "resource": "payment",
+            "id": payment_id,
+            "mode": "test",
+            "description": "test payment",
+            "amount": {"currency": "EUR", "value": "10.00"},
+            "sequenceType": "first",
+            "profileId": "pfl_test",
+            "status": status,
+            "createdAt": "2026-01-01T00:00:00+00:00",
+            "_links": {
+                "self": {"href": f"{self.url}/v2/payments/{payment_id}", "type": "application/hal+json"},
+                "dashboard": {"href": "https://example.com", "type": "text/html"},
+            },
+            **extra,
+        }
+
+    def __enter__(self) -> FakeMollieServer:
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
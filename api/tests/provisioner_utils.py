@@ -1,13 +1,22 @@
 from __future__ import annotations
 
+from app.provisioner import HelmReleaseStatusResult
+
 
 class FakeProvisioner:
     def __init__(self) -> None:
         self.calls: list[tuple[str, dict]] = []
         self.raise_on_upgrade: Exception | None = None
+        # (namespace, release) -> ReleaseReadiness reported by release_readiness
+        self.readiness: dict = {}
+        # namespace -> phase reported by list_namespaces
+        self.namespaces: dict[str, str] = {}
+        # (namespace, release) -> status reported by helm_get_release_status
+        self.release_status: dict[tuple[str, str], str] = {}
 
     def ensure_namespace(self, *, name: str):
         self.calls.append(("ensure_namespace", {"name": name}))
+        self.namespaces[name] = "Active"
         return None
 
     def helm_upgrade_install(
@@ -52,6 +61,29 @@ class FakeProvisioner:
         )
         return None
 
-    def delete_namespace(self, *, name: str):
-        self.calls.append(("delete_namespace", {"name": name}))
+    def delete_namespace(self, *, name: str, wait: bool = True):
+        self.calls.append(("delete_namespace", {"name": name, "wait": wait}))
+        if wait:
+            self.namespaces.pop(name, None)
+        elif name in self.namespaces:
+            self.namespaces[name] = "Terminating"
+        return None
+
+    def list_namespaces(self):
+        self.calls.append(("list_namespaces", {}))
+        return dict(self.namespaces)
+
+    def helm_rollback(self, *, release_name: str, namespace: str, timeout: int):
+        self.calls.append(("helm_rollback", {"release_name": release_name, "namespace": namespace}))
         return None
+
+    def release_readiness(self, *, namespaces=None):
+        self.calls.append(("release_readiness", {"namespaces": namespaces}))
+        return dict(self.readiness)
+
+    def helm_get_release_status(self, *, release_name: str, namespace: str):
+        self.calls.append(("helm_get_release_status", {"release_name": release_name, "namespace": namespace}))
+        status = self.release_status.get((namespace, release_name))
+        return HelmReleaseStatusResult(
+            release_name=release_name, namespace=namespace, exists=status is not None, status=status
+        )
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.services.resolver import ResolutionError
+
+
+class StubResolver:
+    """In-memory resolver: maps names to addresses; unknown names do not resolve.
+
+    With *workers*, at most that many queries are answered at once and the
+    rest queue, like ``getaddrinfo`` calls on a thread pool.
+    """
+
+    def __init__(
+        self, records: dict[str, set[str]] | None = None, *, delay: float = 0.0, workers: int | None = None
+    ) -> None:
+        self.records = records or {}
+        self.delay = delay
+        self.queries: list[str] = []
+        self._workers = asyncio.Semaphore(workers) if workers else None
+        self.active = 0
+        self.max_active = 0
+
+    async def resolve(self, fqdn: str) -> frozenset[str]:
+        self.queries.append(fqdn)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if self._workers is not None:
+                async with self._workers:
+                    await asyncio.sleep(self.delay)
+            elif self.delay:
+                await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if fqdn not in self.records:
+            raise ResolutionError(f"NXDOMAIN {fqdn}")
+        return frozenset(self.records[fqdn])
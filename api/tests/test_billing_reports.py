@@ -0,0 +1,135 @@
+"""Tests for aggregated billing reports and the materialized summary."""
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlmodel import select
+
+from app.config import get_settings
+from app.models import (
+    BillingInterval,
+    BillingSummaryDirtyORM,
+    MolliePaymentORM,
+    MolliePaymentStatus,
+    PaymentStatus,
+    PlanTemplateVersionORM,
+    ProductORM,
+    SubscriptionORM,
+    SubscriptionStatus,
+    UserORM,
+)
+from app.services import billing_reports, subscriptions as subscription_service
+from tests.conftest import create_paid_plan_template
+
+
+@pytest.fixture
+def billing_data(db_session):
+    product = ProductORM(name="Wiki", description="")
+    user = UserORM(email="finance@example.com")
+    db_session.add_all([product, user])
+    db_session.commit()
+    monthly = create_paid_plan_template(db_session, product.id, price_cents=1000, name="Pro")
+    annual = create_paid_plan_template(db_session, product.id, price_cents=12000, name="Pro yearly")
+    db_session.get(PlanTemplateVersionORM, annual).billing_interval = BillingInterval.ANNUAL
+    db_session.commit()
+
+    def sub(ptv_id, payment_status, status=SubscriptionStatus.ACTIVE):
+        s = SubscriptionORM(plan_template_id=ptv_id, user_id=user.id, payment_status=payment_status, status=status)
+        db_session.add(s)
+        db_session.flush()
+        return s
+
+    subs = [
+        sub(monthly, PaymentStatus.CURRENT),
+        sub(monthly, PaymentStatus.CURRENT),
+        sub(monthly, PaymentStatus.ARREARS),
+        sub(monthly, PaymentStatus.CURRENT, SubscriptionStatus.CANCELLED),
+        sub(annual, PaymentStatus.CURRENT),
+        sub(annual, PaymentStatus.PENDING),
+    ]
+    old = datetime.now(UTC) - timedelta(days=60)
+    for i, (s, status, created_at) in enumerate([
+        (subs[0], MolliePaymentStatus.PAID, old),
+        (subs[0], MolliePaymentStatus.PAID, None),
+        (subs[2], MolliePaymentStatus.FAILED, None),
+        (subs[4], MolliePaymentStatus.PAID, None),
+    ]):
+        payment = MolliePaymentORM(
+            subscription_id=s.id,
+            mollie_payment_id=f"tr_report_{i}",
+            status=status,
+            sequence_type="recurring",
+            amount_cents=s.plan_template.price_cents,
+        )
+        if created_at:
+            payment.created_at = created_at
+        db_session.add(payment)
+    db_session.commit()
+    return {"monthly": monthly, "annual": annual, "subs": subs}
+
+
+def test_billing_report_aggregates_per_plan(db_session, billing_data):
+    report = billing_reports.billing_report(db_session, materialized=False)
+
+    assert (report.active, report.current, report.arrears, report.pending) == (5, 3, 1, 1)
+    # 2 x 10.00 monthly + 1 x 120.00 yearly (10.00 per month)
+    assert report.mrr_cents == 3000
+    assert report.revenue_cents == 1000 + 1000 + 12000
+    by_plan = {p.plan_name: p for p in report.plans}
+    assert (by_plan["Pro"].active, by_plan["Pro"].arrears, by_plan["Pro"].mrr_cents) == (3, 1, 2000)
+    assert (by_plan["Pro yearly"].pending, by_plan["Pro yearly"].mrr_cents) == (1, 1000)
+
+    recent = billing_reports.billing_report(db_session, since=datetime.now(UTC) - timedelta(days=30))
+    assert recent.revenue_cents == 1000 + 12000
+    assert recent.mrr_cents == 3000
+
+
+def test_materialized_summary_refreshes_incrementally(db_session, billing_data, monkeypatch):
+    monkeypatch.setenv("CAELUS_BILLING_SUMMARY_MATERIALIZED", "true")
+    get_settings.cache_clear()
+    billing_reports.register_listeners()
+
+    assert billing_reports.refresh_summary(db_session, full=True) == 2
+    stored = billing_reports.billing_report(db_session)
+    live = billing_reports.billing_report(db_session, materialized=False)
+    assert stored.materialized
+    assert stored.model_dump(exclude={"as_of", "materialized"}) == live.model_dump(exclude={"as_of", "materialized"})
+
+    # A change marks only its plan template dirty, and the report lags until refreshed.
+    subscription_service.cancel_subscription(db_session, subscription_id=billing_data["subs"][0].id)
+    dirty = db_session.exec(select(BillingSummaryDirtyORM.plan_template_id)).all()
+    assert set(dirty) == {billing_data["monthly"]}
+    assert billing_reports.billing_report(db_session).mrr_cents == 3000
+
+    assert billing_reports.refresh_summary(db_session) == 1
+    assert db_session.exec(select(BillingSummaryDirtyORM)).all() == []
+    report = billing_reports.billing_report(db_session)
+    assert report.materialized
+    assert report.mrr_cents == 2000
+    assert report.mrr_cents == billing_reports.billing_report(db_session, materialized=False).mrr_cents
+    assert billing_reports.refresh_summary(db_session) == 0
+
+
+def test_materialized_report_is_live_until_the_first_refresh_seeds_it(db_session, billing_data, monkeypatch):
+    monkeypatch.setenv("CAELUS_BILLING_SUMMARY_MATERIALIZED", "true")
+    get_settings.cache_clear()
+
+    before = billing_reports.billing_report(db_session)
+    assert not before.materialized
+    assert before.mrr_cents == 3000
+
+    # No dirty markers yet, but an empty summary is seeded in full.
+    assert billing_reports.refresh_summary(db_session) == 2
+    after = billing_reports.billing_report(db_session)
+    assert after.materialized
+    assert after.model_dump(exclude={"as_of", "materialized"}) == before.model_dump(exclude={"as_of", "materialized"})
+
+
+def test_billing_report_endpoint(client, db_session, billing_data):
+    resp = client.get("/api/billing/report")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["mrr_cents"] == 3000
+    assert body["materialized"] is False
+    assert {p["plan_name"] for p in body["plans"]} == {"Pro", "Pro yearly"}
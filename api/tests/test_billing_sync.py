@@ -0,0 +1,128 @@
+"""Tests for reconciling local billing state with Mollie (billing sync)."""
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+from sqlmodel import select
+
+from app.models import (
+    DeploymentORM,
+    DeploymentReconcileJobORM,
+    MolliePaymentORM,
+    MolliePaymentStatus,
+    PaymentStatus,
+    SubscriptionORM,
+)
+from app.services.billing_sync import sync_billing
+from app.services.outbox import dispatch_batch
+from app.services.reconcile_constants import DEPLOYMENT_STATUS_PROVISIONING
+from tests.test_mollie_integration import (
+    _complete_first_payment,
+    _create_paid_deployment,
+    _get_mollie_payment,
+    _setup_product_and_template,
+)
+
+SINCE = datetime.now(UTC) - timedelta(days=35)
+
+
+def _paid_deployment(client, db_session):
+    product_id, template_id = _setup_product_and_template(client)
+    _, resp = _create_paid_deployment(client, db_session, product_id, template_id)
+    assert resp.status_code == 201
+    return resp.json()["deployment"]
+
+
+def test_missed_first_payment_webhook_is_applied(paid_client, fake_payment_provider, db_session):
+    deployment = _paid_deployment(paid_client, db_session)
+    mp = _get_mollie_payment(db_session, deployment["subscription_id"])
+    # Paid at Mollie, but the webhook never arrived.
+    fake_payment_provider.simulate_paid(mp.mollie_payment_id)
+
+    dry = sync_billing(db_session, fake_payment_provider, since=SINCE, dry_run=True)
+    assert dry.payments_corrected == [mp.mollie_payment_id]
+    db_session.expire_all()
+    assert db_session.get(SubscriptionORM, deployment["subscription_id"]).payment_status == PaymentStatus.PENDING
+
+    report = sync_billing(db_session, fake_payment_provider, since=SINCE)
+    assert report.payments_corrected == [mp.mollie_payment_id]
+    assert report.errors == []
+    dispatch_batch(db_session, fake_payment_provider, worker_id="test")
+
+    db_session.expire_all()
+    sub = db_session.get(SubscriptionORM, deployment["subscription_id"])
+    assert sub.payment_status == PaymentStatus.CURRENT
+    assert sub.mollie_subscription_id is not None
+    assert db_session.get(DeploymentORM, UUID(deployment["id"])).status == DEPLOYMENT_STATUS_PROVISIONING
+    assert len(db_session.exec(select(DeploymentReconcileJobORM)).all()) == 1
+
+    # Nothing left to correct on the next run.
+    assert sync_billing(db_session, fake_payment_provider, since=SINCE).payments_corrected == []
+
+
+def test_missed_recurring_payment_and_suspension(paid_client, fake_payment_provider, db_session):
+    deployment = _paid_deployment(paid_client, db_session)
+    sub_id = deployment["subscription_id"]
+    _complete_first_payment(paid_client, fake_payment_provider, db_session, sub_id)
+    sub = db_session.get(SubscriptionORM, sub_id)
+
+    fake_payment_provider.payments["tr_missed_recurring"] = {
+        "status": "failed",
+        "customer_id": sub.user.mollie_customer_id,
+        "amount_cents": 1000,
+        "metadata": None,
+        "mandate_id": sub.mollie_mandate_id,
+        "subscription_id": sub.mollie_subscription_id,
+        "sequence_type": "recurring",
+    }
+    # Too old to be listed, and unrelated to any local subscription.
+    fake_payment_provider.payments["tr_ancient"] = {
+        "status": "paid",
+        "metadata": None,
+        "subscription_id": "sub_unknown",
+        "created_at": datetime.now(UTC) - timedelta(days=400),
+    }
+
+    report = sync_billing(db_session, fake_payment_provider, since=SINCE)
+    assert report.payments_corrected == ["tr_missed_recurring"]
+    db_session.expire_all()
+    recurring = db_session.exec(
+        select(MolliePaymentORM).where(MolliePaymentORM.mollie_payment_id == "tr_missed_recurring")
+    ).one()
+    assert recurring.status == MolliePaymentStatus.FAILED
+    assert db_session.get(SubscriptionORM, sub_id).payment_status == PaymentStatus.ARREARS
+
+    # Recovered locally, but Mollie has since suspended the subscription.
+    sub = db_session.get(SubscriptionORM, sub_id)
+    sub.payment_status = PaymentStatus.CURRENT
+    db_session.commit()
+    fake_payment_provider.subscriptions[sub.mollie_subscription_id]["status"] = "suspended"
+    report = sync_billing(db_session, fake_payment_provider, since=SINCE)
+    assert report.subscriptions_corrected == [sub_id]
+    db_session.expire_all()
+    assert db_session.get(SubscriptionORM, sub_id).payment_status == PaymentStatus.ARREARS
+
+    fake_payment_provider.subscriptions[sub.mollie_subscription_id]["status"] = "canceled"
+    report = sync_billing(db_session, fake_payment_provider, since=SINCE)
+    assert report.subscriptions_corrected == []
+    assert len(report.discrepancies) == 1
+
+
+def test_paid_first_payment_without_mollie_subscription_is_retried(paid_client, fake_payment_provider, db_session):
+    deployment = _paid_deployment(paid_client, db_session)
+    sub_id = deployment["subscription_id"]
+    _complete_first_payment(paid_client, fake_payment_provider, db_session, sub_id)
+    # Creating the Mollie subscription failed after the payment was recorded.
+    sub = db_session.get(SubscriptionORM, sub_id)
+    fake_payment_provider.subscriptions.clear()
+    sub.mollie_subscription_id = None
+    db_session.commit()
+
+    report = sync_billing(db_session, fake_payment_provider, since=SINCE)
+    assert report.payments_corrected == [_get_mollie_payment(db_session, sub_id).mollie_payment_id]
+    # The creation is queued again in the outbox and delivered by the worker.
+    dispatch_batch(db_session, fake_payment_provider, worker_id="test")
+    db_session.expire_all()
+    assert db_session.get(SubscriptionORM, sub_id).mollie_subscription_id is not None
+    assert len(fake_payment_provider.subscriptions) == 1
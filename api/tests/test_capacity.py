@@ -0,0 +1,134 @@
+"""Tests for capacity admission of deployments."""
+from __future__ import annotations
+
+import pytest
+from sqlmodel import select
+
+from app.config import get_settings
+from app.models import (
+    DeploymentCreate,
+    DeploymentORM,
+    DeploymentUpdate,
+    PlanTemplateVersionORM,
+    ProductORM,
+    UserORM,
+)
+from app.services import capacity, deployments, products, templates, users
+from app.services.errors import CapacityException
+from app.services.jobs import JobService
+from app.services.reconcile import DeploymentReconciler
+from tests.conftest import ADMIN_EMAIL, create_free_plan_template
+from tests.provisioner_utils import FakeProvisioner
+
+GIB = 1024**3
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setenv("CAELUS_CAPACITY_MEMORY_BYTES", str(5 * GIB))
+    monkeypatch.setenv("CAELUS_CAPACITY_STORAGE_BYTES", str(100 * GIB))
+    get_settings.cache_clear()
+
+
+def _template(db_session, product_id, *, memory_bytes, version="1.0.0"):
+    template = templates.create_template(
+        db_session,
+        payload=templates.ProductTemplateVersionCreate(
+            product_id=product_id,
+            chart_ref="oci://example/immich",
+            chart_version=version,
+            footprint_cpu_millicores=500,
+            footprint_memory_bytes=memory_bytes,
+            footprint_storage_bytes=GIB,
+        ),
+    )
+    product = db_session.get(ProductORM, product_id)
+    product.template_id = template.id
+    db_session.commit()
+    return template
+
+
+@pytest.fixture
+def immich(db_session):
+    product = products.create_product(db_session, payload=products.ProductCreate(name="immich", description=""))
+    template = _template(db_session, product.id, memory_bytes=2 * GIB)
+    ptv_id = create_free_plan_template(db_session, product.id)
+    db_session.get(PlanTemplateVersionORM, ptv_id).storage_bytes = 10 * GIB
+    db_session.commit()
+    return product, template, ptv_id
+
+
+def _create(db_session, template, ptv_id, n):
+    user = users.create_user(db_session, payload=users.UserCreate(email=f"cap{n}@example.com"))
+    return deployments.create_deployment(
+        db_session,
+        payload=DeploymentCreate(user_id=user.id, desired_template_id=template.id, plan_template_id=ptv_id),
+    ).deployment
+
+
+def _drain_jobs(db_session):
+    jobs = JobService(db_session)
+    while job := jobs.claim_next_job(worker_id="test"):
+        DeploymentReconciler(session=db_session, provisioner=FakeProvisioner()).reconcile(job.deployment_id)
+        jobs.mark_job_done(job_id=job.id)
+
+
+def test_create_rejects_deployments_that_do_not_fit(db_session, immich, limits):
+    _, template, ptv_id = immich
+
+    first = _create(db_session, template, ptv_id, 1)
+    _create(db_session, template, ptv_id, 2)
+    with pytest.raises(CapacityException, match="memory"):
+        _create(db_session, template, ptv_id, 3)
+
+    report = capacity.get_capacity(db_session)
+    assert report.memory_bytes.committed == 4 * GIB
+    assert report.memory_bytes.available == GIB
+    assert report.storage_bytes.committed == 2 * 11 * GIB
+    assert report.cpu_millicores.committed == 1000 and report.cpu_millicores.limit is None
+    assert db_session.get(DeploymentORM, first.id).reserved_memory_bytes == 2 * GIB
+
+
+def test_delete_releases_and_update_adjusts_reservation(db_session, immich, limits):
+    product, template, ptv_id = immich
+    first = _create(db_session, template, ptv_id, 1)
+    second = _create(db_session, template, ptv_id, 2)
+    _drain_jobs(db_session)
+
+    # Upgrading to a template that needs more memory than is left is rejected.
+    bigger = _template(db_session, product.id, memory_bytes=4 * GIB, version="2.0.0")
+    with pytest.raises(CapacityException):
+        deployments.update_deployment(
+            db_session, DeploymentUpdate(id=first.id, user_id=first.user_id, desired_template_id=bigger.id)
+        )
+    assert db_session.get(DeploymentORM, first.id).desired_template_id == template.id
+
+    deployments.delete_deployment(db_session, user_id=second.user_id, deployment_id=second.id)
+    assert capacity.get_capacity(db_session).memory_bytes.committed == 4 * GIB
+    _drain_jobs(db_session)
+    assert capacity.get_capacity(db_session).memory_bytes.committed == 2 * GIB
+
+    updated = deployments.update_deployment(
+        db_session, DeploymentUpdate(id=first.id, user_id=first.user_id, desired_template_id=bigger.id)
+    )
+    assert updated.desired_template_id == bigger.id
+    assert capacity.get_capacity(db_session).memory_bytes.committed == 4 * GIB
+    assert capacity.rebuild_ledger(db_session).memory_bytes.committed == 4 * GIB
+
+
+def test_capacity_api_and_rejection_status(client, db_session, immich, monkeypatch):
+    _, template, ptv_id = immich
+    monkeypatch.setenv("CAELUS_CAPACITY_MEMORY_BYTES", str(GIB))
+    get_settings.cache_clear()
+
+    admin = db_session.exec(select(UserORM).where(UserORM.email == ADMIN_EMAIL)).one()
+    resp = client.post(
+        f"/api/users/{admin.id}/deployments",
+        json={"desired_template_id": template.id, "plan_template_id": ptv_id},
+    )
+    assert resp.status_code == 409
+    assert "Insufficient cluster capacity" in resp.json()["detail"]
+
+    resp = client.get("/api/capacity")
+    assert resp.status_code == 200
+    assert resp.json()["memory_bytes"] == {"committed": 0, "limit": GIB, "available": GIB}
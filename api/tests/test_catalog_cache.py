@@ -0,0 +1,143 @@
+"""Tests for catalog ETags, conditional GETs and the serialized response cache."""
+import pytest
+
+from app.models import PlanCreate, PlanORM
+from app.models.core import _utcnow
+from app.services import catalog as catalog_service
+from app.services import plans as plan_service
+from app.services import products as product_service
+from tests.conftest import create_free_plan_template
+
+
+@pytest.fixture(autouse=True)
+def _clear_catalog_cache():
+    catalog_service.clear_cache()
+    yield
+    catalog_service.clear_cache()
+
+
+def _create_product(client, name="catalog-product"):
+    resp = client.post("/api/products", json={"name": name, "description": "desc"})
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+
+def test_list_products_sets_strong_etag(client):
+    _create_product(client)
+    resp = client.get("/api/products")
+    assert resp.status_code == 200
+    etag = resp.headers["etag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+    assert resp.headers["cache-control"] == "private, no-cache"
+    assert [p["name"] for p in resp.json()] == ["catalog-product"]
+
+
+def test_if_none_match_returns_304_without_loading(client, monkeypatch):
+    _create_product(client)
+    etag = client.get("/api/products").headers["etag"]
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("catalog should not be queried on a cache hit")
+
+    monkeypatch.setattr(product_service, "list_products", _fail)
+    resp = client.get("/api/products", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+    assert resp.content == b""
+
+    # Unconditional requests are served from the cached body.
+    resp = client.get("/api/products")
+    assert resp.status_code == 200
+    assert resp.headers["etag"] == etag
+    assert resp.json()[0]["name"] == "catalog-product"
+
+
+def test_weak_and_wildcard_if_none_match(client):
+    _create_product(client)
+    etag = client.get("/api/products").headers["etag"]
+    assert client.get("/api/products", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get("/api/products", headers={"If-None-Match": '"x", *'}).status_code == 304
+    assert client.get("/api/products", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_product_write_changes_etag(client):
+    product_id = _create_product(client)
+    etag = client.get("/api/products").headers["etag"]
+
+    resp = client.put(f"/api/products/{product_id}", json={"description": "updated"})
+    assert resp.status_code == 200
+
+    resp = client.get("/api/products", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
+    assert resp.json()[0]["description"] == "updated"
+
+
+def test_template_write_invalidates_template_list(client):
+    product_id = _create_product(client)
+    resp = client.get(f"/api/products/{product_id}/templates")
+    assert resp.json() == []
+    etag = resp.headers["etag"]
+
+    client.post(
+        f"/api/products/{product_id}/templates",
+        json={"chart_ref": "oci://example/chart", "chart_version": "1.0.0"},
+    )
+    resp = client.get(f"/api/products/{product_id}/templates", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert [t["chart_version"] for t in resp.json()] == ["1.0.0"]
+
+
+def test_direct_session_writes_invalidate_plan_list(client, db_session):
+    product_id = _create_product(client)
+    create_free_plan_template(db_session, product_id)
+    resp = client.get(f"/api/products/{product_id}/plans")
+    assert [p["name"] for p in resp.json()] == ["Free"]
+    etag = resp.headers["etag"]
+
+    db_session.add(PlanORM(name="Extra", product_id=product_id, created_at=_utcnow()))
+    db_session.commit()
+
+    resp = client.get(f"/api/products/{product_id}/plans", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert sorted(p["name"] for p in resp.json()) == ["Extra", "Free"]
+
+
+def test_rolled_back_write_keeps_etag(client, db_session):
+    _create_product(client)
+    etag = client.get("/api/products").headers["etag"]
+
+    db_session.add(PlanORM(name="Ghost", product_id=999, created_at=_utcnow()))
+    db_session.flush()
+    db_session.rollback()
+
+    assert client.get("/api/products", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_plans_for_unknown_product_still_404(client):
+    _create_product(client)
+    assert client.get("/api/products/999/plans").status_code == 404
+
+
+def test_unknown_product_never_answers_304(client):
+    _create_product(client)
+    etag = client.get("/api/products").headers["etag"]
+    for validator in ("*", etag):
+        resp = client.get("/api/products/999/plans", headers={"If-None-Match": validator})
+        assert resp.status_code == 404
+
+
+def test_init_db_seeds_catalog_revision(db_session):
+    etag = catalog_service.current_etag(db_session)
+    assert etag is not None and etag.endswith('-1"')
+
+
+def test_non_catalog_writes_do_not_bump_revision(client, db_session):
+    product_id = _create_product(client)
+    etag = catalog_service.current_etag(db_session)
+    client.get("/api/me", headers={"X-Auth-Request-Email": "someone-new@example.com"})
+    catalog_service.clear_cache()
+    assert catalog_service.current_etag(db_session) == etag
+    plan_service.create_plan(db_session, product_id=product_id, payload=PlanCreate(name="p"))
+    catalog_service.clear_cache()
+    assert catalog_service.current_etag(db_session) != etag
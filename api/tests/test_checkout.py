@@ -0,0 +1,126 @@
+"""Tests for the outbox-driven checkout step of paid deployments."""
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+from sqlmodel import select
+
+from app.config import get_settings
+from app.models import CheckoutRead, MolliePaymentORM, OutboxORM
+from app.services import checkout as checkout_service, outbox as outbox_service
+from tests.conftest import create_paid_plan_template
+from tests.test_mollie_integration import _get_user, _setup_product_and_template
+
+
+def _post_paid_deployment(client, db_session):
+    product_id, template_id = _setup_product_and_template(client)
+    ptv_id = create_paid_plan_template(db_session, product_id)
+    user_id = _get_user(client)["id"]
+    resp = client.post(
+        f"/api/users/{user_id}/deployments",
+        json={"desired_template_id": template_id, "plan_template_id": ptv_id},
+    )
+    assert resp.status_code == 201
+    return user_id, resp.json()
+
+
+def _make_due(db_session):
+    for row in db_session.exec(select(OutboxORM)).all():
+        row.run_after = datetime.now(UTC) - timedelta(seconds=1)
+    db_session.commit()
+
+
+def test_mollie_calls_run_outside_db_transactions(paid_client, fake_payment_provider, db_session):
+    seen = []
+    for name in ("ensure_customer", "create_first_payment"):
+        original = getattr(fake_payment_provider, name)
+
+        def call(*args, _name=name, _original=original, **kwargs):
+            seen.append((_name, db_session.in_transaction(), kwargs.get("idempotency_key")))
+            return _original(*args, **kwargs)
+
+        setattr(fake_payment_provider, name, call)
+
+    _, data = _post_paid_deployment(paid_client, db_session)
+    assert data["checkout_status"] == "ready"
+    deployment_id = data["deployment"]["id"]
+    assert seen == [
+        ("ensure_customer", False, f"customer_{deployment_id}"),
+        ("create_first_payment", False, f"first_payment_{deployment_id}"),
+    ]
+    assert db_session.exec(select(OutboxORM)).one().status == outbox_service.OUTBOX_STATUS_DONE
+
+
+def test_deferred_checkout_is_delivered_by_worker(paid_client, fake_payment_provider, db_session, monkeypatch):
+    monkeypatch.setenv("CAELUS_CHECKOUT_INLINE", "false")
+    get_settings.cache_clear()
+
+    user_id, data = _post_paid_deployment(paid_client, db_session)
+    assert data["checkout_url"] is None
+    assert data["checkout_status"] == "pending"
+    assert fake_payment_provider.payments == {}
+    url = f"/api/users/{user_id}/deployments/{data['deployment']['id']}/checkout"
+    assert paid_client.get(url).json() == {"status": "pending", "checkout_url": None, "last_error": None}
+
+    results = outbox_service.dispatch_batch(db_session, fake_payment_provider, worker_id="test")
+    assert [r.status for r in results] == ["done"]
+    # A second delivery of the same row is a no-op.
+    assert outbox_service.dispatch_batch(db_session, fake_payment_provider, worker_id="test") == []
+
+    checkout = paid_client.get(url).json()
+    assert checkout["status"] == "ready"
+    payment = db_session.exec(select(MolliePaymentORM)).one()
+    assert checkout["checkout_url"] == payment.checkout_url
+
+
+def test_checkout_long_poll_waits_for_ready(paid_client, db_session, monkeypatch):
+    monkeypatch.setenv("CAELUS_CHECKOUT_INLINE", "false")
+    monkeypatch.setenv("CAELUS_CHECKOUT_POLL_INTERVAL_SECONDS", "0.01")
+    get_settings.cache_clear()
+    user_id, data = _post_paid_deployment(paid_client, db_session)
+
+    states = iter([
+        CheckoutRead(status="pending"),
+        CheckoutRead(status="pending"),
+        CheckoutRead(status="ready", checkout_url="https://fake.mollie.com/checkout/tr_x"),
+    ])
+    monkeypatch.setattr(checkout_service, "get_checkout", lambda *args, **kwargs: next(states))
+
+    resp = paid_client.get(f"/api/users/{user_id}/deployments/{data['deployment']['id']}/checkout?wait=5")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "ready"
+
+
+def test_checkout_fails_after_max_attempts(paid_client, fake_payment_provider, db_session, monkeypatch):
+    monkeypatch.setenv("CAELUS_OUTBOX_MAX_ATTEMPTS", "2")
+    get_settings.cache_clear()
+
+    def failing(*args, **kwargs):
+        raise RuntimeError("Mollie API unreachable")
+
+    fake_payment_provider.ensure_customer = failing
+    user_id, data = _post_paid_deployment(paid_client, db_session)
+    assert data["checkout_status"] == "pending"
+
+    _make_due(db_session)
+    results = outbox_service.dispatch_batch(db_session, fake_payment_provider, worker_id="test")
+    assert [r.status for r in results] == ["failed"]
+    checkout = paid_client.get(f"/api/users/{user_id}/deployments/{data['deployment']['id']}/checkout").json()
+    assert checkout["status"] == "failed"
+    assert "Mollie API unreachable" in checkout["last_error"]
+
+
+def test_checkout_skipped_for_deleted_deployment(paid_client, fake_payment_provider, db_session, monkeypatch):
+    monkeypatch.setenv("CAELUS_CHECKOUT_INLINE", "false")
+    get_settings.cache_clear()
+    user_id, data = _post_paid_deployment(paid_client, db_session)
+
+    resp = paid_client.delete(f"/api/users/{user_id}/deployments/{data['deployment']['id']}")
+    assert resp.status_code == 204
+
+    results = outbox_service.dispatch_batch(db_session, fake_payment_provider, worker_id="test")
+    assert [r.status for r in results] == ["done"]
+    assert fake_payment_provider.payments == {}
+    assert paid_client.get(
+        f"/api/users/{user_id}/deployments/{data['deployment']['id']}/checkout"
+    ).json()["status"] == "not_required"
@@ -162,6 +162,23 @@ def test_cli_user_flow(cli_runner):
     assert "cli@example.com" in emails
 
 
+def test_cli_check_hostnames(cli_runner, tmp_path):
+    runner, app = cli_runner
+    names = tmp_path / "hosts.txt"
+    names.write_text("two.example.com\n\nbad\n")
+
+    result = runner.invoke(app, ["check-hostnames", "One.example.com", "--file", str(names)])
+    assert result.exit_code == 0
+    assert _parse_yaml_stdout(result) == [
+        {"fqdn": "one.example.com", "usable": True, "reason": None},
+        {"fqdn": "two.example.com", "usable": True, "reason": None},
+        {"fqdn": "bad", "usable": False, "reason": "invalid"},
+    ]
+
+    result = runner.invoke(app, ["check-hostnames"])
+    assert result.exit_code == 1
+
+
 def test_cli_product_flow(cli_runner):
     """Test creating, listing, and deleting a product via CLI."""
     runner, app = cli_runner
@@ -1145,3 +1162,99 @@ def test_cli_list_deployments_all_forbidden_for_non_admin(cli_runner):
     result = runner.invoke(app, ["list-deployments", "--all"])
     assert result.exit_code == 1
     assert "admin" in result.output.lower()
+
+
+def test_cli_gc_icons(cli_runner, static_dir):
+    runner, app = cli_runner
+    orphan = static_dir / "icons" / f"{'e' * 40}.png"
+    orphan.write_bytes(b"orphan")
+
+    result = runner.invoke(app, ["gc-icons", "--min-age-hours", "0", "--dry-run"])
+    assert result.exit_code == 0
+    assert _parse_yaml_stdout(result) == {"dry_run": True, "removed": [f"icons/{'e' * 40}.png"]}
+    assert orphan.exists()
+
+    result = runner.invoke(app, ["gc-icons", "--min-age-hours", "0"])
+    assert result.exit_code == 0
+    assert not orphan.exists()
+
+
+def test_cli_billing_sync_requires_payment_provider(cli_runner, monkeypatch):
+    runner, app = cli_runner
+    monkeypatch.delenv("CAELUS_MOLLIE_API_KEY", raising=False)
+
+    result = runner.invoke(app, ["billing-sync", "--dry-run"])
+    assert result.exit_code == 1
+    assert "no payment provider configured" in result.output
+
+
+def test_cli_outbox_stats(cli_runner):
+    runner, app = cli_runner
+
+    result = runner.invoke(app, ["outbox-stats", "--window-minutes", "5"])
+    assert result.exit_code == 0
+    assert _parse_yaml_stdout(result) == {"window_seconds": 300.0, "kinds": []}
+
+
+def test_cli_billing_report(cli_runner):
+    runner, app = cli_runner
+
+    result = runner.invoke(app, ["billing-report", "--refresh"])
+    assert result.exit_code == 0
+    report = _parse_yaml_stdout(result)
+    assert (report["mrr_cents"], report["plans"]) == (0, [])
+
+
+def test_cli_price_sweep_prints_csv(cli_runner):
+    runner, app = cli_runner
+
+    result = runner.invoke(
+        app,
+        ["price-sweep", "--cpu-cores", "0.1,0.25", "--ram-gb", "1", "--storage-gb", "50,500",
+         "--cost-model-json", '{"mode": "component"}'],
+    )
+    assert result.exit_code == 0, result.output
+    lines = result.stdout.strip().splitlines()
+    assert lines[0].split(",")[:4] == ["cpu_cores", "ram_gb", "storage_gb", "bandwidth_gb_mo"]
+    assert "price" in lines[0].split(",")
+    assert len(lines) == 5
+
+    result = runner.invoke(app, ["price-sweep", "--cpu-cores", "x", "--ram-gb", "1", "--storage-gb", "1"])
+    assert result.exit_code == 1
+
+
+def test_cli_capacity(cli_runner):
+    runner, app = cli_runner
+
+    result = runner.invoke(app, ["capacity", "--rebuild"])
+    assert result.exit_code == 0, result.output
+    report = _parse_yaml_stdout(result)
+    assert report["memory_bytes"] == {"committed": 0, "limit": None, "available": None}
+
+
+def test_cli_purge_tears_down_a_users_deployments(cli_runner, monkeypatch):
+    from app.services import teardown as teardown_service
+    from tests.provisioner_utils import FakeProvisioner
+
+    runner, app = cli_runner
+    user_id, deployment_id = _seed_deployment_via_services()
+    fake_provisioner = FakeProvisioner()
+    monkeypatch.setattr(teardown_service, "default_provisioner", fake_provisioner)
+    with session_scope() as session:
+        # Deletes are refused while the create job is still open.
+        jobs = JobService(session)
+        jobs.mark_job_done(job_id=jobs.claim_next_job(worker_id="w").id)
+
+    result = runner.invoke(app, ["purge", "--user-id", str(user_id), "--concurrency", "4", "--poll-seconds", "0"])
+
+    assert result.exit_code == 0, result.output
+    assert _stdout(result).count("status: deleting") == 1
+    assert _stdout(result).count("status: deleted") == 1
+    assert ("delete_namespace", {"name": _get_deployment_by_id(deployment_id).namespace, "wait": False}) in (
+        fake_provisioner.calls
+    )
+    assert _get_deployment_by_id(deployment_id).status == "deleted"
+
+    result = runner.invoke(app, ["purge", "--concurrency", "0"])
+    assert result.exit_code == 1
+    assert "--concurrency must be >= 1" in result.output
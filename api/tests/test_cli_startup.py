@@ -0,0 +1,54 @@
+"""Import-time budget of the ``caelus`` command line (see app.cli)."""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import subprocess
+import sys
+from typing import get_args
+
+from app.models import BillingInterval
+
+API_ROOT = Path(__file__).resolve().parents[1]
+# `import app.cli` took ~1.7s when it imported every service; it now takes
+# well under 100ms. The budget leaves room for slow CI machines.
+IMPORT_BUDGET_MS = 300
+HEAVY_MODULES = ("app.db", "app.models", "sqlalchemy", "fastapi", "mollie", "PIL", "jsonschema", "yaml", "numpy")
+
+
+def _python(code: str, *flags: str) -> subprocess.CompletedProcess[str]:
+    env = {**os.environ, "PYTHONPATH": str(API_ROOT)}
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], cwd=API_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def _cumulative_ms(importtime: str, module: str) -> float:
+    # Lines read "import time: <self us> | <cumulative us> | <indented module>".
+    for line in importtime.splitlines():
+        if line.startswith("import time:") and line.rsplit("|", 1)[1].strip() == module:
+            return int(line.split("|")[1]) / 1000
+    raise AssertionError(f"{module} not in -X importtime output")
+
+
+def test_cli_import_stays_within_budget():
+    # Best of three, so one slow run on a busy machine does not fail the test.
+    timings = [_cumulative_ms(_python("import app.cli", "-X", "importtime").stderr, "app.cli") for _ in range(3)]
+    assert min(timings) < IMPORT_BUDGET_MS
+
+
+def test_cli_help_does_not_load_services_or_the_database():
+    loaded = _python(
+        "import sys\n"
+        "from typer.testing import CliRunner\n"
+        "from app.cli import app\n"
+        "assert CliRunner().invoke(app, ['--help']).exit_code == 0\n"
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    ).stdout.split()
+    assert loaded == []
+
+
+def test_cli_billing_intervals_match_the_model():
+    from app.cli import _BillingInterval
+
+    assert set(get_args(_BillingInterval)) == {interval.value for interval in BillingInterval}
@@ -0,0 +1,102 @@
+"""Tests for the cluster registry, placement and per-cluster job claiming."""
+from __future__ import annotations
+
+import pytest
+
+from app.config import get_settings
+from app.models import ClusterCreate, ClusterUpdate, DeploymentORM, ProductUpdate
+from app.services import capacity, clusters, products
+from app.services.errors import CapacityException
+from app.services.jobs import JobService
+from tests.test_capacity import GIB, _create, immich  # noqa: F401
+
+
+def _register(db_session, name, *, memory_gib=None, **kwargs):
+    return clusters.create_cluster(
+        db_session,
+        ClusterCreate(
+            name=name,
+            capacity_memory_bytes=memory_gib * GIB if memory_gib is not None else None,
+            **kwargs,
+        ),
+    )
+
+
+def _clusters_of(db_session, created):
+    return [db_session.get(DeploymentORM, d.id).cluster for d in created]
+
+
+def test_without_clusters_deployments_stay_unplaced(db_session, immich):
+    _, template, ptv_id = immich
+    deployment = _create(db_session, template, ptv_id, 1)
+
+    assert deployment.cluster is None
+    job = JobService(db_session).claim_next_job(worker_id="w")
+    assert job.deployment_id == deployment.id and job.cluster is None
+
+
+def test_least_loaded_spreads_and_bin_pack_fills(db_session, immich, monkeypatch):
+    _, template, ptv_id = immich
+    _register(db_session, "east", memory_gib=8)
+    _register(db_session, "west", memory_gib=4)
+
+    # 2 GiB each: east (8) is emptier first, then west, then east again.
+    spread = [_create(db_session, template, ptv_id, n) for n in range(3)]
+    assert _clusters_of(db_session, spread) == ["east", "west", "east"]
+
+    monkeypatch.setenv("CAELUS_PLACEMENT_POLICY", "bin_pack")
+    get_settings.cache_clear()
+    # west would be full (4/4 vs 6/8), so it is filled first, then east.
+    packed = [_create(db_session, template, ptv_id, n) for n in range(3, 6)]
+    assert _clusters_of(db_session, packed) == ["west", "east", "east"]
+    with pytest.raises(CapacityException, match="no cluster has room"):
+        _create(db_session, template, ptv_id, 6)
+
+    by_name = {c.name: c for c in clusters.list_clusters(db_session)}
+    assert by_name["east"].memory_bytes == 8 * GIB and by_name["west"].memory_bytes == 4 * GIB
+    assert capacity.get_capacity(db_session).memory_bytes.committed == 12 * GIB
+    assert [c.memory_bytes for c in capacity.rebuild_ledger(db_session).clusters] == [8 * GIB, 4 * GIB]
+
+
+def test_pinned_products_and_disabled_clusters(db_session, immich):
+    product, template, ptv_id = immich
+    _register(db_session, "east")
+    _register(db_session, "west")
+    products.update_product(db_session, product=ProductUpdate(id=product.id, cluster="west"))
+
+    assert _clusters_of(db_session, [_create(db_session, template, ptv_id, 1)]) == ["west"]
+
+    clusters.update_cluster(db_session, name="west", payload=ClusterUpdate(enabled=False))
+    with pytest.raises(CapacityException, match="no cluster is accepting"):
+        _create(db_session, template, ptv_id, 2)
+
+    products.update_product(db_session, product=ProductUpdate(id=product.id, cluster=""))
+    assert _clusters_of(db_session, [_create(db_session, template, ptv_id, 3)]) == ["east"]
+
+
+def test_workers_only_claim_jobs_of_their_cluster(db_session, immich):
+    _, template, ptv_id = immich
+    _register(db_session, "east", memory_gib=2)
+    _register(db_session, "west", memory_gib=2)
+    first = _create(db_session, template, ptv_id, 1)
+    second = _create(db_session, template, ptv_id, 2)
+    on_east = first if first.cluster == "east" else second
+    jobs = JobService(db_session)
+
+    assert jobs.claim_next_job(worker_id="default") is None
+    claimed = jobs.claim_next_job(worker_id="east-1", cluster="east")
+    assert (claimed.deployment_id, claimed.cluster) == (on_east.id, "east")
+    assert jobs.claim_next_job(worker_id="east-2", cluster="east") is None
+    assert jobs.claim_next_job(worker_id="west-1", cluster="west").cluster == "west"
+
+
+def test_cluster_api(client):
+    resp = client.post("/api/clusters", json={"name": "east", "capacity_memory_bytes": 8 * GIB})
+    assert resp.status_code == 201
+    assert resp.json()["memory_bytes"] == 0
+    assert client.post("/api/clusters", json={"name": "east"}).status_code == 409
+
+    resp = client.put("/api/clusters/east", json={"enabled": False})
+    assert resp.status_code == 200 and resp.json()["enabled"] is False
+    assert [c["name"] for c in client.get("/api/clusters").json()] == ["east"]
+    assert client.put("/api/clusters/nope", json={"enabled": True}).status_code == 404
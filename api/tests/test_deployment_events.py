@@ -0,0 +1,273 @@
+"""Tests for deployment status events and the SSE stream."""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+from datetime import UTC, datetime
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine
+from sqlmodel import Session
+from starlette.testclient import TestClient
+
+from app.db import get_session, init_db
+from app.main import app
+from app.models import DeploymentORM, UserORM
+from app.services import deployment_events, deployments as deployment_service
+from app.services.deployment_events import DeploymentEvent, DeploymentEventHub, PostgresEventListener
+from app.services.reconcile import DeploymentReconciler
+from tests.conftest import ADMIN_EMAIL, AUTH_HEADER, seed_deployment
+from tests.provisioner_utils import FakeProvisioner
+
+
+def _event(deployment_id, status="ready", **overrides) -> DeploymentEvent:
+    fields = dict(
+        deployment_id=deployment_id,
+        user_id=1,
+        status=status,
+        generation=1,
+        last_error=None,
+        last_reconcile_at=datetime.now(UTC),
+    )
+    fields.update(overrides)
+    return DeploymentEvent(**fields)
+
+
+def test_event_json_round_trip():
+    evt = _event(uuid4(), last_error="boom")
+    assert DeploymentEvent.from_json(evt.to_json()) == evt
+
+
+def test_event_truncates_long_errors(db_session):
+    deployment_id = seed_deployment(db_session)
+    deployment = db_session.get(DeploymentORM, deployment_id)
+    deployment.last_error = "x" * 10_000
+    evt = DeploymentEvent.from_deployment(deployment)
+    assert len(evt.last_error) == 2000
+    assert len(evt.to_json()) < 8000
+
+
+def test_hub_delivers_only_to_matching_subscribers():
+    hub = DeploymentEventHub()
+    target, other = uuid4(), uuid4()
+
+    async def scenario():
+        with hub.subscribe(target) as sub, hub.subscribe(other) as other_sub:
+            hub.dispatch(_event(target))
+            received = await sub.get(timeout=1)
+            assert received.deployment_id == target
+            assert await other_sub.get(timeout=0.05) is None
+        assert hub.subscriber_count() == 0
+
+    asyncio.run(scenario())
+
+
+def test_hub_drops_oldest_event_for_slow_subscribers():
+    hub = DeploymentEventHub()
+    deployment_id = uuid4()
+
+    async def scenario():
+        with hub.subscribe(deployment_id) as sub:
+            for generation in range(40):
+                hub.dispatch(_event(deployment_id, generation=generation))
+            await asyncio.sleep(0)
+            received = []
+            while (evt := await sub.get(timeout=0.05)) is not None:
+                received.append(evt.generation)
+            assert received[-1] == 39
+            assert len(received) == 16
+
+    asyncio.run(scenario())
+
+
+def test_reconcile_commit_publishes_event(db_session):
+    deployment_id = seed_deployment(db_session)
+
+    async def scenario():
+        with deployment_events.hub.subscribe(deployment_id) as sub:
+            await asyncio.to_thread(
+                DeploymentReconciler(session=db_session, provisioner=FakeProvisioner()).reconcile,
+                deployment_id,
+            )
+            evt = await sub.get(timeout=1)
+            assert evt is not None
+            assert evt.status == "ready"
+            assert evt.last_error is None
+
+    asyncio.run(scenario())
+
+
+def test_reconcile_failure_publishes_error(db_session):
+    deployment_id = seed_deployment(db_session)
+    provisioner = FakeProvisioner()
+    provisioner.raise_on_upgrade = RuntimeError("helm exploded")
+
+    async def scenario():
+        with deployment_events.hub.subscribe(deployment_id) as sub:
+            await asyncio.to_thread(
+                DeploymentReconciler(session=db_session, provisioner=provisioner).reconcile,
+                deployment_id,
+            )
+            evt = await sub.get(timeout=1)
+            assert evt.status == "error"
+            assert evt.last_error == "helm exploded"
+
+    asyncio.run(scenario())
+
+
+def test_rolled_back_notifications_are_discarded(db_session):
+    deployment_id = seed_deployment(db_session)
+    deployment = db_session.get(DeploymentORM, deployment_id)
+
+    async def scenario():
+        with deployment_events.hub.subscribe(deployment_id) as sub:
+            deployment_events.notify_deployment_changed(db_session, deployment)
+            db_session.rollback()
+            db_session.commit()
+            assert await sub.get(timeout=0.05) is None
+
+    asyncio.run(scenario())
+
+
+def test_listener_ignores_malformed_payloads():
+    hub = DeploymentEventHub()
+    deployment_id = uuid4()
+
+    class _Engine:
+        url = "postgresql+psycopg://u:p@localhost/db"
+
+    listener = PostgresEventListener(_Engine(), target=hub)
+
+    async def scenario():
+        with hub.subscribe(deployment_id) as sub:
+            listener._relay("not json")
+            listener._relay(_event(deployment_id).to_json())
+            evt = await sub.get(timeout=1)
+            assert evt.deployment_id == deployment_id
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    """A file-backed SQLite engine, so concurrent threads get their own connections."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'events.db'}", connect_args={"check_same_thread": False}
+    )
+    init_db(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_sse_stream_pushes_reconcile_changes(file_engine, monkeypatch):
+    with Session(file_engine) as session:
+        deployment_id = seed_deployment(session)
+        user_id = session.get(DeploymentORM, deployment_id).user_id
+        session.add(UserORM(email=ADMIN_EMAIL, is_admin=True))
+        session.commit()
+
+    def override_get_db():
+        with Session(file_engine) as session:
+            yield session
+
+    # Reconcile only once the endpoint has read its snapshot, so the expected
+    # event sequence is deterministic.
+    snapshot_taken = threading.Event()
+    get_deployment = deployment_service.get_deployment
+
+    def get_deployment_and_signal(*args, **kwargs):
+        try:
+            return get_deployment(*args, **kwargs)
+        finally:
+            snapshot_taken.set()
+
+    monkeypatch.setattr(deployment_service, "get_deployment", get_deployment_and_signal)
+    errors: list[BaseException] = []
+
+    def drive_reconciles():
+        try:
+            assert snapshot_taken.wait(timeout=5), "stream never read its snapshot"
+            with Session(file_engine) as session:
+                reconciler = DeploymentReconciler(session=session, provisioner=FakeProvisioner())
+                reconciler.reconcile(deployment_id)
+                orm = session.get(DeploymentORM, deployment_id)
+                orm.deleted_at = datetime.now(UTC)
+                session.commit()
+                reconciler.reconcile(deployment_id)
+        except BaseException as exc:
+            errors.append(exc)
+            # The test client buffers the whole stream; end it so the test fails
+            # instead of hanging.
+            deployment_events.hub.dispatch(_event(deployment_id, status="deleted", generation=-1))
+
+    app.dependency_overrides[get_session] = override_get_db
+    driver = threading.Thread(target=drive_reconciles, daemon=True)
+    driver.start()
+    try:
+        with TestClient(app, headers=AUTH_HEADER) as client:
+            resp = client.get(f"/api/users/{user_id}/deployments/{deployment_id}/events")
+    finally:
+        app.dependency_overrides.clear()
+        driver.join(timeout=5)
+
+    assert not errors, errors
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [
+        json.loads(line.removeprefix("data: "))
+        for line in resp.text.splitlines()
+        if line.startswith("data: ")
+    ]
+    assert [e["status"] for e in events] == ["provisioning", "ready", "deleted"]
+    assert all(e["deployment_id"] == str(deployment_id) for e in events)
+    assert deployment_events.hub.subscriber_count(deployment_id) == 0
+
+
+def test_sse_stream_requires_ownership(user_client, db_session):
+    client, _admin = user_client
+    deployment_id = seed_deployment(db_session)
+    owner_id = db_session.get(DeploymentORM, deployment_id).user_id
+    resp = client.get(f"/api/users/{owner_id}/deployments/{deployment_id}/events")
+    assert resp.status_code == 403
+    assert deployment_events.hub.subscriber_count(deployment_id) == 0
+
+
+def test_sse_stream_unknown_deployment_returns_404(client):
+    user_id = client.get("/api/me").json()["id"]
+    deployment_id = uuid4()
+    resp = client.get(f"/api/users/{user_id}/deployments/{deployment_id}/events")
+    assert resp.status_code == 404
+    assert deployment_events.hub.subscriber_count(deployment_id) == 0
+
+
+@pytest.mark.skipif(
+    not os.getenv("POSTGRES_TEST_DATABASE_URL"),
+    reason="POSTGRES_TEST_DATABASE_URL is not set",
+)
+def test_postgres_notify_reaches_listener():
+    engine = create_engine(os.environ["POSTGRES_TEST_DATABASE_URL"])
+    init_db(engine)
+    hub = DeploymentEventHub()
+    listener = PostgresEventListener(engine, target=hub, poll_seconds=0.2)
+    listener.start()
+    deployment_id = uuid4()
+
+    async def scenario():
+        with hub.subscribe(deployment_id) as sub:
+            await asyncio.sleep(1)  # let the listener issue LISTEN
+            with Session(engine) as session:
+                deployment = DeploymentORM(
+                    id=deployment_id, user_id=1, desired_template_id=1, name="n", namespace="ns", status="ready"
+                )
+                deployment_events.notify_deployment_changed(session, deployment)
+                session.commit()
+            evt = await sub.get(timeout=5)
+            assert evt is not None and evt.status == "ready"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        listener.stop()
@@ -10,7 +10,7 @@ from tests.conftest import client, db_session, user_client, USER_AUTH_HEADER
 from tests.conftest import create_free_plan_template
 from sqlmodel import select
 
-from app.models import DeploymentORM, DeploymentReconcileJobORM, UserORM
+from app.models import DeploymentORM, DeploymentReconcileJobORM, ProductTemplateVersionORM, UserORM
 from app.services.jobs import JobService
 
 
@@ -316,6 +316,7 @@ def test_create_deployment_derives_hostname_recursively_case_insensitive_and_fir
     )
     assert tmpl_resp.status_code == 201
     tmpl_id = tmpl_resp.json()["id"]
+    assert tmpl_resp.json()["hostname_paths_json"] == [["outer_first"], ["nested", "inner"]]
 
     # Make it the canonical template
     client.put(f"/api/products/{product_id}", json={"template_id": tmpl_id})
@@ -334,6 +335,44 @@ def test_create_deployment_derives_hostname_recursively_case_insensitive_and_fir
     assert dep_resp.json()["deployment"]["hostname"] == "first.example.test"
 
 
+def test_create_deployment_derives_hostname_paths_for_legacy_templates(client, db_session):
+    user_id = client.post("/api/users", json={"email": "legacy@example.com"}).json()["id"]
+    product_id = client.post(
+        "/api/products", json={"name": "legacy-prod", "description": "desc"}
+    ).json()["id"]
+    tmpl_id = client.post(
+        f"/api/products/{product_id}/templates",
+        json={
+            "chart_ref": "oci://example/chart",
+            "chart_version": "1.0.0",
+            "values_schema_json": {
+                "type": "object",
+                "properties": {"domain": {"type": "string", "title": "hostname"}},
+            },
+        },
+    ).json()["id"]
+    client.put(f"/api/products/{product_id}", json={"template_id": tmpl_id})
+    # Simulate a template created before hostname paths were persisted.
+    template = db_session.get(ProductTemplateVersionORM, tmpl_id)
+    template.hostname_paths_json = None
+    db_session.commit()
+    ptv_id = create_free_plan_template(db_session, product_id)
+
+    dep_resp = client.post(
+        f"/api/users/{user_id}/deployments",
+        json={
+            "desired_template_id": tmpl_id,
+            "user_values_json": {"domain": "Legacy.example.test"},
+            "plan_template_id": ptv_id,
+        },
+    )
+    assert dep_resp.status_code == 201
+    assert dep_resp.json()["deployment"]["hostname"] == "legacy.example.test"
+    # The paths are computed on the fly; the catalog row is left alone.
+    db_session.refresh(template)
+    assert template.hostname_paths_json is None
+
+
 def test_update_deployment_rederives_hostname_from_user_values(client, db_session):
     user_resp = client.post("/api/users", json={"email": "rederive@example.com"})
     assert user_resp.status_code == 201
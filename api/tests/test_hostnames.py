@@ -1,4 +1,5 @@
 """Tests for the hostname validation service and API endpoint."""
+import asyncio
 import socket
 from unittest.mock import patch
 from uuid import UUID
@@ -13,21 +14,33 @@ from app.services.hostnames import (
     _check_reserved,
     _check_available,
     _check_resolving,
+    check_hostnames,
     require_valid_hostname_for_deployment,
 )
+from app.services import resolver
+from app.services.resolver import ResolutionError, SystemResolver
 from app.db import get_session
 from app.main import app as fastapi_app
-from app.models import DeploymentORM, DeploymentReconcileJobORM, UserORM, ProductORM, ProductTemplateVersionORM
+from app.models import (
+    HOSTNAME_BATCH_MAX,
+    DeploymentORM,
+    DeploymentReconcileJobORM,
+    ProductORM,
+    ProductTemplateVersionORM,
+    UserORM,
+)
 from app.services.jobs import JobService
 from app.services.reconcile_constants import (
     DEPLOYMENT_STATUS_PROVISIONING,
     DEPLOYMENT_STATUS_DELETED,
 )
+from sqlalchemy import event
 from sqlmodel import select
 from starlette.testclient import TestClient
 
 from tests.conftest import client, db_session
 from tests.conftest import create_free_plan_template
+from tests.resolver_utils import StubResolver
 
 
 def _settings(**overrides) -> CaelusSettings:
@@ -36,6 +49,14 @@ def _settings(**overrides) -> CaelusSettings:
     return CaelusSettings(**{**defaults, **overrides}, _env_file=None)
 
 
+@pytest.fixture
+def stub_resolver():
+    stub = StubResolver()
+    resolver.set_resolver(stub, settings=_settings())
+    yield stub
+    resolver.reset()
+
+
 @pytest.fixture
 def seed_parents(db_session):
     """Create the minimum parent rows (user, product, template) so that
@@ -202,46 +223,46 @@ class TestCheckAvailable:
 
 
 class TestCheckResolving:
-    def test_skipped_when_lb_ips_empty(self):
+    def test_skipped_when_lb_ips_empty(self, stub_resolver):
         # Should not raise even if DNS would fail
         _check_resolving("nonexistent.example.test", _settings(lb_ips=[]))
+        assert stub_resolver.queries == []
 
-    def test_passes_when_all_ips_match(self):
-        fake_results = [
-            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("1.2.3.4", 0)),
-            (socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("2001:db8::1", 0, 0, 0)),
-        ]
-        with patch("app.services.hostnames.socket.getaddrinfo", return_value=fake_results):
-            _check_resolving("good.example.com", _settings(lb_ips=["1.2.3.4", "2001:db8::1"]))
+    def test_passes_when_all_ips_match(self, stub_resolver):
+        stub_resolver.records["good.example.com"] = {"1.2.3.4", "2001:db8::1"}
+        _check_resolving("good.example.com", _settings(lb_ips=["1.2.3.4", "2001:db8::1"]))
 
-    def test_passes_ipv4_only_subset(self):
-        fake_results = [
-            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("1.2.3.4", 0)),
-        ]
-        with patch("app.services.hostnames.socket.getaddrinfo", return_value=fake_results):
-            _check_resolving("v4only.example.com", _settings(lb_ips=["1.2.3.4", "2001:db8::1"]))
+    def test_passes_ipv4_only_subset(self, stub_resolver):
+        stub_resolver.records["v4only.example.com"] = {"1.2.3.4"}
+        _check_resolving("v4only.example.com", _settings(lb_ips=["1.2.3.4", "2001:db8::1"]))
+
+    def test_fails_when_ip_outside_lb_set(self, stub_resolver):
+        stub_resolver.records["mixed.example.com"] = {"1.2.3.4", "9.9.9.9"}
+        with pytest.raises(HostnameException, match="not_resolving"):
+            _check_resolving("mixed.example.com", _settings(lb_ips=["1.2.3.4"]))
 
-    def test_fails_when_ip_outside_lb_set(self):
+    def test_fails_when_dns_does_not_resolve(self, stub_resolver):
+        with pytest.raises(HostnameException, match="not_resolving"):
+            _check_resolving("nxdomain.example.com", _settings(lb_ips=["1.2.3.4"]))
+
+    def test_fails_when_no_results_returned(self, stub_resolver):
+        stub_resolver.records["empty.example.com"] = set()
+        with pytest.raises(HostnameException, match="not_resolving"):
+            _check_resolving("empty.example.com", _settings(lb_ips=["1.2.3.4"]))
+
+    def test_system_resolver_uses_getaddrinfo(self):
         fake_results = [
             (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("1.2.3.4", 0)),
-            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("9.9.9.9", 0)),
+            (socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("2001:db8::1", 0, 0, 0)),
         ]
-        with patch("app.services.hostnames.socket.getaddrinfo", return_value=fake_results):
-            with pytest.raises(HostnameException, match="not_resolving"):
-                _check_resolving("mixed.example.com", _settings(lb_ips=["1.2.3.4"]))
+        with patch("socket.getaddrinfo", return_value=fake_results):
+            addresses = asyncio.run(SystemResolver().resolve("good.example.com"))
+        assert addresses == {"1.2.3.4", "2001:db8::1"}
 
-    def test_fails_when_dns_does_not_resolve(self):
-        with patch(
-            "app.services.hostnames.socket.getaddrinfo",
-            side_effect=socket.gaierror("Name or service not known"),
-        ):
-            with pytest.raises(HostnameException, match="not_resolving"):
-                _check_resolving("nxdomain.example.com", _settings(lb_ips=["1.2.3.4"]))
-
-    def test_fails_when_no_results_returned(self):
-        with patch("app.services.hostnames.socket.getaddrinfo", return_value=[]):
-            with pytest.raises(HostnameException, match="not_resolving"):
-                _check_resolving("empty.example.com", _settings(lb_ips=["1.2.3.4"]))
+    def test_system_resolver_maps_gaierror(self):
+        with patch("socket.getaddrinfo", side_effect=socket.gaierror("Name or service not known")):
+            with pytest.raises(ResolutionError):
+                asyncio.run(SystemResolver().resolve("nxdomain.example.com"))
 
 
 # ── Orchestration (short-circuit behavior) ────────────────────────────
@@ -394,20 +415,27 @@ class TestHostnameCheckEndpoint:
         assert resp.json()["usable"] is False
         assert resp.json()["reason"] == "in_use"
 
-    def test_not_resolving(self, client, monkeypatch):
+    def test_not_resolving(self, client, monkeypatch, stub_resolver):
         monkeypatch.setattr(
             "app.services.hostnames.get_settings",
             lambda: _settings(lb_ips=["1.2.3.4"]),
         )
-        with patch(
-            "app.services.hostnames.socket.getaddrinfo",
-            side_effect=socket.gaierror("nope"),
-        ):
-            resp = client.get("/api/hostnames/nxdomain.example.com")
+        resp = client.get("/api/hostnames/nxdomain.example.com")
         assert resp.status_code == 200
         assert resp.json()["usable"] is False
         assert resp.json()["reason"] == "not_resolving"
 
+    def test_resolving_lookup_is_cached(self, client, monkeypatch, stub_resolver):
+        monkeypatch.setattr(
+            "app.services.hostnames.get_settings",
+            lambda: _settings(lb_ips=["1.2.3.4"]),
+        )
+        stub_resolver.records["typed.example.com"] = {"1.2.3.4"}
+        for _ in range(3):
+            resp = client.get("/api/hostnames/typed.example.com")
+            assert resp.json()["usable"] is True
+        assert stub_resolver.queries == ["typed.example.com"]
+
     def test_unauthenticated_returns_404(self, db_session):
         def override_get_db():
             yield db_session
@@ -430,6 +458,94 @@ class TestHostnameCheckEndpoint:
         assert set(resp.json().keys()) == {"fqdn", "usable", "reason"}
 
 
+# ── Batch validation ──────────────────────────────────────────────────
+
+
+class TestCheckHostnamesBatch:
+    def test_reports_per_hostname_reasons_in_order(self, db_session, seed_parents, stub_resolver):
+        db_session.add(DeploymentORM(
+            user_id=seed_parents["user_id"],
+            desired_template_id=seed_parents["template_id"],
+            hostname="taken.example.com",
+            status=DEPLOYMENT_STATUS_PROVISIONING,
+            name="batch-name",
+            namespace="batch-namespace",
+        ))
+        db_session.flush()
+        stub_resolver.records.update({
+            "good.example.com": {"1.2.3.4"},
+            "elsewhere.example.com": {"9.9.9.9"},
+        })
+        results = check_hostnames(
+            db_session,
+            [
+                "Good.Example.com", "-bad", "a.b.apps.test", "smtp.example.com",
+                "Taken.example.com", "good.example.com", "elsewhere.example.com", "nx.example.com",
+            ],
+            settings=_settings(
+                lb_ips=["1.2.3.4"],
+                wildcard_domains=["apps.test"],
+                reserved_hostnames=["smtp.example.com"],
+            ),
+        )
+        assert [(r.fqdn, r.reason) for r in results] == [
+            ("good.example.com", None),
+            ("-bad", "invalid"),
+            ("a.b.apps.test", "nested_subdomain"),
+            ("smtp.example.com", "reserved"),
+            ("taken.example.com", "in_use"),
+            ("good.example.com", "duplicate"),
+            ("elsewhere.example.com", "not_resolving"),
+            ("nx.example.com", "not_resolving"),
+        ]
+        assert results[0].usable is True
+        assert all(not r.usable for r in results[1:])
+        # Only hostnames that passed the local checks are resolved, each once.
+        assert sorted(stub_resolver.queries) == [
+            "elsewhere.example.com", "good.example.com", "nx.example.com",
+        ]
+
+    def test_availability_is_a_single_query(self, db_session):
+        fqdns = [f"host-{i}.example.com" for i in range(300)]
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            if "FROM deployment" in statement:
+                statements.append(statement)
+
+        engine = db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            results = check_hostnames(db_session, fqdns, settings=_settings())
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        assert all(r.usable for r in results)
+        assert len(statements) == 1
+
+    def test_batch_endpoint(self, client, monkeypatch, stub_resolver):
+        monkeypatch.setattr(
+            "app.services.hostnames.get_settings",
+            lambda: _settings(lb_ips=["1.2.3.4"]),
+        )
+        stub_resolver.records["ok.example.com"] = {"1.2.3.4"}
+        resp = client.post(
+            "/api/hostnames/check", json={"fqdns": ["ok.example.com", "nx.example.com", "bad"]},
+        )
+        assert resp.status_code == 200
+        assert resp.json() == [
+            {"fqdn": "ok.example.com", "usable": True, "reason": None},
+            {"fqdn": "nx.example.com", "usable": False, "reason": "not_resolving"},
+            {"fqdn": "bad", "usable": False, "reason": "invalid"},
+        ]
+
+    def test_batch_endpoint_rejects_oversized_batches(self, client):
+        resp = client.post(
+            "/api/hostnames/check",
+            json={"fqdns": [f"h{i}.example.com" for i in range(HOSTNAME_BATCH_MAX + 1)]},
+        )
+        assert resp.status_code == 422
+
+
 # ── Domains endpoint tests ────────────────────────────────────────────
 
 
@@ -0,0 +1,113 @@
+"""Tests for the content-addressed icon store and icon garbage collection."""
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+import os
+
+from app.models import ProductORM
+from app.services import icon_store
+from app.services.icon_store import LocalIconStore, S3IconStore, gc_icons
+from app.services.images import ProcessedIcon
+from tests.icon_store_utils import FakeS3Client
+
+DIGEST_A = "a" * 40
+DIGEST_B = "b" * 40
+
+
+def _icon(digest: str) -> ProcessedIcon:
+    return ProcessedIcon(digest=digest, variants={"256.png": b"png", "64.webp": b"webp"})
+
+
+def _age(path, hours: float) -> None:
+    stamp = (datetime.now(UTC) - timedelta(hours=hours)).timestamp()
+    os.utime(path, (stamp, stamp))
+
+
+def test_local_store_dedupes_and_lists(static_dir):
+    store = LocalIconStore(static_dir)
+    assert store.put(_icon(DIGEST_A)) == f"icons/{DIGEST_A}/256.png"
+    assert store.put(_icon(DIGEST_A)) == f"icons/{DIGEST_A}/256.png"
+    (static_dir / "icons" / f"{DIGEST_B}.png").write_bytes(b"legacy")
+    (static_dir / "icons" / "README").write_text("not an icon")
+
+    assert sorted(s.key for s in store.list_icons()) == [f"icons/{DIGEST_A}", f"icons/{DIGEST_B}.png"]
+    assert sorted(p.name for p in (static_dir / "icons" / DIGEST_A).iterdir()) == ["256.png", "64.webp"]
+
+    store.delete(f"icons/{DIGEST_A}")
+    store.delete(f"icons/{DIGEST_B}.png")
+    assert store.list_icons() == []
+
+
+def test_gc_removes_only_old_unreferenced_icons(db_session, static_dir):
+    store = LocalIconStore(static_dir)
+    referenced = store.put(_icon(DIGEST_A))
+    store.put(_icon(DIGEST_B))
+    legacy = static_dir / "icons" / f"{'c' * 40}.png"
+    legacy.write_bytes(b"legacy")
+    fresh = store.put(_icon("d" * 40))
+    for path in (static_dir / "icons" / DIGEST_A, static_dir / "icons" / DIGEST_B, legacy):
+        _age(path, hours=2)
+
+    # Soft-deleted products still hold their icon.
+    db_session.add(ProductORM(name="p1", description="", rel_icon_path=referenced, deleted_at=datetime.now(UTC)))
+    db_session.commit()
+
+    assert gc_icons(db_session, store=store, dry_run=True) == [f"icons/{DIGEST_B}", f"icons/{'c' * 40}.png"]
+    assert (static_dir / "icons" / DIGEST_B).is_dir()
+
+    assert gc_icons(db_session, store=store) == [f"icons/{DIGEST_B}", f"icons/{'c' * 40}.png"]
+    assert sorted(s.key for s in store.list_icons()) == [f"icons/{DIGEST_A}", fresh.rsplit("/", 1)[0]]
+
+
+def test_s3_store_round_trip():
+    client = FakeS3Client(page_size=1)
+    store = S3IconStore(client, "icons-bucket", prefix="caelus/")
+
+    assert store.put(_icon(DIGEST_A)) == f"icons/{DIGEST_A}/256.png"
+    store.put(_icon(DIGEST_B))
+    stored = client.objects[("icons-bucket", f"caelus/icons/{DIGEST_A}/64.webp")]
+    assert stored["ContentType"] == "image/webp"
+    assert "immutable" in stored["CacheControl"]
+
+    assert sorted(s.key for s in store.list_icons()) == [f"icons/{DIGEST_A}", f"icons/{DIGEST_B}"]
+    store.delete(f"icons/{DIGEST_A}")
+    assert sorted(key for _, key in client.objects) == [
+        f"caelus/icons/{DIGEST_B}/256.png",
+        f"caelus/icons/{DIGEST_B}/64.webp",
+    ]
+
+
+def test_hashed_icons_are_served_immutable(client, static_dir):
+    icon_store.get_icon_store().put(_icon(DIGEST_A))
+    (static_dir / "plain.txt").write_text("hello")
+
+    resp = client.get(f"/api/static/icons/{DIGEST_A}/64.webp")
+    assert resp.status_code == 200
+    assert resp.content == b"webp"
+    assert resp.headers["etag"] == f'"{DIGEST_A}-64.webp"'
+    assert "immutable" in resp.headers["cache-control"]
+
+    resp = client.get(f"/api/static/icons/{DIGEST_A}/64.webp", headers={"If-None-Match": f'"{DIGEST_A}-64.webp"'})
+    assert resp.status_code == 304
+
+    resp = client.get("/api/static/plain.txt")
+    assert resp.status_code == 200
+    assert "cache-control" not in resp.headers
+
+
+def test_icon_urls_use_configured_base(client, monkeypatch):
+    from app.config import get_settings
+    from tests.test_product_icons import create_test_image
+
+    monkeypatch.setenv("CAELUS_ICON_BASE_URL", "https://cdn.example.com/")
+    get_settings.cache_clear()
+    product_id = client.post("/api/products", json={"name": "cdn-icon", "description": ""}).json()["id"]
+    data = client.put(
+        f"/api/products/{product_id}/icon", files={"icon": ("i.png", create_test_image(), "image/png")}
+    ).json()
+    assert data["icon_url"].startswith("https://cdn.example.com/icons/")
+    assert data["icon_variants"]["64.webp"].startswith("https://cdn.example.com/icons/")
+
+    resp = client.get(f"/api/products/{product_id}/icon", follow_redirects=False)
+    assert resp.headers["location"] == data["icon_url"]
+    assert resp.headers["cache-control"] == "private, max-age=300"
@@ -5,6 +5,7 @@ from datetime import UTC, datetime, timedelta
 import pytest
 from sqlmodel import select
 
+from app.config import get_settings
 from app.models import DeploymentReconcileJobORM, ProductORM
 from app.services import deployments, products, templates, users
 from app.services.jobs import JobService
@@ -166,3 +167,52 @@ def test_list_jobs_multi_status_applies_global_limit_and_order(db_session):
     assert [job.id for job in listed] == [seed_job_id, first.id]
     assert [job.status for job in listed] == ["done", "done"]
     assert all(job.id != second.id for job in listed)
+
+
+def _seed_tenants(db_session, deployments_per_user: dict[str, int]):
+    product = products.create_product(db_session, payload=products.ProductCreate(name="fair-product", description=""))
+    template = templates.create_template(
+        db_session,
+        payload=templates.ProductTemplateVersionCreate(
+            product_id=product.id, chart_ref="oci://example/chart", chart_version="1.0.0"
+        ),
+    )
+    db_session.get(ProductORM, product.id).template_id = template.id
+    db_session.commit()
+    ptv_id = create_free_plan_template(db_session, product.id)
+    owners = {}
+    for email, count in deployments_per_user.items():
+        user = users.create_user(db_session, payload=users.UserCreate(email=email))
+        for _ in range(count):
+            deployment = deployments.create_deployment(
+                db_session,
+                payload=deployments.DeploymentCreate(
+                    user_id=user.id, desired_template_id=template.id, plan_template_id=ptv_id
+                ),
+            ).deployment
+            owners[deployment.id] = email
+    return owners
+
+
+def test_claims_are_fair_across_users_and_respect_caps(db_session, monkeypatch):
+    # The heavy user's jobs are all older than the light user's.
+    owners = _seed_tenants(db_session, {"heavy@example.com": 4, "light@example.com": 1})
+    jobs = JobService(db_session)
+
+    first = jobs.claim_next_job(worker_id="w1")
+    second = jobs.claim_next_job(worker_id="w2")
+    assert [owners[first.deployment_id], owners[second.deployment_id]] == ["heavy@example.com", "light@example.com"]
+
+    monkeypatch.setenv("CAELUS_JOB_MAX_RUNNING_PER_USER", "2")
+    get_settings.cache_clear()
+    assert owners[jobs.claim_next_job(worker_id="w3").deployment_id] == "heavy@example.com"
+    assert jobs.claim_next_job(worker_id="w4") is None
+
+    jobs.mark_job_done(job_id=first.id)
+    monkeypatch.delenv("CAELUS_JOB_MAX_RUNNING_PER_USER")
+    monkeypatch.setenv("CAELUS_JOB_MAX_RUNNING_PER_PRODUCT", "3")
+    get_settings.cache_clear()
+    # Three of the product's jobs are running again, so the product is at its
+    # cap although the heavy user still has one queued.
+    assert owners[jobs.claim_next_job(worker_id="w5").deployment_id] == "heavy@example.com"
+    assert jobs.claim_next_job(worker_id="w6") is None
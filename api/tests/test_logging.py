@@ -0,0 +1,89 @@
+"""Tests for the logging setup: JSON records, context fields, sampling and the queue handler."""
+from __future__ import annotations
+
+import json
+import logging
+
+import pytest
+
+from app import logging_config
+from app.config import get_settings
+from app.logging_config import log_context
+
+
+@pytest.fixture
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    logging_config._stop_listener()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def _record(msg, *args, level=logging.INFO, lineno=10):
+    return logging.LogRecord("app.test", level, "/app/test.py", lineno, msg, args, None)
+
+
+def test_json_records_carry_the_log_context():
+    context = logging_config._ContextFilter()
+    with log_context(worker_id="w-1", job_id=7), log_context(deployment_id="d-1", job_id=None):
+        record = _record("Reconciled %s", "immich")
+        context.filter(record)
+    outside = _record("idle")
+    context.filter(outside)
+
+    entry = json.loads(logging_config._JsonFormatter().format(record))
+    assert {k: entry[k] for k in ("level", "logger", "message", "worker_id", "job_id", "deployment_id")} == {
+        "level": "INFO",
+        "logger": "app.test",
+        "message": "Reconciled immich",
+        "worker_id": "w-1",
+        "job_id": 7,
+        "deployment_id": "d-1",
+    }
+    assert "worker_id" not in json.loads(logging_config._JsonFormatter().format(outside))
+
+
+def test_repetitive_records_are_rate_limited_per_call_site(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(logging_config.time, "monotonic", lambda: now[0])
+    limit = logging_config._RateLimitFilter(burst=2, window=10.0)
+
+    assert [limit.filter(_record("poll")) for _ in range(4)] == [True, True, False, False]
+    assert limit.filter(_record("other call site", lineno=20))
+    assert limit.filter(_record("failed", level=logging.WARNING))
+
+    now[0] += 10.0
+    record = _record("poll")
+    assert limit.filter(record) and record.suppressed == 2
+
+
+def test_queue_handler_writes_json_from_the_listener(monkeypatch, capsys, restore_root_logger):
+    monkeypatch.setenv("CAELUS_LOG_FORMAT", "json")
+    monkeypatch.setenv("CAELUS_LOG_LEVEL", "WARNING")
+    get_settings.cache_clear()
+    logging_config.configure_logging(force=True)
+    assert isinstance(restore_root_logger.handlers[0], logging_config._QueueHandler)
+
+    logger = logging.getLogger("app.test")
+    with log_context(request_id="req-1"):
+        logger.info("dropped by level")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Failed %s", "hard")
+    logging_config._stop_listener()
+
+    lines = capsys.readouterr().err.strip().splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert (entry["message"], entry["request_id"], entry["level"]) == ("Failed hard", "req-1", "ERROR")
+    assert "ValueError: boom" in entry["exc"]
+
+
+def test_api_echoes_request_ids(client):
+    resp = client.get("/api/docs", headers={"X-Request-ID": "abc-123"})
+    assert resp.headers["x-request-id"] == "abc-123"
+    generated = client.get("/api/docs", headers={"X-Request-ID": "bad id\t!"}).headers["x-request-id"]
+    assert len(generated) == 32 and generated != "bad id\t!"
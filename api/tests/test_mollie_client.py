@@ -0,0 +1,112 @@
+"""Tests for the pooled, rate-limited Mollie client (against a local fake server)."""
+from __future__ import annotations
+
+import logging
+
+import pytest
+
+from app.services.mollie import MolliePaymentProvider, TokenBucket
+from tests.mollie_utils import FakeMollieServer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+        self.slept: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def mollie_server():
+    with FakeMollieServer() as server:
+        yield server
+
+
+def test_get_payment_is_cached_and_fresh_bypasses_cache(mollie_server):
+    mollie_server.add_payment("tr_one", status="open", mandateId="mdt_1", subscriptionId="sub_1")
+    clock = FakeClock()
+    provider = MolliePaymentProvider("test_key", server_url=mollie_server.url, payment_cache_ttl=5.0, clock=clock)
+    try:
+        info = provider.get_payment("tr_one")
+        assert (info.status, info.mandate_id, info.subscription_id) == ("open", "mdt_1", "sub_1")
+        mollie_server.add_payment("tr_one", status="paid")
+        assert provider.get_payment("tr_one").status == "open"
+        assert len(mollie_server.requests) == 1
+
+        assert provider.get_payment("tr_one", fresh=True).status == "paid"
+        mollie_server.add_payment("tr_one", status="expired")
+        # The fresh answer replaced the cached one ...
+        assert provider.get_payment("tr_one").status == "paid"
+        # ... until the TTL runs out.
+        clock.now += 6
+        assert provider.get_payment("tr_one").status == "expired"
+        assert [path for path, _ in mollie_server.requests] == ["/v2/payments/tr_one"] * 3
+    finally:
+        provider.close()
+
+
+def test_connections_are_kept_alive(mollie_server):
+    mollie_server.add_payment("tr_one")
+    provider = MolliePaymentProvider("test_key", server_url=mollie_server.url)
+    try:
+        for _ in range(3):
+            provider.get_payment("tr_one", fresh=True)
+    finally:
+        provider.close()
+    assert len({port for _, port in mollie_server.requests}) == 1
+
+
+def test_payment_logging_is_compact(mollie_server, caplog):
+    mollie_server.add_payment("tr_one", status="paid")
+    provider = MolliePaymentProvider("test_key", server_url=mollie_server.url)
+    try:
+        with caplog.at_level(logging.INFO, logger="app.services.mollie"):
+            provider.get_payment("tr_one")
+    finally:
+        provider.close()
+    messages = [r.getMessage() for r in caplog.records if r.name == "app.services.mollie"]
+    assert messages == ["Fetched Mollie payment id=tr_one status=paid mandate_id=None subscription_id=None"]
+
+
+def test_requests_go_through_the_rate_limiter(mollie_server):
+    mollie_server.add_payment("tr_one")
+    clock = FakeClock()
+    limiter = TokenBucket(rate=10, burst=2, clock=clock, sleep=clock.sleep)
+    provider = MolliePaymentProvider("test_key", server_url=mollie_server.url, rate_limiter=limiter)
+    try:
+        for _ in range(4):
+            provider.get_payment("tr_one", fresh=True)
+    finally:
+        provider.close()
+    assert clock.slept == pytest.approx([0.1, 0.1])
+
+
+def test_token_bucket_refills_up_to_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    clock.now += 60
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.acquire() == pytest.approx(0.5)
+
+
+def test_payment_provider_is_shared_per_process(monkeypatch):
+    from app.config import get_settings
+    from app.deps import _shared_payment_provider, get_payment_provider
+
+    monkeypatch.setenv("CAELUS_MOLLIE_API_KEY", "test_shared")
+    get_settings.cache_clear()
+    try:
+        provider = get_payment_provider()
+        assert isinstance(provider, MolliePaymentProvider)
+        assert get_payment_provider() is provider
+    finally:
+        _shared_payment_provider.cache_clear()
+        get_settings.cache_clear()
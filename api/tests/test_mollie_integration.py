@@ -5,7 +5,7 @@ Covers:
 - 10.2:  Paid deployment creation returns checkout_url, pending state
 - 10.3:  Free deployment creation unchanged
 - 10.4:  Paid plan with no payment provider treated as free
-- 10.5:  Mollie API failure rolls back, no DB records
+- 10.5:  Mollie API failure keeps the pending deployment, checkout retried
 - 10.6:  Webhook first payment paid -> provision
 - 10.7:  Webhook first payment failed -> arrears
 - 10.8:  Webhook first payment expired -> arrears
@@ -31,9 +31,11 @@ from app.models import (
     DeploymentReconcileJobORM,
     MolliePaymentORM,
     MolliePaymentStatus,
+    OutboxORM,
     PaymentStatus,
     SubscriptionORM,
 )
+from app.services import outbox as outbox_service, payment_webhooks as payment_webhook_service
 from app.services.reconcile_constants import (
     DEPLOYMENT_STATUS_PENDING,
     DEPLOYMENT_STATUS_PROVISIONING,
@@ -100,16 +102,19 @@ def _get_mollie_payment(db_session, sub_id):
     ).one()
 
 
-def _trigger_webhook(client, mollie_payment_id):
-    """POST to the Mollie webhook endpoint."""
-    return client.post("/api/webhooks/mollie", data={"id": mollie_payment_id})
+def _trigger_webhook(client, mollie_payment_id, payment_provider, db_session):
+    """POST to the Mollie webhook endpoint, then let the worker stages process it."""
+    resp = client.post("/api/webhooks/mollie", data={"id": mollie_payment_id})
+    payment_webhook_service.process_inbox(db_session, payment_provider, worker_id="test-worker")
+    outbox_service.dispatch_batch(db_session, payment_provider, worker_id="test-worker")
+    return resp
 
 
 def _complete_first_payment(client, fake_payment_provider, db_session, sub_id):
     """Simulate first payment success via webhook. Returns mollie_payment_id."""
     mp = _get_mollie_payment(db_session, sub_id)
     fake_payment_provider.simulate_paid(mp.mollie_payment_id)
-    resp = _trigger_webhook(client, mp.mollie_payment_id)
+    resp = _trigger_webhook(client, mp.mollie_payment_id, fake_payment_provider, db_session)
     assert resp.status_code == 200
     db_session.expire_all()
     return mp.mollie_payment_id
@@ -239,11 +244,11 @@ def test_paid_plan_no_provider_treated_as_free(client, db_session):
 
 
 # ===========================================================================
-# 10.5: Mollie API failure -> error, no DB records
+# 10.5: Mollie API failure -> pending deployment, checkout retried later
 # ===========================================================================
 
 
-def test_mollie_failure_returns_error_no_db_records(
+def test_mollie_failure_keeps_pending_deployment_and_retries_checkout(
     paid_client, fake_payment_provider, db_session
 ):
     product_id, template_id = _setup_product_and_template(paid_client)
@@ -251,7 +256,6 @@ def test_mollie_failure_returns_error_no_db_records(
 
     user_id = _get_user(paid_client)['id']
 
-    # Monkey-patch the fake to raise on ensure_customer
     original = fake_payment_provider.ensure_customer
 
     def failing_ensure(*args, **kwargs):
@@ -259,29 +263,33 @@ def test_mollie_failure_returns_error_no_db_records(
 
     fake_payment_provider.ensure_customer = failing_ensure
 
-    # TestClient re-raises server exceptions by default
-    with pytest.raises(RuntimeError, match="Mollie API unreachable"):
-        paid_client.post(
-            f"/api/users/{user_id}/deployments",
-            json={"desired_template_id": template_id, "plan_template_id": ptv_id},
-        )
-
-    fake_payment_provider.ensure_customer = original
+    resp = paid_client.post(
+        f"/api/users/{user_id}/deployments",
+        json={"desired_template_id": template_id, "plan_template_id": ptv_id},
+    )
+    assert resp.status_code == 201
+    data = resp.json()
+    assert data["checkout_url"] is None
+    assert data["checkout_status"] == "pending"
+    assert data["deployment"]["status"] == DEPLOYMENT_STATUS_PENDING
+    deployment_id = data["deployment"]["id"]
 
-    # Rollback any pending session state from the failed transaction
-    db_session.rollback()
+    checkout = paid_client.get(f"/api/users/{user_id}/deployments/{deployment_id}/checkout").json()
+    assert checkout["status"] == "pending"
+    assert "Mollie API unreachable" in checkout["last_error"]
 
-    # No deployments for this user
-    deps = db_session.exec(
-        select(DeploymentORM).where(DeploymentORM.user_id == user_id)
-    ).all()
-    assert len(deps) == 0
+    # Mollie recovers; the worker delivers the queued checkout step.
+    fake_payment_provider.ensure_customer = original
+    row = db_session.exec(select(OutboxORM)).one()
+    row.run_after = row.created_at
+    db_session.commit()
+    results = outbox_service.dispatch_batch(db_session, fake_payment_provider, worker_id="test")
+    assert [r.status for r in results] == ["done"]
 
-    # No subscriptions for this user
-    subs = db_session.exec(
-        select(SubscriptionORM).where(SubscriptionORM.user_id == user_id)
-    ).all()
-    assert len(subs) == 0
+    checkout = paid_client.get(f"/api/users/{user_id}/deployments/{deployment_id}/checkout").json()
+    assert checkout["status"] == "ready"
+    assert "fake.mollie.com/checkout" in checkout["checkout_url"]
+    assert len(db_session.exec(select(MolliePaymentORM)).all()) == 1
 
 
 # ===========================================================================
@@ -306,7 +314,7 @@ def test_webhook_first_payment_paid(
     mp = _get_mollie_payment(db_session, sub_id)
     fake_payment_provider.simulate_paid(mp.mollie_payment_id)
 
-    webhook_resp = _trigger_webhook(paid_client, mp.mollie_payment_id)
+    webhook_resp = _trigger_webhook(paid_client, mp.mollie_payment_id, fake_payment_provider, db_session)
     assert webhook_resp.status_code == 200
 
     db_session.expire_all()
@@ -359,7 +367,7 @@ def test_webhook_first_payment_failed(
 
     fake_payment_provider._next_payment_status = "failed"
 
-    webhook_resp = _trigger_webhook(paid_client, mp.mollie_payment_id)
+    webhook_resp = _trigger_webhook(paid_client, mp.mollie_payment_id, fake_payment_provider, db_session)
     assert webhook_resp.status_code == 200
 
     db_session.expire_all()
@@ -402,7 +410,7 @@ def test_webhook_first_payment_expired(
 
     fake_payment_provider._next_payment_status = "expired"
 
-    webhook_resp = _trigger_webhook(paid_client, mp.mollie_payment_id)
+    webhook_resp = _trigger_webhook(paid_client, mp.mollie_payment_id, fake_payment_provider, db_session)
     assert webhook_resp.status_code == 200
 
     db_session.expire_all()
@@ -448,7 +456,7 @@ def test_webhook_recurring_payment_paid(
     }
     fake_payment_provider._next_payment_status = "paid"
 
-    webhook_resp = _trigger_webhook(paid_client, recurring_id)
+    webhook_resp = _trigger_webhook(paid_client, recurring_id, fake_payment_provider, db_session)
     assert webhook_resp.status_code == 200
 
     db_session.expire_all()
@@ -502,7 +510,7 @@ def test_webhook_recurring_payment_failed(
     }
     fake_payment_provider._next_payment_status = "failed"
 
-    webhook_resp = _trigger_webhook(paid_client, recurring_id)
+    webhook_resp = _trigger_webhook(paid_client, recurring_id, fake_payment_provider, db_session)
     assert webhook_resp.status_code == 200
 
     db_session.expire_all()
@@ -555,7 +563,7 @@ def test_webhook_recurring_payment_recovers_from_arrears(
     }
     fake_payment_provider._next_payment_status = "paid"
 
-    webhook_resp = _trigger_webhook(paid_client, recurring_id)
+    webhook_resp = _trigger_webhook(paid_client, recurring_id, fake_payment_provider, db_session)
     assert webhook_resp.status_code == 200
 
     db_session.expire_all()
@@ -585,7 +593,7 @@ def test_webhook_duplicate_is_idempotent(
     fake_payment_provider.simulate_paid(mp.mollie_payment_id)
 
     # First webhook call
-    resp1 = _trigger_webhook(paid_client, mp.mollie_payment_id)
+    resp1 = _trigger_webhook(paid_client, mp.mollie_payment_id, fake_payment_provider, db_session)
     assert resp1.status_code == 200
     db_session.expire_all()
 
@@ -600,7 +608,7 @@ def test_webhook_duplicate_is_idempotent(
     subs_after_first = len(fake_payment_provider.subscriptions)
 
     # Second webhook call (duplicate)
-    resp2 = _trigger_webhook(paid_client, mp.mollie_payment_id)
+    resp2 = _trigger_webhook(paid_client, mp.mollie_payment_id, fake_payment_provider, db_session)
     assert resp2.status_code == 200
     db_session.expire_all()
 
@@ -638,7 +646,7 @@ def test_webhook_unknown_payment_id(
     }
     fake_payment_provider._next_payment_status = "paid"
 
-    webhook_resp = _trigger_webhook(paid_client, unknown_id)
+    webhook_resp = _trigger_webhook(paid_client, unknown_id, fake_payment_provider, db_session)
     assert webhook_resp.status_code == 200
 
     # No MolliePaymentORM or SubscriptionORM changes
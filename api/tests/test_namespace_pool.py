@@ -0,0 +1,57 @@
+"""Tests for the warm namespace pool."""
+from __future__ import annotations
+
+from datetime import timedelta
+
+import pytest
+
+from app.config import get_settings
+from app.services import namespace_pool
+from tests.provisioner_utils import FakeProvisioner
+from tests.test_capacity import _create, immich  # noqa: F401
+
+
+@pytest.fixture
+def pool_of_two(monkeypatch):
+    monkeypatch.setenv("CAELUS_NAMESPACE_POOL_SIZE", "2")
+    get_settings.cache_clear()
+
+
+def test_new_deployments_take_warm_namespaces_until_the_pool_is_empty(db_session, immich, pool_of_two):
+    _, template, ptv_id = immich
+    fake_provisioner = FakeProvisioner()
+
+    assert namespace_pool.refill_pool(db_session, provisioner=fake_provisioner) == 2
+    warm = sorted(fake_provisioner.namespaces)
+    assert len(warm) == 2 and all(name.startswith("tenant-") for name in warm)
+    # A full pool is left alone.
+    assert namespace_pool.refill_pool(db_session, provisioner=fake_provisioner) == 0
+
+    created = [_create(db_session, template, ptv_id, n) for n in range(3)]
+
+    assert sorted(d.namespace for d in created[:2]) == warm
+    assert created[2].namespace.startswith("cap2-")
+    stats = namespace_pool.pool_stats(db_session, window=timedelta(hours=1))
+    assert (stats.ready, stats.created_recently, stats.hits_recently) == (0, 3, 2)
+    assert stats.hit_rate == pytest.approx(2 / 3)
+
+    assert namespace_pool.refill_pool(db_session, provisioner=fake_provisioner) == 2
+    assert namespace_pool.pool_stats(db_session, window=timedelta(hours=1)).ready == 2
+
+
+def test_pool_is_unused_when_disabled(db_session, immich):
+    _, template, ptv_id = immich
+    fake_provisioner = FakeProvisioner()
+
+    assert namespace_pool.refill_pool(db_session, provisioner=fake_provisioner) == 0
+    assert _create(db_session, template, ptv_id, 1).namespace.startswith("cap1-")
+    assert fake_provisioner.calls == []
+
+
+def test_namespace_pool_stats_api(client, pool_of_two):
+    resp = client.get("/api/namespace-pool/stats", params={"window_minutes": 5})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert (body["target_size"], body["ready"], body["window_seconds"]) == (2, 0, 300.0)
+    assert body["hit_rate"] is None
+    assert client.get("/api/namespace-pool/stats", params={"window_minutes": 0}).status_code == 422
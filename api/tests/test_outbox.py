@@ -0,0 +1,105 @@
+"""Tests for the transactional outbox and its Mollie side effects."""
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+from sqlmodel import select
+
+from app.models import OutboxORM, SubscriptionORM, SubscriptionStatus
+from app.services import outbox as outbox_service, subscriptions as subscription_service
+from app.services.payment_webhooks import CREATE_SUBSCRIPTION_KIND, process_inbox
+from tests.test_mollie_integration import (
+    _complete_first_payment,
+    _create_paid_deployment,
+    _get_mollie_payment,
+    _setup_product_and_template,
+)
+
+
+def _paid_subscription_id(client, db_session) -> int:
+    product_id, template_id = _setup_product_and_template(client)
+    _, resp = _create_paid_deployment(client, db_session, product_id, template_id)
+    assert resp.status_code == 201
+    return resp.json()["deployment"]["subscription_id"]
+
+
+def test_webhook_queues_subscription_creation(paid_client, fake_payment_provider, db_session):
+    sub_id = _paid_subscription_id(paid_client, db_session)
+    mp = _get_mollie_payment(db_session, sub_id)
+    fake_payment_provider.simulate_paid(mp.mollie_payment_id)
+    paid_client.post("/api/webhooks/mollie", data={"id": mp.mollie_payment_id})
+    process_inbox(db_session, fake_payment_provider, worker_id="test")
+
+    # Applying the webhook made no Mollie call; the intent waits in the outbox.
+    assert fake_payment_provider.subscriptions == {}
+    row = db_session.exec(select(OutboxORM).where(OutboxORM.kind == CREATE_SUBSCRIPTION_KIND)).one()
+    assert row.key == f"subscription_{sub_id}"
+    assert row.status == outbox_service.OUTBOX_STATUS_QUEUED
+
+    in_transaction = []
+    original = fake_payment_provider.create_subscription
+
+    def create_subscription(*args, **kwargs):
+        in_transaction.append(db_session.in_transaction())
+        return original(*args, **kwargs)
+
+    fake_payment_provider.create_subscription = create_subscription
+    results = outbox_service.dispatch_batch(db_session, fake_payment_provider, worker_id="test")
+    assert [(r.kind, r.status) for r in results] == [(CREATE_SUBSCRIPTION_KIND, "done")]
+    assert in_transaction == [False]
+    db_session.expire_all()
+    assert db_session.get(SubscriptionORM, sub_id).mollie_subscription_id == "sub_fake_1"
+
+    # Delivering the intent again (e.g. re-queued by billing sync) is a no-op.
+    outbox_service.enqueue(db_session, kind=CREATE_SUBSCRIPTION_KIND, key=row.key, payload=row.payload)
+    db_session.commit()
+    outbox_service.dispatch_batch(db_session, fake_payment_provider, worker_id="test")
+    assert len(fake_payment_provider.subscriptions) == 1
+
+
+def test_cancel_subscription_cancels_at_mollie_after_commit(paid_client, fake_payment_provider, db_session):
+    sub_id = _paid_subscription_id(paid_client, db_session)
+    _complete_first_payment(paid_client, fake_payment_provider, db_session, sub_id)
+    mollie_sub_id = db_session.get(SubscriptionORM, sub_id).mollie_subscription_id
+
+    subscription_service.cancel_subscription(db_session, subscription_id=sub_id)
+    assert fake_payment_provider.subscriptions[mollie_sub_id].get("status", "active") == "active"
+    assert db_session.get(SubscriptionORM, sub_id).status == SubscriptionStatus.CANCELLED
+
+    outbox_service.dispatch_batch(db_session, fake_payment_provider, worker_id="test")
+    assert fake_payment_provider.subscriptions[mollie_sub_id]["status"] == "canceled"
+
+
+def test_outbox_stats_report_backlog_retries_and_latency(db_session, fake_payment_provider, monkeypatch):
+    now = datetime.now(UTC)
+    handled = []
+
+    def flaky(session, provider, key, payload):
+        handled.append(key)
+        if payload.get("fail"):
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(outbox_service, "_handlers", lambda: {"test.effect": flaky})
+    for key, fail in (("a", False), ("b", True)):
+        outbox_service.enqueue(db_session, kind="test.effect", key=key, payload={"fail": fail})
+    db_session.add(OutboxORM(kind="test.effect", key="later", run_after=now + timedelta(hours=1)))
+    db_session.commit()
+    for row in db_session.exec(select(OutboxORM)).all():
+        row.created_at = now - timedelta(seconds=30)
+    db_session.commit()
+
+    results = outbox_service.dispatch_batch(db_session, fake_payment_provider, worker_id="test")
+    assert sorted((r.key, r.status) for r in results) == [("a", "done"), ("b", "queued")]
+
+    stats = outbox_service.outbox_stats(db_session)
+    [kind] = stats.kinds
+    assert (kind.kind, kind.queued, kind.done, kind.failed, kind.retrying) == ("test.effect", 2, 1, 0, 1)
+    assert kind.oldest_open_age_seconds >= 30
+    assert kind.delivered_recently == 1
+    assert 30 <= kind.max_latency_seconds < 60
+
+
+def test_outbox_stats_endpoint(client, db_session):
+    resp = client.get("/api/outbox/stats")
+    assert resp.status_code == 200
+    assert resp.json() == {"window_seconds": 3600.0, "kinds": []}
@@ -0,0 +1,134 @@
+"""Tests for the queued Mollie webhook inbox."""
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+import threading
+import time
+
+from sqlmodel import select
+
+from app.config import CaelusSettings
+from app.models import MollieWebhookInboxORM
+from app.services import payment_webhooks
+from app.services.mollie import PaymentInfo
+
+
+class CountingProvider:
+    """Payment provider stub that records calls and peak concurrency."""
+
+    def __init__(self, *, delay: float = 0.0, fail: set[str] | None = None) -> None:
+        self.delay = delay
+        self.fail = fail or set()
+        self.calls: list[str] = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def get_payment(self, payment_id: str, *, fresh: bool = False) -> PaymentInfo:
+        with self._lock:
+            self.calls.append(payment_id)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            if payment_id in self.fail:
+                raise ConnectionError("mollie unavailable")
+            return PaymentInfo(status="paid", metadata=None, mandate_id=None, subscription_id=None, payload={})
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def _settings(**overrides) -> CaelusSettings:
+    return CaelusSettings(_env_file=None, **overrides)
+
+
+def _rows(db_session) -> dict[str, MollieWebhookInboxORM]:
+    db_session.expire_all()
+    return {r.mollie_payment_id: r for r in db_session.exec(select(MollieWebhookInboxORM)).all()}
+
+
+def test_endpoint_only_queues_and_collapses_duplicates(paid_client, fake_payment_provider, db_session):
+    for _ in range(3):
+        assert paid_client.post("/api/webhooks/mollie", data={"id": "tr_burst"}).status_code == 200
+    assert paid_client.post("/api/webhooks/mollie", data={"id": "not-a-payment"}).status_code == 200
+
+    rows = _rows(db_session)
+    assert list(rows) == ["tr_burst"]
+    assert rows["tr_burst"].status == "queued"
+    assert fake_payment_provider.payments == {}
+
+
+def test_each_payment_is_fetched_once_per_batch(db_session):
+    for payment_id in ("tr_a", "tr_b", "tr_a", "tr_a"):
+        payment_webhooks.record_webhook(db_session, payment_id)
+    provider = CountingProvider()
+
+    results = payment_webhooks.process_inbox(db_session, provider, worker_id="w", settings=_settings())
+    assert sorted(provider.calls) == ["tr_a", "tr_b"]
+    assert {r.status for r in results} == {"done"}
+    assert payment_webhooks.process_inbox(db_session, provider, worker_id="w", settings=_settings()) == []
+
+    # A later status change for a processed payment queues it again.
+    payment_webhooks.record_webhook(db_session, "tr_a")
+    assert _rows(db_session)["tr_a"].status == "queued"
+
+
+def test_mollie_calls_are_bounded(db_session):
+    for i in range(8):
+        payment_webhooks.record_webhook(db_session, f"tr_{i}")
+    provider = CountingProvider(delay=0.05)
+
+    payment_webhooks.process_inbox(
+        db_session, provider, worker_id="w", settings=_settings(mollie_webhook_concurrency=2)
+    )
+    assert len(provider.calls) == 8
+    assert provider.peak == 2
+
+
+def test_webhook_during_processing_requeues(db_session, monkeypatch):
+    payment_webhooks.record_webhook(db_session, "tr_busy")
+    original = payment_webhooks.apply_payment
+
+    def apply_and_get_notified(session, payment_id, payment_info, provider):
+        original(session, payment_id, payment_info, provider)
+        # Mollie notifies again mid-processing (in the real system: another request).
+        session.get(MollieWebhookInboxORM, _rows(session)["tr_busy"].id).received_at = datetime.now(UTC) + timedelta(seconds=1)
+
+    monkeypatch.setattr(payment_webhooks, "apply_payment", apply_and_get_notified)
+    results = payment_webhooks.process_inbox(db_session, CountingProvider(), worker_id="w", settings=_settings())
+    assert results[0].status == "queued"
+
+
+def test_failed_fetches_back_off_then_give_up(db_session):
+    payment_webhooks.record_webhook(db_session, "tr_down")
+    provider = CountingProvider(fail={"tr_down"})
+    settings = _settings(mollie_webhook_max_attempts=2)
+
+    results = payment_webhooks.process_inbox(db_session, provider, worker_id="w", settings=settings)
+    assert results[0].status == "queued"
+    assert "mollie unavailable" in results[0].error
+    row = _rows(db_session)["tr_down"]
+    assert row.run_after.replace(tzinfo=UTC) > datetime.now(UTC)
+
+    # Not runnable until the backoff expires.
+    assert payment_webhooks.process_inbox(db_session, provider, worker_id="w", settings=settings) == []
+    row.run_after = datetime.now(UTC) - timedelta(seconds=1)
+    db_session.commit()
+
+    results = payment_webhooks.process_inbox(db_session, provider, worker_id="w", settings=settings)
+    assert results[0].status == "failed"
+    assert provider.calls == ["tr_down", "tr_down"]
+
+
+def test_expired_leases_are_reclaimed(db_session):
+    payment_webhooks.record_webhook(db_session, "tr_orphan")
+    settings = _settings(mollie_webhook_lease_seconds=60)
+    claimed = payment_webhooks.claim_batch(db_session, worker_id="dead", limit=10, lease=timedelta(seconds=60))
+    assert [c.mollie_payment_id for c in claimed] == ["tr_orphan"]
+
+    assert payment_webhooks.process_inbox(db_session, CountingProvider(), worker_id="w", settings=settings) == []
+    _rows(db_session)["tr_orphan"].locked_at = datetime.now(UTC) - timedelta(minutes=5)
+    db_session.commit()
+    results = payment_webhooks.process_inbox(db_session, CountingProvider(), worker_id="w", settings=settings)
+    assert [r.status for r in results] == ["done"]
@@ -80,6 +80,24 @@ def test_helm_upgrade_install_passes_values_and_returns_status() -> None:
     assert "--wait" in upgrade_cmd
 
 
+def test_adapters_pass_cluster_kubeconfig_and_context() -> None:
+    calls: list[list[str]] = []
+
+    def runner(cmd: list[str]) -> subprocess.CompletedProcess[str]:
+        calls.append(cmd)
+        return _result(args=cmd, returncode=0, stdout="{}")
+
+    KubeAdapter(runner=runner, kubeconfig="/etc/east.yaml", context="k3s-east").namespace_exists("ns-a")
+    HelmAdapter(runner=runner, kubeconfig="/etc/east.yaml", context="k3s-east").helm_uninstall(
+        release_name="rel-a", namespace="ns-a", timeout=60, wait=False
+    )
+
+    assert calls[0] == [
+        "kubectl", "get", "namespace", "ns-a", "-o", "name", "--kubeconfig", "/etc/east.yaml", "--context", "k3s-east"
+    ]
+    assert calls[1][-4:] == ["--kubeconfig", "/etc/east.yaml", "--kube-context", "k3s-east"]
+
+
 def test_helm_status_not_found_returns_exists_false() -> None:
     def runner(cmd: list[str]) -> subprocess.CompletedProcess[str]:
         return _result(args=cmd, returncode=1, stderr="Error: release: not found")
@@ -118,3 +136,57 @@ def test_helm_upgrade_install_timeout_raises_command_error() -> None:
             wait=False,
         )
     assert "context deadline exceeded" in str(exc_info.value).lower()
+
+
+def test_kube_release_readiness_groups_workloads_by_release() -> None:
+    calls: list[list[str]] = []
+
+    def workload(kind, name, namespace, release, **status):
+        return {
+            "kind": kind,
+            "metadata": {
+                "name": name,
+                "namespace": namespace,
+                "generation": 2,
+                "annotations": {"meta.helm.sh/release-name": release},
+            },
+            "spec": {"replicas": 1},
+            "status": {"observedGeneration": 2, **status},
+        }
+
+    items = [
+        workload("Deployment", "web", "ns-a", "app-a", availableReplicas=1, updatedReplicas=1),
+        workload("StatefulSet", "db", "ns-a", "app-a", readyReplicas=0, updatedReplicas=1),
+        workload("Deployment", "web", "ns-b", "app-b", availableReplicas=1, updatedReplicas=1),
+        workload("Deployment", "web", "ns-other", "other", availableReplicas=0, updatedReplicas=0),
+    ]
+
+    def runner(cmd: list[str]) -> subprocess.CompletedProcess[str]:
+        calls.append(cmd)
+        return _result(args=cmd, returncode=0, stdout=json.dumps({"items": items}))
+
+    readiness = KubeAdapter(runner=runner).release_readiness({"ns-a", "ns-b"})
+
+    assert len(calls) == 1
+    assert set(readiness) == {("ns-a", "app-a"), ("ns-b", "app-b")}
+    assert readiness[("ns-a", "app-a")].ready is False
+    assert readiness[("ns-a", "app-a")].reason == "StatefulSet/db 0/1 available"
+    assert readiness[("ns-b", "app-b")].ready is True
+
+
+def test_kube_async_namespace_delete_and_listing() -> None:
+    calls: list[list[str]] = []
+
+    def runner(cmd: list[str]) -> subprocess.CompletedProcess[str]:
+        calls.append(cmd)
+        items = [
+            {"metadata": {"name": "ns-a"}, "status": {"phase": "Active"}},
+            {"metadata": {"name": "ns-b"}, "status": {"phase": "Terminating"}},
+        ]
+        return _result(args=cmd, returncode=0, stdout=json.dumps({"items": items}))
+
+    adapter = KubeAdapter(runner=runner)
+    adapter.delete_namespace("ns-b", wait=False)
+
+    assert calls[0] == ["kubectl", "delete", "namespace", "ns-b", "--ignore-not-found=true", "--wait=false"]
+    assert adapter.list_namespaces() == {"ns-a": "Active", "ns-b": "Terminating"}
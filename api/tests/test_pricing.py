@@ -0,0 +1,118 @@
+"""Tests for the vectorized pricing engine and plan pricing."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from sqlmodel import select
+
+from app import pricing
+from app.models import (
+    BillingInterval,
+    PlanORM,
+    PlanPricingRequest,
+    PlanTemplateVersionORM,
+    ProductORM,
+)
+from app.services import pricing as pricing_service
+from tests.conftest import create_paid_plan_template
+
+
+def test_evaluate_matches_scalar_model():
+    server_share = pricing.CostModel()
+    result = pricing.evaluate(server_share, 0.25, 2.0, [57.5, 2300.0], 20.0)
+
+    # RAM-bound: 2/256 of a $215 server, whose NVMe slice covers the small tier.
+    assert result["server_share"].tolist() == [2 / 256, 2 / 256]
+    assert not result["cpu_bound"].any()
+    assert result["storage"][0] == 0
+    assert result["cost"] == pytest.approx([215 * 2 / 256 + 10, 215 * 2 / 256 + 1.1025 * 40 / 12 + 10])
+    assert result["price"] == pytest.approx(result["cost"] * 2)
+
+    component = pricing.CostModel(mode=pricing.COST_MODE_COMPONENT, target_margin_pct=20)
+    result = pricing.evaluate(component, 0.25, 2.0, 57.5, 20.0)
+    assert result["cost"] == pytest.approx([1.125 + 0.7 + 0.02875 * 40 / 12 + 0.02 * 1.3 + 10])
+    assert result["price"] == pytest.approx(result["cost"] / 0.8)
+
+
+def test_scenario_grid_covers_every_combination_and_is_cached():
+    pricing.cache_clear()
+    model = pricing.CostModel()
+    small = pricing.ServerSpec(name="AX102", cost_mo=118.0, cpu_cores=16, ram_gb=128, storage_tb=3.84)
+    axes = ([0.1, 0.25, 0.5], [0.5, 1.0, 2.0, 4.0], [50.0, 200.0, 1000.0], [5.0, 50.0])
+
+    grid = pricing.scenario_grid(model, *axes, servers=[model.server, small])
+
+    assert len(grid) == 3 * 4 * 3 * 2 * 2
+    rows = list(grid.rows())
+    assert {row["server"] for row in rows} == {"AX162-R", "AX102"}
+    # Same scenario on the smaller server occupies a larger share of it.
+    first = pricing.evaluate(model, 0.1, 0.5, 50.0, 5.0)
+    assert rows[0]["cost"] == pytest.approx(first["cost"][0])
+    assert rows[1]["server_share"] > rows[0]["server_share"]
+
+    assert pricing.scenario_grid(model, *axes, servers=[model.server, small]) is grid
+    with pytest.raises(ValueError):
+        grid["cost"][0] = 0
+    with pytest.raises(ValueError, match="exceed"):
+        pricing.scenario_grid(model, np.arange(1000), np.arange(1000), np.arange(2), [1.0])
+
+
+def test_price_plans_publishes_new_template_versions(db_session):
+    product = ProductORM(name="Photos", description="")
+    db_session.add(product)
+    db_session.commit()
+    small = create_paid_plan_template(db_session, product.id, price_cents=299, name="50 GB")
+    large = create_paid_plan_template(db_session, product.id, price_cents=1199, name="1 TB")
+    db_session.get(PlanTemplateVersionORM, small).storage_bytes = 50 * 1000**3
+    large_ptv = db_session.get(PlanTemplateVersionORM, large)
+    large_ptv.storage_bytes = 1000 * 1000**3
+    large_ptv.billing_interval = BillingInterval.ANNUAL
+    db_session.commit()
+    request = PlanPricingRequest(cpu_cores=0.25, ram_gb=2.0, bandwidth_gb_mo=20.0, storage_overhead_pct=15)
+
+    preview = pricing_service.price_plans(db_session, product_id=product.id, request=request)
+    assert [p.template_id for p in preview.plans] == [small, large]
+    assert preview.plans[0].cost_cents == 1168
+    assert preview.plans[0].suggested_price_cents == 2336
+    assert preview.plans[1].cost_cents > 12 * preview.plans[0].cost_cents
+    assert all(p.new_template_id is None for p in preview.plans)
+
+    applied = pricing_service.price_plans(db_session, product_id=product.id, request=request, apply=True)
+    plans = db_session.exec(select(PlanORM).where(PlanORM.product_id == product.id).order_by(PlanORM.id)).all()
+    assert [plan.template_id for plan in plans] == [p.new_template_id for p in applied.plans]
+    assert [plan.template.price_cents for plan in plans] == [p.suggested_price_cents for p in applied.plans]
+    assert plans[1].template.billing_interval == BillingInterval.ANNUAL
+    # The old versions stay for their subscriptions.
+    assert db_session.get(PlanTemplateVersionORM, small).price_cents == 299
+
+
+def test_pricing_api(client, db_session):
+    product = ProductORM(name="Files", description="")
+    db_session.add(product)
+    db_session.commit()
+    create_paid_plan_template(db_session, product.id, price_cents=100, name="Basic")
+
+    resp = client.post(
+        f"/api/products/{product.id}/plans/pricing?apply=true",
+        json={"cpu_cores": 0.15, "ram_gb": 0.75, "cost_model": {"target_margin_pct": 60}},
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["applied"] is True
+    assert body["plans"][0]["new_template_id"] is not None
+
+    resp = client.post(
+        "/api/pricing/sweep",
+        json={"cpu_cores": [0.1, 0.2], "ram_gb": [1], "storage_gb": [10, 100, 1000]},
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["count"] == 6
+    assert len(body["columns"]["price"]) == 6
+    assert body["columns"]["server"] == ["AX162-R"] * 6
+
+    resp = client.post(
+        "/api/pricing/sweep",
+        json={"cpu_cores": list(range(1000)), "ram_gb": list(range(1000)), "storage_gb": [1, 2]},
+    )
+    assert resp.status_code == 400
@@ -12,16 +12,6 @@ def create_test_image(size=(100, 100), format="PNG"):
     return buf.getvalue()
 
 
-@pytest.fixture(autouse=True)
-def setup_static_dir():
-    from app.config import get_settings
-
-    static_path = get_settings().static_path
-    icons_dir = static_path / "icons"
-    icons_dir.mkdir(parents=True, exist_ok=True)
-    yield
-
-
 def test_product_icon_url_absent_on_create(client):
     """Product created without icon should have null icon_url."""
     resp = client.post("/api/products", json={"name": "test-prod", "description": "Test"})
@@ -273,3 +263,104 @@ def test_static_path_traversal_blocked(client):
     """Static endpoint should block path traversal."""
     resp = client.get("/api/static/../../../etc/passwd")
     assert resp.status_code == 404
+
+
+def test_icon_upload_generates_size_and_format_variants(client):
+    resp = client.post("/api/products", json={"name": "variants-test", "description": "Test"})
+    product_id = resp.json()["id"]
+
+    upload_resp = client.put(
+        f"/api/products/{product_id}/icon",
+        files={"icon": ("test.png", create_test_image((600, 400)), "image/png")},
+    )
+    assert upload_resp.status_code == 200
+    data = upload_resp.json()
+    variants = data["icon_variants"]
+    assert set(variants) == {f"{size}.{ext}" for size in (64, 128, 256) for ext in ("png", "webp")}
+    assert variants["256.png"] == data["icon_url"]
+
+    for name, url in variants.items():
+        file_resp = client.get(url)
+        assert file_resp.status_code == 200
+        size, ext = name.split(".")
+        img = Image.open(io.BytesIO(file_resp.content))
+        assert img.size == (int(size), int(size))
+        assert img.format == ext.upper()
+
+
+def test_identical_icon_uploads_share_one_stored_icon(client, static_dir):
+    first = client.post("/api/products", json={"name": "dedupe-a", "description": "Test"}).json()["id"]
+    second = client.post("/api/products", json={"name": "dedupe-b", "description": "Test"}).json()["id"]
+    icon_data = create_test_image()
+
+    urls = [
+        client.put(
+            f"/api/products/{product_id}/icon",
+            files={"icon": ("test.png", icon_data, "image/png")},
+        ).json()["icon_url"]
+        for product_id in (first, second)
+    ]
+    assert urls[0] == urls[1]
+    stored = [p.name for p in (static_dir / "icons").iterdir()]
+    assert len(stored) == 1 and not stored[0].startswith(".tmp-")
+
+
+def test_render_icon_variants_rejects_invalid_data():
+    from app.services.images import render_icon
+
+    with pytest.raises(ValueError, match="Invalid image file"):
+        render_icon(b"not an image")
+
+
+def test_multipart_create_streams_without_buffering_body(client, monkeypatch):
+    """Multipart uploads are parsed from the stream; the body is never buffered whole."""
+    from starlette.requests import Request
+
+    async def no_body(self):
+        raise AssertionError("multipart body must not be buffered")
+
+    monkeypatch.setattr(Request, "body", no_body)
+    resp = client.post(
+        "/api/products",
+        data={"payload": '{"name": "streamed-prod", "description": "Streamed"}'},
+        files={"icon": ("icon.png", create_test_image(), "image/png")},
+    )
+    assert resp.status_code == 201
+    assert resp.json()["icon_url"] is not None
+
+
+def test_multipart_create_oversized_icon_rejected(client):
+    """Oversized icons in a multipart create are rejected while streaming."""
+    resp = client.post(
+        "/api/products",
+        data={"payload": '{"name": "big-icon-prod", "description": "Too big"}'},
+        files={"icon": ("large.png", b"x" * (11 * 1024 * 1024), "image/png")},
+    )
+    assert resp.status_code == 400
+    assert "too large" in resp.json()["detail"]
+    assert client.get("/api/products").json() == []
+
+
+def test_render_icon_times_out_and_recycles_pool(monkeypatch):
+    """A render slower than icon_timeout_seconds is abandoned and its workers replaced."""
+    import asyncio
+
+    from app.config import get_settings
+    from app.services import images
+
+    images.shutdown_pool()
+    monkeypatch.setenv("CAELUS_ICON_TIMEOUT_SECONDS", "0.001")
+    get_settings.cache_clear()
+    try:
+        # A fresh pool still has to spawn its workers, far slower than 1ms.
+        with pytest.raises(ValueError, match="timed out"):
+            images.render_icon(create_test_image())
+        with pytest.raises(ValueError, match="timed out"):
+            asyncio.run(images.render_icon_async(create_test_image()))
+
+        monkeypatch.setenv("CAELUS_ICON_TIMEOUT_SECONDS", "30")
+        get_settings.cache_clear()
+        assert "64.webp" in images.render_icon(create_test_image()).variants
+    finally:
+        get_settings.cache_clear()
+        images.shutdown_pool()
@@ -1,6 +1,5 @@
 import io
 
-import pytest
 from PIL import Image
 
 from tests.conftest import client
@@ -96,16 +95,6 @@ def _create_test_image(size=(100, 100)):
     return buf.getvalue()
 
 
-@pytest.fixture(autouse=True)
-def _setup_static_dir():
-    from app.config import get_settings
-
-    static_path = get_settings().static_path
-    icons_dir = static_path / "icons"
-    icons_dir.mkdir(parents=True, exist_ok=True)
-    yield
-
-
 def test_update_product_multipart_with_icon(client):
     """PUT with multipart form should update fields and icon atomically."""
     prod_resp = client.post("/api/products", json={"name": "IconUpdate", "description": "before"})
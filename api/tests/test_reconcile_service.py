@@ -1,91 +1,22 @@
 from __future__ import annotations
 
-from datetime import UTC, datetime
-
-from app.models import DeploymentCreate, DeploymentORM, ProductORM, PlanORM, PlanTemplateVersionORM, BillingInterval
-from app.models.core import _utcnow
-from app.services import deployments, products, templates, users
-from app.services.reconcile import DeploymentReconciler
-from tests.provisioner_utils import FakeProvisioner
-
-
-def _create_plan_template(db_session, product_id: int, storage_bytes: int | None) -> int:
-    """Create a Plan + PlanTemplateVersion with a specific storage_bytes value."""
-    plan = PlanORM(name=f"plan-{storage_bytes}", product_id=product_id, created_at=_utcnow())
-    db_session.add(plan)
-    db_session.flush()
-    ptv = PlanTemplateVersionORM(
-        plan_id=plan.id,
-        price_cents=0,
-        billing_interval=BillingInterval.MONTHLY,
-        storage_bytes=storage_bytes,
-        created_at=_utcnow(),
-    )
-    db_session.add(ptv)
-    db_session.flush()
-    plan.template_id = ptv.id
-    db_session.commit()
-    db_session.refresh(ptv)
-    return ptv.id
+from datetime import UTC, datetime, timedelta
 
+from sqlalchemy import update
 
-def _seed_deployment(db_session, *, storage_bytes: int | None = 0) -> int:
-    """Seed a deployment with a plan template.
-
-    ``storage_bytes`` defaults to 0 (free-plan behaviour used by existing tests).
-    Pass an explicit int to test plan storage injection, or ``None`` for a plan
-    with no storage quota.
-    """
-    user = users.create_user(db_session, payload=users.UserCreate(email="reconcile-user@example.com"))
-    product = products.create_product(
-        db_session,
-        payload=products.ProductCreate(name="reconcile-product", description="desc"),
-    )
-    schema = {
-        "type": "object",
-        "properties": {
-            "user": {
-                "type": "object",
-                "properties": {
-                    "message": {"type": "string"},
-                    "domain": {"type": "string", "title": "hostname"},
-                },
-                "additionalProperties": False,
-            },
-            "replicas": {"type": "integer"},
-        },
-        "additionalProperties": False,
-    }
-    template = templates.create_template(
-        db_session,
-        payload=templates.ProductTemplateVersionCreate(
-            product_id=product.id,
-            chart_ref="oci://example/chart",
-            chart_version="1.2.3",
-            system_values_json={"replicas": 1},
-            values_schema_json=schema,
-            health_timeout_sec=120,
-        ),
-    )
-    product_orm = db_session.get(ProductORM, product.id)
-    product_orm.template_id = template.id
-    db_session.add(product_orm)
-    db_session.commit()
-    ptv_id = _create_plan_template(db_session, product.id, storage_bytes)
-    deployment = deployments.create_deployment(
-        db_session,
-        payload=DeploymentCreate(
-            user_id=user.id,
-            desired_template_id=template.id,
-            user_values_json={"user": {"message": "hello", "domain": "reconcile.example.test"}},
-            plan_template_id=ptv_id,
-        ),
-    ).deployment
-    return deployment.id
+from app.config import get_settings
+from app.models import DeploymentORM, DeploymentReconcileJobORM
+from app.provisioner import ReleaseReadiness
+from app.services.jobs import JobService
+from app.services.readiness import ReadinessIndex
+from app.services.reconcile import DeploymentReconciler, check_rollouts
+from tests.conftest import seed_deployment
+from tests.provisioner_utils import FakeProvisioner
+from tests.test_capacity import _create, immich  # noqa: F401
 
 
 def test_reconcile_apply_happy_path_returns_ready_and_applied_template(db_session) -> None:
-    deployment_id = _seed_deployment(db_session)
+    deployment_id = seed_deployment(db_session)
     fake_provisioner = FakeProvisioner()
     reconciler = DeploymentReconciler(session=db_session, provisioner=fake_provisioner)
 
@@ -109,7 +40,7 @@ def test_reconcile_apply_happy_path_returns_ready_and_applied_template(db_sessio
 
 
 def test_reconcile_delete_returns_deleted_when_marked_deleted(db_session) -> None:
-    deployment_id = _seed_deployment(db_session)
+    deployment_id = seed_deployment(db_session)
     deployment = db_session.get(DeploymentORM, deployment_id)
     assert deployment is not None
     deployment.deleted_at = datetime.now(UTC)
@@ -133,7 +64,7 @@ def test_reconcile_delete_returns_deleted_when_marked_deleted(db_session) -> Non
 
 
 def test_reconcile_validation_failure_returns_error_and_persists(db_session) -> None:
-    deployment_id = _seed_deployment(db_session)
+    deployment_id = seed_deployment(db_session)
     deployment = db_session.get(DeploymentORM, deployment_id)
     assert deployment is not None
     deployment.name = ""
@@ -155,7 +86,7 @@ def test_reconcile_validation_failure_returns_error_and_persists(db_session) ->
 
 
 def test_reconcile_schema_validation_failure_returns_error_result(db_session) -> None:
-    deployment_id = _seed_deployment(db_session)
+    deployment_id = seed_deployment(db_session)
     deployment = db_session.get(DeploymentORM, deployment_id)
     assert deployment is not None
     deployment.user_values_json = {"message": 123}
@@ -178,7 +109,7 @@ def test_reconcile_schema_validation_failure_returns_error_result(db_session) ->
 
 def test_reconcile_injects_plan_storage_into_helm_values(db_session) -> None:
     """Plan storage_bytes is projected into caelus.plan namespace in Helm values."""
-    deployment_id = _seed_deployment(db_session, storage_bytes=10737418240)  # 10 GiB
+    deployment_id = seed_deployment(db_session, storage_bytes=10737418240)  # 10 GiB
     fake_provisioner = FakeProvisioner()
     reconciler = DeploymentReconciler(session=db_session, provisioner=fake_provisioner)
 
@@ -196,7 +127,7 @@ def test_reconcile_injects_plan_storage_into_helm_values(db_session) -> None:
 
 def test_reconcile_injects_empty_caelus_plan_when_no_storage_quota(db_session) -> None:
     """When plan has no storage quota, caelus.plan is injected but empty."""
-    deployment_id = _seed_deployment(db_session, storage_bytes=None)
+    deployment_id = seed_deployment(db_session, storage_bytes=None)
     fake_provisioner = FakeProvisioner()
     reconciler = DeploymentReconciler(session=db_session, provisioner=fake_provisioner)
 
@@ -206,3 +137,142 @@ def test_reconcile_injects_empty_caelus_plan_when_no_storage_quota(db_session) -
     values = fake_provisioner.calls[1][1]["values"]
     assert values["caelus"] == {"plan": {}}
     assert values["replicas"] == 1
+
+
+def _start_staged_rollout(db_session, monkeypatch, fake_provisioner):
+    monkeypatch.setenv("CAELUS_ROLLOUT_POLL_SECONDS", "0")
+    get_settings.cache_clear()
+    deployment_id = seed_deployment(db_session)
+    jobs = JobService(db_session)
+    job = jobs.claim_next_job(worker_id="w")
+    result = DeploymentReconciler(session=db_session, provisioner=fake_provisioner, staged=True).reconcile(
+        deployment_id
+    )
+    jobs.await_ready(job_id=job.id, deadline=result.rollout_deadline)
+    return db_session.get(DeploymentORM, deployment_id), job.id
+
+
+def test_staged_apply_installs_without_waiting_and_settles_in_bulk(db_session, monkeypatch) -> None:
+    fake_provisioner = FakeProvisioner()
+    deployment, job_id = _start_staged_rollout(db_session, monkeypatch, fake_provisioner)
+
+    install = fake_provisioner.calls[1][1]
+    assert (install["atomic"], install["wait"]) == (False, False)
+    assert deployment.status == "provisioning" and deployment.applied_template_id is None
+    # The job stays open, so a second reconcile job cannot start meanwhile.
+    assert JobService(db_session).claim_next_job(worker_id="w") is None
+
+    key = (deployment.namespace, deployment.name)
+    fake_provisioner.readiness[key] = ReleaseReadiness(*key, ready=False, reason="Deployment/web 0/1 available")
+    assert check_rollouts(db_session, worker_id="poller", provisioner=fake_provisioner) == []
+    assert db_session.get(DeploymentReconcileJobORM, job_id).status == "queued"
+
+    fake_provisioner.readiness[key] = ReleaseReadiness(*key, ready=True)
+    [settled] = check_rollouts(db_session, worker_id="poller", provisioner=fake_provisioner)
+    db_session.refresh(deployment)
+    assert (settled.job_id, settled.status) == (job_id, "done")
+    assert deployment.status == "ready"
+    assert deployment.applied_template_id == deployment.desired_template_id
+    # One listing of all namespaces per poll.
+    assert fake_provisioner.calls[-1] == ("release_readiness", {"namespaces": None})
+
+
+def test_staged_rollout_past_deadline_is_rolled_back(db_session, monkeypatch) -> None:
+    fake_provisioner = FakeProvisioner()
+    deployment, job_id = _start_staged_rollout(db_session, monkeypatch, fake_provisioner)
+    job = db_session.get(DeploymentReconcileJobORM, job_id)
+    job.deadline = datetime.now(UTC)
+    db_session.commit()
+    key = (deployment.namespace, deployment.name)
+    fake_provisioner.readiness[key] = ReleaseReadiness(*key, ready=False, reason="StatefulSet/db 0/1 available")
+
+    [settled] = check_rollouts(db_session, worker_id="poller", provisioner=fake_provisioner)
+
+    db_session.refresh(deployment)
+    assert settled.status == "failed"
+    assert deployment.status == "error"
+    assert "StatefulSet/db 0/1" in deployment.last_error
+    # A first install is removed, as `helm --atomic` would.
+    assert fake_provisioner.calls[-1][0] == "helm_uninstall"
+
+
+def test_unlisted_release_waits_for_the_deadline_then_asks_helm(db_session, monkeypatch) -> None:
+    fake_provisioner = FakeProvisioner()
+    deployment, job_id = _start_staged_rollout(db_session, monkeypatch, fake_provisioner)
+    key = (deployment.namespace, deployment.name)
+
+    # Not listed yet: keep waiting rather than calling it ready.
+    assert check_rollouts(db_session, worker_id="poller", provisioner=fake_provisioner) == []
+    assert db_session.get(DeploymentReconcileJobORM, job_id).status == "queued"
+
+    # Past the deadline, a deployed release without workloads is ready.
+    job = db_session.get(DeploymentReconcileJobORM, job_id)
+    job.deadline = datetime.now(UTC)
+    db_session.commit()
+    fake_provisioner.release_status[key] = "deployed"
+    [settled] = check_rollouts(db_session, worker_id="poller", provisioner=fake_provisioner)
+    db_session.refresh(deployment)
+    assert settled.status == "done" and deployment.status == "ready"
+    assert ("helm_get_release_status", {"release_name": deployment.name, "namespace": deployment.namespace}) in (
+        fake_provisioner.calls
+    )
+
+
+def test_unlisted_release_missing_from_helm_fails_at_deadline(db_session, monkeypatch) -> None:
+    fake_provisioner = FakeProvisioner()
+    deployment, job_id = _start_staged_rollout(db_session, monkeypatch, fake_provisioner)
+    job = db_session.get(DeploymentReconcileJobORM, job_id)
+    job.deadline = datetime.now(UTC)
+    db_session.commit()
+
+    [settled] = check_rollouts(db_session, worker_id="poller", provisioner=fake_provisioner)
+
+    db_session.refresh(deployment)
+    assert settled.status == "failed" and deployment.status == "error"
+    assert "release is not found" in deployment.last_error
+    # Nothing to roll back.
+    assert "helm_uninstall" not in [call for call, _ in fake_provisioner.calls]
+
+
+def test_rollouts_are_checked_in_batches_against_one_listing(db_session, immich, monkeypatch) -> None:
+    monkeypatch.setenv("CAELUS_ROLLOUT_POLL_SECONDS", "60")
+    monkeypatch.setenv("CAELUS_ROLLOUT_BATCH_SIZE", "2")
+    get_settings.cache_clear()
+    _, template, ptv_id = immich
+    created = [_create(db_session, template, ptv_id, n) for n in range(5)]
+    fake_provisioner = FakeProvisioner()
+    jobs = JobService(db_session)
+    while job := jobs.claim_next_job(worker_id="w"):
+        result = DeploymentReconciler(session=db_session, provisioner=fake_provisioner, staged=True).reconcile(
+            job.deployment_id
+        )
+        jobs.await_ready(job_id=job.id, deadline=result.rollout_deadline)
+
+    def make_due():
+        past = datetime.now(UTC) - timedelta(seconds=1)
+        db_session.execute(update(DeploymentReconcileJobORM).values(run_after=past))
+        db_session.commit()
+
+    slow = created[0]
+    for deployment in created[1:]:
+        fake_provisioner.readiness[(deployment.namespace, deployment.name)] = ReleaseReadiness(
+            deployment.namespace, deployment.name, ready=True
+        )
+    key = (slow.namespace, slow.name)
+    fake_provisioner.readiness[key] = ReleaseReadiness(*key, ready=False, reason="Deployment/web 0/1 available")
+    index = ReadinessIndex(fake_provisioner)
+    make_due()
+
+    settled = check_rollouts(db_session, worker_id="poller", provisioner=fake_provisioner, index=index)
+
+    assert sorted(str(r.deployment_id) for r in settled) == sorted(str(d.id) for d in created[1:])
+    assert [call for call, _ in fake_provisioner.calls].count("release_readiness") == 1
+    statuses = {d.id: db_session.get(DeploymentORM, d.id).status for d in created}
+    assert statuses.pop(slow.id) == "provisioning"
+    assert set(statuses.values()) == {"ready"}
+
+    # Within the poll interval the snapshot is reused: no second listing.
+    fake_provisioner.readiness[key] = ReleaseReadiness(*key, ready=True)
+    make_due()
+    assert check_rollouts(db_session, worker_id="poller", provisioner=fake_provisioner, index=index) == []
+    assert [call for call, _ in fake_provisioner.calls].count("release_readiness") == 1
@@ -0,0 +1,145 @@
+"""Tests for the cached, coalescing DNS resolver."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.config import CaelusSettings
+from app.services import resolver
+from app.services.resolver import CachingResolver
+from tests.resolver_utils import StubResolver
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _caching(stub, clock, **overrides) -> CachingResolver:
+    options = dict(timeout=1.0, positive_ttl=60.0, negative_ttl=5.0, max_entries=100, clock=clock)
+    options.update(overrides)
+    return CachingResolver(stub, **options)
+
+
+def test_positive_answers_are_cached_until_ttl_expires():
+    stub = StubResolver({"app.example.com": {"1.2.3.4"}})
+    clock = FakeClock()
+    caching = _caching(stub, clock)
+
+    async def scenario():
+        assert await caching.resolve("app.example.com") == {"1.2.3.4"}
+        clock.now += 59
+        assert await caching.resolve("app.example.com") == {"1.2.3.4"}
+        assert stub.queries == ["app.example.com"]
+        clock.now += 2
+        await caching.resolve("app.example.com")
+        assert stub.queries == ["app.example.com"] * 2
+
+    asyncio.run(scenario())
+
+
+def test_negative_answers_use_the_negative_ttl():
+    stub = StubResolver()
+    clock = FakeClock()
+    caching = _caching(stub, clock)
+
+    async def scenario():
+        assert await caching.resolve("new.example.com") is None
+        assert await caching.resolve("new.example.com") is None
+        assert len(stub.queries) == 1
+        # The record gets created; it shows up once the negative entry expires.
+        stub.records["new.example.com"] = {"1.2.3.4"}
+        clock.now += 6
+        assert await caching.resolve("new.example.com") == {"1.2.3.4"}
+
+    asyncio.run(scenario())
+
+
+def test_identical_concurrent_lookups_share_one_query():
+    stub = StubResolver({"app.example.com": {"1.2.3.4"}}, delay=0.05)
+    caching = _caching(stub, FakeClock())
+
+    async def scenario():
+        results = await asyncio.gather(*(caching.resolve("app.example.com") for _ in range(20)))
+        assert all(r == {"1.2.3.4"} for r in results)
+        assert stub.queries == ["app.example.com"]
+
+    asyncio.run(scenario())
+
+
+def test_slow_queries_time_out_as_not_resolving():
+    stub = StubResolver({"slow.example.com": {"1.2.3.4"}}, delay=5)
+    caching = _caching(stub, FakeClock(), timeout=0.05)
+
+    async def scenario():
+        assert await caching.resolve("slow.example.com") is None
+        # Timeouts are cached negatively, so the next keystroke does not wait again.
+        assert await caching.resolve("slow.example.com") is None
+        assert len(stub.queries) == 1
+
+    asyncio.run(scenario())
+
+
+def test_batches_larger_than_the_pool_wait_for_a_slot_not_the_timeout():
+    records = {f"h{i}.example.com": {"1.2.3.4"} for i in range(40)}
+    # Each answer takes 50ms on a pool of 4; the whole batch takes ~0.5s,
+    # well past the 0.2s per-query timeout.
+    stub = StubResolver(records, delay=0.05, workers=4)
+    clock = FakeClock()
+    caching = _caching(stub, clock, timeout=0.2, max_concurrency=4)
+
+    async def scenario():
+        results = await asyncio.gather(*(caching.resolve(fqdn) for fqdn in records))
+        assert results == [{"1.2.3.4"}] * 40
+        assert stub.max_active == 4
+
+    asyncio.run(scenario())
+
+
+def test_cache_is_bounded():
+    stub = StubResolver({f"h{i}.example.com": {"1.2.3.4"} for i in range(5)})
+    caching = _caching(stub, FakeClock(), max_entries=2)
+
+    async def scenario():
+        for i in range(5):
+            await caching.resolve(f"h{i}.example.com")
+        await caching.resolve("h4.example.com")
+        await caching.resolve("h0.example.com")
+        assert stub.queries.count("h4.example.com") == 1
+        assert stub.queries.count("h0.example.com") == 2
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def stub_resolver():
+    stub = StubResolver({"app.example.com": {"1.2.3.4"}}, delay=0.05)
+    resolver.set_resolver(stub, settings=CaelusSettings(_env_file=None))
+    yield stub
+    resolver.reset()
+
+
+def test_sync_and_async_callers_share_cache(stub_resolver):
+    async def scenario():
+        return await asyncio.gather(*(resolver.lookup_async("app.example.com") for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [{"1.2.3.4"}] * 5
+    assert resolver.lookup("app.example.com") == {"1.2.3.4"}
+    assert resolver.lookup("missing.example.com") is None
+    assert stub_resolver.queries == ["app.example.com", "missing.example.com"]
+
+
+def test_sync_batch_waits_for_all_slots(stub_resolver):
+    records = {f"h{i}.example.com": {"1.2.3.4"} for i in range(40)}
+    stub = StubResolver(records, delay=0.05, workers=4)
+    settings = CaelusSettings(_env_file=None, dns_timeout_seconds=0.2, dns_max_concurrency=4)
+    resolver.set_resolver(stub, settings=settings)
+
+    answers = resolver.lookup_many([*records, "h0.example.com"])
+    assert all(answers[fqdn] == {"1.2.3.4"} for fqdn in records)
+    # Duplicates share one query.
+    assert len(stub.queries) == 40
@@ -0,0 +1,78 @@
+"""Tests for asynchronous deployment teardown and its namespace sweep."""
+from __future__ import annotations
+
+from app.models import DeploymentORM
+from app.services import capacity, deployments, teardown
+from app.services.jobs import JobService
+from app.services.reconcile import DeploymentReconciler
+from tests.provisioner_utils import FakeProvisioner
+from tests.test_capacity import GIB, _create, immich  # noqa: F401
+
+
+def _deploy(db_session, immich, provisioner, count):
+    _, template, ptv_id = immich
+    created = [_create(db_session, template, ptv_id, n) for n in range(count)]
+    jobs = JobService(db_session)
+    while job := jobs.claim_next_job(worker_id="w"):
+        DeploymentReconciler(session=db_session, provisioner=provisioner).reconcile(job.deployment_id)
+        jobs.mark_job_done(job_id=job.id)
+    for deployment in created:
+        deployments.delete_deployment(db_session, user_id=deployment.user_id, deployment_id=deployment.id)
+    return created
+
+
+def test_async_delete_stays_deleting_until_the_namespace_is_gone(db_session, immich):
+    fake_provisioner = FakeProvisioner()
+    first, second = _deploy(db_session, immich, fake_provisioner, 2)
+    jobs = JobService(db_session)
+    while job := jobs.claim_next_job(worker_id="w"):
+        result = DeploymentReconciler(
+            session=db_session, provisioner=fake_provisioner, async_teardown=True
+        ).reconcile(job.deployment_id)
+        jobs.mark_job_done(job_id=job.id)
+        assert result.status == "deleting"
+
+    assert ("delete_namespace", {"name": first.namespace, "wait": False}) in fake_provisioner.calls
+    assert fake_provisioner.namespaces[first.namespace] == "Terminating"
+    assert capacity.get_capacity(db_session).memory_bytes.committed == 4 * GIB
+
+    sweep = teardown.sweep_teardowns(db_session, provisioner=fake_provisioner)
+    assert (sweep.deleted, sorted(sweep.terminating)) == ([], sorted([first.id, second.id]))
+
+    # The finalizers of the first namespace are done.
+    del fake_provisioner.namespaces[first.namespace]
+    sweep = teardown.sweep_teardowns(db_session, provisioner=fake_provisioner)
+
+    assert (sweep.deleted, sweep.terminating) == ([first.id], [second.id])
+    assert db_session.get(DeploymentORM, first.id).status == "deleted"
+    assert db_session.get(DeploymentORM, second.id).status == "deleting"
+    assert capacity.get_capacity(db_session).memory_bytes.committed == 2 * GIB
+    # One listing per sweep, however many teardowns are pending.
+    assert [name for name, _ in fake_provisioner.calls].count("list_namespaces") == 2
+
+
+def test_start_teardowns_claims_only_deletes_and_records_failures(db_session, immich):
+    class FlakyProvisioner(FakeProvisioner):
+        def helm_uninstall(self, *, release_name, namespace, timeout, wait):
+            if namespace == self.broken:
+                raise RuntimeError("cluster unreachable")
+            return super().helm_uninstall(release_name=release_name, namespace=namespace, timeout=timeout, wait=wait)
+
+    fake_provisioner = FlakyProvisioner()
+    created = _deploy(db_session, immich, fake_provisioner, 3)
+    fake_provisioner.broken = created[1].namespace
+    _, template, ptv_id = immich
+    pending_create = _create(db_session, template, ptv_id, 99)
+
+    first = teardown.start_teardowns(db_session, worker_id="purge", concurrency=2, provisioner=fake_provisioner)
+    second = teardown.start_teardowns(db_session, worker_id="purge", concurrency=2, provisioner=fake_provisioner)
+
+    assert [len(first), len(second)] == [2, 1]
+    assert teardown.start_teardowns(db_session, worker_id="purge", concurrency=2, provisioner=fake_provisioner) == []
+    by_deployment = {r.deployment_id: r for r in first + second}
+    assert set(by_deployment) == {d.id for d in created}
+    assert by_deployment[created[1].id].status == "error"
+    assert "cluster unreachable" in by_deployment[created[1].id].last_error
+    assert db_session.get(DeploymentORM, created[0].id).status == "deleting"
+    # The create job of another deployment is left for the workers.
+    assert JobService(db_session).claim_next_job(worker_id="w").deployment_id == pending_create.id
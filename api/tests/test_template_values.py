@@ -6,6 +6,7 @@ from app.services.errors import IntegrityException
 from app.services.template_values import (
     bytes_to_k8s_size,
     deep_merge,
+    find_hostname_paths,
     merge_values_scoped,
     validate_user_values,
 )
@@ -54,3 +55,29 @@ def test_deep_merge_replaces_arrays_and_scalars() -> None:
 )
 def test_bytes_to_k8s_size(input_bytes: int, expected: str) -> None:
     assert bytes_to_k8s_size(input_bytes) == expected
+
+
+def test_find_hostname_paths_walks_nested_combinators_and_arrays() -> None:
+    schema = {
+        "type": "object",
+        "properties": {
+            "user": {
+                "type": "object",
+                "properties": {
+                    "domain": {"type": "string", "title": "Hostname"},
+                    "aliases": {"type": "array", "items": {"type": "string", "title": "hostname"}},
+                    "extra": {"allOf": [{"properties": {"host": {"title": "hostname"}}}]},
+                },
+            },
+        },
+    }
+    assert find_hostname_paths(schema) == [
+        ["user", "domain"],
+        ["user", "aliases", "*"],
+        ["user", "extra", "host"],
+    ]
+
+
+def test_find_hostname_paths_handles_missing_schema() -> None:
+    assert find_hostname_paths(None) == []
+    assert find_hostname_paths({"type": "object"}) == []
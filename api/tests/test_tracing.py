@@ -0,0 +1,68 @@
+"""Tests for the optional OpenTelemetry spans and the trace context stored on jobs."""
+from __future__ import annotations
+
+from contextlib import contextmanager
+import subprocess
+
+import pytest
+
+sdk_trace = pytest.importorskip("opentelemetry.sdk.trace")
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor  # noqa: E402
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter  # noqa: E402
+
+from app import tracing, worker  # noqa: E402
+from app.proc import run_command  # noqa: E402
+from tests.provisioner_utils import FakeProvisioner  # noqa: E402
+from tests.test_capacity import _create, immich  # noqa: E402,F401
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    exporter = InMemorySpanExporter()
+    provider = sdk_trace.TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(tracing, "_tracer", lambda: provider.get_tracer("caelus"))
+    return exporter
+
+
+def test_worker_spans_join_the_trace_of_the_enqueuing_request(db_session, immich, spans, monkeypatch):
+    _, template, ptv_id = immich
+
+    @contextmanager
+    def _session_scope():
+        yield db_session
+
+    monkeypatch.setattr(worker, "session_scope", _session_scope)
+
+    with tracing.span("POST /api/users/{user_id}/deployments", kind="SERVER"):
+        deployment = _create(db_session, template, ptv_id, 1)
+    payload = worker.process_one_job("w", provisioner=FakeProvisioner())
+    run_command(
+        ["helm", "version"],
+        runner=lambda cmd: subprocess.CompletedProcess(cmd, 0, "", ""),
+        error_message="helm failed",
+    )
+
+    assert payload["deployment_id"] == deployment.id and payload["status"] == "done"
+    by_name = {span.name: span for span in spans.get_finished_spans()}
+    request, enqueue = by_name["POST /api/users/{user_id}/deployments"], by_name["reconcile_job.enqueue"]
+    queued, run, reconcile = by_name["reconcile_job.queued"], by_name["reconcile_job.run"], by_name["reconcile"]
+    assert {s.context.trace_id for s in (request, enqueue, queued, run, reconcile)} == {request.context.trace_id}
+    assert enqueue.parent.span_id == request.context.span_id
+    assert queued.parent.span_id == run.parent.span_id == enqueue.context.span_id
+    assert reconcile.parent.span_id == run.context.span_id
+    assert (run.attributes["deployment_id"], reconcile.attributes["status"]) == (str(deployment.id), "ready")
+    assert by_name["helm version"].attributes["returncode"] == 0
+
+
+def test_request_spans_continue_an_incoming_traceparent(client, spans):
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    resp = client.get(
+        "/api/namespace-pool/stats", headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"}
+    )
+
+    assert resp.status_code == 200
+    (span,) = spans.get_finished_spans()
+    assert span.name == "GET /api/namespace-pool/stats"
+    assert format(span.context.trace_id, "032x") == trace_id
+    assert span.attributes["http.response.status_code"] == 200
@@ -2,11 +2,23 @@
 Caelus Pricing Model — Interactive cost & pricing explorer.
 
 Run:  uv run streamlit run pricing_model.py --server.address 0.0.0.0 --server.port 8501
+
+The cost model itself lives in the API package (``api/app/pricing.py``) so the
+``caelus price-plans`` / ``price-sweep`` commands and the ``/api/pricing``
+endpoints compute exactly the same figures; this script is the UI around it.
 """
 
+import sys
+from pathlib import Path
+
+import numpy as np
 import streamlit as st
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "api"))
+
+from app import pricing  # noqa: E402
+
 st.set_page_config(page_title="Caelus Pricing Model", layout="wide")
 st.title("Caelus Pricing Model")
 
@@ -214,95 +226,80 @@ target_margin_pct = st.sidebar.slider(
 # ─────────────────────────────────────────────────
 # Helpers
 # ─────────────────────────────────────────────────
-def support_cost_per_customer_mo():
-    return (support_fte_cost_yr / 12) / customers_per_support_fte
-
+if cost_mode == "Server-share (recommended)":
+    cost_model = pricing.CostModel(
+        mode=pricing.COST_MODE_SERVER_SHARE,
+        server=pricing.ServerSpec(
+            name="Reference server",
+            cost_mo=server_cost_mo,
+            cpu_cores=server_cpu_cores,
+            ram_gb=server_ram_gb,
+            storage_tb=server_storage_tb,
+            storage_usable_pct=storage_usable_pct,
+            bw_included_tb=server_bw_included_tb,
+            extra_bw_cost_tb=extra_bw_cost_tb,
+        ),
+        nvme_cost_tb_yr=nvme_cost_tb_yr,
+        avg_storage_utilisation_pct=avg_storage_utilisation_pct,
+        support_fte_cost_yr=support_fte_cost_yr,
+        customers_per_support_fte=customers_per_support_fte,
+        target_margin_pct=target_margin_pct,
+    )
+else:
+    cost_model = pricing.CostModel(
+        mode=pricing.COST_MODE_COMPONENT,
+        components=pricing.ComponentCosts(
+            cpu_cost_core_mo=cpu_cost_core_mo,
+            ram_cost_gb_mo=ram_cost_gb_mo,
+            bandwidth_cost_tb=bandwidth_cost_tb,
+        ),
+        nvme_cost_tb_yr=nvme_cost_tb_yr,
+        avg_storage_utilisation_pct=avg_storage_utilisation_pct,
+        support_fte_cost_yr=support_fte_cost_yr,
+        customers_per_support_fte=customers_per_support_fte,
+        target_margin_pct=target_margin_pct,
+    )
 
-def cost_per_customer_mo(cpu_cores: float, ram_gb: float, storage_gb: float, bandwidth_gb_mo: float):
-    """Compute monthly cost-to-serve for one customer instance.
 
-    Storage is scaled by avg_storage_utilisation_pct: customers don't fill their
-    full quota on average, so the actual physical storage consumed (and thus
-    the cost) is lower than the plan size.  This enables overcommitting storage.
+def support_cost_per_customer_mo():
+    return cost_model.support_cost_mo
 
-    Server-share mode: baseline NVMe from server rental is a pooled resource.
-    Each customer's compute share "pays for" a proportional slice.  Only storage
-    beyond that included slice is charged at the NVMe expansion rate.
-    """
-    support = support_cost_per_customer_mo()
-    # Actual storage consumed on average (plan * utilisation%)
-    actual_storage_gb = storage_gb * (avg_storage_utilisation_pct / 100)
 
-    if cost_mode == "Server-share (recommended)":
-        # Compute: fraction of one server consumed by this customer
-        cpu_frac = cpu_cores / server_cpu_cores
-        ram_frac = ram_gb / server_ram_gb
-        server_frac = max(cpu_frac, ram_frac)
-        compute_cost = server_frac * server_cost_mo
-
-        # Storage: baseline NVMe is included in the server rental.
-        # The customer's compute share entitles them to a proportional slice
-        # of one server's usable storage.  Anything beyond that is expansion.
-        included_storage_gb = server_frac * usable_storage_per_server_tb * 1000
-        extra_storage_gb = max(0, actual_storage_gb - included_storage_gb)
-        storage_cost = (extra_storage_gb / 1000) * (nvme_cost_tb_yr / 12)
-
-        # Bandwidth: included pool is proportional to compute share
-        included_bw_tb = server_frac * server_bw_included_tb
-        extra_bw_tb = max(0, (bandwidth_gb_mo / 1000) - included_bw_tb)
-        bw_cost = extra_bw_tb * extra_bw_cost_tb
-
-        return compute_cost + storage_cost + bw_cost + support
-    else:
-        cpu = cpu_cores * cpu_cost_core_mo
-        ram = ram_gb * ram_cost_gb_mo
-        storage = (actual_storage_gb / 1000) * (nvme_cost_tb_yr / 12)
-        bw = (bandwidth_gb_mo / 1000) * bandwidth_cost_tb
-        return cpu + ram + storage + bw + support
+def tier_costs(cpu_cores, ram_gb, storage_gb, bandwidth_gb_mo):
+    """Evaluate all tiers of a product at once (cached on the inputs by the engine)."""
+    return pricing.evaluate(cost_model, cpu_cores, ram_gb, storage_gb, bandwidth_gb_mo)
 
 
-def cost_breakdown(cpu_cores: float, ram_gb: float, storage_gb: float, bandwidth_gb_mo: float):
-    """Return a dict with cost components for display."""
-    support = support_cost_per_customer_mo()
-    actual_storage_gb = storage_gb * (avg_storage_utilisation_pct / 100)
+def cost_breakdown(result):
+    """Return one dict of display strings per evaluated scenario."""
     util_pct = avg_storage_utilisation_pct
-
-    if cost_mode == "Server-share (recommended)":
-        cpu_frac = cpu_cores / server_cpu_cores
-        ram_frac = ram_gb / server_ram_gb
-        server_frac = max(cpu_frac, ram_frac)
-        bottleneck = "CPU" if cpu_frac >= ram_frac else "RAM"
-        compute_cost = server_frac * server_cost_mo
-
-        included_storage_gb = server_frac * usable_storage_per_server_tb * 1000
-        extra_storage_gb = max(0, actual_storage_gb - included_storage_gb)
-        storage_cost = (extra_storage_gb / 1000) * (nvme_cost_tb_yr / 12)
-
-        included_bw_tb = server_frac * server_bw_included_tb
-        extra_bw_tb = max(0, (bandwidth_gb_mo / 1000) - included_bw_tb)
-        bw_cost = extra_bw_tb * extra_bw_cost_tb
-
-        return {
-            "Server share": f"{server_frac * 100:.2f}% ({bottleneck}-bound)",
-            "Compute": f"${compute_cost:.2f}",
-            "Avg usage": f"{actual_storage_gb:.0f}GB ({util_pct}% of {storage_gb:.0f}GB)",
-            "Incl. storage": f"{included_storage_gb:.0f}GB",
-            "Extra storage": f"${storage_cost:.2f}" + (f" ({extra_storage_gb:.0f}GB)" if extra_storage_gb > 0 else ""),
-            "Bandwidth": f"${bw_cost:.2f}",
-            "Support": f"${support:.2f}",
-        }
-    else:
-        return {
-            "CPU": f"${cpu_cores * cpu_cost_core_mo:.2f}",
-            "RAM": f"${ram_gb * ram_cost_gb_mo:.2f}",
-            "Storage": f"${(actual_storage_gb / 1000) * (nvme_cost_tb_yr / 12):.2f} ({actual_storage_gb:.0f}GB @ {util_pct}%)",
-            "Bandwidth": f"${(bandwidth_gb_mo / 1000) * bandwidth_cost_tb:.2f}",
-            "Support": f"${support:.2f}",
-        }
+    rows = []
+    for r in result.rows():
+        if cost_model.mode == pricing.COST_MODE_SERVER_SHARE:
+            bottleneck = "CPU" if r["cpu_bound"] else "RAM"
+            extra = f" ({r['extra_storage_gb']:.0f}GB)" if r["extra_storage_gb"] > 0 else ""
+            rows.append({
+                "Server share": f"{r['server_share'] * 100:.2f}% ({bottleneck}-bound)",
+                "Compute": f"${r['compute']:.2f}",
+                "Avg usage": f"{r['storage_used_gb']:.0f}GB ({util_pct}% of {r['storage_gb']:.0f}GB)",
+                "Incl. storage": f"{r['included_storage_gb']:.0f}GB",
+                "Extra storage": f"${r['storage']:.2f}" + extra,
+                "Bandwidth": f"${r['bandwidth']:.2f}",
+                "Support": f"${r['support']:.2f}",
+            })
+        else:
+            rows.append({
+                "CPU": f"${r['cpu']:.2f}",
+                "RAM": f"${r['ram']:.2f}",
+                "Storage": f"${r['storage']:.2f} ({r['storage_used_gb']:.0f}GB @ {util_pct}%)",
+                "Bandwidth": f"${r['bandwidth']:.2f}",
+                "Support": f"${r['support']:.2f}",
+            })
+    return rows
 
 
 def price_from_cost(cost: float):
-    return cost / (1 - target_margin_pct / 100)
+    return float(pricing.price_from_cost(cost, target_margin_pct))
 
 
 # ─────────────────────────────────────────────────
@@ -448,12 +445,13 @@ with tab_immich:
     ente_monthly = [2.99, 5.99, 11.99, 23.99]
     ente_annual = [2.49, 4.99, 9.99, 19.99]
 
+    immich_storage = np.array(immich_tiers_gb) * (1 + immich_db_overhead_pct / 100)
+    immich = tier_costs(immich_cpu, immich_ram, immich_storage, immich_bw)
+
     rows = []
-    for i, tier_gb in enumerate(immich_tiers_gb):
-        effective_storage = tier_gb * (1 + immich_db_overhead_pct / 100)
-        cost = cost_per_customer_mo(immich_cpu, immich_ram, effective_storage, immich_bw)
-        suggested = price_from_cost(cost)
-        breakdown = cost_breakdown(immich_cpu, immich_ram, effective_storage, immich_bw)
+    for i, (tier_gb, breakdown) in enumerate(zip(immich_tiers_gb, cost_breakdown(immich))):
+        cost = immich["cost"][i]
+        suggested = immich["price"][i]
         row = {"Tier": f"{tier_gb} GB", "Total Cost": f"${cost:.2f}", "Suggested Price": f"${suggested:.2f}",
                "Ente Price": f"${ente_monthly[i]:.2f}", "vs Ente": f"{((suggested / ente_monthly[i]) - 1) * 100:+.0f}%"}
         row.update(breakdown)
@@ -464,8 +462,7 @@ with tab_immich:
     st.subheader("Margin if Matching Competitor Price")
     margin_rows = []
     for i, tier_gb in enumerate(immich_tiers_gb):
-        effective_storage = tier_gb * (1 + immich_db_overhead_pct / 100)
-        cost = cost_per_customer_mo(immich_cpu, immich_ram, effective_storage, immich_bw)
+        cost = immich["cost"][i]
         for label, comp_price in [("Ente monthly", ente_monthly[i]), ("Ente annual", ente_annual[i])]:
             margin = ((comp_price - cost) / comp_price) * 100 if comp_price > 0 else 0
             margin_rows.append({
@@ -516,12 +513,13 @@ with tab_nextcloud:
 
     nc_tiers_gb = [100, 500, 1000, 2000]
 
+    nc_storage = np.array(nc_tiers_gb) * (1 + nc_db_overhead_pct / 100)
+    nc = tier_costs(nc_cpu, nc_ram, nc_storage, nc_bw)
+
     nc_rows = []
-    for tier_gb in nc_tiers_gb:
-        effective_storage = tier_gb * (1 + nc_db_overhead_pct / 100)
-        cost = cost_per_customer_mo(nc_cpu, nc_ram, effective_storage, nc_bw)
-        suggested = price_from_cost(cost)
-        breakdown = cost_breakdown(nc_cpu, nc_ram, effective_storage, nc_bw)
+    for i, (tier_gb, breakdown) in enumerate(zip(nc_tiers_gb, cost_breakdown(nc))):
+        cost = nc["cost"][i]
+        suggested = nc["price"][i]
         row = {"Tier": f"{tier_gb} GB", "Total Cost": f"${cost:.2f}", "Suggested Price": f"${suggested:.2f}"}
         row.update(breakdown)
         nc_rows.append(row)
@@ -535,9 +533,8 @@ with tab_nextcloud:
         2000: ("pCloud 2TB", 8.33),
     }
     nc_margin_rows = []
-    for tier_gb in nc_tiers_gb:
-        effective_storage = tier_gb * (1 + nc_db_overhead_pct / 100)
-        cost = cost_per_customer_mo(nc_cpu, nc_ram, effective_storage, nc_bw)
+    for i, tier_gb in enumerate(nc_tiers_gb):
+        cost = nc["cost"][i]
         comp_name, comp_price = nc_comp_prices[tier_gb]
         margin = ((comp_price - cost) / comp_price) * 100 if comp_price > 0 else 0
         nc_margin_rows.append({
@@ -585,8 +582,9 @@ with tab_vaultwarden:
 
     st.subheader("Pricing Analysis")
 
-    vw_cost = cost_per_customer_mo(vw_cpu, vw_ram, vw_storage, vw_bw)
-    vw_breakdown = cost_breakdown(vw_cpu, vw_ram, vw_storage, vw_bw)
+    vw = tier_costs(vw_cpu, vw_ram, vw_storage, vw_bw)
+    vw_cost = float(vw["cost"][0])
+    vw_breakdown = cost_breakdown(vw)[0]
 
     st.write("**Cost breakdown (individual):**")
     st.json(vw_breakdown)
@@ -659,9 +657,8 @@ with tab_scenario:
     immich_prices = {}
     with price_col1:
         st.write("**Immich**")
-        for tier_gb in immich_tiers_gb:
-            effective_storage = tier_gb * (1 + immich_db_overhead_pct / 100)
-            default_price = price_from_cost(cost_per_customer_mo(immich_cpu, immich_ram, effective_storage, immich_bw))
+        for i, tier_gb in enumerate(immich_tiers_gb):
+            default_price = float(immich["price"][i])
             immich_prices[tier_gb] = st.number_input(
                 f"Immich {tier_gb}GB price", value=round(default_price, 2), step=0.50,
                 key=f"price_immich_{tier_gb}", format="%.2f"
@@ -670,9 +667,8 @@ with tab_scenario:
     nc_prices = {}
     with price_col2:
         st.write("**Nextcloud**")
-        for tier_gb in nc_tiers_gb:
-            effective_storage = tier_gb * (1 + nc_db_overhead_pct / 100)
-            default_price = price_from_cost(cost_per_customer_mo(nc_cpu, nc_ram, effective_storage, nc_bw))
+        for i, tier_gb in enumerate(nc_tiers_gb):
+            default_price = float(nc["price"][i])
             nc_prices[tier_gb] = st.number_input(
                 f"NC {tier_gb}GB price", value=round(default_price, 2), step=0.50,
                 key=f"price_nc_{tier_gb}", format="%.2f"
@@ -716,17 +712,13 @@ with tab_scenario:
 
     _products = []
 
-    for tier_gb in immich_tiers_gb:
-        eff = tier_gb * (1 + immich_db_overhead_pct / 100)
-        _products.append(_add(f"Immich {tier_gb}GB", immich_counts[tier_gb],
-                              cost_per_customer_mo(immich_cpu, immich_ram, eff, immich_bw),
-                              immich_prices[tier_gb], immich_cpu, immich_ram, eff))
-
-    for tier_gb in nc_tiers_gb:
-        eff = tier_gb * (1 + nc_db_overhead_pct / 100)
-        _products.append(_add(f"Nextcloud {tier_gb}GB", nc_counts[tier_gb],
-                              cost_per_customer_mo(nc_cpu, nc_ram, eff, nc_bw),
-                              nc_prices[tier_gb], nc_cpu, nc_ram, eff))
+    for i, tier_gb in enumerate(immich_tiers_gb):
+        _products.append(_add(f"Immich {tier_gb}GB", immich_counts[tier_gb], immich["cost"][i],
+                              immich_prices[tier_gb], immich_cpu, immich_ram, immich_storage[i]))
+
+    for i, tier_gb in enumerate(nc_tiers_gb):
+        _products.append(_add(f"Nextcloud {tier_gb}GB", nc_counts[tier_gb], nc["cost"][i],
+                              nc_prices[tier_gb], nc_cpu, nc_ram, nc_storage[i]))
 
     _products.append(_add("VW Individual", vw_individual, vw_cost, vw_ind_price, vw_cpu, vw_ram, vw_storage))
     _products.append(_add("VW Family", vw_family, vw_cost * 2.5, vw_fam_price, vw_cpu * 2.5, vw_ram * 2.5, vw_storage * 2.5))
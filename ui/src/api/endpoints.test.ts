@@ -1,5 +1,5 @@
 import { describe, expect, it, vi } from 'vitest'
-import { createDeployment, createTemplate } from './endpoints'
+import { createDeployment, createTemplate, waitForCheckoutUrl } from './endpoints'
 import { requestJson } from './client'
 
 vi.mock('./client', () => ({
@@ -108,4 +108,16 @@ describe('endpoints payload contracts', () => {
       }),
     })
   })
+
+  it('long-polls the checkout endpoint while the checkout is pending', async () => {
+    vi.mocked(requestJson).mockReset()
+    vi.mocked(requestJson)
+      .mockResolvedValueOnce({ status: 'pending', checkout_url: null, last_error: null } as never)
+      .mockResolvedValueOnce({ status: 'ready', checkout_url: 'https://pay.example/tr_1', last_error: null } as never)
+
+    const created = { deployment: { id: 'abc' }, checkout_url: null, checkout_status: 'pending' } as never
+    await expect(waitForCheckoutUrl(3, created)).resolves.toBe('https://pay.example/tr_1')
+    expect(requestJson).toHaveBeenCalledWith('/users/3/deployments/abc/checkout?wait=25')
+    expect(requestJson).toHaveBeenCalledTimes(2)
+  })
 })
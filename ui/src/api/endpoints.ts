@@ -1,5 +1,5 @@
 import { requestJson, requestMultipart } from './client'
-import type { Deployment, DeploymentCreateResponse, HostnameCheckResult, Plan, PlanTemplateVersion, Product, ProductTemplate, User } from './types'
+import type { Checkout, Deployment, DeploymentCreateResponse, HostnameCheckResult, Plan, PlanTemplateVersion, Product, ProductTemplate, User } from './types'
 
 export function getMe() {
   return requestJson<User>('/me')
@@ -136,6 +136,21 @@ export function createDeployment(
   })
 }
 
+export function getCheckout(userId: number, deploymentId: string, waitSeconds = 0) {
+  return requestJson<Checkout>(`/users/${userId}/deployments/${deploymentId}/checkout?wait=${waitSeconds}`)
+}
+
+/** Resolve the checkout URL of a new paid deployment, long-polling while it is being created. */
+export async function waitForCheckoutUrl(userId: number, created: DeploymentCreateResponse, attempts = 4) {
+  if (created.checkout_url || created.checkout_status !== 'pending') return created.checkout_url
+  for (let i = 0; i < attempts; i++) {
+    const checkout = await getCheckout(userId, created.deployment.id, 25)
+    if (checkout.status === 'ready') return checkout.checkout_url
+    if (checkout.status !== 'pending') break
+  }
+  throw new Error('Checkout is not available yet. Please try again from your deployments list.')
+}
+
 export function updateDeployment(
   userId: number,
   deploymentId: string,
@@ -13,7 +13,10 @@ export interface Product {
   name: string
   description?: string | null
   template_id?: number | null
+  cluster?: string | null
   icon_url?: string | null
+  // Variant name (e.g. "64.webp") -> URL; absent for older icons.
+  icon_variants?: Record<string, string> | null
   created_at: IsoDate
 }
 
@@ -27,6 +30,9 @@ export interface ProductTemplate {
   system_values_json?: Record<string, unknown> | null
   values_schema_json?: Record<string, unknown> | null
   capabilities_json?: Record<string, unknown> | null
+  footprint_cpu_millicores?: number | null
+  footprint_memory_bytes?: number | null
+  footprint_storage_bytes?: number | null
   created_at: IsoDate
   product: Product
 }
@@ -81,6 +87,7 @@ export interface Deployment {
   applied_template?: ProductTemplate | null
   subscription_id?: number | null
   subscription?: Subscription | null
+  cluster?: string | null
   name?: string | null
   namespace?: string | null
   status?: DeploymentStatus
@@ -92,4 +99,13 @@ export interface Deployment {
 export interface DeploymentCreateResponse {
   deployment: Deployment
   checkout_url: string | null
+  checkout_status?: CheckoutStatus | null
+}
+
+export type CheckoutStatus = 'pending' | 'ready' | 'failed' | 'not_required'
+
+export interface Checkout {
+  status: CheckoutStatus
+  checkout_url: string | null
+  last_error: string | null
 }
@@ -15,6 +15,7 @@ vi.mock('../api/endpoints', () => ({
   listTemplates: (...args: unknown[]) => listTemplatesMock(...args),
   listPlans: (...args: unknown[]) => listPlansMock(...args),
   createDeployment: (...args: unknown[]) => createDeploymentMock(...args),
+  waitForCheckoutUrl: async (_userId: number, created: { checkout_url: string | null }) => created.checkout_url,
   updateDeployment: (...args: unknown[]) => updateDeploymentMock(...args),
   checkHostname: (...args: unknown[]) => checkHostnameMock(...args),
   listDomains: (...args: unknown[]) => listDomainsMock(...args),
@@ -1,7 +1,7 @@
 import { Dialog, DialogContent } from '@mui/material'
 import { useMutation, useQuery, useQueryClient } from '@tanstack/react-query'
 import { useCallback, useMemo, useState } from 'react'
-import { createDeployment, updateDeployment, listTemplates, listPlans } from '../api/endpoints'
+import { createDeployment, updateDeployment, listTemplates, listPlans, waitForCheckoutUrl } from '../api/endpoints'
 import type { Deployment, Plan, Product, ProductTemplate } from '../api/types'
 import { validateUserValues } from './UserValuesForm'
 import { DeployDialogContent } from './DeployDialogContent'
@@ -61,12 +61,15 @@ export function DeployDialog({ product, userId, onClose, deployment }: DeployDia
   }, [isEditMode, selectedPlanTemplateId, plans])
 
   const createMutation = useMutation({
-    mutationFn: (payload: { templateId: number; userValuesJson?: object; planTemplateId?: number }) =>
-      createDeployment(userId, {
+    mutationFn: async (payload: { templateId: number; userValuesJson?: object; planTemplateId?: number }) => {
+      const created = await createDeployment(userId, {
         desired_template_id: payload.templateId,
         user_values_json: payload.userValuesJson,
         plan_template_id: payload.planTemplateId,
-      }),
+      })
+      // Paid plans: the checkout may still be being created after the deployment commits.
+      return { ...created, checkout_url: await waitForCheckoutUrl(userId, created) }
+    },
     onSuccess: (data) => {
       queryClient.invalidateQueries({ queryKey: ['deployments'] })
       if (data.checkout_url) {
@@ -11,8 +11,8 @@ import {
   Typography,
 } from '@mui/material'
 import CheckCircleIcon from '@mui/icons-material/CheckCircle'
-import { resolveApiPath } from '../api/client'
 import type { Plan, Product } from '../api/types'
+import { productIconProps } from '../utils/productIcon'
 import { UserValuesForm } from './UserValuesForm'
 import { PlanCardContent } from './PlanCardContent'
 
@@ -63,7 +63,7 @@ export function DeployDialogContent({
     <>
       <Stack direction="row" spacing={2} alignItems="center" sx={{ mb: 2 }}>
         <Avatar
-          src={product.icon_url ? resolveApiPath(product.icon_url) : undefined}
+          {...productIconProps(product)}
           alt={product.name}
           variant="rounded"
           sx={{ width: 48, height: 48 }}
@@ -9,8 +9,8 @@ import {
 } from '@mui/material'
 import AddIcon from '@mui/icons-material/Add'
 import { useMemo } from 'react'
-import { resolveApiPath } from '../api/client'
 import type { Product } from '../api/types'
+import { productIconProps } from '../utils/productIcon'
 
 interface ProductListProps {
   products?: Product[]
@@ -46,7 +46,7 @@ export function ProductList({ products, selectedProductId, onSelectProduct, show
             >
               <CardContent sx={{ flex: 1, display: 'flex', flexDirection: 'column', alignItems: 'center', textAlign: 'center', gap: 1 }}>
                 <Avatar
-                  src={product.icon_url ? resolveApiPath(product.icon_url) : undefined}
+                  {...productIconProps(product)}
                   alt={product.name}
                   variant="rounded"
                   sx={{ width: 48, height: 48 }}
@@ -10,9 +10,9 @@ import {
 import EditIcon from '@mui/icons-material/Edit'
 import { useMutation, useQueryClient } from '@tanstack/react-query'
 import { deleteProduct, updateProduct } from '../api/endpoints'
-import { resolveApiPath } from '../api/client'
 import type { Product } from '../api/types'
 import { formatDateTime } from '../utils/format'
+import { productIconProps } from '../utils/productIcon'
 import { ConfirmDeleteDialog } from './ConfirmDeleteDialog'
 
 interface SelectedProductProps {
@@ -185,7 +185,7 @@ export function SelectedProduct({ product, onError }: SelectedProductProps) {
           onClick={handleIconClick}
         >
           <Avatar
-            src={product.icon_url ? resolveApiPath(product.icon_url) : undefined}
+            {...productIconProps(product)}
             alt={product.name}
             variant="rounded"
             sx={{ width: 64, height: 64 }}
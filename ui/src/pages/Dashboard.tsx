@@ -23,10 +23,10 @@ import {
   listProducts,
 } from '../api/endpoints'
 import type { Deployment, Product } from '../api/types'
-import { resolveApiPath } from '../api/client'
 import { useAuth } from '../state/AuthContext'
 import { isTransitionalStatus, statusColor } from '../utils/deploymentStatus'
 import { ensureUrl, formatDateTime } from '../utils/format'
+import { productIconProps } from '../utils/productIcon'
 import { ProductList } from '../components/ProductList'
 import { DeployDialog } from '../components/DeployDialog'
 import { ConfirmDeleteDialog } from '../components/ConfirmDeleteDialog'
@@ -145,7 +145,7 @@ function Dashboard() {
                       </Typography>
                     </Stack>
                     <Avatar
-                      src={deployment.desired_template?.product?.icon_url ? resolveApiPath(deployment.desired_template.product.icon_url) : undefined}
+                      {...productIconProps(deployment.desired_template?.product)}
                       alt={deployment.desired_template?.product?.name}
                       variant="rounded"
                       sx={{ width: 64, height: 64, flexShrink: 0 }}
@@ -0,0 +1,29 @@
+import { describe, expect, it } from 'vitest'
+import { resolveApiPath } from '../api/client'
+import { productIconProps } from './productIcon'
+
+describe('productIconProps', () => {
+  it('prefers the WebP variants with a 2x candidate', () => {
+    const props = productIconProps({
+      icon_url: '/api/static/icons/abc/256.png',
+      icon_variants: {
+        '64.webp': '/api/static/icons/abc/64.webp',
+        '128.webp': '/api/static/icons/abc/128.webp',
+      },
+    })
+    expect(props.src).toBe(resolveApiPath('/api/static/icons/abc/64.webp'))
+    expect(props.srcSet).toBe(
+      `${resolveApiPath('/api/static/icons/abc/64.webp')} 1x, ${resolveApiPath('/api/static/icons/abc/128.webp')} 2x`,
+    )
+  })
+
+  it('falls back to icon_url for icons without variants', () => {
+    const props = productIconProps({ icon_url: '/api/static/icons/old.png', icon_variants: null })
+    expect(props).toEqual({ src: resolveApiPath('/api/static/icons/old.png') })
+  })
+
+  it('returns no source without an icon', () => {
+    expect(productIconProps({ icon_url: null })).toEqual({ src: undefined })
+    expect(productIconProps(undefined)).toEqual({ src: undefined })
+  })
+})
@@ -0,0 +1,22 @@
+import { resolveApiPath } from '../api/client'
+import type { Product } from '../api/types'
+
+type IconSource = Pick<Product, 'icon_url' | 'icon_variants'>
+
+/**
+ * Avatar image props for a product icon: the 64px WebP with the 128px one
+ * for high-density screens, falling back to the 256px PNG for icons
+ * uploaded before variants were generated.
+ */
+export function productIconProps(product?: IconSource | null): { src?: string; srcSet?: string } {
+  const variants = product?.icon_variants
+  const small = variants?.['64.webp']
+  if (small) {
+    const large = variants?.['128.webp']
+    return {
+      src: resolveApiPath(small),
+      srcSet: large ? `${resolveApiPath(small)} 1x, ${resolveApiPath(large)} 2x` : undefined,
+    }
+  }
+  return { src: product?.icon_url ? resolveApiPath(product.icon_url) : undefined }
+}